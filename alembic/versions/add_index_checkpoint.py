@@ -0,0 +1,36 @@
+"""add index checkpoint table
+
+Revision ID: add_index_checkpoint
+Revises: add_thread_ucb_score
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_index_checkpoint"
+down_revision = "add_thread_ucb_score"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "index_checkpoint",
+        sa.Column("channel_id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("guild_id", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("status", sa.String(), nullable=False, server_default="running"),
+        sa.Column("run_started_at", sa.DateTime(), nullable=False),
+        sa.Column("run_since", sa.DateTime(), nullable=True),
+        sa.Column("resume_before", sa.DateTime(), nullable=True),
+        sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failures", sa.JSON(), nullable=True),
+        sa.Column("last_completed_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("channel_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("index_checkpoint")
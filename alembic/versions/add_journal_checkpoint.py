@@ -0,0 +1,28 @@
+"""add journal checkpoint table
+
+Revision ID: add_journal_checkpoint
+Revises: add_user_unread_counter
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_journal_checkpoint"
+down_revision = "add_user_unread_counter"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "journal_checkpoint",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("segment", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("journal_checkpoint")
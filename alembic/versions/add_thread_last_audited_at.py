@@ -0,0 +1,28 @@
+"""add last audited time to thread
+
+Revision ID: add_thread_last_audited_at
+Revises: add_index_checkpoint
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_thread_last_audited_at"
+down_revision = "add_index_checkpoint"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 旧数据为空，审计器会以创建时间作为基准安排首次审计
+    with op.batch_alter_table("thread", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("last_audited_at", sa.DateTime(), nullable=True))
+        batch_op.create_index("ix_thread_last_audited_at", ["last_audited_at"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("thread", schema=None) as batch_op:
+        batch_op.drop_index("ix_thread_last_audited_at")
+        batch_op.drop_column("last_audited_at")
@@ -0,0 +1,35 @@
+"""add materialized ucb score to thread
+
+Revision ID: add_thread_ucb_score
+Revises: add_user_update_pref
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_thread_ucb_score"
+down_revision = "add_user_update_pref"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 分数由 UcbScoreService 在启动时全量计算，这里只需建列和索引
+    with op.batch_alter_table("thread", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "ucb_score",
+                sa.Float(),
+                nullable=False,
+                server_default=sa.text("0"),
+            )
+        )
+        batch_op.create_index("ix_thread_ucb_score", ["ucb_score"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("thread", schema=None) as batch_op:
+        batch_op.drop_index("ix_thread_ucb_score")
+        batch_op.drop_column("ucb_score")
@@ -0,0 +1,43 @@
+"""add user unread counter table
+
+Revision ID: add_user_unread_counter
+Revises: add_thread_last_audited_at
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "add_user_unread_counter"
+down_revision = "add_thread_last_audited_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_unread_counter",
+        sa.Column("user_id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("unread_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # 用现有的关注记录初始化计数
+    op.execute(
+        """
+        INSERT INTO user_unread_counter (user_id, unread_count)
+        SELECT thread_follow.user_id, COUNT(*)
+        FROM thread_follow
+        JOIN thread ON thread_follow.thread_id = thread.thread_id
+        WHERE thread.latest_update_at IS NOT NULL
+          AND (
+            thread_follow.last_viewed_at IS NULL
+            OR thread.latest_update_at > thread_follow.last_viewed_at
+          )
+        GROUP BY thread_follow.user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_unread_counter")
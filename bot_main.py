@@ -11,20 +11,34 @@ if sys.platform != "win32":
 
 
 import json
+import time
 import discord
 import logging
 from discord.ext import commands
 import asyncio
+import contextlib
 import uvicorn
 
-from shared.database import AsyncSessionFactory, init_db, close_db
+from shared.database import (
+    AsyncSessionFactory,
+    ReadSessionFactory,
+    close_db,
+    configure_database,
+    init_db,
+)
 from ThreadManager.cog import ThreadManager
 from core.tag_cache_service import TagCacheService
 from core.cache_service import CacheService
-from core.sync_service import SyncService
+from core.author_cache_service import AuthorCacheService
+from core.sync_service import DEFAULT_REPOST_FETCH_CONCURRENCY, SyncService
 from core.impression_cache_service import ImpressionCacheService
+from shared.write_ahead_journal import open_journal
+from core.thread_index_service import ThreadIndexService
+from core.ucb_score_service import UcbScoreService
+from core.thumbnail_refresh_service import ThumbnailRefreshService
 from indexer.cog import Indexer
 from search.cog import Search
+from search.result_cache import SearchResultCache
 from preferences.cog import Preferences
 from preferences.preferences_service import PreferencesService
 from auditor.cog import Auditor
@@ -34,6 +48,8 @@ from config.config_service import ConfigService
 from collection.cog import CollectionCog
 from update_detector.cog import UpdateDetector
 from shared.api_scheduler import APIScheduler
+from shared.http_client import close_http_client
+from shared.metrics import set_slow_search_threshold
 from api.v1.routers import (
     preferences as preferences_api,
     search as search_api,
@@ -43,33 +59,55 @@ from api.v1.routers import (
     booklists as booklists_api,
 )
 from api.main import app as fastapi_app
+from api.state_snapshot import DEFAULT_EVENTS_DIR, DEFAULT_STATE_PATH, ApiStateWriter
 from api.v1.dependencies.security import initialize_api_security
-from api.v1.routers.auth import initialize_auth_config
+from api.v1.routers.auth import get_member_cache, initialize_auth_config
 
 logger = logging.getLogger(__name__)
 
+# API 工作进程意外退出后重启前的等待时间（秒），连续退出时逐次翻倍
+API_WORKER_RESTART_DELAY = 5
+API_WORKER_MAX_RESTART_DELAY = 300
+# 运行超过这个时间（秒）后才退出的，重启等待时间恢复为初始值
+API_WORKER_STABLE_SECONDS = 60
+
 
 class MyBot(commands.Bot):
     def __init__(self, *, intents: discord.Intents, config: dict):
         proxy = config.get("proxy")
-        bot_kwargs = {"command_prefix": "!", "intents": intents}
+        performance = config.get("performance", {})
+
+        # 从配置初始化API调度器，并通过 HTTP 追踪回调让其读取速率限制响应头
+        self.api_scheduler = APIScheduler(
+            concurrent_requests=performance.get("api_scheduler_concurrency", 40),
+            reserved_ratio=performance.get("api_reserved_ratio", 0.2),
+        )
+        bot_kwargs = {
+            "command_prefix": "!",
+            "intents": intents,
+            "http_trace": self.api_scheduler.rate_limits.trace_config(),
+        }
         if proxy:
             bot_kwargs["proxy"] = proxy
+        max_ratelimit_timeout = performance.get("api_max_ratelimit_timeout")
+        if max_ratelimit_timeout:
+            # 等待时间更长的 429 交给调度器重新排队，不在请求内部休眠占用并发
+            bot_kwargs["max_ratelimit_timeout"] = max_ratelimit_timeout
         super().__init__(**bot_kwargs)
 
         self.config = config
         self.db_url = config["db_url"]
         self.tag_cache_service: TagCacheService
         self.cache_service: CacheService
+        self.author_cache_service: AuthorCacheService
         self.sync_service: SyncService
         self.impression_cache_service: ImpressionCacheService
+        self.thread_index_service: ThreadIndexService | None = None
+        self.search_result_cache: SearchResultCache | None = None
+        self.ucb_score_service: UcbScoreService | None = None
+        self.thumbnail_refresh_service: ThumbnailRefreshService | None = None
         self.config_service: ConfigService
-
-        # 从配置初始化API调度器
-        concurrency = self.config.get("performance", {}).get(
-            "api_scheduler_concurrency", 40
-        )
-        self.api_scheduler = APIScheduler(concurrent_requests=concurrency)
+        self.api_state_writer: ApiStateWriter | None = None
 
     async def process_commands(self, message: discord.Message):
         """
@@ -119,7 +157,19 @@ class MyBot(commands.Bot):
         """在机器人登录前执行的初始化。"""
         # 启动API调度器
         self.api_scheduler.start()
-        await init_db()
+        await configure_database(
+            self.config.get("performance", {}).get("db_profile", "default")
+        )
+        await init_db(
+            fts_rebuild_workers=self.config.get("performance", {}).get(
+                "fts_rebuild_workers", 0
+            )
+        )
+
+        set_slow_search_threshold(
+            self.config.get("performance", {}).get("slow_search_threshold_ms", 1000)
+            / 1000
+        )
 
         # 确保搜索配置存在并初始化缓存
         async with AsyncSessionFactory() as session:
@@ -130,20 +180,78 @@ class MyBot(commands.Bot):
         # 1. 初始化核心服务
         self.tag_cache_service = TagCacheService(AsyncSessionFactory)
         self.cache_service = CacheService(self, AsyncSessionFactory)
+        self.author_cache_service = AuthorCacheService(
+            bot=self,
+            session_factory=AsyncSessionFactory,
+            ttl=self.config.get("performance", {}).get("author_cache_ttl", 3600),
+        )
+        self.author_cache_service.start()
         self.sync_service = SyncService(
             bot=self,
             session_factory=AsyncSessionFactory,
+            author_cache=self.author_cache_service,
+            repost_fetch_concurrency=self.config.get("performance", {}).get(
+                "repost_fetch_concurrency", DEFAULT_REPOST_FETCH_CONCURRENCY
+            ),
         )
         self.impression_cache_service = ImpressionCacheService(
-            bot=self, session_factory=AsyncSessionFactory
+            bot=self,
+            session_factory=AsyncSessionFactory,
+            flush_interval=self.config.get("performance", {}).get(
+                "impression_flush_interval", 60
+            ),
+            journal=open_journal(
+                self.config.get("performance", {}).get("journal_dir", "data/journal"),
+                "impressions",
+            ),
         )
-        self.impression_cache_service.start()
+        await self.impression_cache_service.start()
+
+        # 可选的帖子内存索引，开启后搜索的过滤和排序不再走 SQL
+        if self.config.get("performance", {}).get("thread_index_enabled", False):
+            self.thread_index_service = ThreadIndexService(AsyncSessionFactory)
+
+        # 搜索结果缓存，设置为 0 时关闭
+        result_cache_size = self.config.get("performance", {}).get(
+            "search_result_cache_size", 256
+        )
+        if result_cache_size > 0:
+            self.search_result_cache = SearchResultCache(max_entries=result_cache_size)
+
+        # 物化的 UCB1 分数，综合排序可以走索引
+        if self.config.get("performance", {}).get("materialized_ucb_score", True):
+            self.ucb_score_service = UcbScoreService(
+                AsyncSessionFactory,
+                rescore_interval=self.config.get("performance", {}).get(
+                    "ucb_rescore_interval", 3600
+                ),
+            )
+            self.ucb_score_service.start()
+
+        # 封面链接过期前主动重新签名，设置为 0 时关闭
+        thumbnail_lead_time = self.config.get("performance", {}).get(
+            "thumbnail_refresh_lead_time", 3600
+        )
+        if thumbnail_lead_time > 0:
+            self.thumbnail_refresh_service = ThumbnailRefreshService(
+                bot=self,
+                session_factory=AsyncSessionFactory,
+                lead_time=thumbnail_lead_time,
+            )
 
         # 并行构建缓存
-        await asyncio.gather(
+        cache_tasks = [
             self.tag_cache_service.build_cache(),
             self.cache_service.build_or_refresh_cache(),
-        )
+            self.author_cache_service.load(),
+        ]
+        if self.thread_index_service:
+            cache_tasks.append(self.thread_index_service.build())
+        if self.thumbnail_refresh_service:
+            cache_tasks.append(self.thumbnail_refresh_service.load())
+        await asyncio.gather(*cache_tasks)
+        if self.thumbnail_refresh_service:
+            self.thumbnail_refresh_service.start()
 
         # 1.5. 初始化共享服务
         preferences_service = PreferencesService(
@@ -172,12 +280,16 @@ class MyBot(commands.Bot):
             Search(
                 bot=self,
                 session_factory=AsyncSessionFactory,
+                read_session_factory=ReadSessionFactory,
                 config=self.config,
                 tag_service=self.tag_cache_service,
                 cache_service=self.cache_service,
                 preferences_service=preferences_service,
                 impression_cache_service=self.impression_cache_service,
                 config_service=self.config_service,
+                thread_index_service=self.thread_index_service,
+                result_cache=self.search_result_cache,
+                ucb_score_service=self.ucb_score_service,
             ),
             Preferences(
                 bot=self,
@@ -190,6 +302,9 @@ class MyBot(commands.Bot):
                 session_factory=AsyncSessionFactory,
                 api_scheduler=self.api_scheduler,
                 sync_service=self.sync_service,
+                reconcile_interval_hours=self.config.get("performance", {}).get(
+                    "audit_reconcile_interval_hours", 6
+                ),
             ),
             Configuration(
                 bot=self,
@@ -220,6 +335,46 @@ class MyBot(commands.Bot):
 
         # 3. 注册全局事件监听器
         self.add_listener(self.on_index_updated_global, "on_index_updated")
+        if self.thread_index_service:
+            index = self.thread_index_service
+            self.add_listener(index.on_index_updated, "on_index_updated")
+            self.add_listener(index.on_threads_synced, "on_threads_synced")
+            self.add_listener(
+                index.on_thread_activity_flushed, "on_thread_activity_flushed"
+            )
+            self.add_listener(index.on_impressions_flushed, "on_impressions_flushed")
+        if self.search_result_cache:
+            cache = self.search_result_cache
+            self.add_listener(cache.on_index_updated, "on_index_updated")
+            self.add_listener(cache.on_threads_synced, "on_threads_synced")
+            self.add_listener(
+                cache.on_thread_activity_flushed, "on_thread_activity_flushed"
+            )
+            self.add_listener(cache.on_impressions_flushed, "on_impressions_flushed")
+        if self.ucb_score_service:
+            scorer = self.ucb_score_service
+            self.add_listener(scorer.on_threads_synced, "on_threads_synced")
+            self.add_listener(scorer.on_impressions_flushed, "on_impressions_flushed")
+            self.add_listener(scorer.on_config_updated, "on_config_updated")
+        if self.thumbnail_refresh_service:
+            self.add_listener(
+                self.thumbnail_refresh_service.on_threads_synced, "on_threads_synced"
+            )
+
+        # API 运行在独立工作进程时，把只有机器人进程才有的状态写入快照
+        api_config = self.config.get("api", {})
+        if api_config.get("workers", 0) > 0:
+            self.api_state_writer = ApiStateWriter(
+                self,
+                path=api_config.get("state_path", DEFAULT_STATE_PATH),
+                interval=api_config.get("state_interval", 5),
+                events_dir=api_config.get("events_dir", DEFAULT_EVENTS_DIR),
+            )
+            writer = self.api_state_writer
+            self.add_listener(writer.on_index_updated, "on_index_updated")
+            self.add_listener(writer.on_config_updated, "on_config_updated")
+            self.add_listener(writer.on_threads_synced, "on_threads_synced")
+            writer.start()
 
         # --- 同步应用程序命令 ---
         try:
@@ -230,12 +385,76 @@ class MyBot(commands.Bot):
 
     async def close(self):
         """关闭机器人时，一并关闭调度器和数据库连接。"""
+        # 先卸载 Cog：ThreadManager 等在 cog_unload 中做最后一次回写，还需要调度器和数据库
+        for cog_name in tuple(self.cogs):
+            try:
+                await self.remove_cog(cog_name)
+            except Exception as e:
+                logger.error(f"卸载 {cog_name} 失败: {e}", exc_info=True)
+        if self.api_state_writer:
+            self.api_state_writer.stop()
+        if self.thumbnail_refresh_service:
+            self.thumbnail_refresh_service.stop()
         await self.impression_cache_service.stop()
+        await self.author_cache_service.stop()
+        if self.ucb_score_service:
+            await self.ucb_score_service.stop()
         await self.api_scheduler.stop()
+        await close_http_client()
         await close_db()
         await super().close()
 
 
+async def run_api_workers(api_config: dict):
+    """
+    以独立进程运行 API：uvicorn 启动 api_config["workers"] 个工作进程，
+    HTTP 请求不再占用网关事件循环。进程意外退出时等待一段时间后重启，
+    任务被取消（机器人关闭）时一并终止。
+    """
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "api.worker:create_app",
+        "--factory",
+        "--workers",
+        str(api_config["workers"]),
+        "--host",
+        api_config.get("host", "0.0.0.0"),
+        "--port",
+        str(api_config.get("port", 10810)),
+        "--log-level",
+        "info",
+    ]
+    if api_config.get("enable_ssl", False):
+        command += [
+            "--ssl-keyfile",
+            api_config.get("ssl_key_path", ""),
+            "--ssl-certfile",
+            api_config.get("ssl_cert_path", ""),
+        ]
+
+    delay = API_WORKER_RESTART_DELAY
+    while True:
+        started_at = time.monotonic()
+        process = await asyncio.create_subprocess_exec(*command)
+        logger.info(
+            f"已启动 {api_config['workers']} 个 API 工作进程 (PID: {process.pid})"
+        )
+        try:
+            returncode = await process.wait()
+        finally:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+        if time.monotonic() - started_at >= API_WORKER_STABLE_SECONDS:
+            delay = API_WORKER_RESTART_DELAY
+        logger.error(f"API 工作进程已退出，返回码: {returncode}，{delay} 秒后重启")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, API_WORKER_MAX_RESTART_DELAY)
+
+
 async def main():
     # 配置日志记录
     logging.basicConfig(
@@ -278,33 +497,15 @@ async def main():
         if collection_cog:
             search_api.collection_cog_instance = collection_cog
             booklists_api.collection_cog_instance = collection_cog
-        search_api.async_session_factory = AsyncSessionFactory
+        search_api.async_session_factory = ReadSessionFactory
         meta_api.cache_service_instance = bot.cache_service
         search_api.cache_service_instance = bot.cache_service
         search_api.config_service_instance = bot.config_service
 
         # 注入频道映射配置
-        raw_mappings = bot.config.get("channel_mappings", {})
-        parsed_mappings = {}
-        for key, val in raw_mappings.items():
-            if key.startswith("_"):
-                continue
-            try:
-                ch_id = int(key)
-                if isinstance(val, list):
-                    parsed_mappings[ch_id] = [
-                        {
-                            "tag_name": m["tag_name"],
-                            "source_channel_ids": [
-                                int(c) for c in m.get("source_channel_ids", [])
-                            ],
-                        }
-                        for m in val
-                        if isinstance(m, dict) and "tag_name" in m
-                    ]
-            except (ValueError, TypeError):
-                continue
-        search_api.channel_mappings_config = parsed_mappings
+        search_api.channel_mappings_config = search_api.parse_channel_mappings(
+            bot.config.get("channel_mappings", {})
+        )
 
         auth_section = (
             bot.config.get("auth", {}) if isinstance(bot.config, dict) else {}
@@ -313,6 +514,8 @@ async def main():
             session_factory=AsyncSessionFactory,
             bot_token=auth_section.get("bot_token"),
             guild_id=auth_section.get("guild_id"),
+            rate_limits=bot.api_scheduler.rate_limits,
+            bot=bot,
         )
 
         # 注入 banner 路由服务
@@ -320,6 +523,11 @@ async def main():
         banner_api.banner_config = bot.config.get("banner", {})
         banner_api.bot_instance = bot
 
+        # 成员验证优先使用网关的成员缓存
+        member_cache = get_member_cache()
+        if member_cache:
+            member_cache.attach_bot(bot)
+
         logger.info("API 路由服务注入完成")
 
     bot.setup_hook = enhanced_setup_hook
@@ -345,7 +553,16 @@ async def main():
     server = uvicorn.Server(uvicorn_config)
 
     async with bot:
-        await asyncio.gather(bot.start(config["token"]), server.serve())
+        if api_config.get("workers", 0) > 0:
+            workers_task = asyncio.create_task(run_api_workers(api_config))
+            try:
+                await bot.start(config["token"])
+            finally:
+                workers_task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await workers_task
+        else:
+            await asyncio.gather(bot.start(config["token"]), server.serve())
 
 
 if __name__ == "__main__":
@@ -2,11 +2,14 @@ import asyncio
 import logging
 from collections import defaultdict
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from core.journal_checkpoint_service import JournalCheckpointService
 from core.sync_service import SyncService
 from core.thread_service import ThreadService
+from shared.write_ahead_journal import WriteAheadJournal
 from ThreadManager.update_data_dto import UpdateData
 
 logger = logging.getLogger(__name__)
@@ -16,17 +19,25 @@ UpdatePayload = dict[int, UpdateData]
 
 
 class BatchUpdateService:
-    """负责批量更新帖子回复数和活跃时间的服务。"""
+    """
+    负责批量更新帖子回复数和活跃时间的服务。
+
+    传入 journal 时，每次更新先写入本地日志，启动时回放日志恢复上次未落库的更新，
+    回写失败的更新会放回内存等待下一次回写。回写时在同一事务中记录日志段编号，
+    已落库但未删除的日志段不会被重复回放。
+    """
 
     def __init__(
         self,
         session_factory: async_sessionmaker,
         sync_service: SyncService,
         interval: int = 30,
+        journal: Optional[WriteAheadJournal] = None,
     ):
         self.session_factory = session_factory
         self.sync_service = sync_service
         self.interval = interval  # 每隔多少秒写入一次数据库
+        self.journal = journal
 
         # 待处理的更新
         self.pending_updates: defaultdict[int, UpdateData] = defaultdict(
@@ -35,13 +46,62 @@ class BatchUpdateService:
 
         # asyncio.Lock 用于保证并发安全
         self.lock = asyncio.Lock()
+        # 保证同一时刻只有一次回写，日志段按回写顺序提交
+        self._flush_lock = asyncio.Lock()
 
         self._task: asyncio.Task | None = None
         logger.debug("BatchUpdateService 已初始化。")
 
-    def start(self):
+    def _apply(
+        self, thread_id: int, increment: int, last_active_at: Optional[datetime]
+    ):
+        update = self.pending_updates[thread_id]
+        update["increment"] += increment
+        if last_active_at is not None and (
+            update["last_active_at"] is None
+            or last_active_at > update["last_active_at"]
+        ):
+            update["last_active_at"] = last_active_at
+
+    async def _replay_journal(self):
+        """回放日志中上次未落库的更新"""
+        if self.journal is None:
+            return
+        async with self.session_factory() as session:
+            committed = await JournalCheckpointService(session).get(self.journal.name)
+        self.journal.recover(committed)
+        count = 0
+        for record in self.journal.replay():
+            at = record.get("at")
+            self._apply(
+                record["t"], record["i"], datetime.fromisoformat(at) if at else None
+            )
+            count += 1
+        if count:
+            logger.info(
+                f"从日志中恢复了 {count} 条未落库的更新，涉及 {len(self.pending_updates)} 个帖子。"
+            )
+
+    def _journal(
+        self, thread_id: int, increment: int, last_active_at: Optional[datetime]
+    ):
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(
+                {
+                    "t": thread_id,
+                    "i": increment,
+                    "at": last_active_at.isoformat() if last_active_at else None,
+                }
+            )
+        except OSError:
+            logger.warning("写入批量更新日志失败。", exc_info=True)
+
+    async def start(self):
         """启动后台的批量写入任务。"""
         if self._task is None or self._task.done():
+            await self._replay_journal()
             self._task = asyncio.create_task(self._run_loop())
             logger.debug(f"批量更新后台任务已启动，每 {self.interval} 秒执行一次。")
 
@@ -52,6 +112,8 @@ class BatchUpdateService:
 
         logger.debug("正在执行最后的批量数据刷新...")
         await self.flush_to_db()
+        if self.journal:
+            self.journal.close()
         logger.debug("最后的批量数据刷新完成。")
 
     async def add_update(self, thread_id: int, message_time: datetime):
@@ -59,6 +121,7 @@ class BatchUpdateService:
         添加一次新消息更新到内存队列中。
         """
         async with self.lock:
+            self._journal(thread_id, 1, message_time)
             self.pending_updates[thread_id]["increment"] += 1
             self.pending_updates[thread_id]["last_active_at"] = message_time
 
@@ -67,16 +130,22 @@ class BatchUpdateService:
         添加一次消息删除更新到内存队列中。
         """
         async with self.lock:
+            self._journal(thread_id, -1, None)
             self.pending_updates[thread_id]["increment"] -= 1
 
     async def flush_to_db(self):
         """将内存中的所有待处理更新写入数据库，并处理幽灵数据。"""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
         async with self.lock:
             if not self.pending_updates:
                 return  # 如果没有更新，直接返回
 
             updates_to_process = self.pending_updates.copy()
             self.pending_updates.clear()
+            segment = self.journal.seal() if self.journal else None
 
         intended_count = len(updates_to_process)
         logger.debug(f"准备将 {intended_count} 个帖子的更新写入数据库。")
@@ -86,37 +155,56 @@ class BatchUpdateService:
                 updated_count = await repo.batch_update_thread_activity(
                     updates_to_process
                 )
+                if self.journal and segment is not None:
+                    await JournalCheckpointService(session).save(
+                        self.journal.name, segment
+                    )
                 await session.commit()
+        except Exception as e:
+            logger.error(
+                "批量更新写入数据库时发生严重错误！更新已放回队列，等待下次重试。",
+                exc_info=e,
+            )
+            # 放回队列，封存的日志段保留到下一次成功回写
+            async with self.lock:
+                for thread_id, update in updates_to_process.items():
+                    self._apply(
+                        thread_id, update["increment"], update["last_active_at"]
+                    )
+            return
 
-            logger.debug(f"批量更新成功写入数据库，影响了 {updated_count} 行。")
+        if self.journal:
+            self.journal.commit(segment)
 
-            # 处理可能不存在于数据库里的数据
-            if updated_count < intended_count:
-                logger.info(
-                    f"批量更新消息数时发现 {intended_count - updated_count} 条幽灵数据，"
-                    "将触发数据补录。"
-                )
+        logger.debug(f"批量更新成功写入数据库，影响了 {updated_count} 行。")
+        self.sync_service.bot.dispatch("thread_activity_flushed", updates_to_process)
+
+        # 处理可能不存在于数据库里的数据
+        if updated_count < intended_count:
+            logger.info(
+                f"批量更新消息数时发现 {intended_count - updated_count} 条幽灵数据，"
+                "将触发数据补录。"
+            )
 
+            try:
                 # 查询比对
                 async with self.session_factory() as session:
                     repo = ThreadService(session)
                     all_ids_in_batch = list(updates_to_process.keys())
                     existing_ids = await repo.get_existing_thread_ids(all_ids_in_batch)
+            except Exception as e:
+                logger.error("查询幽灵数据时发生错误！", exc_info=e)
+                return
 
-                ghost_ids = set(all_ids_in_batch) - set(existing_ids)
-
-                logger.info(f"需要补录的帖子ID: {list(ghost_ids)}")
+            ghost_ids = set(all_ids_in_batch) - set(existing_ids)
 
-                # 为每个帖子触发一次完整的同步，使用 create_task 在后台执行
-                for thread_id in ghost_ids:
-                    asyncio.create_task(
-                        self.sync_service.sync_thread(thread_id, priority=10)
-                    )
+            logger.info(f"需要补录的帖子ID: {list(ghost_ids)}")
 
-        except Exception as e:
-            logger.error("批量更新写入数据库时发生严重错误！", exc_info=e)
-            # todo: 可以在这里添加错误重试逻辑，例如将 updates_to_process 放回 self.pending_updates
-            # 我想想，嗯
+            # 为每个帖子触发一次完整的同步，使用 create_task 在后台执行
+            for thread_id in ghost_ids:
+                asyncio.create_task(
+                    self.sync_service.sync_thread(thread_id, priority=10)
+                )
 
     async def _run_loop(self):
         """后台任务的主循环。"""
@@ -4,13 +4,14 @@ from typing import TYPE_CHECKING, Any, Dict, List
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from config.config_service import ConfigService
 from core.cache_service import CacheService
 from shared.enum.search_config_type import SearchConfigType
 from shared.safe_defer import safe_defer
+from shared.write_ahead_journal import open_journal
 
 if TYPE_CHECKING:
     from bot_main import MyBot
@@ -20,7 +21,9 @@ import logging
 from core.tag_service import TagService
 from core.thread_service import ThreadService
 from ThreadManager.batch_update_service import BatchUpdateService
+from ThreadManager.reaction_update_service import ReactionUpdateService
 from ThreadManager.services.follow_service import FollowService
+from ThreadManager.services.unread_counter_service import UnreadCounterService
 from ThreadManager.views.vote_view import TagVoteView
 
 logger = logging.getLogger(__name__)
@@ -48,7 +51,26 @@ class ThreadManager(commands.Cog):
             "batch_update_interval", 30
         )
         self.batch_update_service = BatchUpdateService(
-            session_factory, sync_service=self.sync_service, interval=update_interval
+            session_factory,
+            sync_service=self.sync_service,
+            interval=update_interval,
+            journal=open_journal(
+                self.config.get("performance", {}).get("journal_dir", "data/journal"),
+                "thread_activity",
+            ),
+        )
+
+        # 首楼反应事件的合并窗口，默认为5秒
+        reaction_interval = self.config.get("performance", {}).get(
+            "reaction_update_interval", 5
+        )
+        self.reaction_update_service = ReactionUpdateService(
+            session_factory, sync_service=self.sync_service, interval=reaction_interval
+        )
+
+        # 未读计数与关注记录对账的间隔（小时），设置为0时关闭
+        self.unread_reconcile_interval_hours = self.config.get("performance", {}).get(
+            "unread_reconcile_interval_hours", 6
         )
 
         logger.info("ThreadManager 模块已加载")
@@ -56,11 +78,30 @@ class ThreadManager(commands.Cog):
     # 3. 添加 cog_load 和 cog_unload 生命周期方法
     async def cog_load(self):
         """当 Cog 加载时，启动后台任务。"""
-        self.batch_update_service.start()
+        await self.batch_update_service.start()
+        self.reaction_update_service.start()
+        if self.unread_reconcile_interval_hours > 0:
+            self.unread_reconcile_loop.change_interval(
+                hours=self.unread_reconcile_interval_hours
+            )
+            self.unread_reconcile_loop.start()
 
     async def cog_unload(self):
         """当 Cog 卸载时（例如机器人关闭），确保所有数据都被写入。"""
         await self.batch_update_service.stop()
+        await self.reaction_update_service.stop()
+        self.unread_reconcile_loop.cancel()
+
+    @tasks.loop(hours=6)
+    async def unread_reconcile_loop(self):
+        """定期按关注记录重算所有用户的未读计数，修正删除帖子等操作带来的偏差。"""
+        try:
+            async with self.session_factory() as session:
+                await UnreadCounterService(session).reconcile()
+                await session.commit()
+            logger.debug("未读计数对账完成。")
+        except Exception as e:
+            logger.error(f"未读计数对账失败: {e}", exc_info=True)
 
     def is_channel_indexed(self, channel_id: int) -> bool:
         """检查频道是否已索引"""
@@ -400,8 +441,11 @@ class ThreadManager(commands.Cog):
     async def on_thread_delete(self, thread: discord.Thread):
         if self.is_channel_indexed(thread.parent_id):
             async with self.session_factory() as session:
-                repo = ThreadService(session=session)
+                repo = ThreadService(
+                    session=session, tag_cache_service=self.bot.tag_cache_service
+                )
                 await repo.delete_thread_index(thread_id=thread.id)
+            self.bot.dispatch("threads_synced", [thread.id])
             # 缓存现在由全局事件处理，此处不再需要手动刷新
 
     @commands.Cog.listener()
@@ -445,6 +489,7 @@ class ThreadManager(commands.Cog):
                         await repo.update_thread_last_active_at(
                             channel.id, datetime.datetime.now(datetime.timezone.utc)
                         )
+                    self.bot.dispatch("threads_synced", [channel.id])
         except Exception:
             logger.warning("处理消息编辑事件失败", exc_info=True)
 
@@ -461,8 +506,12 @@ class ThreadManager(commands.Cog):
                 # 如果首楼被删除，删除整个索引
                 if payload.message_id == channel.id:
                     async with self.session_factory() as session:
-                        repo = ThreadService(session=session)
+                        repo = ThreadService(
+                            session=session,
+                            tag_cache_service=self.bot.tag_cache_service,
+                        )
                         await repo.delete_thread_index(thread_id=channel.id)
+                    self.bot.dispatch("threads_synced", [channel.id])
                     # 缓存现在由全局事件处理，此处不再需要手动刷新
                 else:
                     # 普通消息删除
@@ -482,10 +531,7 @@ class ThreadManager(commands.Cog):
             ):
                 # 只有对首楼消息的反应才更新统计
                 if payload.message_id == channel.id:
-                    await self.bot.api_scheduler.submit(
-                        coro_factory=lambda: self._update_reaction_count(channel),
-                        priority=5,
-                    )
+                    self.reaction_update_service.add_reaction_event(channel)
         except Exception:
             logger.warning("处理反应添加事件失败", exc_info=True)
 
@@ -501,49 +547,10 @@ class ThreadManager(commands.Cog):
             ):
                 # 只有对首楼消息的反应才更新统计
                 if payload.message_id == channel.id:
-                    await self.bot.api_scheduler.submit(
-                        coro_factory=lambda: self._update_reaction_count(channel),
-                        priority=5,
-                    )
+                    self.reaction_update_service.add_reaction_event(channel)
         except Exception:
             logger.warning("处理反应移除事件失败", exc_info=True)
 
-    async def _update_reaction_count(self, thread: discord.Thread):
-        """(协程) 更新帖子的反应数。如果记录不存在，则触发一次完整的同步进行补录。"""
-        try:
-            # 优先从缓存获取，失败则API调用
-            first_msg = thread.get_partial_message(thread.id)
-            first_msg = await first_msg.fetch()
-
-            reaction_count = (
-                max([r.count for r in first_msg.reactions])
-                if first_msg.reactions
-                else 0
-            )
-
-            async with self.session_factory() as session:
-                repo = ThreadService(session)
-
-                update_succeeded = await repo.update_thread_reaction_count(
-                    thread.id, reaction_count
-                )
-
-                # 如果更新失败，说明数据库中可能没有这条记录
-                if not update_succeeded:
-                    logger.warning(
-                        f"帖子 {thread.id} 的反应数更新失败（记录可能不存在），触发一次完整的同步进行补录。"
-                    )
-                    # 调用 sync_service 进行补录
-                    await self.sync_service.sync_thread(thread=thread)
-
-        except discord.NotFound:
-            # 如果在 fetch() 过程中帖子被删除，这是一种正常情况，记录一下并忽略
-            logger.info(f"尝试更新反应数时，帖子 {thread.id} 已被删除，操作中止。")
-        except Exception:
-            logger.warning(
-                f"更新或补录反应数时失败 (帖子ID: {thread.id})", exc_info=True
-            )
-
     async def pre_sync_forum_tags(self, channel: discord.ForumChannel):
         """
         预同步一个论坛频道的所有可用标签，确保它们都存在于数据库中。
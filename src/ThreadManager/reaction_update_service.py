@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+import discord
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.sync_service import SyncService
+from core.thread_service import ThreadService
+
+logger = logging.getLogger(__name__)
+
+
+class ReactionUpdateService:
+    """
+    负责合并首楼反应事件并批量更新帖子反应数的服务。
+
+    每个反应事件只把帖子标记为待更新，后台任务每隔 interval 秒
+    对每个待更新的帖子获取一次首楼消息，再用一条语句写入所有帖子的反应数。
+    热门帖子在一个周期内收到的大量反应只产生一次 API 调用和一次提交。
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        sync_service: SyncService,
+        interval: float = 5,
+    ):
+        self.session_factory = session_factory
+        self.sync_service = sync_service
+        self.interval = interval  # 合并反应事件的时间窗口（秒）
+
+        # 待更新的帖子: {thread_id: thread}
+        self.pending_threads: dict[int, discord.Thread] = {}
+
+        self._task: asyncio.Task | None = None
+        logger.debug("ReactionUpdateService 已初始化。")
+
+    def start(self):
+        """启动后台的批量写入任务。"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+            logger.debug(f"反应数更新后台任务已启动，每 {self.interval} 秒执行一次。")
+
+    async def stop(self):
+        """停止后台任务并执行最后一次刷新。"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+        logger.debug("正在执行最后的反应数刷新...")
+        await self.flush()
+        logger.debug("最后的反应数刷新完成。")
+
+    def add_reaction_event(self, thread: discord.Thread):
+        """记录一次首楼反应变化，同一帖子在一个窗口内只会被获取一次。"""
+        self.pending_threads[thread.id] = thread
+
+    async def _fetch_reaction_count(self, thread: discord.Thread) -> int | None:
+        """获取首楼消息的反应数，帖子已被删除或获取失败时返回 None。"""
+        try:
+            first_msg = await self.sync_service.bot.api_scheduler.submit(
+                coro_factory=lambda: thread.get_partial_message(thread.id).fetch(),
+                priority=5,
+            )
+        except discord.NotFound:
+            # 如果在 fetch() 过程中帖子被删除，这是一种正常情况，记录一下并忽略
+            logger.info(f"尝试更新反应数时，帖子 {thread.id} 已被删除，操作中止。")
+            return None
+        except Exception:
+            logger.warning(f"获取帖子 {thread.id} 的首楼消息失败", exc_info=True)
+            return None
+
+        return max([r.count for r in first_msg.reactions]) if first_msg.reactions else 0
+
+    async def flush(self):
+        """获取所有待更新帖子的反应数并批量写入数据库。"""
+        if not self.pending_threads:
+            return
+
+        threads = self.pending_threads
+        self.pending_threads = {}
+
+        counts = await asyncio.gather(
+            *(self._fetch_reaction_count(thread) for thread in threads.values())
+        )
+        reaction_counts = {
+            thread_id: count
+            for thread_id, count in zip(threads, counts)
+            if count is not None
+        }
+        if not reaction_counts:
+            return
+
+        try:
+            async with self.session_factory() as session:
+                repo = ThreadService(session)
+                updated_count = await repo.batch_update_thread_reaction_counts(
+                    reaction_counts
+                )
+                await session.commit()
+                existing_ids = set(reaction_counts)
+                if updated_count < len(reaction_counts):
+                    existing_ids = set(
+                        await repo.get_existing_thread_ids(list(reaction_counts))
+                    )
+        except Exception as e:
+            logger.error("批量更新反应数时发生错误！", exc_info=e)
+            return
+
+        logger.debug(f"批量更新了 {updated_count} 个帖子的反应数。")
+        if existing_ids:
+            self.sync_service.bot.dispatch("threads_synced", list(existing_ids))
+
+        # 数据库中没有记录的帖子，触发一次完整的同步进行补录
+        for thread_id in set(reaction_counts) - existing_ids:
+            logger.warning(
+                f"帖子 {thread_id} 的反应数更新失败（记录可能不存在），触发一次完整的同步进行补录。"
+            )
+            asyncio.create_task(
+                self.sync_service.sync_thread(thread=threads[thread_id])
+            )
+
+    async def _run_loop(self):
+        """后台任务的主循环。"""
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                logger.info("反应数更新后台任务已被取消。")
+                break
+            except Exception as e:
+                logger.error("反应数更新后台循环发生错误。", exc_info=e)
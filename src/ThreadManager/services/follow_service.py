@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import col
 
 from models import Thread, ThreadFollow
+from ThreadManager.services.unread_counter_service import UnreadCounterService
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,14 @@ class FollowService:
 
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.unread_counter = UnreadCounterService(session)
+
+    async def _thread_has_update(self, thread_id: int) -> bool:
+        """帖子是否发布过更新（新关注者会有一条未读更新）"""
+        result = await self.session.execute(
+            select(Thread.latest_update_at).where(Thread.thread_id == thread_id)
+        )
+        return result.scalar_one_or_none() is not None
 
     async def add_follow(
         self, user_id: int, thread_id: int, auto_view: bool = False
@@ -55,6 +64,8 @@ class FollowService:
             )
 
             self.session.add(follow)
+            if not auto_view and await self._thread_has_update(thread_id):
+                await self.unread_counter.add([user_id], 1)
             await self.session.commit()
 
             logger.info(f"用户 {user_id} 已关注帖子 {thread_id}")
@@ -110,6 +121,8 @@ class FollowService:
             ]
 
             self.session.add_all(follows)
+            if await self._thread_has_update(thread_id):
+                await self.unread_counter.add(new_user_ids, 1)
             await self.session.commit()
 
             # logger.info(f"为帖子 {thread_id} 批量添加了 {len(new_user_ids)} 个关注")
@@ -132,12 +145,14 @@ class FollowService:
             是否成功取消
         """
         try:
+            unread = await self.unread_counter.count_unread_follows(user_id, thread_id)
             statement = delete(ThreadFollow).where(
                 and_(
                     ThreadFollow.user_id == user_id, ThreadFollow.thread_id == thread_id
                 )
             )
             result = await self.session.execute(statement)
+            await self.unread_counter.add([user_id], -unread)
             await self.session.commit()
 
             if result.rowcount > 0:
@@ -180,8 +195,12 @@ class FollowService:
                 follow = result.scalar_one_or_none()
 
                 if follow:
+                    unread = await self.unread_counter.count_unread_follows(
+                        user_id, thread_id
+                    )
                     follow.last_viewed_at = now
                     self.session.add(follow)
+                    await self.unread_counter.add([user_id], -unread)
                     await self.session.commit()
                     logger.debug(f"已更新用户 {user_id} 对帖子 {thread_id} 的查看时间")
                     return True
@@ -198,6 +217,7 @@ class FollowService:
                     follow.last_viewed_at = now
                     self.session.add(follow)
 
+                await self.unread_counter.reset(user_id)
                 await self.session.commit()
                 logger.debug(f"已更新用户 {user_id} 的所有关注查看时间")
                 return True
@@ -301,6 +321,9 @@ class FollowService:
         """
         获取用户未读更新的数量
 
+        读取 user_unread_counter 中维护的计数，只需一次主键查询；
+        计数由关注、查看和帖子更新时增量维护，并定期与关注记录对账。
+
         Args:
             user_id: 用户Discord ID
 
@@ -308,28 +331,7 @@ class FollowService:
             未读更新数量
         """
         try:
-            # 查询有更新且未查看的帖子数量
-            statement = (
-                select(func.count())
-                .select_from(ThreadFollow)
-                .join(Thread, ThreadFollow.thread_id == Thread.thread_id)
-                .where(
-                    and_(
-                        ThreadFollow.user_id == user_id,
-                        Thread.latest_update_at.isnot(None),
-                        # 未查看 或 更新时间晚于查看时间
-                        (
-                            (ThreadFollow.last_viewed_at.is_(None))
-                            | (Thread.latest_update_at > ThreadFollow.last_viewed_at)
-                        ),
-                    )
-                )
-            )
-
-            result = await self.session.execute(statement)
-            count = result.scalar() or 0
-
-            return count
+            return await self.unread_counter.get(user_id)
 
         except Exception as e:
             logger.error(f"获取未读数量失败: {e}", exc_info=True)
@@ -0,0 +1,119 @@
+import logging
+from typing import Iterable
+
+from sqlalchemy import and_, delete, func, literal, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col
+
+from models import Thread, ThreadFollow, UserUnreadCounter
+
+logger = logging.getLogger(__name__)
+
+
+def unread_condition():
+    """关注记录有未读更新的条件，需要与 Thread 联表使用"""
+    return and_(
+        col(Thread.latest_update_at).isnot(None),
+        or_(
+            col(ThreadFollow.last_viewed_at).is_(None),
+            Thread.latest_update_at > ThreadFollow.last_viewed_at,
+        ),
+    )
+
+
+class UnreadCounterService:
+    """
+    维护 user_unread_counter 表中每个用户的未读更新数。
+
+    所有方法只执行语句不提交，与关注记录的修改在同一个事务中生效。
+    计数可能因删除帖子等操作产生偏差，由 reconcile() 定期按关注记录重算。
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, user_id: int) -> int:
+        """按主键读取用户的未读数"""
+        result = await self.session.execute(
+            select(UserUnreadCounter.unread_count).where(
+                UserUnreadCounter.user_id == user_id
+            )
+        )
+        return result.scalar_one_or_none() or 0
+
+    async def add(self, user_ids: Iterable[int], delta: int):
+        """给每个用户的未读数加上 delta（可以为负数，结果不小于 0）"""
+        rows = [
+            {"user_id": user_id, "unread_count": max(delta, 0)} for user_id in user_ids
+        ]
+        if not rows or delta == 0:
+            return
+        stmt = sqlite_insert(UserUnreadCounter).values(rows)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={
+                    "unread_count": func.max(UserUnreadCounter.unread_count + delta, 0)
+                },
+            )
+        )
+
+    async def reset(self, user_id: int):
+        """用户查看了全部关注，未读数清零"""
+        stmt = sqlite_insert(UserUnreadCounter).values(user_id=user_id, unread_count=0)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id"], set_={"unread_count": 0}
+            )
+        )
+
+    async def count_unread_follows(self, user_id: int, thread_id: int) -> int:
+        """用户对某个帖子的关注记录中有未读更新的数量"""
+        result = await self.session.execute(
+            select(func.count())
+            .select_from(ThreadFollow)
+            .join(Thread, ThreadFollow.thread_id == Thread.thread_id)
+            .where(
+                ThreadFollow.user_id == user_id,
+                ThreadFollow.thread_id == thread_id,
+                unread_condition(),
+            )
+        )
+        return result.scalar() or 0
+
+    async def publish_update(self, thread_id: int):
+        """
+        帖子发布更新前调用：用一条语句给此前没有未读更新的关注者各加一。
+
+        发布后所有关注者都有未读更新，原本就未读的关注者不重复计数。
+        """
+        newly_unread = (
+            select(ThreadFollow.user_id, literal(1))
+            .join(Thread, ThreadFollow.thread_id == Thread.thread_id)
+            .where(ThreadFollow.thread_id == thread_id, ~unread_condition())
+        )
+        stmt = sqlite_insert(UserUnreadCounter).from_select(
+            ["user_id", "unread_count"], newly_unread
+        )
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"unread_count": UserUnreadCounter.unread_count + 1},
+            )
+        )
+
+    async def reconcile(self):
+        """按关注记录重算所有用户的未读数"""
+        counts = (
+            select(ThreadFollow.user_id, func.count())
+            .join(Thread, ThreadFollow.thread_id == Thread.thread_id)
+            .where(unread_condition())
+            .group_by(ThreadFollow.user_id)
+        )
+        await self.session.execute(delete(UserUnreadCounter))
+        await self.session.execute(
+            sqlite_insert(UserUnreadCounter).from_select(
+                ["user_id", "unread_count"], counts
+            )
+        )
@@ -1,8 +1,10 @@
 import json
+import secrets
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 
 from api.v1.routers import (
     auth,
@@ -14,12 +16,15 @@ from api.v1.routers import (
     preferences,
     search,
 )
+from shared.metrics import REGISTRY
 
 # 读取配置
 try:
     with open("config.json", "r", encoding="utf-8") as f:
         config = json.load(f)
     enable_docs = config.get("api", {}).get("enable_docs", True)
+    enable_metrics = config.get("api", {}).get("enable_metrics", False)
+    metrics_token = config.get("api", {}).get("metrics_token", "")
 
     # CORS配置：支持配置多个允许的源
     api_config = config.get("api", {})
@@ -32,6 +37,8 @@ try:
 
 except (FileNotFoundError, KeyError):
     enable_docs = True
+    enable_metrics = False
+    metrics_token = ""
     cors_origins = ["*"]
 
 # 根据配置决定是否启用文档
@@ -88,6 +95,34 @@ async def health_check():
     return {"status": "ok"}
 
 
+def _metrics_authorized(authorization: str, token: str) -> bool:
+    """校验 Authorization: Bearer 令牌；未配置令牌时拒绝所有请求。"""
+    if not token or not authorization.startswith("Bearer "):
+        return False
+    return secrets.compare_digest(
+        authorization[7:].strip().encode("utf-8"), token.encode("utf-8")
+    )
+
+
+if enable_metrics:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        """
+        Prometheus 文本格式的指标，需要携带 Authorization: Bearer <metrics_token>。
+
+        指标按进程统计：api.workers > 0 时只返回响应本次请求的工作进程的指标，
+        不包含其他工作进程和机器人进程（Discord 内的搜索）。
+        """
+        if not _metrics_authorized(
+            request.headers.get("Authorization", ""), metrics_token
+        ):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4"
+        )
+
+
 @app.get("/", summary="API 根路径", tags=["系统"])
 async def root():
     """API 服务根路径"""
@@ -0,0 +1,336 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence
+
+if TYPE_CHECKING:
+    from bot_main import MyBot
+    from core.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+# 机器人进程与 API 工作进程共享的状态快照文件
+DEFAULT_STATE_PATH = "data/api_state.json"
+
+# API 工作进程转交给机器人进程的事件目录，每个事件一个文件
+DEFAULT_EVENTS_DIR = "data/api_events"
+
+# 需要机器人进程处理的事件：UCB1 分数、内存索引和结果缓存都只在机器人进程中维护
+FORWARDED_EVENTS = ("config_updated", "impressions_flushed", "threads_synced")
+
+# 同一纳秒内写入多个事件时区分文件名
+_event_sequence = itertools.count()
+
+# 快照中保留的最近几批帖子同步记录，工作进程落后更多时全量重建标签位图
+SYNCED_THREADS_HISTORY = 200
+
+
+@dataclass(frozen=True)
+class SnapshotTag:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class SnapshotChannel:
+    """只包含 API 用到字段的频道，接口与 discord.ForumChannel 的对应属性一致"""
+
+    id: int
+    guild_id: int
+    name: str
+    available_tags: tuple[SnapshotTag, ...]
+
+
+def build_state(
+    cache_service: "CacheService",
+    *,
+    index_version: int,
+    config_version: int,
+    ucb_ready: bool,
+    threads_version: int = 0,
+    synced_threads: Sequence[tuple[int, list[int]]] = (),
+) -> dict[str, Any]:
+    """从机器人进程的缓存构建状态快照"""
+    return {
+        "index_version": index_version,
+        "config_version": config_version,
+        "ucb_ready": ucb_ready,
+        "threads_version": threads_version,
+        "synced_threads": [[version, ids] for version, ids in synced_threads],
+        "channels": [
+            {
+                "id": channel.id,
+                "guild_id": channel.guild.id,
+                "name": channel.name,
+                "available_tags": [
+                    {"id": tag.id, "name": tag.name} for tag in channel.available_tags
+                ],
+            }
+            for channel in cache_service.get_indexed_channels()
+        ],
+    }
+
+
+def write_state(path: str | os.PathLike, state: dict[str, Any]):
+    """先写临时文件再替换，工作进程不会读到写了一半的快照"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def write_event(directory: str | os.PathLike, event: str, *args):
+    """
+    工作进程一侧：把事件写成单独的文件，由机器人进程读取后分发。
+    先写临时文件再改名，机器人进程不会读到写了一半的事件。
+    """
+    if event == "impressions_flushed":
+        # JSON 的键只能是字符串，展示次数增量按 [帖子ID, 增量] 列表保存
+        args = ([[thread_id, count] for thread_id, count in args[0].items()],)
+    elif event == "threads_synced":
+        args = (list(args[0]),)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns():020d}-{os.getpid()}-{next(_event_sequence)}"
+    tmp_path = directory / f"{name}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"event": event, "args": list(args)}, f)
+    os.replace(tmp_path, directory / f"{name}.json")
+
+
+def read_events(directory: str | os.PathLike) -> Iterator[tuple[str, list]]:
+    """机器人进程一侧：按写入顺序读出并删除工作进程转交的事件"""
+    directory = Path(directory)
+    if not directory.exists():
+        return
+    for path in sorted(directory.glob("*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取工作进程事件 {path} 失败: {e}")
+            record = None
+        path.unlink(missing_ok=True)
+        if record is None or record.get("event") not in FORWARDED_EVENTS:
+            continue
+
+        event, args = record["event"], record.get("args", [])
+        if event == "impressions_flushed":
+            args = [{thread_id: count for thread_id, count in args[0]}]
+        yield event, args
+
+
+class ApiStateWriter:
+    """
+    机器人进程一侧：把 API 需要、但只有机器人进程才有的状态写入快照文件。
+
+    已索引频道及其标签来自 Discord 网关缓存；索引和配置更新事件会提升对应的版本号，
+    工作进程据此重建自己的标签缓存和配置缓存。帖子同步事件同样提升版本号，
+    并在快照中保留最近几批同步的帖子 ID，工作进程据此增量更新标签位图。
+    快照内容没有变化时不会重写文件。
+
+    反方向上，工作进程的展示次数回写等事件写入 events_dir，
+    这里定期读取并在机器人进程中分发，由各监听者更新分数、索引和缓存。
+    """
+
+    def __init__(
+        self,
+        bot: "MyBot",
+        path: str = DEFAULT_STATE_PATH,
+        interval=5,
+        events_dir: str = DEFAULT_EVENTS_DIR,
+    ):
+        self.bot = bot
+        self.path = path
+        self.events_dir = events_dir
+        self.interval = interval
+        self.index_version = 0
+        self.config_version = 0
+        self.threads_version = 0
+        self._synced_threads: deque[tuple[int, list[int]]] = deque(
+            maxlen=SYNCED_THREADS_HISTORY
+        )
+        self._last_state: Optional[dict] = None
+        self._task: asyncio.Task | None = None
+
+    async def on_index_updated(self):
+        self.index_version += 1
+
+    async def on_config_updated(self):
+        self.config_version += 1
+
+    async def on_threads_synced(self, thread_ids: Sequence[int]):
+        self.threads_version += 1
+        self._synced_threads.append((self.threads_version, list(thread_ids)))
+
+    def write_if_changed(self):
+        state = build_state(
+            self.bot.cache_service,
+            index_version=self.index_version,
+            config_version=self.config_version,
+            ucb_ready=bool(
+                self.bot.ucb_score_service and self.bot.ucb_score_service.ready
+            ),
+            threads_version=self.threads_version,
+            synced_threads=self._synced_threads,
+        )
+        if state == self._last_state:
+            return
+        write_state(self.path, state)
+        self._last_state = state
+
+    def forward_worker_events(self):
+        """分发工作进程转交的事件"""
+        for event, args in read_events(self.events_dir):
+            self.bot.dispatch(event, *args)
+
+    def start(self):
+        """立即写入一次快照并启动定期写入任务"""
+        self.write_if_changed()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _run_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                self.forward_worker_events()
+                self.write_if_changed()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("写入 API 状态快照失败。", exc_info=e)
+
+
+class SnapshotCacheService:
+    """
+    工作进程一侧：从快照文件读取机器人进程的状态。
+
+    提供与 CacheService 相同的只读接口，可以直接注入到 API 路由中。
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = Path(path)
+        self.index_version: Optional[int] = None
+        self.config_version: Optional[int] = None
+        self.ucb_ready = False
+        self.threads_version: Optional[int] = None
+        self._synced_threads: list[tuple[int, list[int]]] = []
+        self.indexed_channels: dict[int, SnapshotChannel] = {}
+        self.guild_channels: dict[int, dict[int, SnapshotChannel]] = {}
+        # 快照文件的 (inode, mtime, 大小)，每次写入都会替换成新文件
+        self._file_key: Optional[tuple[int, int, int]] = None
+
+    @property
+    def ready(self) -> bool:
+        """供搜索服务判断物化的 UCB1 分数是否可用"""
+        return self.ucb_ready
+
+    @property
+    def indexed_channel_ids(self) -> set[int]:
+        return set(self.indexed_channels)
+
+    def reload(self) -> tuple[bool, bool]:
+        """
+        快照文件有变化时重新读取。
+
+        Returns:
+            (索引版本是否变化, 配置版本是否变化)
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return False, False
+        file_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_key == self._file_key:
+            return False, False
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取 API 状态快照失败: {e}")
+            return False, False
+        self._file_key = file_key
+
+        channels = {
+            data["id"]: SnapshotChannel(
+                id=data["id"],
+                guild_id=data["guild_id"],
+                name=data["name"],
+                available_tags=tuple(
+                    SnapshotTag(id=tag["id"], name=tag["name"])
+                    for tag in data["available_tags"]
+                ),
+            )
+            for data in state.get("channels", [])
+        }
+        guild_channels: dict[int, dict[int, SnapshotChannel]] = {}
+        for channel in channels.values():
+            guild_channels.setdefault(channel.guild_id, {})[channel.id] = channel
+        self.indexed_channels = channels
+        self.guild_channels = guild_channels
+        self.ucb_ready = bool(state.get("ucb_ready", False))
+        self.threads_version = state.get("threads_version")
+        self._synced_threads = [
+            (version, ids) for version, ids in state.get("synced_threads", [])
+        ]
+
+        index_changed = state.get("index_version") != self.index_version
+        config_changed = state.get("config_version") != self.config_version
+        self.index_version = state.get("index_version")
+        self.config_version = state.get("config_version")
+        return index_changed, config_changed
+
+    def synced_thread_ids_since(self, version: Optional[int]) -> Optional[set[int]]:
+        """
+        获取 version 之后机器人进程同步过的帖子 ID。
+
+        Returns:
+            帖子 ID 集合；快照保留的记录不足以覆盖（落后太多或机器人进程重启过）时返回 None，
+            调用方应全量重建。
+        """
+        current = self.threads_version
+        if version is None or current is None or version > current:
+            return None
+        if version == current:
+            return set()
+        oldest = self._synced_threads[0][0] if self._synced_threads else current + 1
+        if oldest > version + 1:
+            return None
+        return {
+            thread_id
+            for synced_version, ids in self._synced_threads
+            if synced_version > version
+            for thread_id in ids
+        }
+
+    def is_channel_indexed(self, channel_id: int) -> bool:
+        return channel_id in self.indexed_channels
+
+    def get_indexed_channels(
+        self, guild_id: int | None = None
+    ) -> list[SnapshotChannel]:
+        if guild_id is not None:
+            return list(self.guild_channels.get(guild_id, {}).values())
+        return list(self.indexed_channels.values())
+
+    def get_indexed_channel_ids_set(self, guild_id: int | None = None) -> set[int]:
+        if guild_id is not None:
+            return set(self.guild_channels.get(guild_id, {}))
+        return self.indexed_channel_ids
+
+    def get_indexed_channel_ids_list(self, guild_id: int | None = None) -> list[int]:
+        return list(self.get_indexed_channel_ids_set(guild_id))
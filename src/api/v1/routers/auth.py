@@ -10,16 +10,19 @@ from fastapi import APIRouter, HTTPException, Request, Response, status
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 
 from api.v1.utils.jwt_utils import sign_jwt, verify_jwt
+from core.member_cache_service import MemberCacheService
 
 logger = logging.getLogger(__name__)
 
 # 全局配置变量，将在应用启动时初始化
 _AUTH_CONFIG: Optional[dict] = None
+# 成员验证缓存，随认证配置一起初始化
+_MEMBER_CACHE: Optional[MemberCacheService] = None
 
 
 def initialize_auth_config():
     """在应用启动时调用，初始化认证配置"""
-    global _AUTH_CONFIG
+    global _AUTH_CONFIG, _MEMBER_CACHE
     try:
         with open("config.json", "r", encoding="utf-8") as f:
             config = json.load(f)
@@ -43,11 +46,24 @@ def initialize_auth_config():
                 raise ValueError(f"认证配置字段 {field} 未在 config.json 中配置")
 
         _AUTH_CONFIG = auth_config
+        _MEMBER_CACHE = MemberCacheService(
+            guild_id=auth_config["guild_id"],
+            role_ids=auth_config["role_ids"].split(","),
+            bot_token=auth_config.get("bot_token"),
+            ttl=auth_config.get("member_cache_ttl", 300),
+            negative_ttl=auth_config.get("member_negative_cache_ttl", 60),
+        )
         logger.info("认证配置已初始化")
 
     except (FileNotFoundError, ValueError) as e:
         logger.error(f"无法加载认证配置: {e}")
         _AUTH_CONFIG = None
+        _MEMBER_CACHE = None
+
+
+def get_member_cache() -> Optional[MemberCacheService]:
+    """返回成员验证缓存，认证配置未初始化时为 None"""
+    return _MEMBER_CACHE
 
 
 router = APIRouter(prefix="/auth", tags=["认证"])
@@ -409,8 +425,7 @@ async def check_auth(request: Request):
     if not payload:
         return JSONResponse(content={"loggedIn": False}, status_code=200)
 
-    # 使用 Bot Token 再次验证 Discord 身份并获取完整用户信息
-    bot_token = _AUTH_CONFIG.get("bot_token")
+    # 再次验证 Discord 身份并获取完整用户信息（优先使用缓存）
     user_info = {
         "id": payload["id"],
         "username": payload.get("username", ""),
@@ -418,48 +433,23 @@ async def check_auth(request: Request):
         "avatar": None,
     }
 
-    if bot_token:
-        try:
-            async with httpx.AsyncClient() as client:
-                member_response = await client.get(
-                    f"https://discord.com/api/guilds/{_AUTH_CONFIG['guild_id']}/members/{payload['id']}",
-                    headers={"Authorization": f"Bot {bot_token}"},
-                )
-
-                if member_response.status_code != 200:
-                    response = JSONResponse(
-                        content={"loggedIn": False}, status_code=200
-                    )
-                    response.delete_cookie(key="session", path="/")
-                    return response
-
-                member = member_response.json()
-                role_ids = _AUTH_CONFIG["role_ids"].split(",")
-                has_role = any(
-                    role_id in member.get("roles", []) for role_id in role_ids
-                )
-
-                if not has_role:
-                    response = JSONResponse(
-                        content={"loggedIn": False}, status_code=200
-                    )
-                    response.delete_cookie(key="session", path="/")
-                    return response
-
-                # 获取完整的用户信息
-                if "user" in member:
-                    user_data = member["user"]
-                    user_info = {
-                        "id": user_data.get("id", payload["id"]),
-                        "username": user_data.get(
-                            "username", payload.get("username", "")
-                        ),
-                        "global_name": user_data.get("global_name"),
-                        "avatar": user_data.get("avatar"),
-                    }
+    member_status = (
+        await _MEMBER_CACHE.get_status(int(payload["id"])) if _MEMBER_CACHE else None
+    )
+    if member_status is not None:
+        if not member_status.verified:
+            response = JSONResponse(content={"loggedIn": False}, status_code=200)
+            response.delete_cookie(key="session", path="/")
+            return response
 
-        except Exception as e:
-            logger.error(f"验证 Discord 身份失败: {e}")
+        if member_status.user_info:
+            user_data = member_status.user_info
+            user_info = {
+                "id": user_data.get("id") or payload["id"],
+                "username": user_data.get("username") or payload.get("username", ""),
+                "global_name": user_data.get("global_name"),
+                "avatar": user_data.get("avatar"),
+            }
 
     # 获取未读更新数量
     unread_count = 0
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import re
-from typing import Any, List, Optional
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, List, Optional
 
 import httpx
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
-from sqlalchemy import update
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
 from api.v1.dependencies.security import require_auth
-from models import Thread
+from core.thread_service import ThreadService
+from shared.api_scheduler import RateLimitTracker
+from shared.http_client import DISCORD_API_BASE, get_http_client
+
+if TYPE_CHECKING:
+    from bot_main import MyBot
+
+logger = logging.getLogger(__name__)
 
-DISCORD_API_BASE = "https://discord.com/api/v10"
 IMAGE_URL_REGEX = re.compile(
     r"https?://[^\s]+\.(?:jpg|jpeg|png|gif|webp)", re.IGNORECASE
 )
@@ -27,6 +36,8 @@ router = APIRouter(
 _async_session_factory: Optional[async_sessionmaker] = None
 _bot_token: Optional[str] = None
 _guild_id: Optional[str] = None
+# 封面写入后分发 'threads_synced'，封面刷新服务据此跟踪新链接的过期时间
+_bot: Optional[MyBot] = None
 
 
 class FetchImageItem(BaseModel):
@@ -51,19 +62,52 @@ class FetchImageResponse(BaseModel):
     results: List[FetchImageResponseItem]
 
 
+@dataclass
+class _RefreshResult:
+    """一个帖子的刷新结果，会在短时间内被其它请求复用"""
+
+    thumbnail_urls: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    updated: bool = False
+    # 网络错误、限流等临时错误不缓存，下次上报时重新获取
+    cacheable: bool = True
+
+
+# 同时向 Discord 获取首楼消息的请求数
+MAX_CONCURRENT_FETCHES = 5
+# 最近刷新结果的缓存时间（秒），大量浏览器同时上报同一个失效链接时只获取一次
+REFRESH_CACHE_TTL = 60
+# 限流时最多等待的时间（秒），更长的等待直接返回错误，由前端稍后重试
+MAX_RATE_LIMIT_WAIT = 5.0
+
+_fetch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+_rate_limits = RateLimitTracker()
+# {thread_id: (过期时间 time.monotonic(), 结果)}
+_recent_results: dict[int, tuple[float, _RefreshResult]] = {}
+# 正在刷新的帖子，其它请求等待同一个结果
+_inflight: dict[int, asyncio.Future] = {}
+
+
 def configure_fetch_images_router(
     *,
     session_factory: async_sessionmaker,
     bot_token: Optional[str],
     guild_id: Optional[str],
+    rate_limits: Optional[RateLimitTracker] = None,
+    bot: Optional[MyBot] = None,
 ) -> None:
     """
     由 bot_main 在启动时调用，注入共享依赖。
+    rate_limits 传入机器人调度器的速率限制记录，与 discord.py 共用同一个 Bot Token 的全局限流状态。
+    bot 用于分发封面更新后的 'threads_synced' 事件，API 工作进程中传入 WorkerEvents。
     """
-    global _async_session_factory, _bot_token, _guild_id
+    global _async_session_factory, _bot_token, _guild_id, _rate_limits, _bot
     _async_session_factory = session_factory
     _bot_token = bot_token
     _guild_id = guild_id
+    _bot = bot
+    if rate_limits is not None:
+        _rate_limits = rate_limits
 
 
 @router.post("/", response_model=FetchImageResponse, summary="批量刷新帖子封面")
@@ -84,51 +128,137 @@ async def refresh_thread_thumbnails(payload: FetchImageRequest) -> FetchImageRes
             detail="图片刷新服务尚未初始化",
         )
 
-    results: List[FetchImageResponseItem] = []
+    thread_ids = list(dict.fromkeys(item.thread_id for item in payload.items))
+    now = time.monotonic()
+    pending: dict[int, asyncio.Future] = {}
+    owned: dict[int, asyncio.Future] = {}
+    results: dict[int, _RefreshResult] = {}
+
+    for thread_id in thread_ids:
+        cached = _recent_results.get(thread_id)
+        if cached is not None and cached[0] > now:
+            results[thread_id] = cached[1]
+        elif thread_id in _inflight:
+            pending[thread_id] = _inflight[thread_id]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            _inflight[thread_id] = future
+            owned[thread_id] = future
+
+    if owned:
+        await _refresh_owned(owned)
+    for thread_id, future in {**owned, **pending}.items():
+        results[thread_id] = await asyncio.shield(future)
+
+    return FetchImageResponse(
+        results=[
+            FetchImageResponseItem(
+                thread_id=str(item.thread_id),
+                thumbnail_urls=results[item.thread_id].thumbnail_urls,
+                updated=results[item.thread_id].updated,
+                error=results[item.thread_id].error,
+            )
+            for item in payload.items
+        ]
+    )
+
 
+async def _refresh_owned(owned: dict[int, asyncio.Future]):
+    """并发获取本请求负责的帖子，用一条 UPDATE 写入，再把结果交给等待中的请求"""
+    results: dict[int, _RefreshResult] = {}
+    try:
+        client = get_http_client()
+        fetched = await asyncio.gather(
+            *(_fetch_thumbnails(client, thread_id) for thread_id in owned)
+        )
+        results = dict(zip(owned, fetched))
+
+        thumbnails = {
+            thread_id: result.thumbnail_urls
+            for thread_id, result in results.items()
+            if result.thumbnail_urls
+        }
+        try:
+            for thread_id in await _persist_thumbnails(thumbnails):
+                results[thread_id].updated = True
+        except Exception as e:
+            logger.error(
+                f"批量写入 {len(thumbnails)} 个帖子封面失败: {e}", exc_info=True
+            )
+            # 没有落库的结果不缓存，下次上报时重新获取并写入
+            for thread_id in thumbnails:
+                results[thread_id].cacheable = False
+    finally:
+        expires_at = time.monotonic() + REFRESH_CACHE_TTL
+        for thread_id, future in owned.items():
+            result = results.get(thread_id) or _RefreshResult(
+                error="internal_error", cacheable=False
+            )
+            if result.cacheable:
+                _recent_results[thread_id] = (expires_at, result)
+            _inflight.pop(thread_id, None)
+            if not future.done():
+                future.set_result(result)
+        _prune_recent_results()
+
+
+def _prune_recent_results():
+    now = time.monotonic()
+    for thread_id in [
+        thread_id
+        for thread_id, (expires_at, _) in _recent_results.items()
+        if expires_at <= now
+    ]:
+        del _recent_results[thread_id]
+
+
+async def _fetch_thumbnails(
+    client: httpx.AsyncClient, thread_id: int
+) -> _RefreshResult:
+    """获取首楼消息并提取图片，遵守 Discord 的速率限制响应头"""
+    url = f"{DISCORD_API_BASE}/channels/{thread_id}/messages/{thread_id}"
     headers = {
         "Authorization": f"Bot {_bot_token}",
         "User-Agent": "OdysseiaBot (fetch-images)",
     }
 
-    async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
-        for item in payload.items:
-            response_item = await _process_single_item(client, item)
-            results.append(response_item)
-
-    return FetchImageResponse(results=results)
-
-
-async def _process_single_item(
-    client: httpx.AsyncClient, item: FetchImageItem
-) -> FetchImageResponseItem:
-    url = f"{DISCORD_API_BASE}/channels/{item.thread_id}/messages/{item.thread_id}"
-    response_item = FetchImageResponseItem(thread_id=str(item.thread_id))
-
-    try:
-        resp = await client.get(url)
-    except httpx.HTTPError as exc:  # pragma: no cover - 网络错误情况下的日志
-        response_item.error = f"httpx_error: {exc}"
-        return response_item
+    async with _fetch_semaphore:
+        for attempt in range(2):
+            wait = _rate_limits.global_wait()
+            if wait > MAX_RATE_LIMIT_WAIT:
+                return _RefreshResult(error="rate_limited", cacheable=False)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                resp = await client.get(url, headers=headers)
+            except httpx.HTTPError as exc:  # pragma: no cover - 网络错误情况下的日志
+                return _RefreshResult(error=f"httpx_error: {exc}", cacheable=False)
+
+            info = _rate_limits.observe(resp.headers, resp.status_code)
+            if resp.status_code != status.HTTP_429_TOO_MANY_REQUESTS:
+                break
+            retry_after = info.retry_after or 1.0
+            if attempt > 0 or retry_after > MAX_RATE_LIMIT_WAIT:
+                return _RefreshResult(error="rate_limited", cacheable=False)
+            await asyncio.sleep(retry_after)
+
+        # 当前路由的额度已用完时占住并发名额直到重置，避免后续请求触发 429
+        if info.remaining == 0 and info.reset_after:
+            await asyncio.sleep(min(info.reset_after, MAX_RATE_LIMIT_WAIT))
 
     if resp.status_code == status.HTTP_404_NOT_FOUND:
-        response_item.error = "not_found"
-        return response_item
+        return _RefreshResult(error="not_found")
 
     if resp.status_code != status.HTTP_200_OK:
-        response_item.error = f"http_status_{resp.status_code}"
-        return response_item
-
-    message_payload = resp.json()
-    thumbnail_urls = _extract_thumbnail_urls(message_payload)
+        return _RefreshResult(
+            error=f"http_status_{resp.status_code}", cacheable=resp.status_code < 500
+        )
 
+    thumbnail_urls = _extract_thumbnail_urls(resp.json())
     if not thumbnail_urls:
-        response_item.error = "no_image_found"
-        return response_item
-
-    response_item.thumbnail_urls = thumbnail_urls
-    response_item.updated = await _persist_thumbnail(item.thread_id, thumbnail_urls)
-    return response_item
+        return _RefreshResult(error="no_image_found")
+    return _RefreshResult(thumbnail_urls=thumbnail_urls)
 
 
 def _is_image_attachment(attachment: dict[str, Any]) -> bool:
@@ -169,14 +299,14 @@ def _extract_thumbnail_urls(message_payload: dict[str, Any]) -> List[str]:
     return deduped
 
 
-async def _persist_thumbnail(thread_id: int, thumbnail_urls: List[str]) -> bool:
+async def _persist_thumbnails(thumbnails: dict[int, List[str]]) -> List[int]:
+    """一条 UPDATE 写入整批封面，返回数据库中存在并被更新的帖子 ID"""
+    if not thumbnails:
+        return []
     assert _async_session_factory is not None  # 为类型检查器准备
     async with _async_session_factory() as session:
-        stmt = (
-            update(Thread)
-            .where(Thread.thread_id == thread_id)  # type: ignore[arg-type]
-            .values(thumbnail_urls=thumbnail_urls)
-        )
-        result = await session.execute(stmt)
+        updated = await ThreadService(session).batch_update_thumbnail_urls(thumbnails)
         await session.commit()
-        return bool(result.rowcount)
+    if updated and _bot is not None:
+        _bot.dispatch("threads_synced", updated)
+    return updated
@@ -14,10 +14,13 @@ from config.config_service import ConfigService
 from core.cache_service import CacheService
 from search.cog import Search
 from search.qo.thread_search import ThreadSearchQuery
+from search.result_cache import describe_query
 from search.search_service import SearchService
 from shared.enum.collection_type import CollectionType
 from shared.enum.search_config_type import SearchConfigDefaults, SearchConfigType
+from shared.exceptions import InvalidSearchCursor
 from shared.keyword_parser import KeywordParser
+from shared.metrics import StageTimer
 from ThreadManager.services.follow_service import FollowService
 
 # 全局变量，将在应用启动时由 bot_main.py 注入
@@ -29,6 +32,31 @@ cache_service_instance: CacheService | None = None
 # 频道映射配置: { target_channel_id: [ { "tag_name": str, "source_channel_ids": [int] } ] }
 channel_mappings_config: Dict[int, List[Dict]] = {}
 
+
+def parse_channel_mappings(raw_mappings: Dict[str, Any]) -> Dict[int, List[Dict]]:
+    """解析 config.json 中的 channel_mappings，忽略注释键和格式错误的条目"""
+    parsed_mappings: Dict[int, List[Dict]] = {}
+    for key, val in raw_mappings.items():
+        if key.startswith("_"):
+            continue
+        try:
+            ch_id = int(key)
+            if isinstance(val, list):
+                parsed_mappings[ch_id] = [
+                    {
+                        "tag_name": m["tag_name"],
+                        "source_channel_ids": [
+                            int(c) for c in m.get("source_channel_ids", [])
+                        ],
+                    }
+                    for m in val
+                    if isinstance(m, dict) and "tag_name" in m
+                ]
+        except (ValueError, TypeError):
+            continue
+    return parsed_mappings
+
+
 router = APIRouter(
     prefix="/search", tags=["帖子搜索"], dependencies=[Depends(require_auth)]
 )
@@ -55,6 +83,8 @@ async def execute_search(
             detail="Search 服务尚未初始化",
         )
 
+    timer = StageTimer("api")
+
     # 解析高级搜索语法
     author_name = None
     parsed_include_keywords = []
@@ -176,6 +206,7 @@ async def execute_search(
         custom_base_sort=request.custom_base_sort,
         user_id_for_collection_search=user_id_for_collection_search,
     )
+    timer.lap("parse")
 
     try:
         total_disp_conf = await config_service_instance.get_config_from_cache(
@@ -207,15 +238,30 @@ async def execute_search(
         exclude_thread_ids = request.exclude_thread_ids or []
 
         async with async_session_factory() as session:
-            repo = SearchService(session, search_cog_instance.tag_service)
-            threads, total_threads = await repo.search_threads_with_count(
-                query_object,
-                limit=request.limit,
-                total_display_count=total_display_count,
-                exploration_factor=exploration_factor,
-                strength_weight=strength_weight,
-                exclude_thread_ids=exclude_thread_ids,
+            repo = SearchService(
+                session,
+                search_cog_instance.tag_service,
+                search_cog_instance.thread_index_service,
+                search_cog_instance.result_cache,
+                search_cog_instance.ucb_score_service,
+                fts_mode=search_cog_instance.fts_mode,
+                timer=timer,
             )
+            try:
+                cursor_result = await repo.search_threads_with_cursor(
+                    query_object,
+                    limit=request.limit,
+                    cursor=request.cursor,
+                    total_display_count=total_display_count,
+                    exploration_factor=exploration_factor,
+                    strength_weight=strength_weight,
+                    exclude_thread_ids=exclude_thread_ids,
+                )
+                threads, total_threads, next_cursor = cursor_result
+            except InvalidSearchCursor as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+                )
 
             # 当排序方法为按创建时间或收藏时间排序时，不记录展示次数
             count_view = not (
@@ -232,6 +278,8 @@ async def execute_search(
                     thread_ids_to_update
                 )
 
+            timer.lap("impressions")
+
             # 检查收藏状态（复用同一 session）
             collected_thread_ids = set()
             user_id = (
@@ -244,6 +292,8 @@ async def execute_search(
                     user_id, CollectionType.THREAD, thread_ids
                 )
 
+            timer.lap("collections")
+
             # 预计算 channel_id → 匹配的虚拟标签名（用于帖子卡片标签展示）
             channel_to_virtual: dict[int, list[str]] = {}
             if has_mapping and effective_channel_ids:
@@ -309,6 +359,8 @@ async def execute_search(
 
                     available_tags = virtual_tags + real_tag_names
 
+            timer.lap("post_process")
+
             # 获取 Banner 轮播列表（复用同一 session）
             banner_carousel = []
             banner_service = BannerService(session)
@@ -325,6 +377,8 @@ async def execute_search(
                 for banner in banners
             ]
 
+            timer.lap("banners")
+
             # 读取未读更新数量（复用同一 session）
             unread_count = 0
             try:
@@ -335,7 +389,9 @@ async def execute_search(
                     )
             except Exception:
                 unread_count = 0
+            timer.lap("unread_count")
 
+        timer.finish(describe_query(query_object))
         return SearchResponse(
             total=total_threads,
             limit=request.limit,
@@ -345,7 +401,10 @@ async def execute_search(
             virtual_tags=virtual_tags,
             banner_carousel=banner_carousel,
             unread_count=unread_count,
+            next_cursor=next_cursor,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         # 生产环境中应使用 logger.exception
         print(f"搜索时发生内部错误: {e}")
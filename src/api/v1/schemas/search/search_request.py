@@ -98,6 +98,12 @@ class SearchRequest(BaseModel):
         default_factory=list,
         description="已在前端展示的帖子 thread_id 列表，本次请求将排除这些帖子",
     )
+    cursor: Optional[str] = Field(
+        default=None,
+        description="上一次响应返回的 next_cursor，用于获取下一页。"
+        "使用游标翻页时沿用首页的 exclude_thread_ids（游标中已保存，本次传入的值会被忽略），"
+        "其余搜索条件需与首页保持一致",
+    )
     offset: int = Field(
         default=0, ge=0, description="结果的偏移页（已弃用，为兼容旧版本保留）"
     )
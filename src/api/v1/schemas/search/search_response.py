@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import Field
 
@@ -23,3 +23,6 @@ class SearchResponse(PaginatedResponse[ThreadDetail]):
         description="Banner轮播列表，包含当前频道+全频道的banner（最多8个）",
     )
     unread_count: int = Field(default=0, description="当前用户关注列表的未读更新数量")
+    next_cursor: Optional[str] = Field(
+        default=None, description="下一页的游标，没有更多结果时为空"
+    )
@@ -0,0 +1,255 @@
+"""
+API 工作进程入口。
+
+配置 api.workers > 0 时，bot_main 不在网关事件循环里运行 API，而是启动：
+
+    python -m uvicorn api.worker:create_app --factory --workers N
+
+每个工作进程直接读写同一个 SQLite 数据库，只有机器人进程才有的状态
+（已索引频道、索引/配置/帖子版本、UCB1 分数是否就绪）通过 state_snapshot 写出的快照文件获取。
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.main import app
+from api.state_snapshot import (
+    DEFAULT_EVENTS_DIR,
+    DEFAULT_STATE_PATH,
+    FORWARDED_EVENTS,
+    SnapshotCacheService,
+    write_event,
+)
+from api.v1.dependencies.security import initialize_api_security
+from api.v1.routers import (
+    banner as banner_api,
+    booklists as booklists_api,
+    fetch_images as fetch_images_api,
+    meta as meta_api,
+    preferences as preferences_api,
+    search as search_api,
+)
+from api.v1.routers.auth import initialize_auth_config
+from collection.cog import CollectionCog
+from config.config_service import ConfigService
+from core.impression_cache_service import ImpressionCacheService
+from core.tag_cache_service import TagCacheService
+from preferences.preferences_service import PreferencesService
+from search.search_service import FTS_MODE_AUTO
+from shared.database import (
+    AsyncSessionFactory,
+    ReadSessionFactory,
+    close_db,
+    configure_database,
+)
+from shared.http_client import close_http_client
+from shared.metrics import set_slow_search_threshold
+
+logger = logging.getLogger(__name__)
+
+# 轮询状态快照的间隔（秒）
+SNAPSHOT_POLL_INTERVAL = 2
+
+
+class WorkerEvents:
+    """
+    代替 bot.dispatch 的事件接收者。
+
+    曝光回写会更新总展示次数配置，这里记下来，由快照轮询任务刷新本进程的配置缓存。
+    UCB1 分数、内存索引和结果缓存由机器人进程维护，相关事件写入 events_dir 转交给机器人进程。
+    """
+
+    def __init__(self, events_dir: str = DEFAULT_EVENTS_DIR):
+        self.events_dir = events_dir
+        self.config_dirty = False
+
+    def dispatch(self, event: str, *args):
+        if event == "config_updated":
+            self.config_dirty = True
+        if event in FORWARDED_EVENTS:
+            try:
+                write_event(self.events_dir, event, *args)
+            except OSError:
+                logger.warning(f"转交事件 {event} 给机器人进程失败。", exc_info=True)
+
+
+@dataclass
+class WorkerSearchContext:
+    """搜索路由需要的服务，字段与 Search cog 上的同名属性一致"""
+
+    tag_service: TagCacheService
+    impression_cache_service: ImpressionCacheService
+    ucb_score_service: Optional[SnapshotCacheService]
+    fts_mode: str = FTS_MODE_AUTO
+    thread_index_service: None = None
+    result_cache: None = None
+
+
+@dataclass
+class WorkerPreferencesContext:
+    """偏好路由需要的服务，字段与 Preferences cog 上的同名属性一致"""
+
+    preferences_service: PreferencesService
+
+
+def load_config() -> dict:
+    try:
+        with open("config.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning("未找到 config.json，API 工作进程使用默认配置。")
+        return {}
+
+
+def configure_routers(
+    config: dict,
+    *,
+    session_factory: async_sessionmaker,
+    read_session_factory: async_sessionmaker,
+    snapshot: SnapshotCacheService,
+    tag_service: TagCacheService,
+    config_service: ConfigService,
+    impression_cache_service: ImpressionCacheService,
+    events: WorkerEvents,
+):
+    """把工作进程的服务注入到 API 路由，对应 bot_main 中的 enhanced_setup_hook"""
+    performance = config.get("performance", {})
+    collection_cog = CollectionCog(bot=None, session_factory=session_factory)  # type: ignore[arg-type]
+
+    preferences_api.preferences_cog_instance = WorkerPreferencesContext(  # type: ignore[assignment]
+        preferences_service=PreferencesService(
+            bot=None,  # type: ignore[arg-type]
+            session_factory=session_factory,
+            tag_service=tag_service,
+            cache_service=snapshot,  # type: ignore[arg-type]
+        )
+    )
+    search_api.search_cog_instance = WorkerSearchContext(  # type: ignore[assignment]
+        tag_service=tag_service,
+        impression_cache_service=impression_cache_service,
+        # 物化分数由机器人进程维护，快照里记录它是否就绪
+        ucb_score_service=snapshot
+        if performance.get("materialized_ucb_score", True)
+        else None,
+        fts_mode=performance.get("search_fts_mode", FTS_MODE_AUTO),
+    )
+    search_api.collection_cog_instance = collection_cog
+    booklists_api.collection_cog_instance = collection_cog
+    search_api.async_session_factory = read_session_factory
+    meta_api.cache_service_instance = snapshot  # type: ignore[assignment]
+    search_api.cache_service_instance = snapshot  # type: ignore[assignment]
+    search_api.config_service_instance = config_service
+    search_api.channel_mappings_config = search_api.parse_channel_mappings(
+        config.get("channel_mappings", {})
+    )
+
+    auth_section = config.get("auth", {})
+    fetch_images_api.configure_fetch_images_router(
+        session_factory=session_factory,
+        bot_token=auth_section.get("bot_token"),
+        guild_id=auth_section.get("guild_id"),
+        bot=events,  # type: ignore[arg-type]
+    )
+
+    # 审核消息需要网关连接，工作进程只写数据库
+    banner_api.async_session_factory = session_factory
+    banner_api.banner_config = config.get("banner", {})
+    banner_api.bot_instance = None
+
+
+async def poll_snapshot(
+    snapshot: SnapshotCacheService,
+    tag_service: TagCacheService,
+    config_service: ConfigService,
+    events: WorkerEvents,
+    interval: float = SNAPSHOT_POLL_INTERVAL,
+):
+    """跟随机器人进程的索引、帖子和配置变化刷新本进程的缓存"""
+    threads_version = snapshot.threads_version
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            index_changed, config_changed = snapshot.reload()
+            if index_changed:
+                await tag_service.build_cache()
+            elif snapshot.threads_version != threads_version:
+                # 机器人进程写入的帖子标签只在它自己的位图里，这里按同步记录补上
+                synced = snapshot.synced_thread_ids_since(threads_version)
+                if synced is None:
+                    await tag_service.build_cache()
+                elif synced:
+                    await tag_service.refresh_threads(synced)
+            threads_version = snapshot.threads_version
+            if config_changed or events.config_dirty:
+                events.config_dirty = False
+                await config_service.build_or_refresh_cache()
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.error("刷新 API 工作进程缓存失败。", exc_info=e)
+
+
+@asynccontextmanager
+async def worker_lifespan(_app: FastAPI):
+    config = load_config()
+    performance = config.get("performance", {})
+    await configure_database(performance.get("db_profile", "default"))
+    set_slow_search_threshold(performance.get("slow_search_threshold_ms", 1000) / 1000)
+    initialize_api_security()
+    initialize_auth_config()
+
+    snapshot = SnapshotCacheService(
+        config.get("api", {}).get("state_path", DEFAULT_STATE_PATH)
+    )
+    snapshot.reload()
+
+    tag_service = TagCacheService(AsyncSessionFactory)
+    await tag_service.build_cache()
+    async with AsyncSessionFactory() as session:
+        config_service = ConfigService(session)
+        await config_service.build_or_refresh_cache()
+
+    # 不使用预写日志：日志文件按进程独占，工作进程退出时会在 stop() 中回写
+    events = WorkerEvents(config.get("api", {}).get("events_dir", DEFAULT_EVENTS_DIR))
+    impression_cache_service = ImpressionCacheService(
+        bot=events,  # type: ignore[arg-type]
+        session_factory=AsyncSessionFactory,
+        flush_interval=performance.get("impression_flush_interval", 60),
+    )
+    await impression_cache_service.start()
+
+    configure_routers(
+        config,
+        session_factory=AsyncSessionFactory,
+        read_session_factory=ReadSessionFactory,
+        snapshot=snapshot,
+        tag_service=tag_service,
+        config_service=config_service,
+        impression_cache_service=impression_cache_service,
+        events=events,
+    )
+    poll_task = asyncio.create_task(
+        poll_snapshot(snapshot, tag_service, config_service, events)
+    )
+    logger.info("API 工作进程已启动")
+
+    try:
+        yield
+    finally:
+        poll_task.cancel()
+        await impression_cache_service.stop()
+        await close_http_client()
+        await close_db()
+
+
+def create_app() -> FastAPI:
+    """uvicorn --factory 使用的应用工厂"""
+    app.router.lifespan_context = worker_lifespan
+    return app
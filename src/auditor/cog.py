@@ -1,25 +1,34 @@
 import logging
-import random
 from asyncio import sleep
-from typing import List
+from datetime import datetime, timezone
 
+import discord
 from discord.ext import commands, tasks
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from auditor.reconciler import ArchiveReconciler
 from auditor.repository import AuditorRepository
 from core.sync_service import SyncService
 from shared.api_scheduler import APIScheduler
 
 logger = logging.getLogger(__name__)
 
+# 每轮审计最多提交的帖子数。每个帖子间隔 4 秒提交，一轮约占满 1 分钟的循环周期
+AUDIT_BATCH_SIZE = 15
+
 
 class Auditor(commands.Cog):
     """
     负责后台数据审计的 Cog
 
-    这个 Cog 包含一个后台循环任务，该任务会定期执行完整的审计周期。
-    在每个周期开始时，它会从数据库获取所有已索引的帖子ID，然后以非常低的速率
-    将它们逐一提交给 API 调度器进行数据同步。这确保了本地数据与 Discord 的数据最终一致
+    这个 Cog 包含一个后台循环任务，每轮只审计一小批"到期"的帖子。
+    每个帖子的审计间隔由其活跃程度和热度决定：近期活跃、反应数多的帖子审计得更频繁，
+    长期无活动的归档帖子则很少审计。任何一次完整同步（包括事件驱动的同步）都会刷新
+    帖子的审计时间，因此有事件覆盖的帖子不会被重复审计。
+    到期的帖子按紧迫度排序后以非常低的速率提交给 API 调度器，确保本地数据与 Discord 的数据最终一致
+
+    另有一个低频的对账循环，通过帖子列表接口批量比对所有频道的帖子，
+    一次调用即可确认 100 个帖子，只有发生变化的帖子才会提交完整同步
     """
 
     def __init__(
@@ -28,76 +37,77 @@ class Auditor(commands.Cog):
         session_factory: async_sessionmaker,
         api_scheduler: APIScheduler,
         sync_service: SyncService,
+        reconcile_interval_hours: float = 6,
     ):
         self.bot = bot
         self.session_factory = session_factory
         self.api_scheduler = api_scheduler
         self.sync_service = sync_service
-        self.audit_queue: List[int] = []
+        self.reconciler = ArchiveReconciler(
+            session_factory=session_factory,
+            api_scheduler=api_scheduler,
+            sync_service=sync_service,
+        )
+        self.reconcile_interval_hours = reconcile_interval_hours
         logger.info("Auditor 模块已加载")
 
     async def cog_load(self):
         """当 Cog 加载时，启动后台审计循环。"""
         self.audit_loop.start()
         self.cleanup_loop.start()
+        if self.reconcile_interval_hours > 0:
+            self.reconcile_loop.change_interval(hours=self.reconcile_interval_hours)
+            self.reconcile_loop.start()
 
     async def cog_unload(self):
         """当 Cog 卸载时，取消后台审计循环。"""
         self.audit_loop.cancel()
         self.cleanup_loop.cancel()
-
-    async def _reload_audit_queue(self):
-        """
-        从数据库重新加载需要审计的帖子 ID 列表。
-
-        它会获取所有帖子的ID，并随机打乱顺序，以避免每次都从相同的帖子开始审计。
-        """
-        logger.debug("正在从数据库重新加载审计队列...")
-        async with self.session_factory() as session:
-            repo = AuditorRepository(session)
-            self.audit_queue = await repo.get_all_thread_ids()
-            random.shuffle(self.audit_queue)
-        logger.debug(f"审计队列加载完成，共 {len(self.audit_queue)} 个帖子需要审计。")
+        self.reconcile_loop.cancel()
 
     @tasks.loop(seconds=60)
     async def audit_loop(self):
         """
         主审计循环。
 
-        这个循环负责执行一个完整的审计周期。它会先加载所有帖子ID，然后逐一处理。
-        处理完所有帖子后，会等待一段时间，再开始下一个周期。
+        每轮从数据库取出紧迫度最高的一批到期帖子，逐一提交同步，然后记录审计时间。
+        没有到期的帖子时本轮直接跳过，不会产生任何 API 调用。
         """
         try:
-            logger.debug("开始新一轮的后台数据审计周期...")
-            await self._reload_audit_queue()
-
-            if not self.audit_queue:
-                logger.debug("没有需要审计的帖子，本轮审计周期跳过。")
-            else:
-                for thread_id in self.audit_queue:
-                    if self.audit_loop.is_being_cancelled():
-                        logger.info("审计循环被中断。")
-                        break
-
-                    await self.api_scheduler.submit(
-                        coro_factory=lambda tid=thread_id: self.sync_service.sync_thread(
-                            tid
-                        ),
-                        priority=10,
-                    )
-                    await sleep(4)
+            now = datetime.now(timezone.utc)
+            async with self.session_factory() as session:
+                repo = AuditorRepository(session)
+                due_ids = await repo.get_due_thread_ids(now, limit=AUDIT_BATCH_SIZE)
+
+            if not due_ids:
+                logger.debug("没有到期需要审计的帖子，本轮审计跳过。")
+                return
+
+            logger.debug(f"本轮共有 {len(due_ids)} 个到期帖子需要审计。")
+            submitted: list[int] = []
+            for thread_id in due_ids:
+                if self.audit_loop.is_being_cancelled():
+                    logger.info("审计循环被中断。")
+                    break
+
+                await self.api_scheduler.submit(
+                    coro_factory=lambda tid=thread_id: self.sync_service.sync_thread(
+                        tid
+                    ),
+                    priority=10,
+                    key=("sync_thread", thread_id),
+                )
+                submitted.append(thread_id)
+                await sleep(4)
 
-                if not self.audit_loop.is_being_cancelled():
-                    logger.debug(
-                        f"本轮 {len(self.audit_queue)} 个帖子的审计任务已全部提交。"
-                    )
+            async with self.session_factory() as session:
+                await AuditorRepository(session).mark_audited(
+                    submitted, datetime.now(timezone.utc)
+                )
+            logger.debug(f"本轮 {len(submitted)} 个帖子的审计任务已完成。")
 
         except Exception as e:
             logger.error(f"审计循环发生严重错误: {e}", exc_info=True)
-        finally:
-            if not self.audit_loop.is_being_cancelled():
-                logger.debug("本轮审计周期完成，将在1分钟后开始下一轮。")
-                await sleep(60)
 
     @tasks.loop(hours=6)
     async def cleanup_loop(self):
@@ -117,8 +127,43 @@ class Auditor(commands.Cog):
         except Exception as e:
             logger.error(f"幽灵数据清理任务发生严重错误: {e}", exc_info=True)
 
+    @tasks.loop(hours=6)
+    async def reconcile_loop(self):
+        """定期通过帖子列表对账所有已索引频道的帖子。"""
+        try:
+            async with self.session_factory() as session:
+                channel_ids = await AuditorRepository(session).get_channel_ids()
+
+            logger.info(f"开始对账 {len(channel_ids)} 个频道的帖子...")
+            for channel_id in channel_ids:
+                if self.reconcile_loop.is_being_cancelled():
+                    logger.info("对账循环被中断。")
+                    break
+
+                channel = self.bot.get_channel(channel_id)
+                if not isinstance(channel, discord.ForumChannel):
+                    logger.debug(
+                        f"频道 {channel_id} 不在缓存中或不是论坛频道，跳过对账。"
+                    )
+                    continue
+
+                try:
+                    result = await self.reconciler.reconcile_channel(channel)
+                except Exception as e:
+                    logger.error(f"对账频道 {channel_id} 时出错: {e}", exc_info=True)
+                    continue
+
+                logger.info(
+                    f"频道 {channel_id} 对账完成：{result.listed} 个帖子中 "
+                    f"{result.synced} 个有变化，请求了 {result.pages} 页帖子列表。"
+                )
+
+        except Exception as e:
+            logger.error(f"对账循环发生严重错误: {e}", exc_info=True)
+
     @audit_loop.before_loop
     @cleanup_loop.before_loop
+    @reconcile_loop.before_loop
     async def before_loops(self):
         """在循环开始前，等待机器人完全准备就绪。"""
         await self.bot.wait_until_ready()
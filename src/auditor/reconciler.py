@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import discord
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from auditor.repository import AuditorRepository, ThreadSnapshot
+from core.sync_service import SyncService
+from shared.api_scheduler import APIScheduler
+
+logger = logging.getLogger(__name__)
+
+# 归档帖子列表每页的帖子数（Discord 接口上限）
+ARCHIVE_PAGE_SIZE = 100
+# 两页之间的间隔（秒），对账是纯后台任务，不需要抢占速率
+PAGE_INTERVAL = 2
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """数据库中的时间以不带时区的 UTC 存储"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def needs_full_sync(thread: discord.Thread, snapshot: Optional[ThreadSnapshot]) -> bool:
+    """
+    比较帖子列表中的帖子与数据库快照，判断是否需要完整同步（获取首楼消息）。
+
+    帖子列表已经包含标题、标签、回复数和最后一条消息的 ID，
+    这些字段都没有变化时，首楼内容也不需要重新获取。
+    """
+    if snapshot is None or snapshot.not_found_count > 0:
+        return True
+    if thread.name != snapshot.title:
+        return True
+    if frozenset(t.id for t in thread.applied_tags or []) != snapshot.tag_ids:
+        return True
+    if thread.message_count != snapshot.reply_count:
+        return True
+
+    # 与 SyncService 写入 last_active_at 的方式一致
+    last_active_at = (
+        discord.utils.snowflake_time(thread.last_message_id)
+        if thread.last_message_id
+        else thread.created_at
+    )
+    if snapshot.last_active_at is None or last_active_at is None:
+        return snapshot.last_active_at != last_active_at
+    return _naive_utc(last_active_at) != _naive_utc(snapshot.last_active_at)
+
+
+@dataclass
+class ReconcileResult:
+    """一个频道的对账结果"""
+
+    listed: int = 0
+    unchanged: int = 0
+    synced: int = 0
+    pages: int = 0
+
+
+class ArchiveReconciler:
+    """
+    通过帖子列表批量对账，代替逐个帖子的审计。
+
+    每次调用归档帖子列表接口可以拿到 100 个帖子的标题、标签、回复数和归档时间，
+    与数据库逐页比对后，只有发生变化或数据库中不存在的帖子才会提交完整同步，
+    其余帖子直接记录为已审计。没有出现在列表中的帖子（如已删除的帖子）
+    保持原来的审计时间，仍由逐帖审计确认。
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        api_scheduler: APIScheduler,
+        sync_service: SyncService,
+    ):
+        self.session_factory = session_factory
+        self.api_scheduler = api_scheduler
+        self.sync_service = sync_service
+
+    async def _fetch_archive_page(
+        self, channel: discord.ForumChannel, before: Optional[datetime]
+    ) -> list[discord.Thread]:
+        """通过调度器获取一页归档帖子，一页只产生一次 API 调用"""
+
+        async def fetch():
+            return [
+                thread
+                async for thread in channel.archived_threads(
+                    limit=ARCHIVE_PAGE_SIZE, before=before
+                )
+            ]
+
+        return await self.api_scheduler.submit(coro_factory=fetch, priority=10)
+
+    async def _reconcile_threads(
+        self, threads: list[discord.Thread], result: ReconcileResult
+    ):
+        """比对一批帖子：未变化的批量记录审计时间，变化的逐个提交完整同步"""
+        if not threads:
+            return
+
+        async with self.session_factory() as session:
+            snapshots = await AuditorRepository(session).get_thread_snapshots(
+                [thread.id for thread in threads]
+            )
+
+        unchanged: list[int] = []
+        changed: list[discord.Thread] = []
+        for thread in threads:
+            if needs_full_sync(thread, snapshots.get(thread.id)):
+                changed.append(thread)
+            else:
+                unchanged.append(thread.id)
+
+        if unchanged:
+            async with self.session_factory() as session:
+                await AuditorRepository(session).mark_audited(
+                    unchanged, datetime.now(timezone.utc)
+                )
+
+        for thread in changed:
+            await self.api_scheduler.submit(
+                coro_factory=lambda t=thread: self.sync_service.sync_thread(t),
+                priority=10,
+                key=("sync_thread", thread.id),
+            )
+
+        result.listed += len(threads)
+        result.unchanged += len(unchanged)
+        result.synced += len(changed)
+
+    async def reconcile_channel(
+        self,
+        channel: discord.ForumChannel,
+        active_threads: Optional[Iterable[discord.Thread]] = None,
+    ) -> ReconcileResult:
+        """
+        对账一个论坛频道的所有帖子。
+
+        活跃帖子默认取自缓存（不产生 API 调用），归档帖子逐页获取并比对。
+        """
+        result = ReconcileResult()
+
+        active = list(channel.threads if active_threads is None else active_threads)
+        await self._reconcile_threads(active, result)
+
+        before: Optional[datetime] = None
+        while True:
+            page = await self._fetch_archive_page(channel, before)
+            result.pages += 1
+            await self._reconcile_threads(page, result)
+
+            if len(page) < ARCHIVE_PAGE_SIZE:
+                break
+            before = page[-1].archive_timestamp
+            await asyncio.sleep(PAGE_INTERVAL)
+
+        logger.debug(
+            f"频道 {channel.id} 对账完成：列表中共 {result.listed} 个帖子，"
+            f"{result.unchanged} 个无变化，{result.synced} 个提交完整同步，"
+            f"共请求 {result.pages} 页归档列表。"
+        )
+        return result
@@ -1,7 +1,74 @@
-from sqlalchemy import delete, select
+import math
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Sequence
+
+from sqlalchemy import (
+    DateTime,
+    case,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Thread
+from models import Thread, ThreadTagLink
+
+# 审计间隔（天）。帖子越活跃、越热门，审计越频繁
+HOT_AUDIT_INTERVAL = 10 / (24 * 60)  # 一天内活跃：10 分钟
+WARM_AUDIT_INTERVAL = 1 / 24  # 一周内活跃：1 小时
+COOL_AUDIT_INTERVAL = 0.25  # 一个月内活跃：6 小时
+COLD_AUDIT_INTERVAL = 7.0  # 长期无活动的归档帖子：7 天
+NOT_FOUND_AUDIT_INTERVAL = 1 / 24  # 曾经找不到的帖子：1 小时，尽快确认是否已删除
+
+# 热度加成：审计间隔除以 1 + log10(1 + 反应数) * POPULARITY_WEIGHT
+POPULARITY_WEIGHT = 0.5
+
+# 每批中留给最久未审计的到期帖子的比例，避免冷门帖子被热门帖子长期挤占
+OLDEST_AUDIT_SHARE = 1 / 3
+
+
+def audit_urgency_expression(now: datetime):
+    """
+    构造审计紧迫度的 SQL 表达式：距上次审计的时间 / 该帖子应有的审计间隔。
+    大于等于 1 表示已到期，值越大越应该优先审计。
+    从未审计过的帖子以创建时间作为基准。
+    """
+    now_day = func.julianday(literal(now, DateTime))
+    idle_days = now_day - func.julianday(
+        func.coalesce(Thread.last_active_at, Thread.created_at)
+    )
+    interval = case(
+        (Thread.not_found_count > 0, NOT_FOUND_AUDIT_INTERVAL),  # type: ignore
+        (idle_days <= 1, HOT_AUDIT_INTERVAL),
+        (idle_days <= 7, WARM_AUDIT_INTERVAL),
+        (idle_days <= 30, COOL_AUDIT_INTERVAL),
+        else_=COLD_AUDIT_INTERVAL,
+    ) / (1 + func.log(1 + Thread.reaction_count) * POPULARITY_WEIGHT)
+    stale_days = now_day - func.julianday(
+        func.coalesce(Thread.last_audited_at, Thread.created_at)
+    )
+    return stale_days / interval
+
+
+def min_audit_interval(max_reaction_count: int) -> timedelta:
+    """所有帖子中可能出现的最短审计间隔，距上次审计不足这个时间的帖子一定没有到期"""
+    days = HOT_AUDIT_INTERVAL / (
+        1 + math.log10(1 + max(max_reaction_count, 0)) * POPULARITY_WEIGHT
+    )
+    return timedelta(days=days)
+
+
+class ThreadSnapshot(NamedTuple):
+    """数据库中可以直接与 Discord 帖子列表比对的帖子字段"""
+
+    title: str
+    tag_ids: frozenset[int]
+    reply_count: int
+    last_active_at: Optional[datetime]
+    not_found_count: int
 
 
 class AuditorRepository:
@@ -12,17 +79,113 @@ class AuditorRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_all_thread_ids(self) -> list[int]:
+    async def get_due_thread_ids(self, now: datetime, limit: int) -> list[int]:
         """
-        从数据库中获取所有已索引帖子的 ID。
+        按紧迫度从高到低获取已到审计时间的帖子 ID。
+
+        先用 last_audited_at 上的索引排除最短审计间隔内刚审计过的帖子，
+        只对剩下的帖子计算紧迫度。每批中 OLDEST_AUDIT_SHARE 的名额留给
+        最久未审计的到期帖子，其余名额按紧迫度分配。
 
         Returns:
-            一个包含所有帖子 ID 的列表。
+            最多 limit 个帖子 ID。
         """
-        stmt = select(Thread.thread_id)  # type: ignore
+        max_reaction_count = await self.session.scalar(
+            select(func.max(Thread.reaction_count))
+        )
+        cutoff = now - min_audit_interval(max_reaction_count or 0)
+        urgency = audit_urgency_expression(now).label("urgency")
+        base = select(Thread.thread_id, urgency).where(  # type: ignore
+            or_(
+                Thread.last_audited_at.is_(None),  # type: ignore
+                Thread.last_audited_at < cutoff,  # type: ignore
+            ),
+            urgency >= 1,
+        )
+
+        # 从未审计过的帖子 last_audited_at 为 NULL，升序时排在最前
+        oldest_limit = int(limit * OLDEST_AUDIT_SHARE)
+        rows = []
+        if oldest_limit > 0:
+            rows = (
+                await self.session.execute(
+                    base.order_by(Thread.last_audited_at.asc()).limit(  # type: ignore
+                        oldest_limit
+                    )
+                )
+            ).all()
+
+        picked = [row.thread_id for row in rows]
+        urgent_stmt = base.order_by(urgency.desc()).limit(limit - len(picked))
+        if picked:
+            urgent_stmt = urgent_stmt.where(
+                Thread.thread_id.not_in(picked)  # type: ignore
+            )
+        rows += (await self.session.execute(urgent_stmt)).all()
+
+        rows.sort(key=lambda row: row.urgency, reverse=True)
+        return [row.thread_id for row in rows]
+
+    async def mark_audited(self, thread_ids: Sequence[int], now: datetime):
+        """记录帖子的审计时间，无论同步成功与否，避免失败的帖子被反复审计"""
+        if not thread_ids:
+            return
+        stmt = (
+            update(Thread)
+            .where(Thread.thread_id.in_(thread_ids))  # type: ignore
+            .values(last_audited_at=now)
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+
+    async def get_channel_ids(self) -> list[int]:
+        """获取所有已索引帖子所在的频道 ID。"""
+        stmt = select(Thread.channel_id).distinct()  # type: ignore
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
 
+    async def get_thread_snapshots(
+        self, thread_ids: Sequence[int]
+    ) -> dict[int, ThreadSnapshot]:
+        """
+        批量获取帖子的比对快照。
+
+        Returns:
+            {帖子 ID: 快照}，数据库中不存在的帖子不会出现在结果中。
+        """
+        if not thread_ids:
+            return {}
+
+        stmt = select(
+            Thread.id,
+            Thread.thread_id,
+            Thread.title,
+            Thread.reply_count,
+            Thread.last_active_at,
+            Thread.not_found_count,
+        ).where(Thread.thread_id.in_(thread_ids))  # type: ignore
+        rows = (await self.session.execute(stmt)).all()
+        if not rows:
+            return {}
+
+        tag_stmt = select(ThreadTagLink.thread_id, ThreadTagLink.tag_id).where(
+            ThreadTagLink.thread_id.in_([row.id for row in rows])  # type: ignore
+        )
+        tag_ids: dict[int, set[int]] = {}
+        for row_id, tag_id in (await self.session.execute(tag_stmt)).all():
+            tag_ids.setdefault(row_id, set()).add(tag_id)
+
+        return {
+            row.thread_id: ThreadSnapshot(
+                title=row.title,
+                tag_ids=frozenset(tag_ids.get(row.id, ())),
+                reply_count=row.reply_count,
+                last_active_at=row.last_active_at,
+                not_found_count=row.not_found_count,
+            )
+            for row in rows
+        }
+
     async def delete_stale_threads(self, threshold: int) -> int:
         """
         物理删除那些 not_found_count 超过阈值的帖子记录。
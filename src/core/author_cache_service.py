@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Optional
+
+import discord
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import select
+
+from core.author_service import AuthorRepository, author_data_from_user
+from models import Author
+from shared.discord_utils import DiscordUtils
+
+if TYPE_CHECKING:
+    from bot_main import MyBot
+
+logger = logging.getLogger(__name__)
+
+# 与数据库比较的作者字段，全部相同时跳过写入
+AUTHOR_FIELDS = ("name", "global_name", "display_name", "avatar_url")
+
+
+class AuthorCacheService:
+    """
+    作者信息缓存，去掉同步帖子时重复的用户获取和数据库写入。
+
+    - 成员在 discord.py 缓存中时直接使用，不调用 API；
+      不在缓存中的作者在 ttl 秒内只通过 API 获取一次（获取失败也会记住）。
+    - 记住数据库中每个作者的字段，名称和头像都没有变化时不写入。
+    - 有变化的作者先放入待写入队列，由后台任务定期用一条多行 upsert 写入。
+    """
+
+    def __init__(
+        self,
+        bot: "MyBot",
+        session_factory: async_sessionmaker,
+        ttl: float = 3600,
+        flush_interval: float = 5,
+    ):
+        self.bot = bot
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+
+        # 数据库中的作者字段: {author_id: (name, global_name, display_name, avatar_url)}
+        self._known: dict[int, tuple] = {}
+        # 最近一次从 Discord 获取作者的时间（time.monotonic()）
+        self._checked_at: dict[int, float] = {}
+        # 待写入的作者: {author_id: author_data}
+        self._pending: dict[int, dict] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def load(self):
+        """从数据库加载已有作者的字段，用于变化检测"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(Author.id, *(getattr(Author, f) for f in AUTHOR_FIELDS))
+            )
+            self._known = {row[0]: tuple(row[1:]) for row in result.all()}
+        logger.info(f"作者缓存加载完成，共 {len(self._known)} 个作者。")
+
+    def start(self):
+        """启动后台的批量写入任务。"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        """停止后台任务并写入剩余的作者。"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        await self.flush()
+
+    def _cached_user(
+        self,
+        author_id: int,
+        guild: Optional[discord.Guild],
+        source_member: discord.Member | discord.User | None,
+    ) -> discord.User | discord.Member | None:
+        """只从传入对象和本地缓存中查找用户，不调用 API"""
+        if source_member is not None and source_member.id == author_id:
+            return source_member
+        if guild is not None:
+            member = guild.get_member(author_id)
+            if member is not None:
+                return member
+        return self.bot.get_user(author_id)
+
+    async def observe(
+        self,
+        author_id: int,
+        guild: Optional[discord.Guild] = None,
+        source_member: discord.Member | discord.User | None = None,
+    ):
+        """
+        记录一个帖子作者。
+        本地缓存中有该用户时直接比较；否则只有距上次获取超过 ttl 时才调用 API。
+        """
+        now = time.monotonic()
+        user_obj = self._cached_user(author_id, guild, source_member)
+        if user_obj is None:
+            checked_at = self._checked_at.get(author_id)
+            if checked_at is not None and now - checked_at < self.ttl:
+                return
+            self._checked_at[author_id] = now
+            user_obj = await DiscordUtils.get_or_fetch_user(
+                bot=self.bot,
+                user_id=author_id,
+                guild=guild,
+                source_member=source_member,
+            )
+            if user_obj is None:
+                return
+
+        self._stage(author_data_from_user(user_obj))
+
+    def _stage(self, author_data: dict):
+        """字段与数据库不同时放入待写入队列"""
+        fields = tuple(author_data[f] for f in AUTHOR_FIELDS)
+        if self._known.get(author_data["id"]) == fields:
+            self._pending.pop(author_data["id"], None)
+            return
+        self._pending[author_data["id"]] = author_data
+
+    async def flush(self):
+        """把待写入的作者用一条语句写入数据库"""
+        async with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            try:
+                async with self.session_factory() as session:
+                    await AuthorRepository(session).upsert_authors(
+                        list(pending.values())
+                    )
+            except Exception as e:
+                logger.error(f"批量写入 {len(pending)} 个作者失败: {e}", exc_info=True)
+                # 放回队列，期间有更新的作者以新数据为准
+                self._pending = {**pending, **self._pending}
+                return
+
+            for author_id, author_data in pending.items():
+                self._known[author_id] = tuple(author_data[f] for f in AUTHOR_FIELDS)
+        logger.debug(f"批量写入了 {len(pending)} 个作者。")
+
+    async def _run_loop(self):
+        """后台任务的主循环。"""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                logger.info("作者缓存后台任务已被取消。")
+                break
+            except Exception as e:
+                logger.error("作者缓存后台循环发生错误。", exc_info=e)
@@ -1,6 +1,7 @@
 import logging
-from typing import Dict, Any
+from typing import Any, Dict, List
 
+import discord
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,6 +10,17 @@ from models import Author
 logger = logging.getLogger(__name__)
 
 
+def author_data_from_user(user_obj: discord.User | discord.Member) -> dict:
+    """把用户对象转换为 Author 表的数据"""
+    return {
+        "id": user_obj.id,
+        "name": user_obj.name,
+        "global_name": user_obj.global_name,
+        "display_name": user_obj.display_name,
+        "avatar_url": user_obj.display_avatar.url,
+    }
+
+
 class AuthorRepository:
     """
     负责 Author 模型在数据库中的持久化操作。
@@ -35,6 +47,32 @@ class AuthorRepository:
             await self.session.commit()
         except Exception as e:
             logger.error(
-                f"更新作者 {author_data.get('id')} 信息到数据库时失败: {e}", exc_info=True
+                f"更新作者 {author_data.get('id')} 信息到数据库时失败: {e}",
+                exc_info=True,
             )
             raise  # 重新抛出异常
+
+    async def upsert_authors(self, authors: List[Dict[str, Any]]) -> None:
+        """
+        用一条语句批量更新或插入多个作者的信息。
+
+        Args:
+            authors: 作者信息字典列表，同一作者只应出现一次。
+        """
+        if not authors:
+            return
+
+        stmt = sqlite_insert(Author).values(authors)
+        update_stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                **{
+                    key: getattr(stmt.excluded, key)
+                    for key in authors[0]
+                    if key != "id"
+                },
+                "last_updated": stmt.excluded.last_updated,
+            },
+        )
+        await self.session.execute(update_stmt)
+        await self.session.commit()
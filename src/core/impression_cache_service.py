@@ -1,14 +1,16 @@
 import asyncio
 import logging
 from collections import Counter
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from sqlalchemy import case, func
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlmodel import update
 
+from core.journal_checkpoint_service import JournalCheckpointService
 from models import BotConfig, Thread
 from shared.enum.search_config_type import SearchConfigType
+from shared.write_ahead_journal import WriteAheadJournal
 
 if TYPE_CHECKING:
     from bot_main import MyBot
@@ -19,6 +21,9 @@ logger = logging.getLogger(__name__)
 class ImpressionCacheService:
     """
     处理帖子展示次数的内存缓存和定期数据库回写服务。
+
+    传入 journal 时，每次计数先写入本地日志，启动时回放日志恢复上次未落库的展示次数。
+    回写时在同一事务中记录日志段编号，已落库但未删除的日志段不会被重复回放。
     """
 
     def __init__(
@@ -26,20 +31,25 @@ class ImpressionCacheService:
         bot: "MyBot",
         session_factory: async_sessionmaker,
         flush_interval: int = 60,
+        journal: Optional[WriteAheadJournal] = None,
     ):
         self.bot = bot
         self.session_factory = session_factory
         self.flush_interval = flush_interval  # 默认1分钟回写一次
+        self.journal = journal
         self._impression_cache = Counter()
         self._lock = asyncio.Lock()
+        # 保证同一时刻只有一次回写，日志段按回写顺序提交
+        self._flush_lock = asyncio.Lock()
         self._task: asyncio.Task | None = None
         self._is_running = False
 
-    def start(self):
+    async def start(self):
         """启动后台定期回写任务。"""
         if self._is_running:
             return
         self._is_running = True
+        await self._replay_journal()
         self._task = asyncio.create_task(self._periodic_flush())
         logger.info(
             f"ImpressionCacheService 已启动，每 {self.flush_interval} 秒回写一次数据库。"
@@ -58,8 +68,24 @@ class ImpressionCacheService:
                 pass
         logger.info("ImpressionCacheService 正在停止，执行最后一次数据回写...")
         await self.flush_to_db()
+        if self.journal:
+            self.journal.close()
         logger.info("最终数据回写完成。")
 
+    async def _replay_journal(self):
+        """回放日志中上次未落库的展示次数"""
+        if self.journal is None:
+            return
+        async with self.session_factory() as session:
+            committed = await JournalCheckpointService(session).get(self.journal.name)
+        self.journal.recover(committed)
+        for record in self.journal.replay():
+            self._impression_cache.update(record["ids"])
+        if self._impression_cache:
+            logger.info(
+                f"从日志中恢复了 {len(self._impression_cache)} 个帖子未落库的展示次数。"
+            )
+
     async def _periodic_flush(self):
         """定期执行回写的后台任务。"""
         while self._is_running:
@@ -70,11 +96,20 @@ class ImpressionCacheService:
     async def increment(self, thread_ids: list[int]):
         """在内存中为帖子增加展示次数。"""
         async with self._lock:
+            if self.journal:
+                try:
+                    self.journal.append({"ids": thread_ids})
+                except OSError:
+                    logger.warning("写入展示次数日志失败。", exc_info=True)
             for thread_id in thread_ids:
                 self._impression_cache[thread_id] += 1
 
     async def flush_to_db(self):
         """将内存中的缓存数据写入数据库。"""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
         async with self._lock:
             if not self._impression_cache:
                 return
@@ -82,6 +117,7 @@ class ImpressionCacheService:
             # 复制并清空缓存，以便在DB操作期间可以继续接收新的计数
             data_to_flush = self._impression_cache.copy()
             self._impression_cache.clear()
+            segment = self.journal.seal() if self.journal else None
 
         total_increment = sum(data_to_flush.values())
 
@@ -114,17 +150,25 @@ class ImpressionCacheService:
                     )
                 )
 
+                if self.journal and segment is not None:
+                    await JournalCheckpointService(session).save(
+                        self.journal.name, segment
+                    )
+
                 await session.commit()
+                if self.journal:
+                    self.journal.commit(segment)
 
                 # 发布配置更新事件
                 self.bot.dispatch("config_updated")
+                self.bot.dispatch("impressions_flushed", dict(data_to_flush))
 
                 logger.debug(
                     f"成功回写 {len(data_to_flush)} 个帖子的展示次数，总增量为 {total_increment}。"
                 )
             except Exception as e:
                 logger.error(f"回写展示次数到数据库失败: {e}", exc_info=True)
-                # 失败后将数据还回缓存，下次重试
+                # 失败后将数据还回缓存，下次重试；封存的日志段保留到下一次成功回写
                 async with self._lock:
                     self._impression_cache.update(data_to_flush)
                 await session.rollback()
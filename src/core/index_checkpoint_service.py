@@ -0,0 +1,153 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models import IndexCheckpoint
+
+logger = logging.getLogger(__name__)
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+
+# 索引模式
+MODE_FULL = "full"
+MODE_INCREMENTAL = "incremental"
+MODE_RESUME = "resume"
+
+
+def _to_db(dt: Optional[datetime]) -> Optional[datetime]:
+    """数据库中统一存储不带时区的 UTC 时间"""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _from_db(dt: Optional[datetime]) -> Optional[datetime]:
+    """与 Discord 返回的 archive_timestamp 比较前补上 UTC 时区"""
+    if dt is None or dt.tzinfo is not None:
+        return dt
+    return dt.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class IndexRun:
+    """一轮索引的执行计划"""
+
+    channel_id: int
+    mode: str
+    run_started_at: datetime
+    # 只处理归档时间晚于该时间的帖子，None 表示全量
+    since: Optional[datetime] = None
+    # 归档帖子的翻页起点，None 表示从最新的帖子开始
+    resume_before: Optional[datetime] = None
+    processed: int = 0
+    failures: list[dict] = field(default_factory=list)
+
+
+class IndexCheckpointService:
+    """
+    读写频道索引检查点。
+
+    归档帖子按页处理，每页处理并写入完成后保存翻页游标，
+    中断后再次执行 /构建索引 会从游标处续跑；
+    上一轮完成后再次执行，只遍历上一轮开始之后归档的帖子。
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def get(self, channel_id: int) -> Optional[IndexCheckpoint]:
+        async with self.session_factory() as session:
+            return await session.get(IndexCheckpoint, channel_id)
+
+    async def begin_run(
+        self, channel_id: int, guild_id: int, *, full: bool = False
+    ) -> IndexRun:
+        """
+        根据已有检查点决定本轮的索引方式并标记为进行中。
+
+        - 上一轮未完成：从保存的游标续跑
+        - 上一轮已完成：增量索引
+        - 没有检查点或 full=True：全量索引
+        """
+        now = datetime.now(timezone.utc)
+        async with self.session_factory() as session:
+            checkpoint = await session.get(IndexCheckpoint, channel_id)
+            is_new = checkpoint is None
+            if checkpoint is None:
+                checkpoint = IndexCheckpoint(channel_id=channel_id, guild_id=guild_id)
+
+            if not full and not is_new and checkpoint.status == STATUS_RUNNING:
+                run = IndexRun(
+                    channel_id=channel_id,
+                    mode=MODE_RESUME,
+                    run_started_at=_from_db(checkpoint.run_started_at) or now,
+                    since=_from_db(checkpoint.run_since),
+                    resume_before=_from_db(checkpoint.resume_before),
+                    processed=checkpoint.processed,
+                    failures=list(checkpoint.failures or []),
+                )
+            else:
+                since = None
+                if not full and checkpoint.status == STATUS_COMPLETED:
+                    since = _from_db(checkpoint.last_completed_at)
+                run = IndexRun(
+                    channel_id=channel_id,
+                    mode=MODE_INCREMENTAL if since else MODE_FULL,
+                    run_started_at=now,
+                    since=since,
+                )
+
+            checkpoint.guild_id = guild_id
+            checkpoint.status = STATUS_RUNNING
+            checkpoint.run_started_at = _to_db(run.run_started_at)  # type: ignore
+            checkpoint.run_since = _to_db(run.since)
+            checkpoint.resume_before = _to_db(run.resume_before)
+            checkpoint.processed = run.processed
+            checkpoint.failures = run.failures
+            checkpoint.updated_at = _to_db(now)  # type: ignore
+            session.add(checkpoint)
+            await session.commit()
+
+        logger.info(
+            f"频道 {channel_id} 开始索引，模式: {run.mode}，"
+            f"起点: {run.resume_before}，截止: {run.since}"
+        )
+        return run
+
+    async def save_progress(
+        self,
+        channel_id: int,
+        resume_before: Optional[datetime],
+        processed: int,
+        failures: list[dict],
+    ):
+        """保存翻页游标，调用前该游标之前的帖子必须都已写入数据库"""
+        async with self.session_factory() as session:
+            checkpoint = await session.get(IndexCheckpoint, channel_id)
+            if checkpoint is None:
+                return
+            checkpoint.resume_before = _to_db(resume_before)
+            checkpoint.processed = processed
+            checkpoint.failures = list(failures)
+            checkpoint.updated_at = _to_db(datetime.now(timezone.utc))  # type: ignore
+            session.add(checkpoint)
+            await session.commit()
+
+    async def complete_run(self, run: IndexRun, processed: int, failures: list[dict]):
+        """标记本轮完成，下一轮从本轮的开始时间起做增量索引"""
+        async with self.session_factory() as session:
+            checkpoint = await session.get(IndexCheckpoint, run.channel_id)
+            if checkpoint is None:
+                return
+            checkpoint.status = STATUS_COMPLETED
+            checkpoint.resume_before = None
+            checkpoint.processed = processed
+            checkpoint.failures = list(failures)
+            checkpoint.last_completed_at = _to_db(run.run_started_at)
+            checkpoint.updated_at = _to_db(datetime.now(timezone.utc))  # type: ignore
+            session.add(checkpoint)
+            await session.commit()
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import JournalCheckpoint
+
+
+class JournalCheckpointService:
+    """
+    读写预写日志的落库检查点。
+
+    回写时在同一事务中记录本次封存的日志段编号，日志段的删除晚于事务提交，
+    进程若在两者之间退出，重启时据此丢弃已落库的日志段，避免回放时重复计数。
+    save() 只执行语句不提交。
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get(self, name: str) -> Optional[int]:
+        result = await self.session.execute(
+            select(JournalCheckpoint.segment).where(JournalCheckpoint.name == name)
+        )
+        return result.scalar_one_or_none()
+
+    async def save(self, name: str, segment: int):
+        stmt = sqlite_insert(JournalCheckpoint).values(name=name, segment=segment)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["name"], set_={"segment": segment}
+            )
+        )
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Optional
+
+import discord
+
+from shared.http_client import DISCORD_API_BASE, get_http_client
+
+if TYPE_CHECKING:
+    from bot_main import MyBot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MemberStatus:
+    """一次成员验证的结果"""
+
+    is_member: bool
+    has_role: bool = False
+    # 与 Discord 用户对象字段一致: id, username, global_name, avatar
+    user_info: Optional[dict] = None
+
+    @property
+    def verified(self) -> bool:
+        return self.is_member and self.has_role
+
+
+NOT_A_MEMBER = MemberStatus(is_member=False)
+
+
+class MemberCacheService:
+    """
+    社区成员及身份组验证的缓存，供 /auth/checkauth 使用。
+
+    - 与机器人同进程时优先查网关的成员缓存（intents.members 已开启），不调用 API；
+      on_member_update / on_member_remove 会直接更新缓存的结果。
+    - 未命中时通过共享的 HTTP 客户端获取成员，结果缓存 ttl 秒；
+      不在社区或缺少身份组的结果缓存 negative_ttl 秒。
+    - 同一用户并发的未命中只发出一次请求。
+    """
+
+    def __init__(
+        self,
+        guild_id: int | str,
+        role_ids: Iterable[int | str],
+        bot_token: Optional[str] = None,
+        ttl: float = 300,
+        negative_ttl: float = 60,
+    ):
+        self.guild_id = int(guild_id)
+        self.role_ids = {str(role_id).strip() for role_id in role_ids if role_id}
+        self.bot_token = bot_token
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.bot: Optional["MyBot"] = None
+
+        # {user_id: (过期时间 time.monotonic(), 结果)}
+        self._entries: dict[int, tuple[float, MemberStatus]] = {}
+        self._inflight: dict[int, asyncio.Task] = {}
+
+    def attach_bot(self, bot: "MyBot"):
+        """与机器人同进程运行时，使用网关的成员缓存并监听成员变化"""
+        self.bot = bot
+        bot.add_listener(self.on_member_update, "on_member_update")
+        bot.add_listener(self.on_member_remove, "on_member_remove")
+
+    def status_from_member(self, member: discord.Member) -> MemberStatus:
+        return MemberStatus(
+            is_member=True,
+            has_role=any(str(role.id) in self.role_ids for role in member.roles),
+            user_info={
+                "id": str(member.id),
+                "username": member.name,
+                "global_name": member.global_name,
+                "avatar": member.avatar.key if member.avatar else None,
+            },
+        )
+
+    def status_from_payload(self, member: dict) -> MemberStatus:
+        """解析 GET /guilds/{guild_id}/members/{user_id} 的响应"""
+        user = member.get("user")
+        return MemberStatus(
+            is_member=True,
+            has_role=any(
+                role_id in self.role_ids for role_id in member.get("roles", [])
+            ),
+            user_info={
+                "id": user.get("id"),
+                "username": user.get("username"),
+                "global_name": user.get("global_name"),
+                "avatar": user.get("avatar"),
+            }
+            if user
+            else None,
+        )
+
+    def _store(self, user_id: int, status: MemberStatus):
+        ttl = self.ttl if status.verified else self.negative_ttl
+        self._entries[user_id] = (time.monotonic() + ttl, status)
+
+    def _gateway_member(self, user_id: int) -> Optional[discord.Member]:
+        if self.bot is None:
+            return None
+        guild = self.bot.get_guild(self.guild_id)
+        return guild.get_member(user_id) if guild else None
+
+    async def get_status(self, user_id: int) -> Optional[MemberStatus]:
+        """
+        返回用户的成员验证结果。
+
+        Returns:
+            MemberStatus；没有配置 Bot Token 或 Discord 暂时不可用时返回 None（无法验证）。
+        """
+        member = self._gateway_member(user_id)
+        if member is not None:
+            return self.status_from_member(member)
+
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, status = entry
+            if time.monotonic() < expires_at:
+                return status
+            del self._entries[user_id]
+
+        if not self.bot_token:
+            return None
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(user_id))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, user_id: int) -> Optional[MemberStatus]:
+        try:
+            response = await get_http_client().get(
+                f"{DISCORD_API_BASE}/guilds/{self.guild_id}/members/{user_id}",
+                headers={"Authorization": f"Bot {self.bot_token}"},
+            )
+        except Exception as e:
+            logger.error(f"验证 Discord 身份失败: {e}")
+            return None
+
+        if response.status_code == 200:
+            status = self.status_from_payload(response.json())
+        elif response.status_code == 404:
+            status = NOT_A_MEMBER
+        else:
+            # 限流或服务端错误不代表用户不在社区，不缓存
+            logger.warning(
+                f"验证 Discord 身份失败 - 用户 {user_id}，状态码: {response.status_code}"
+            )
+            return None
+
+        self._store(user_id, status)
+        return status
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if after.guild.id == self.guild_id:
+            self._store(after.id, self.status_from_member(after))
+
+    async def on_member_remove(self, member: discord.Member):
+        if member.guild.id == self.guild_id:
+            self._store(member.id, NOT_A_MEMBER)
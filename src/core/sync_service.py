@@ -2,20 +2,53 @@ import asyncio
 import datetime
 import logging
 import re
-from typing import TYPE_CHECKING, Coroutine, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Coroutine, List, Optional, Union
 
 import discord
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from core.author_service import AuthorRepository
+from core.author_cache_service import AuthorCacheService
+from core.author_service import AuthorRepository, author_data_from_user
 from core.thread_service import ThreadService
 from shared.discord_utils import DiscordUtils
 
 if TYPE_CHECKING:
     from bot_main import MyBot
+    from core.thread_upsert_buffer import ThreadUpsertBuffer
 
 logger = logging.getLogger(__name__)
 
+# --- 解析帖子用到的正则，只编译一次 ---
+# 重建帖首楼中的原发帖人
+REBUILD_AUTHOR_PATTERN = re.compile(r"发帖人[:：\s*]*<@(\d+)>")
+# 重建帖首楼中的原始创建时间（UTC+8）
+REBUILD_TIME_PATTERN = re.compile(
+    r"原始创建时间[:：\s*]*(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日.*?(\d{2}):(\d{2})"
+)
+# 补档链接: https://discord.com/channels/GUILD_ID/CHANNEL_ID/MESSAGE_ID
+REPOST_LINK_PATTERN = re.compile(
+    r"补档[:：\s*]*\d+\.\s*\[.*?\]\((https://discord.com/channels/(\d+)/(\d+)/(\d+))\)"
+)
+_EMOJI_PATTERN = (
+    r"(?:<:\w+:\d+>|[\U00002600-\U000027BF\U0001F000-\U0001FFFF\U0001F900-\U0001F9FF])"
+)
+# 重建帖第二楼中“表情符号 + 空格 + 数字”形式的原反应数
+REACTION_NUMBER_PATTERN = re.compile(f"{_EMOJI_PATTERN}\\s*(\\d+)(?=\\s|\\||$)")
+# 从重建帖摘要中删除的元数据行：反应数、附件、已编辑标记
+EXCERPT_CLEANING_PATTERN = re.compile(
+    f"(?:^-#\\s*{_EMOJI_PATTERN}\\s*\\d+.*$"
+    r"|^-#\s*📎\s+.*?\s*\(.*?\)$"
+    r"|^-#\s*\(已编辑\)$)\n?",
+    re.MULTILINE,
+)
+# 普通帖首楼内容中的图片链接
+INLINE_IMAGE_PATTERN = re.compile(
+    r"https?://[^\s]+\.(?:jpg|jpeg|png|gif|webp)", re.IGNORECASE
+)
+
+# 同时获取补档消息的最大数量，默认值
+DEFAULT_REPOST_FETCH_CONCURRENCY = 4
+
 
 class SyncService:
     """
@@ -26,9 +59,25 @@ class SyncService:
         self,
         bot: "MyBot",
         session_factory: async_sessionmaker,
+        repost_fetch_concurrency: int = DEFAULT_REPOST_FETCH_CONCURRENCY,
+        author_cache: Optional[AuthorCacheService] = None,
     ):
         self.bot = bot
         self.session_factory = session_factory
+        # 作者缓存，开启后跳过重复的用户获取和没有变化的作者写入
+        self.author_cache = author_cache
+        # 重建帖的补档消息获取：限制并发，补档频道对象缓存起来只获取一次
+        self._repost_semaphore = asyncio.Semaphore(max(1, repost_fetch_concurrency))
+        self._repost_channels: dict[int, discord.abc.Messageable] = {}
+        # 持有后台任务的引用，避免被垃圾回收，并在出错时记录日志
+        self._background_tasks: set[asyncio.Task] = set()
+
+    def _spawn(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """创建一个被追踪的后台任务"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
 
     async def _save_author_to_db(
         self,
@@ -38,7 +87,12 @@ class SyncService:
     ) -> None:
         """
         获取作者信息并保存到数据库。
+        有作者缓存时交给缓存处理，由缓存批量写入有变化的作者。
         """
+        if self.author_cache is not None:
+            await self.author_cache.observe(author_id, guild, source_member)
+            return
+
         # 获取用户对象
         user_obj = await DiscordUtils.get_or_fetch_user(
             bot=self.bot,
@@ -51,13 +105,7 @@ class SyncService:
             return
 
         # 准备要插入或更新的数据
-        author_data = {
-            "id": user_obj.id,
-            "name": user_obj.name,
-            "global_name": user_obj.global_name,
-            "display_name": user_obj.display_name,
-            "avatar_url": user_obj.display_avatar.url,
-        }
+        author_data = author_data_from_user(user_obj)
 
         # 存储数据
         try:
@@ -67,10 +115,99 @@ class SyncService:
         except Exception as e:
             logger.error(f"更新作者 {author_id} 信息到数据库时失败: {e}", exc_info=True)
 
-    async def _parse_thread_data(self, thread: discord.Thread) -> Optional[dict]:
+    async def save_authors(
+        self,
+        authors: dict[int, tuple[discord.Guild, discord.Member | discord.User | None]],
+    ):
+        """
+        批量获取并写入多个作者: {author_id: (guild, source_member)}。
+        有作者缓存时只写入有变化的作者，否则全部写入。
+        """
+        if self.author_cache is not None:
+            await asyncio.gather(
+                *(
+                    self.author_cache.observe(author_id, guild, member)
+                    for author_id, (guild, member) in authors.items()
+                )
+            )
+            await self.author_cache.flush()
+            return
+
+        users = await asyncio.gather(
+            *(
+                DiscordUtils.get_or_fetch_user(
+                    bot=self.bot, user_id=author_id, guild=guild, source_member=member
+                )
+                for author_id, (guild, member) in authors.items()
+            ),
+            return_exceptions=True,
+        )
+        author_data = [
+            author_data_from_user(user)
+            for user in users
+            if user and not isinstance(user, BaseException)
+        ]
+        if not author_data:
+            return
+
+        try:
+            async with self.session_factory() as session:
+                await AuthorRepository(session).upsert_authors(author_data)
+        except Exception as e:
+            logger.error(f"批量写入 {len(author_data)} 个作者失败: {e}", exc_info=True)
+
+    async def _get_repost_channel(
+        self, channel_id: int
+    ) -> Optional[discord.abc.Messageable]:
+        """获取补档消息所在的频道，结果缓存在内存中"""
+        channel = self._repost_channels.get(channel_id)
+        if channel is not None:
+            return channel
+
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            channel = await self.bot.api_scheduler.submit(
+                coro_factory=lambda: self.bot.fetch_channel(channel_id),
+                priority=5,
+                key=("fetch_channel", channel_id),
+            )
+        if not isinstance(channel, discord.abc.Messageable):
+            return None
+        self._repost_channels[channel_id] = channel
+        return channel
+
+    async def _fetch_repost_message(
+        self, thread_id: int, channel_id: int, message_id: int
+    ) -> Optional[discord.Message]:
+        """
+        获取重建帖的补档消息。
+        同时进行的获取数受信号量限制，多个重建帖引用同一条消息时只请求一次。
+        """
+        async with self._repost_semaphore:
+            target_channel = await self._get_repost_channel(channel_id)
+            if target_channel is None:
+                logger.warning(
+                    f"重建帖 {thread_id} 的补档链接指向了一个非消息频道 (ID: {channel_id})。中止对其的索引"
+                )
+                return None
+
+            # 使用调度器提交API请求
+            return await self.bot.api_scheduler.submit(
+                coro_factory=lambda: target_channel.fetch_message(message_id),
+                priority=5,  # 中等优先级
+                key=("fetch_message", channel_id, message_id),
+            )
+
+    async def _parse_thread_data(
+        self,
+        thread: discord.Thread,
+        upsert_buffer: Optional["ThreadUpsertBuffer"] = None,
+    ) -> Optional[dict]:
         """
         解析一个帖子，根据其结构（普通或重建）返回标准化的数据字典。
         如果帖子无效或不满足索引条件，返回 None。
+
+        传入 upsert_buffer 时，作者信息交给缓冲区按作者去重后批量写入。
         """
         messages = [msg async for msg in thread.history(limit=2, oldest_first=True)]
         if not messages:
@@ -121,11 +258,8 @@ class SyncService:
             return result
 
         # --- 检查是否为重建帖 ---
-        match_id = re.search(r"发帖人[:：\s*]*<@(\d+)>", first_msg_content)
-        match_time = re.search(
-            r"原始创建时间[:：\s*]*(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日.*?(\d{2}):(\d{2})",
-            first_msg_content,
-        )
+        match_id = REBUILD_AUTHOR_PATTERN.search(first_msg_content)
+        match_time = REBUILD_TIME_PATTERN.search(first_msg_content)
 
         if match_id:
             # --- 是重建帖，执行解析和检查 ---
@@ -148,10 +282,7 @@ class SyncService:
                 return None
 
             # 2. 检查并解析补档链接: https://discord.com/channels/GUILD_ID/CHANNEL_ID/MESSAGE_ID
-            match_url = re.search(
-                r"补档[:：\s*]*\d+\.\s*\[.*?\]\((https://discord.com/channels/(\d+)/(\d+)/(\d+))\)",
-                first_msg_content,
-            )
+            match_url = REPOST_LINK_PATTERN.search(first_msg_content)
             if not match_url:
                 logger.debug(
                     f"重建帖 {thread.id} 的补档图片链接提取失败。中止对其的索引"
@@ -161,19 +292,8 @@ class SyncService:
             # 3. 通过API获取补档消息的附件
             try:
                 guild_id, channel_id, message_id = map(int, match_url.groups()[1:])
-                target_channel = self.bot.get_channel(
-                    channel_id
-                ) or await self.bot.fetch_channel(channel_id)
-                if not isinstance(target_channel, discord.abc.Messageable):
-                    logger.warning(
-                        f"重建帖 {thread.id} 的补档链接指向了一个非消息频道 (ID: {channel_id})。中止对其的索引"
-                    )
-                    return None
-
-                # 使用调度器提交API请求
-                target_message = await self.bot.api_scheduler.submit(
-                    coro_factory=lambda: target_channel.fetch_message(message_id),
-                    priority=5,  # 中等优先级
+                target_message = await self._fetch_repost_message(
+                    thread.id, channel_id, message_id
                 )
 
                 if not target_message or not target_message.attachments:
@@ -204,10 +324,7 @@ class SyncService:
                 potential_reaction_numbers = []
 
                 # 使用正则表达式查找所有“表情符号 + 空格 + 数字”的模式
-                emoji_pattern = r"(?:<:\w+:\d+>|[\U00002600-\U000027BF\U0001F000-\U0001FFFF\U0001F900-\U0001F9FF])"
-                matches = re.findall(
-                    f"{emoji_pattern}\\s*(\\d+)(?=\\s|\\||$)", second_msg.content
-                )
+                matches = REACTION_NUMBER_PATTERN.findall(second_msg.content)
 
                 for num_str in matches:
                     try:
@@ -223,16 +340,7 @@ class SyncService:
                     reaction_count += reaction_count_ori
 
                 # 从摘要中删除元数据行
-                reaction_line_pattern = f"^-#\\s*{emoji_pattern}\\s*\\d+.*$"
-                attachment_line_pattern = r"^-#\s*📎\s+.*?\s*\(.*?\)$"
-                edited_line_pattern = r"^-#\s*\(已编辑\)$"
-
-                cleaning_pattern = re.compile(
-                    f"(?:{reaction_line_pattern}|{attachment_line_pattern}|{edited_line_pattern})\\n?",
-                    re.MULTILINE,
-                )
-
-                cleaned_excerpt = cleaning_pattern.sub("", excerpt_ori).strip()
+                cleaned_excerpt = EXCERPT_CLEANING_PATTERN.sub("", excerpt_ori).strip()
                 excerpt = cleaned_excerpt
 
         else:
@@ -243,22 +351,25 @@ class SyncService:
                 thumbnail_urls.extend(attachment_urls)
             else:
                 # 如果没有附件，则尝试从首楼内容中提取所有图片 URL
-                inline_image_urls = re.findall(
-                    r"https?://[^\s]+\.(?:jpg|jpeg|png|gif|webp)",
-                    first_msg.content or "",
-                    re.IGNORECASE,
+                inline_image_urls = INLINE_IMAGE_PATTERN.findall(
+                    first_msg.content or ""
                 )
                 if inline_image_urls:
                     thumbnail_urls.extend(inline_image_urls)
 
         if final_author_id and thread.guild:
-            asyncio.create_task(
-                self._save_author_to_db(
-                    author_id=final_author_id,
-                    guild=thread.guild,
-                    source_member=source_user_for_author_service,
+            if upsert_buffer is not None:
+                upsert_buffer.add_author(
+                    final_author_id, thread.guild, source_user_for_author_service
+                )
+            else:
+                self._spawn(
+                    self._save_author_to_db(
+                        author_id=final_author_id,
+                        guild=thread.guild,
+                        source_member=source_user_for_author_service,
+                    )
                 )
-            )
 
         return {
             "thread_id": thread.id,
@@ -273,6 +384,8 @@ class SyncService:
             "reaction_count": reaction_count,
             "reply_count": thread.message_count,
             "not_found_count": 0,
+            # 完整同步等同于一次审计
+            "last_audited_at": datetime.datetime.now(datetime.timezone.utc),
             "first_message_excerpt": excerpt,
             "thumbnail_urls": thumbnail_urls,
         }
@@ -283,10 +396,14 @@ class SyncService:
         priority: int = 10,
         *,
         fetch_if_incomplete: bool = False,
+        upsert_buffer: Optional["ThreadUpsertBuffer"] = None,
     ):
         """
         同步一个帖子的数据到数据库，包括其标签。
         该方法可以接受一个完整的帖子对象，或者一个帖子ID。
+
+        传入 upsert_buffer 时，解析后的数据放入缓冲区批量写入，
+        事件分发和首次关注检查也由缓冲区在写入后统一处理。
         """
         if isinstance(thread, int):
             thread_id = thread
@@ -294,6 +411,7 @@ class SyncService:
                 fetched_channel = await self.bot.api_scheduler.submit(
                     coro_factory=lambda tid=thread_id: self.bot.fetch_channel(tid),
                     priority=priority,
+                    key=("fetch_channel", thread_id),
                 )
                 if not isinstance(fetched_channel, discord.Thread):
                     logger.warning(
@@ -302,6 +420,7 @@ class SyncService:
                     async with self.session_factory() as session:
                         repo = ThreadService(session=session)
                         await repo.increment_not_found_count(thread_id=thread_id)
+                    self.bot.dispatch("threads_synced", [thread_id])
                     return
                 thread = fetched_channel
             except discord.NotFound:
@@ -311,6 +430,7 @@ class SyncService:
                 async with self.session_factory() as session:
                     repo = ThreadService(session=session)
                     await repo.increment_not_found_count(thread_id=thread_id)
+                self.bot.dispatch("threads_synced", [thread_id])
                 return
             except Exception as e:
                 logger.error(
@@ -325,6 +445,7 @@ class SyncService:
                 thread = await self.bot.api_scheduler.submit(
                     coro_factory=lambda tid=thread_id: self.bot.fetch_channel(tid),
                     priority=priority,
+                    key=("fetch_channel", thread_id),
                 )
             except discord.NotFound:
                 logger.warning(
@@ -333,12 +454,13 @@ class SyncService:
                 async with self.session_factory() as session:
                     repo = ThreadService(session=session)
                     await repo.increment_not_found_count(thread_id=thread.id)
+                self.bot.dispatch("threads_synced", [thread.id])
                 return
 
         assert isinstance(thread, discord.Thread)
 
         # 调用辅助方法解析帖子数据
-        thread_data = await self._parse_thread_data(thread)
+        thread_data = await self._parse_thread_data(thread, upsert_buffer)
 
         # 检查解析结果，如果为 None 则中止同步
         if thread_data is None:
@@ -348,12 +470,19 @@ class SyncService:
         # 准备标签数据并存入数据库
         tags_data = {t.id: t.name for t in thread.applied_tags or []}
 
+        if upsert_buffer is not None:
+            await upsert_buffer.add(thread, thread_data, tags_data)
+            return
+
         # 先保存帖子数据
         async with self.session_factory() as session:
-            repo = ThreadService(session=session)
+            repo = ThreadService(
+                session=session, tag_cache_service=self.bot.tag_cache_service
+            )
             await repo.add_or_update_thread_with_tags(
                 thread_data=thread_data, tags_data=tags_data
             )
+        self.bot.dispatch("threads_synced", [thread.id])
 
         # 检查是否是首次被关注（检查关注表而不是帖子表）
         is_first_follow = False
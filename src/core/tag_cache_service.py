@@ -1,6 +1,6 @@
 import logging
 from collections import defaultdict
-from typing import Dict, List
+from typing import Collection, Dict, FrozenSet, Iterable, List, Optional
 
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
@@ -9,6 +9,28 @@ from core.tag_service import TagService
 logger = logging.getLogger(__name__)
 
 
+def bitmap_to_ids(bitmap: int) -> List[int]:
+    """将位图展开为升序的 Thread.id 列表"""
+    if not bitmap:
+        return []
+    # 在二进制字符串上查找比逐位移位快得多
+    bits = bin(bitmap)[:1:-1]
+    ids = []
+    pos = bits.find("1")
+    while pos != -1:
+        ids.append(pos)
+        pos = bits.find("1", pos + 1)
+    return ids
+
+
+def ids_to_bitmap(thread_ids: Iterable[int]) -> int:
+    """将 Thread.id 集合压缩为位图"""
+    bitmap = 0
+    for thread_id in thread_ids:
+        bitmap |= 1 << thread_id
+    return bitmap
+
+
 class TagCacheService:
     """
     一个封装了标签缓存的服务
@@ -20,6 +42,11 @@ class TagCacheService:
         self._name_to_ids: Dict[str, List[int]] = defaultdict(list)
         self._unique_tag_names: List[str] = []
         self.global_merged_tags: list[str] = []
+        # 标签倒排位图：tag_id -> 以 Thread.id 为位的整数位图
+        self._tag_postings: Dict[int, int] = {}
+        # 反向映射，用于增量更新时找到帖子原有的标签
+        self._thread_tags: Dict[int, FrozenSet[int]] = {}
+        self._postings_ready = False
 
     async def build_cache(self):
         """
@@ -33,6 +60,7 @@ class TagCacheService:
             all_unique_tags_from_indexed_threads = (
                 await tag_service.get_all_unique_tags_from_indexed_threads()
             )
+            all_links = await tag_service.get_all_thread_tag_links()
 
         self._id_to_name.clear()
         self._name_to_ids.clear()
@@ -56,6 +84,115 @@ class TagCacheService:
             f"全局合并标签预计算完成，共 {len(self.global_merged_tags)} 个唯一标签"
         )
 
+        self._build_postings(all_links)
+
+    def _build_postings(self, links: Iterable[tuple[int, int]]):
+        """由 (Thread.id, Tag.id) 关联对构建标签倒排位图"""
+        ids_by_tag: Dict[int, List[int]] = defaultdict(list)
+        tags_by_thread: Dict[int, set[int]] = defaultdict(set)
+        for thread_id, tag_id in links:
+            ids_by_tag[tag_id].append(thread_id)
+            tags_by_thread[thread_id].add(tag_id)
+
+        self._tag_postings = {
+            tag_id: ids_to_bitmap(thread_ids)
+            for tag_id, thread_ids in ids_by_tag.items()
+        }
+        self._thread_tags = {
+            thread_id: frozenset(tag_ids)
+            for thread_id, tag_ids in tags_by_thread.items()
+        }
+        self._postings_ready = True
+        logger.info(f"标签倒排位图构建完成，覆盖 {len(self._thread_tags)} 个帖子")
+
+    @property
+    def postings_ready(self) -> bool:
+        return self._postings_ready
+
+    def update_thread_tags(self, thread_id: int, tag_ids: Collection[int]):
+        """
+        增量更新一个帖子的标签位图。
+
+        Args:
+            thread_id: 数据库主键 Thread.id
+            tag_ids: 帖子当前的全部标签ID
+        """
+        new_tags = frozenset(tag_ids)
+        old_tags = self._thread_tags.get(thread_id, frozenset())
+        if new_tags == old_tags:
+            return
+
+        bit = 1 << thread_id
+        for tag_id in old_tags - new_tags:
+            remaining = self._tag_postings.get(tag_id, 0) & ~bit
+            if remaining:
+                self._tag_postings[tag_id] = remaining
+            else:
+                self._tag_postings.pop(tag_id, None)
+        for tag_id in new_tags - old_tags:
+            self._tag_postings[tag_id] = self._tag_postings.get(tag_id, 0) | bit
+
+        if new_tags:
+            self._thread_tags[thread_id] = new_tags
+        else:
+            self._thread_tags.pop(thread_id, None)
+
+    async def refresh_threads(self, thread_ids: Collection[int]):
+        """
+        按 Discord 帖子 ID 从数据库重新读取标签，增量更新位图。
+        用于位图所在进程之外写入了帖子的情况（如 API 工作进程跟随机器人进程）。
+        """
+        async with self.session_factory() as session:
+            links = await TagService(session).get_thread_tag_links_by_thread_ids(
+                thread_ids
+            )
+        tags_by_thread: Dict[int, set[int]] = defaultdict(set)
+        for row_id, tag_id in links:
+            tags = tags_by_thread[row_id]
+            if tag_id is not None:
+                tags.add(tag_id)
+        for row_id, tag_ids in tags_by_thread.items():
+            self.update_thread_tags(row_id, tag_ids)
+
+    def remove_thread(self, thread_id: int):
+        """帖子被删除后，从所有标签位图中移除"""
+        self.update_thread_tags(thread_id, ())
+
+    def get_tag_bitmap(self, tag_ids: Iterable[int]) -> int:
+        """获取拥有任意一个给定标签的帖子位图 (OR)"""
+        bitmap = 0
+        for tag_id in tag_ids:
+            bitmap |= self._tag_postings.get(tag_id, 0)
+        return bitmap
+
+    def resolve_tag_filter(
+        self,
+        include_tag_groups: List[List[int]],
+        exclude_tag_ids: Collection[int],
+    ) -> tuple[Optional[int], int]:
+        """
+        在位图上完成标签的 AND/OR/NOT 运算。
+        组之间为 AND，组内为 OR。
+
+        Returns:
+            (正选位图, 反选位图)，没有正选条件时正选位图为 None
+        """
+        include_bitmap: Optional[int] = None
+        for group in include_tag_groups:
+            group_bitmap = self.get_tag_bitmap(group)
+            include_bitmap = (
+                group_bitmap
+                if include_bitmap is None
+                else include_bitmap & group_bitmap
+            )
+            if not include_bitmap:
+                break
+
+        exclude_bitmap = self.get_tag_bitmap(exclude_tag_ids)
+        if include_bitmap is not None and exclude_bitmap:
+            include_bitmap &= ~exclude_bitmap
+        return include_bitmap, exclude_bitmap
+
     def get_name_by_id(self, tag_id: int) -> str | None:
         """从缓存中通过ID获取标签名称。"""
         return self._id_to_name.get(tag_id)
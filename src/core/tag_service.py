@@ -1,12 +1,12 @@
 import logging
-from typing import List, Sequence, cast
+from typing import Collection, List, Optional, Sequence, cast
 
 from sqlalchemy import ColumnElement
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from models import Tag, Thread
+from models import Tag, Thread, ThreadTagLink
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +67,29 @@ class TagService:
         result = await self.session.execute(statement)
         return result.scalars().all()
 
+    async def get_all_thread_tag_links(self) -> Sequence[tuple[int, int]]:
+        """获取所有 (Thread.id, Tag.id) 关联对"""
+        statement = select(ThreadTagLink.thread_id, ThreadTagLink.tag_id)
+        result = await self.session.execute(statement)
+        return [(thread_id, tag_id) for thread_id, tag_id in result.all()]
+
+    async def get_thread_tag_links_by_thread_ids(
+        self, thread_ids: Collection[int]
+    ) -> Sequence[tuple[int, Optional[int]]]:
+        """
+        按 Discord 帖子 ID 获取 (Thread.id, Tag.id) 关联对。
+        没有标签的帖子也会返回一行，Tag.id 为 None。
+        """
+        if not thread_ids:
+            return []
+        statement = (
+            select(Thread.id, ThreadTagLink.tag_id)
+            .outerjoin(ThreadTagLink, ThreadTagLink.thread_id == Thread.id)  # type: ignore
+            .where(Thread.thread_id.in_(thread_ids))  # type: ignore
+        )
+        result = await self.session.execute(statement)
+        return [(row_id, tag_id) for row_id, tag_id in result.all()]
+
     async def update_tag_name(self, tag_id: int, new_name: str):
         """更新指定ID的标签的名称。"""
         statement = select(Tag).where(Tag.id == tag_id)  # type: ignore
@@ -0,0 +1,569 @@
+import asyncio
+import logging
+import math
+import operator
+from array import array
+from datetime import datetime, timezone
+from typing import Callable, Collection, Iterable, List, Optional, Sequence
+
+from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import col, select
+
+from core.tag_cache_service import bitmap_to_ids
+from models import Thread, ThreadTagLink
+from shared.range_parser import parse_range_string
+from ThreadManager.update_data_dto import UpdateData
+
+logger = logging.getLogger(__name__)
+
+# 快照中需要加载的 Thread 列
+_SNAPSHOT_COLUMNS = (
+    Thread.id,
+    Thread.thread_id,
+    Thread.guild_id,
+    Thread.channel_id,
+    Thread.author_id,
+    Thread.reaction_count,
+    Thread.reply_count,
+    Thread.display_count,
+    Thread.not_found_count,
+    Thread.created_at,
+    Thread.last_active_at,
+)
+
+# 可以由内存索引完成排序的字段
+INDEX_SORTABLE_COLUMNS = frozenset(
+    {
+        "comprehensive",
+        "created_at",
+        "last_active_at",
+        "reaction_count",
+        "reply_count",
+        "display_count",
+    }
+)
+
+# 对账时每次从数据库补齐的帖子数
+RECONCILE_CHUNK_SIZE = 500
+
+_RANGE_OPS: dict[str, Callable[[int, int], bool]] = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+}
+
+
+def _to_epoch(dt: Optional[datetime]) -> float:
+    """
+    将数据库中的时间转换为时间戳。
+    SQLite 中存储的是去掉时区的 UTC 时间，因此 naive 时间按 UTC 解释；
+    None 用 -inf 表示，与 SQLite 中 NULL 的排序位置一致。
+    """
+    if dt is None:
+        return -math.inf
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _set_bit(bitmaps: dict[int, int], key: int, bit: int):
+    bitmaps[key] = bitmaps.get(key, 0) | bit
+
+
+def _clear_bit(bitmaps: dict[int, int], key: int, bit: int):
+    remaining = bitmaps.get(key, 0) & ~bit
+    if remaining:
+        bitmaps[key] = remaining
+    else:
+        bitmaps.pop(key, None)
+
+
+def _union(bitmaps: dict[int, int], keys: Iterable[int]) -> int:
+    mask = 0
+    for key in keys:
+        mask |= bitmaps.get(key, 0)
+    return mask
+
+
+def _positions_mask(pos_by_id: dict[int, int], ids: Iterable[int]) -> int:
+    mask = 0
+    for id_ in ids:
+        pos = pos_by_id.get(id_)
+        if pos is not None:
+            mask |= 1 << pos
+    return mask
+
+
+class _Columns:
+    """
+    一份完整的列式快照。
+
+    数值列按位置存放在紧凑数组中；频道、服务器、作者和标签这些等值过滤条件
+    各自维护一组按位置编号的位图（值 -> 位图），写入和删除时增量更新，
+    过滤时只需要对位图做与/或运算。被删除的位置会被后续新增的帖子复用。
+    """
+
+    def __init__(self):
+        self.row_ids = array("q")  # Thread.id
+        self.thread_ids = array("q")
+        self.guild_ids = array("q")
+        self.channel_ids = array("q")
+        self.author_ids = array("q")
+        self.reaction_counts = array("q")
+        self.reply_counts = array("q")
+        self.display_counts = array("q")
+        self.not_found_counts = array("q")
+        self.created_at = array("d")
+        self.last_active_at = array("d")
+        self.alive = bytearray()
+        self.tag_ids: list[frozenset[int]] = []
+        # 存活且 not_found_count == 0 的位置，即可以被搜索到的帖子
+        self.visible = 0
+        self.by_guild: dict[int, int] = {}
+        self.by_channel: dict[int, int] = {}
+        self.by_author: dict[int, int] = {}
+        self.by_tag: dict[int, int] = {}
+        self.pos_by_row_id: dict[int, int] = {}
+        self.pos_by_thread_id: dict[int, int] = {}
+        # 已删除、可以复用的位置
+        self._free: list[int] = []
+
+    def _unindex(self, pos: int):
+        """从所有位图中移除一个位置"""
+        bit = 1 << pos
+        self.visible &= ~bit
+        _clear_bit(self.by_guild, self.guild_ids[pos], bit)
+        _clear_bit(self.by_channel, self.channel_ids[pos], bit)
+        _clear_bit(self.by_author, self.author_ids[pos], bit)
+        for tag_id in self.tag_ids[pos]:
+            _clear_bit(self.by_tag, tag_id, bit)
+
+    def write_row(self, row, tag_ids: Iterable[int]):
+        """新增或原地覆盖一行数据，并同步更新位图。"""
+        values = (
+            row.thread_id,
+            row.guild_id or 0,
+            row.channel_id,
+            row.author_id,
+            row.reaction_count or 0,
+            row.reply_count or 0,
+            row.display_count or 0,
+            row.not_found_count or 0,
+            _to_epoch(row.created_at),
+            _to_epoch(row.last_active_at),
+        )
+        pos = self.pos_by_row_id.get(row.id)
+        if pos is None and not self._free:
+            pos = len(self.row_ids)
+            self.row_ids.append(row.id)
+            self.thread_ids.append(values[0])
+            self.guild_ids.append(values[1])
+            self.channel_ids.append(values[2])
+            self.author_ids.append(values[3])
+            self.reaction_counts.append(values[4])
+            self.reply_counts.append(values[5])
+            self.display_counts.append(values[6])
+            self.not_found_counts.append(values[7])
+            self.created_at.append(values[8])
+            self.last_active_at.append(values[9])
+            self.alive.append(1)
+            self.tag_ids.append(frozenset(tag_ids))
+        else:
+            if pos is None:
+                pos = self._free.pop()
+            else:
+                self._unindex(pos)
+                old_thread_id = self.thread_ids[pos]
+                if old_thread_id != values[0]:
+                    self.pos_by_thread_id.pop(old_thread_id, None)
+            self.row_ids[pos] = row.id
+            self.thread_ids[pos] = values[0]
+            self.guild_ids[pos] = values[1]
+            self.channel_ids[pos] = values[2]
+            self.author_ids[pos] = values[3]
+            self.reaction_counts[pos] = values[4]
+            self.reply_counts[pos] = values[5]
+            self.display_counts[pos] = values[6]
+            self.not_found_counts[pos] = values[7]
+            self.created_at[pos] = values[8]
+            self.last_active_at[pos] = values[9]
+            self.alive[pos] = 1
+            self.tag_ids[pos] = frozenset(tag_ids)
+
+        bit = 1 << pos
+        if values[7] == 0:
+            self.visible |= bit
+        _set_bit(self.by_guild, values[1], bit)
+        _set_bit(self.by_channel, values[2], bit)
+        _set_bit(self.by_author, values[3], bit)
+        for tag_id in self.tag_ids[pos]:
+            _set_bit(self.by_tag, tag_id, bit)
+        self.pos_by_row_id[row.id] = pos
+        self.pos_by_thread_id[values[0]] = pos
+
+    def kill(self, pos: int):
+        """删除一行，该位置留给之后新增的帖子复用。"""
+        if not self.alive[pos]:
+            return
+        self._unindex(pos)
+        self.alive[pos] = 0
+        self.pos_by_row_id.pop(self.row_ids[pos], None)
+        self.pos_by_thread_id.pop(self.thread_ids[pos], None)
+        self._free.append(pos)
+
+
+class ThreadIndexService:
+    """
+    帖子可搜索字段的内存列式快照。
+
+    从数据库全量构建一次，之后通过同步/批量更新/展示次数回写发出的事件增量维护，
+    索引完成后只按主键对账，不再全量重建。
+    搜索时先用位图求出满足等值条件的帖子，再在剩下的帖子上判断范围并排序，
+    只有最终一页的帖子才需要回表查询。
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+        self._columns = _Columns()
+        self._ready = False
+        self._build_lock = asyncio.Lock()
+        self._building = False
+        # 构建期间收到的变更，构建完成后再从数据库补齐
+        self._dirty_thread_ids: set[int] = set()
+        self._dirty_row_ids: set[int] = set()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._columns.pos_by_row_id)
+
+    # ---------------------------------------------------------------- 构建与维护
+
+    async def build(self):
+        """从数据库全量构建快照。"""
+        async with self._build_lock:
+            self._building = True
+            try:
+                columns = _Columns()
+                async with self.session_factory() as session:
+                    thread_rows = (
+                        await session.execute(select(*_SNAPSHOT_COLUMNS))
+                    ).all()
+                    link_rows = (
+                        await session.execute(
+                            select(ThreadTagLink.thread_id, ThreadTagLink.tag_id)
+                        )
+                    ).all()
+
+                tags_by_row: dict[int, list[int]] = {}
+                for row_id, tag_id in link_rows:
+                    tags_by_row.setdefault(row_id, []).append(tag_id)
+
+                for row in thread_rows:
+                    columns.write_row(row, tags_by_row.get(row.id, ()))
+
+                self._columns = columns
+                self._ready = True
+                logger.info(f"帖子内存索引构建完成，共 {len(thread_rows)} 个帖子。")
+            finally:
+                self._building = False
+
+            dirty_thread_ids = self._dirty_thread_ids
+            dirty_row_ids = self._dirty_row_ids
+            self._dirty_thread_ids = set()
+            self._dirty_row_ids = set()
+
+        if dirty_thread_ids or dirty_row_ids:
+            await self.refresh_threads(
+                thread_ids=dirty_thread_ids, row_ids=dirty_row_ids
+            )
+
+    async def refresh_threads(
+        self,
+        thread_ids: Collection[int] = (),
+        row_ids: Collection[int] = (),
+    ):
+        """
+        从数据库重新加载指定帖子的数据。
+        数据库中已不存在的帖子会从快照中移除。
+
+        Args:
+            thread_ids: Discord 帖子 ID
+            row_ids: 数据库主键 Thread.id
+        """
+        if not thread_ids and not row_ids:
+            return
+        if self._building or not self._ready:
+            self._dirty_thread_ids.update(thread_ids)
+            self._dirty_row_ids.update(row_ids)
+            return
+
+        conditions = []
+        if thread_ids:
+            conditions.append(col(Thread.thread_id).in_(list(thread_ids)))
+        if row_ids:
+            conditions.append(col(Thread.id).in_(list(row_ids)))
+
+        async with self.session_factory() as session:
+            stmt = select(*_SNAPSHOT_COLUMNS).where(or_(*conditions))
+            thread_rows = (await session.execute(stmt)).all()
+            found_row_ids = [row.id for row in thread_rows]
+            link_rows = []
+            if found_row_ids:
+                link_rows = (
+                    await session.execute(
+                        select(ThreadTagLink.thread_id, ThreadTagLink.tag_id).where(
+                            col(ThreadTagLink.thread_id).in_(found_row_ids)
+                        )
+                    )
+                ).all()
+
+        # 如果在查询期间开始了全量重建，交给重建流程处理
+        if self._building:
+            self._dirty_thread_ids.update(thread_ids)
+            self._dirty_row_ids.update(row_ids)
+            return
+
+        tags_by_row: dict[int, list[int]] = {}
+        for row_id, tag_id in link_rows:
+            tags_by_row.setdefault(row_id, []).append(tag_id)
+
+        columns = self._columns
+        for row in thread_rows:
+            columns.write_row(row, tags_by_row.get(row.id, ()))
+
+        found_thread_ids = {row.thread_id for row in thread_rows}
+        for thread_id in thread_ids:
+            if thread_id not in found_thread_ids:
+                pos = columns.pos_by_thread_id.get(thread_id)
+                if pos is not None:
+                    columns.kill(pos)
+        found_row_id_set = set(found_row_ids)
+        for row_id in row_ids:
+            if row_id not in found_row_id_set:
+                pos = columns.pos_by_row_id.get(row_id)
+                if pos is not None:
+                    columns.kill(pos)
+
+    async def reconcile(self):
+        """
+        按主键与数据库对账：移除数据库中已不存在的帖子，补齐快照中缺少的帖子。
+
+        索引过程中写入的帖子已经通过 'threads_synced' 事件增量同步，
+        这里只读取 Thread.id 一列，用来兜底没有发出事件的写入和删除。
+        """
+        if self._building or not self._ready:
+            return
+        async with self.session_factory() as session:
+            db_row_ids = set((await session.execute(select(Thread.id))).scalars().all())
+
+        columns = self._columns
+        stale = [
+            pos
+            for row_id, pos in columns.pos_by_row_id.items()
+            if row_id not in db_row_ids
+        ]
+        for pos in stale:
+            columns.kill(pos)
+
+        missing = list(db_row_ids.difference(columns.pos_by_row_id))
+        for start in range(0, len(missing), RECONCILE_CHUNK_SIZE):
+            await self.refresh_threads(
+                row_ids=missing[start : start + RECONCILE_CHUNK_SIZE]
+            )
+        if stale or missing:
+            logger.info(
+                f"帖子内存索引对账完成：移除 {len(stale)} 个，补齐 {len(missing)} 个帖子。"
+            )
+
+    def apply_activity_updates(self, updates: dict[int, UpdateData]):
+        """将 BatchUpdateService 已写入数据库的回复数/活跃时间增量同步到快照。"""
+        if self._building or not self._ready:
+            self._dirty_thread_ids.update(updates.keys())
+            return
+        columns = self._columns
+        for thread_id, data in updates.items():
+            pos = columns.pos_by_thread_id.get(thread_id)
+            if pos is None:
+                continue
+            columns.reply_counts[pos] += data["increment"]
+            if data["last_active_at"] is not None:
+                columns.last_active_at[pos] = _to_epoch(data["last_active_at"])
+
+    def apply_display_increments(self, increments: dict[int, int]):
+        """将 ImpressionCacheService 已写入数据库的展示次数增量同步到快照。"""
+        if self._building or not self._ready:
+            self._dirty_row_ids.update(increments.keys())
+            return
+        columns = self._columns
+        for row_id, count in increments.items():
+            pos = columns.pos_by_row_id.get(row_id)
+            if pos is not None:
+                columns.display_counts[pos] += count
+
+    # ---------------------------------------------------------------- 事件监听
+
+    async def on_threads_synced(self, thread_ids: Sequence[int]):
+        """监听 'threads_synced' 事件"""
+        try:
+            await self.refresh_threads(thread_ids=thread_ids)
+        except Exception as e:
+            logger.error(f"刷新帖子内存索引失败: {e}", exc_info=True)
+
+    async def on_thread_activity_flushed(self, updates: dict[int, UpdateData]):
+        """监听 'thread_activity_flushed' 事件"""
+        self.apply_activity_updates(updates)
+
+    async def on_impressions_flushed(self, increments: dict[int, int]):
+        """监听 'impressions_flushed' 事件"""
+        self.apply_display_increments(increments)
+
+    async def on_index_updated(self):
+        """监听 'index_updated' 事件，与数据库对账"""
+        try:
+            await self.reconcile()
+        except Exception as e:
+            logger.error(f"帖子内存索引对账失败: {e}", exc_info=True)
+
+    # ---------------------------------------------------------------- 查询
+
+    def search(
+        self,
+        *,
+        guild_id: Optional[int] = None,
+        channel_ids: Optional[Collection[int]] = None,
+        include_author_ids: Optional[Collection[int]] = None,
+        exclude_author_ids: Optional[Collection[int]] = None,
+        exclude_thread_ids: Optional[Collection[int]] = None,
+        reaction_count_range: Optional[str] = None,
+        reply_count_range: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        active_after: Optional[datetime] = None,
+        active_before: Optional[datetime] = None,
+        include_tag_groups: Optional[List[List[int]]] = None,
+        exclude_tag_ids: Optional[Collection[int]] = None,
+        candidate_row_ids: Optional[Collection[int]] = None,
+        excluded_row_ids: Optional[Collection[int]] = None,
+        sort_method: str = "comprehensive",
+        sort_desc: bool = True,
+        total_display_count: int = 1,
+        exploration_factor: float = 1.0,
+        strength_weight: float = 1.0,
+    ) -> List[int]:
+        """
+        在快照上执行过滤和排序，返回排好序的 Thread.id 列表。
+
+        include_tag_groups 中的每一组之间是 AND 关系，组内的标签 ID 是 OR 关系；
+        candidate_row_ids / excluded_row_ids 通常来自 FTS 的匹配结果。
+        """
+        columns = self._columns
+
+        # 1. 等值条件：在位图上求交集
+        mask = columns.visible
+        if candidate_row_ids is not None:
+            mask &= _positions_mask(columns.pos_by_row_id, candidate_row_ids)
+        if channel_ids:
+            mask &= _union(columns.by_channel, channel_ids)
+        elif guild_id:
+            mask &= columns.by_guild.get(guild_id, 0)
+        if include_author_ids:
+            mask &= _union(columns.by_author, include_author_ids)
+        if exclude_author_ids:
+            mask &= ~_union(columns.by_author, exclude_author_ids)
+        for group in include_tag_groups or []:
+            mask &= _union(columns.by_tag, group)
+        if exclude_tag_ids:
+            mask &= ~_union(columns.by_tag, exclude_tag_ids)
+        if exclude_thread_ids:
+            mask &= ~_positions_mask(columns.pos_by_thread_id, exclude_thread_ids)
+        if excluded_row_ids:
+            mask &= ~_positions_mask(columns.pos_by_row_id, excluded_row_ids)
+
+        positions = bitmap_to_ids(mask)
+
+        # 2. 范围条件：在剩下的帖子上一次判断完
+        checks = self._range_checks(
+            columns.reaction_counts, reaction_count_range
+        ) + self._range_checks(columns.reply_counts, reply_count_range)
+        if created_after:
+            checks.append((columns.created_at, operator.ge, _to_epoch(created_after)))
+        if created_before:
+            checks.append((columns.created_at, operator.le, _to_epoch(created_before)))
+        if active_after or active_before:
+            checks.append((columns.last_active_at, operator.ne, -math.inf))
+            if active_after:
+                checks.append(
+                    (columns.last_active_at, operator.ge, _to_epoch(active_after))
+                )
+            if active_before:
+                checks.append(
+                    (columns.last_active_at, operator.le, _to_epoch(active_before))
+                )
+        if checks:
+            positions = [
+                p
+                for p in positions
+                if all(op(values[p], bound) for values, op, bound in checks)
+            ]
+
+        row_ids = columns.row_ids
+        if sort_method == "comprehensive":
+            scores = self._ucb1_scores(
+                positions, total_display_count, exploration_factor, strength_weight
+            )
+            order = sorted(
+                range(len(positions)),
+                key=lambda i: (scores[i], row_ids[positions[i]]),
+                reverse=sort_desc,
+            )
+            return [row_ids[positions[i]] for i in order]
+
+        sort_col = {
+            "created_at": columns.created_at,
+            "last_active_at": columns.last_active_at,
+            "reaction_count": columns.reaction_counts,
+            "reply_count": columns.reply_counts,
+            "display_count": columns.display_counts,
+        }[sort_method]
+        positions.sort(key=lambda p: (sort_col[p], row_ids[p]), reverse=sort_desc)
+        return [row_ids[p] for p in positions]
+
+    @staticmethod
+    def _range_checks(values: array, range_str: Optional[str]) -> list[tuple]:
+        """把范围字符串转换为 (列, 比较函数, 边界) 的列表"""
+        if not range_str:
+            return []
+        min_val, max_val, min_op, max_op = parse_range_string(range_str)
+        checks = []
+        if min_val is not None and min_op is not None:
+            checks.append((values, _RANGE_OPS[min_op], min_val))
+        if max_val is not None and max_op is not None:
+            checks.append((values, _RANGE_OPS[max_op], max_val))
+        return checks
+
+    def _ucb1_scores(
+        self,
+        positions: List[int],
+        total_display_count: int,
+        exploration_factor: float,
+        strength_weight: float,
+    ) -> List[float]:
+        """
+        与 SearchService._apply_ucb1_ranking 相同的 UCB1 分数。
+        注意 SQLite 的 log() 是以 10 为底的，这里保持一致以得到相同的排序。
+        """
+        reactions = self._columns.reaction_counts
+        displays = self._columns.display_counts
+        log_n = math.log10(float(max(1, total_display_count)))
+        W = strength_weight
+        C = exploration_factor
+        scores = []
+        for p in positions:
+            n = float(displays[p]) if displays[p] > 0 else 1.0
+            scores.append(W * (reactions[p] / n) + C * math.sqrt(log_n / n))
+        return scores
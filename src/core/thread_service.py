@@ -1,25 +1,39 @@
 import logging
 from datetime import datetime
-from typing import List, Sequence, cast
+from typing import TYPE_CHECKING, List, Optional, Sequence, cast
 
-from sqlalchemy import ColumnElement, case, update
+from sqlalchemy import JSON, ColumnElement, case, delete, tuple_, type_coerce, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlmodel import select
 
 from core.tag_service import TagService
-from models import TagVote, Thread, ThreadTagLink
+from models import TagVote, Thread, ThreadFollow, ThreadTagLink
+from ThreadManager.services.unread_counter_service import UnreadCounterService
 from ThreadManager.update_data_dto import UpdateData
 
+if TYPE_CHECKING:
+    from core.tag_cache_service import TagCacheService
+
 logger = logging.getLogger(__name__)
 
+# 批量写入帖子时每条 INSERT 语句的最大行数，避免超出 SQLite 的变量数限制
+BULK_UPSERT_CHUNK_SIZE = 200
+
 
 class ThreadService:
     """封装与 Thread 表相关的数据库操作。"""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        tag_cache_service: Optional["TagCacheService"] = None,
+    ):
         self.session = session
         self.tag_service = TagService(session)
+        # 传入时，标签变更会同步到标签倒排位图
+        self.tag_cache_service = tag_cache_service
 
     async def add_or_update_thread_with_tags(
         self, thread_data: dict, tags_data: dict[int, str]
@@ -63,21 +77,143 @@ class ThreadService:
                 db_thread.tags.extend(tags_to_add)
 
             self.session.add(db_thread)
+            row_id = db_thread.id
         else:
             # 创建新帖子
             new_thread = Thread(**thread_data)
             new_thread.tags = tags
             self.session.add(new_thread)
+            await self.session.flush()
+            row_id = new_thread.id
+        await self.session.commit()
+
+        if self.tag_cache_service and row_id is not None:
+            self.tag_cache_service.update_thread_tags(row_id, tags_data.keys())
+
+    async def bulk_upsert_threads_with_tags(
+        self, items: Sequence[tuple[dict, dict[int, str]]]
+    ) -> dict[int, int]:
+        """
+        在一个事务中批量添加或更新帖子及其标签。
+
+        帖子使用 INSERT ... ON CONFLICT(thread_id) DO UPDATE 写入，
+        只更新 thread_data 中给出的字段；标签关联按差异增删，保留已有关联的投票数据。
+
+        Args:
+            items: [(thread_data, tags_data), ...]，同一帖子出现多次时以最后一次为准
+
+        Returns:
+            {Discord 帖子 ID: Thread.id}
+        """
+        latest: dict[int, tuple[dict, dict[int, str]]] = {}
+        for thread_data, tags_data in items:
+            latest[thread_data["thread_id"]] = (thread_data, tags_data)
+        if not latest:
+            return {}
+
+        # 所有标签一次性获取或创建
+        all_tags: dict[int, str] = {}
+        for _, tags_data in latest.values():
+            all_tags.update(tags_data)
+        await self.tag_service.get_or_create_tags(all_tags)
+
+        # 按字段集合分组，保证同一条 INSERT 的每行字段一致
+        groups: dict[tuple[str, ...], list[dict]] = {}
+        for thread_data, _ in latest.values():
+            groups.setdefault(tuple(sorted(thread_data)), []).append(thread_data)
+
+        row_ids: dict[int, int] = {}
+        for keys, group_rows in groups.items():
+            for start in range(0, len(group_rows), BULK_UPSERT_CHUNK_SIZE):
+                rows = group_rows[start : start + BULK_UPSERT_CHUNK_SIZE]
+                # 新帖子需要模型上的默认值（展示次数等），冲突时只更新给出的字段
+                values = [Thread(**row).model_dump(exclude={"id"}) for row in rows]
+                insert_stmt = sqlite_insert(Thread).values(values)
+                upsert_stmt = insert_stmt.on_conflict_do_update(
+                    index_elements=["thread_id"],
+                    set_={
+                        key: getattr(insert_stmt.excluded, key)
+                        for key in keys
+                        if key != "thread_id"
+                    },
+                ).returning(
+                    cast(ColumnElement, Thread.id),
+                    cast(ColumnElement, Thread.thread_id),
+                )
+                result = await self.session.execute(upsert_stmt)
+                for row_id, thread_id in result.all():
+                    row_ids[thread_id] = row_id
+
+        # 标签关联差异
+        existing_links: set[tuple[int, int]] = set()
+        link_result = await self.session.execute(
+            select(ThreadTagLink.thread_id, ThreadTagLink.tag_id).where(
+                cast(ColumnElement, ThreadTagLink.thread_id).in_(row_ids.values())
+            )
+        )
+        for link_thread_id, tag_id in link_result.all():
+            existing_links.add((link_thread_id, tag_id))
+
+        wanted_links = {
+            (row_ids[thread_id], tag_id)
+            for thread_id, (_, tags_data) in latest.items()
+            for tag_id in tags_data
+        }
+        links_to_add = wanted_links - existing_links
+        links_to_remove = existing_links - wanted_links
+
+        if links_to_remove:
+            await self.session.execute(
+                delete(ThreadTagLink).where(
+                    tuple_(ThreadTagLink.thread_id, ThreadTagLink.tag_id).in_(
+                        list(links_to_remove)
+                    )
+                )
+            )
+        if links_to_add:
+            await self.session.execute(
+                sqlite_insert(ThreadTagLink)
+                .values(
+                    [
+                        {"thread_id": thread_id, "tag_id": tag_id}
+                        for thread_id, tag_id in links_to_add
+                    ]
+                )
+                .on_conflict_do_nothing()
+            )
+
         await self.session.commit()
 
+        if self.tag_cache_service:
+            for thread_id, (_, tags_data) in latest.items():
+                self.tag_cache_service.update_thread_tags(
+                    row_ids[thread_id], tags_data.keys()
+                )
+        return row_ids
+
+    async def get_followed_thread_ids(self, thread_ids: Sequence[int]) -> set[int]:
+        """从给定的 Discord 帖子 ID 中，返回至少有一条关注记录的帖子"""
+        if not thread_ids:
+            return set()
+        statement = (
+            select(ThreadFollow.thread_id)
+            .where(cast(ColumnElement, ThreadFollow.thread_id).in_(thread_ids))
+            .distinct()
+        )
+        result = await self.session.execute(statement)
+        return set(result.scalars().all())
+
     async def delete_thread_index(self, thread_id: int):
         """删除帖子记录"""
         statement = select(Thread).where(Thread.thread_id == thread_id)  # type: ignore
         result = await self.session.execute(statement)
         db_thread = result.scalars().first()
         if db_thread:
+            row_id = db_thread.id
             await self.session.delete(db_thread)
             await self.session.commit()
+            if self.tag_cache_service and row_id is not None:
+                self.tag_cache_service.remove_thread(row_id)
 
     async def update_thread_activity(
         self, thread_id: int, last_active_at: datetime, reply_count: int
@@ -277,6 +413,70 @@ class ThreadService:
         result = await self.session.execute(stmt)
         return result.rowcount
 
+    async def batch_update_thread_reaction_counts(
+        self, reaction_counts: dict[int, int]
+    ) -> int:
+        """
+        用一条 UPDATE 语句批量更新多个帖子的反应数。
+
+        Args:
+            reaction_counts(dict[int, int]): {thread_id: reaction_count}
+
+        Returns:
+            (int) 成功更新的行数。
+        """
+        if not reaction_counts:
+            return 0
+
+        reaction_count_case = case(
+            reaction_counts,
+            value=Thread.thread_id,
+            else_=Thread.reaction_count,
+        )
+        stmt = (
+            update(Thread)
+            .where(cast(ColumnElement, Thread.thread_id).in_(list(reaction_counts)))
+            .values(reaction_count=reaction_count_case)
+            .execution_options(synchronize_session=False)
+        )
+
+        result = await self.session.execute(stmt)
+        return result.rowcount
+
+    async def batch_update_thumbnail_urls(
+        self, thumbnails: dict[int, List[str]]
+    ) -> List[int]:
+        """
+        用一条 UPDATE 语句批量更新多个帖子的封面链接。
+
+        Args:
+            thumbnails(dict[int, List[str]]): {thread_id: thumbnail_urls}
+
+        Returns:
+            (List[int]) 数据库中存在并被更新的帖子 ID。
+        """
+        if not thumbnails:
+            return []
+
+        thumbnail_case = case(
+            {
+                thread_id: type_coerce(urls, JSON)
+                for thread_id, urls in thumbnails.items()
+            },
+            value=Thread.thread_id,
+            else_=Thread.thumbnail_urls,
+        )
+        stmt = (
+            update(Thread)
+            .where(cast(ColumnElement, Thread.thread_id).in_(list(thumbnails)))
+            .values(thumbnail_urls=thumbnail_case)
+            .returning(Thread.thread_id)
+            .execution_options(synchronize_session=False)
+        )
+
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
     async def get_existing_thread_ids(self, thread_ids: List[int]) -> List[int]:
         """
         从给定的ID列表中，查询并返回那些在数据库中真实存在的记录ID
@@ -317,6 +517,8 @@ class ThreadService:
         """
         from datetime import datetime, timezone
 
+        # 在同一事务中先给此前没有未读更新的关注者计数加一
+        await UnreadCounterService(self.session).publish_update(thread_id)
         stmt = (
             update(Thread)
             .where(Thread.thread_id == thread_id)  # type: ignore
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import discord
+
+from core.thread_service import ThreadService
+
+if TYPE_CHECKING:
+    from core.sync_service import SyncService
+
+logger = logging.getLogger(__name__)
+
+# 默认每攒够多少个帖子写入一次数据库
+DEFAULT_UPSERT_BATCH_SIZE = 200
+
+
+class ThreadUpsertBuffer:
+    """
+    索引帖子时的批量写入缓冲区。
+
+    消费者解析完帖子后只把数据放入缓冲区，攒够 batch_size 个帖子后
+    在一个会话、一个事务中批量写入，代替每个帖子单独开会话、查询、提交。
+    写入完成后统一分发 'threads_synced' 事件并批量检查首次关注，
+    首次检测到的老帖子在后台并发添加自动关注。
+
+    作者信息同样在缓冲区中攒批写入，同一次索引中每个作者只写入一次。
+    """
+
+    def __init__(
+        self, sync_service: "SyncService", batch_size: int = DEFAULT_UPSERT_BATCH_SIZE
+    ):
+        self.sync_service = sync_service
+        self.batch_size = max(1, batch_size)
+        self._pending: list[tuple[discord.Thread, dict, dict[int, str]]] = []
+        # 待写入的作者: {author_id: (guild, source_member)}
+        self._pending_authors: dict[
+            int, tuple[discord.Guild, discord.Member | discord.User | None]
+        ] = {}
+        # 本次索引中已经处理过的作者
+        self._seen_authors: set[int] = set()
+        self._lock = asyncio.Lock()
+        # 后台执行中的首次关注任务
+        self._follow_tasks: set[asyncio.Task] = set()
+        # 写入失败的帖子，格式与索引仪表板的 failures 一致
+        self.failures: list[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def add(
+        self, thread: discord.Thread, thread_data: dict, tags_data: dict[int, str]
+    ):
+        """放入一个已解析的帖子，缓冲区满时立即写入"""
+        self._pending.append((thread, thread_data, tags_data))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    def add_author(
+        self,
+        author_id: int,
+        guild: discord.Guild,
+        source_member: discord.Member | discord.User | None = None,
+    ):
+        """登记一个帖子作者，本次索引中已经登记过的作者会被忽略"""
+        if author_id in self._seen_authors:
+            return
+        self._seen_authors.add(author_id)
+        self._pending_authors[author_id] = (guild, source_member)
+
+    async def flush(self):
+        """把缓冲区中的帖子和作者写入数据库"""
+        async with self._lock:
+            pending, self._pending = self._pending, []
+            pending_authors, self._pending_authors = self._pending_authors, {}
+            followed = await self._write(pending) if pending else None
+            if pending_authors:
+                await self.sync_service.save_authors(pending_authors)
+        if not pending:
+            return
+
+        bot = self.sync_service.bot
+        bot.dispatch("threads_synced", [thread.id for thread, _, _ in pending])
+
+        # 如果是首次被关注的老帖子，批量添加所有成员到关注列表
+        if followed is None:
+            return
+        first_detected = [
+            thread for thread, _, _ in pending if thread.id not in followed
+        ]
+        if first_detected:
+            # 获取成员需要调用 API，放到后台并发执行，不阻塞后续写入
+            task = asyncio.create_task(self._auto_follow(first_detected))
+            self._follow_tasks.add(task)
+            task.add_done_callback(self._follow_tasks.discard)
+
+    async def _auto_follow(self, threads: list[discord.Thread]):
+        await asyncio.gather(
+            *(
+                self.sync_service._auto_follow_on_first_detect(thread)
+                for thread in threads
+            )
+        )
+
+    async def wait_for_follows(self):
+        """等待已提交的自动关注全部完成"""
+        while self._follow_tasks:
+            await asyncio.gather(*self._follow_tasks)
+
+    async def _write(self, pending) -> set[int] | None:
+        """
+        批量写入并返回已有关注记录的帖子 ID。
+        批量写入失败时逐个帖子重试，此时返回 None，跳过自动关注。
+        """
+        session_factory = self.sync_service.session_factory
+        tag_cache_service = self.sync_service.bot.tag_cache_service
+        try:
+            async with session_factory() as session:
+                repo = ThreadService(
+                    session=session, tag_cache_service=tag_cache_service
+                )
+                await repo.bulk_upsert_threads_with_tags(
+                    [(thread_data, tags_data) for _, thread_data, tags_data in pending]
+                )
+                return await repo.get_followed_thread_ids(
+                    [thread.id for thread, _, _ in pending]
+                )
+        except Exception as e:
+            logger.error(
+                f"批量写入 {len(pending)} 个帖子失败，改为逐个写入: {e}", exc_info=True
+            )
+
+        for thread, thread_data, tags_data in pending:
+            try:
+                async with session_factory() as session:
+                    repo = ThreadService(
+                        session=session, tag_cache_service=tag_cache_service
+                    )
+                    await repo.add_or_update_thread_with_tags(
+                        thread_data=thread_data, tags_data=tags_data
+                    )
+            except Exception as e:
+                logger.error(f"写入帖子 {thread.id} 失败: {e}", exc_info=True)
+                self.failures.append({"id": thread.id, "reason": type(e).__name__})
+        return None
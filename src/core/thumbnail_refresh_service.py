@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import TYPE_CHECKING, Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from discord.http import Route
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import col, select
+
+from core.thread_service import ThreadService
+from models import Thread
+
+if TYPE_CHECKING:
+    from bot_main import MyBot
+
+logger = logging.getLogger(__name__)
+
+# 带签名（ex/is/hm 参数）的 Discord 附件链接所在的域名
+DISCORD_CDN_HOSTS = frozenset({"cdn.discordapp.com", "media.discordapp.net"})
+# refresh-urls 接口每次最多接受的链接数
+REFRESH_URLS_BATCH_SIZE = 50
+# 每轮最多刷新的帖子数，其余的留到下一轮，避免到期时间集中时一次提交过多请求
+MAX_THREADS_PER_TICK = 500
+# 后台刷新的调度优先级，低于所有用户交互和审计请求
+REFRESH_PRIORITY = 20
+
+
+def parse_expiry(url: str) -> Optional[int]:
+    """解析 Discord 附件链接的过期时间（ex 参数，十六进制的 Unix 时间戳）"""
+    parts = urlsplit(url)
+    if parts.hostname not in DISCORD_CDN_HOSTS:
+        return None
+    values = parse_qs(parts.query).get("ex")
+    if not values:
+        return None
+    try:
+        return int(values[0], 16)
+    except ValueError:
+        return None
+
+
+def earliest_expiry(urls: Iterable[str]) -> Optional[int]:
+    """一组链接中最早的过期时间，没有带签名的链接时返回 None"""
+    expiries = [e for e in map(parse_expiry, urls) if e is not None]
+    return min(expiries) if expiries else None
+
+
+class ThumbnailRefreshService:
+    """
+    在封面链接过期前主动重新签名。
+
+    用最小堆按过期时间记录所有带签名的封面链接，后台任务每隔 check_interval 秒
+    取出 lead_time 秒内将要过期的帖子，通过 refresh-urls 接口按 50 个链接一批重新签名，
+    经 APIScheduler 以低优先级提交，结果用一条 UPDATE 写回数据库。
+    帖子同步后重新读取其封面链接；堆中的旧条目在取出时按 _expiry 校验后丢弃。
+    """
+
+    def __init__(
+        self,
+        bot: "MyBot",
+        session_factory: async_sessionmaker,
+        lead_time: float = 3600,
+        check_interval: float = 60,
+    ):
+        self.bot = bot
+        self.session_factory = session_factory
+        self.lead_time = lead_time
+        self.check_interval = check_interval
+
+        # (过期时间, thread_id) 的最小堆
+        self._heap: list[tuple[int, int]] = []
+        # 每个帖子当前有效的过期时间，与堆中条目不一致的视为过期条目
+        self._expiry: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def tracked_count(self) -> int:
+        return len(self._expiry)
+
+    def track(self, thread_id: int, urls: Iterable[str]):
+        """记录（或更新）一个帖子的封面过期时间"""
+        expiry = earliest_expiry(urls)
+        if expiry is None:
+            self._expiry.pop(thread_id, None)
+            return
+        if self._expiry.get(thread_id) == expiry:
+            return
+        self._expiry[thread_id] = expiry
+        heapq.heappush(self._heap, (expiry, thread_id))
+
+    async def _load_thumbnails(
+        self, thread_ids: Optional[list[int]] = None
+    ) -> dict[int, list[str]]:
+        stmt = select(Thread.thread_id, Thread.thumbnail_urls)
+        if thread_ids is not None:
+            stmt = stmt.where(col(Thread.thread_id).in_(thread_ids))
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            return {thread_id: urls or [] for thread_id, urls in result.all()}
+
+    async def load(self):
+        """从数据库加载所有帖子的封面过期时间"""
+        thumbnails = await self._load_thumbnails()
+        self._heap = []
+        self._expiry = {}
+        for thread_id, urls in thumbnails.items():
+            self.track(thread_id, urls)
+        logger.info(f"封面过期时间加载完成，共跟踪 {self.tracked_count} 个帖子。")
+
+    def pop_due(self, now: float, limit: int = MAX_THREADS_PER_TICK) -> list[int]:
+        """取出 lead_time 秒内将要过期的帖子"""
+        due: list[int] = []
+        while self._heap and len(due) < limit:
+            expiry, thread_id = self._heap[0]
+            if expiry - self.lead_time > now:
+                break
+            heapq.heappop(self._heap)
+            if self._expiry.get(thread_id) != expiry:
+                continue
+            del self._expiry[thread_id]
+            due.append(thread_id)
+        return due
+
+    async def _refresh_urls(self, urls: list[str]) -> dict[str, str]:
+        """调用 refresh-urls 接口，返回 {原链接: 新链接}"""
+        data = await self.bot.api_scheduler.submit(
+            coro_factory=lambda: self.bot.http.request(
+                Route("POST", "/attachments/refresh-urls"),
+                json={"attachment_urls": urls},
+            ),
+            priority=REFRESH_PRIORITY,
+        )
+        return {
+            item["original"]: item["refreshed"]
+            for item in (data or {}).get("refreshed_urls", [])
+            if item.get("original") and item.get("refreshed")
+        }
+
+    async def refresh_due(self, now: Optional[float] = None) -> int:
+        """
+        刷新即将过期的封面。
+
+        Returns:
+            封面被更新的帖子数。
+        """
+        async with self._lock:
+            due = self.pop_due(time.time() if now is None else now)
+            if not due:
+                return 0
+
+            # 以数据库为准，帖子可能在入堆后重新同步过
+            thumbnails = await self._load_thumbnails(due)
+            urls = list(
+                dict.fromkeys(
+                    url
+                    for thread_urls in thumbnails.values()
+                    for url in thread_urls
+                    if parse_expiry(url) is not None
+                )
+            )
+
+            refreshed: dict[str, str] = {}
+            failed_urls: set[str] = set()
+            for start in range(0, len(urls), REFRESH_URLS_BATCH_SIZE):
+                batch = urls[start : start + REFRESH_URLS_BATCH_SIZE]
+                try:
+                    refreshed.update(await self._refresh_urls(batch))
+                except Exception as e:
+                    logger.warning(f"刷新 {len(batch)} 个封面链接失败: {e}")
+                    failed_urls.update(batch)
+
+            updates: dict[int, list[str]] = {}
+            for thread_id, thread_urls in thumbnails.items():
+                new_urls = [refreshed.get(url, url) for url in thread_urls]
+                if new_urls != thread_urls:
+                    updates[thread_id] = new_urls
+                elif failed_urls.intersection(thread_urls):
+                    # 请求失败的帖子留在堆中，下一轮重试
+                    self.track(thread_id, thread_urls)
+
+            if updates:
+                async with self.session_factory() as session:
+                    await ThreadService(session).batch_update_thumbnail_urls(updates)
+                    await session.commit()
+                for thread_id, new_urls in updates.items():
+                    self.track(thread_id, new_urls)
+
+        logger.debug(
+            f"封面刷新完成：到期 {len(due)} 个帖子，重新签名 {len(refreshed)} 个链接，"
+            f"更新 {len(updates)} 个帖子。"
+        )
+        return len(updates)
+
+    def start(self):
+        """启动后台刷新任务。"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _run_loop(self):
+        """后台任务的主循环。"""
+        while True:
+            try:
+                await asyncio.sleep(self.check_interval)
+                await self.refresh_due()
+            except asyncio.CancelledError:
+                logger.info("封面刷新后台任务已被取消。")
+                break
+            except Exception as e:
+                logger.error("封面刷新后台循环发生错误。", exc_info=e)
+
+    async def on_threads_synced(self, thread_ids: list[int]):
+        """监听 'threads_synced' 事件，同步后的帖子可能有了新的封面链接"""
+        try:
+            for thread_id, urls in (await self._load_thumbnails(thread_ids)).items():
+                self.track(thread_id, urls)
+        except Exception as e:
+            logger.error(f"更新封面过期时间失败: {e}", exc_info=True)
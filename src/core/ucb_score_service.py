@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlmodel import Float, case, cast, col, func, select, update
+
+from models import BotConfig, Thread
+from shared.enum.search_config_type import SearchConfigDefaults, SearchConfigType
+
+logger = logging.getLogger(__name__)
+
+# 单条 UPDATE 语句中 IN (...) 的最大 ID 数，避免超出 SQLite 的变量数限制
+RESCORE_BATCH_SIZE = 500
+# 全量重算时每个事务覆盖的 Thread.id 范围，分段提交，避免长时间占用写锁
+RESCORE_ALL_CHUNK_SIZE = 2000
+
+
+def ucb1_score_expression(
+    total_display_count: int, exploration_factor: float, strength_weight: float
+):
+    """
+    构造 UCB1 分数的 SQL 表达式。
+    Score = W * (x / n) + C * sqrt(ln(N) / n)
+    """
+    W = strength_weight
+    C = exploration_factor
+    N = float(max(1, total_display_count))
+
+    # reaction_count as x
+    # display_count as n
+    x = cast(Thread.reaction_count, Float)
+    n = case(
+        (Thread.display_count > 0, cast(Thread.display_count, Float)),
+        else_=1.0,  # 避免除零，并给新帖子最大探索加成
+    )
+
+    exploitation_term = W * (x / n)
+    # N/n 可能会非常大，取对数避免溢出
+    exploration_term = C * func.sqrt(func.log(N) / n)
+
+    return exploitation_term + exploration_term
+
+
+class UcbScoreService:
+    """
+    维护 Thread.ucb_score 物化分数的服务。
+
+    综合排序原本在每次查询时对过滤后的所有帖子实时计算 UCB1 分数并全量排序，
+    物化到带索引的列后，首页查询可以直接沿索引扫描。
+
+    - 展示次数回写、帖子同步（反应数变化）后，只重算受影响的帖子
+    - 总展示次数 N 的漂移由定期全量重算处理
+    - 探索因子 C 或权重 W 被修改后立即全量重算
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        rescore_interval: int = 3600,
+    ):
+        self.session_factory = session_factory
+        self.rescore_interval = rescore_interval
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._is_running = False
+        self._ready = False
+        # 上一次全量重算使用的 (C, W)
+        self._last_factors: Optional[tuple[float, float]] = None
+
+    @property
+    def ready(self) -> bool:
+        """首次全量重算完成后，物化分数才可用于排序"""
+        return self._ready
+
+    def start(self):
+        """启动后台定期全量重算任务，首轮立即执行。"""
+        if self._is_running:
+            return
+        self._is_running = True
+        self._task = asyncio.create_task(self._periodic_rescore())
+        logger.info(
+            f"UcbScoreService 已启动，每 {self.rescore_interval} 秒全量重算一次 UCB1 分数。"
+        )
+
+    async def stop(self):
+        if not self._is_running:
+            return
+        self._is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _periodic_rescore(self):
+        while self._is_running:
+            try:
+                await self.rescore_all()
+            except Exception as e:
+                logger.error(f"全量重算 UCB1 分数失败: {e}", exc_info=True)
+            await asyncio.sleep(self.rescore_interval)
+
+    async def _load_parameters(self, session) -> tuple[int, float, float]:
+        """直接从数据库读取 N/C/W，保证与刚回写的数据一致"""
+        result = await session.execute(
+            select(BotConfig.type, BotConfig.value_int, BotConfig.value_float).where(
+                col(BotConfig.type).in_(
+                    [
+                        SearchConfigType.TOTAL_DISPLAY_COUNT,
+                        SearchConfigType.UCB1_EXPLORATION_FACTOR,
+                        SearchConfigType.STRENGTH_WEIGHT,
+                    ]
+                )
+            )
+        )
+        values = {row.type: row for row in result}
+
+        total_display_count = 1
+        exploration_factor = SearchConfigDefaults.UCB1_EXPLORATION_FACTOR.value
+        strength_weight = SearchConfigDefaults.STRENGTH_WEIGHT.value
+
+        row = values.get(SearchConfigType.TOTAL_DISPLAY_COUNT)
+        if row is not None and row.value_int is not None:
+            total_display_count = row.value_int
+        row = values.get(SearchConfigType.UCB1_EXPLORATION_FACTOR)
+        if row is not None and row.value_float is not None:
+            exploration_factor = row.value_float
+        row = values.get(SearchConfigType.STRENGTH_WEIGHT)
+        if row is not None and row.value_float is not None:
+            strength_weight = row.value_float
+
+        return total_display_count, exploration_factor, strength_weight
+
+    async def rescore_all(self):
+        """
+        用当前的 N/C/W 重算所有帖子的分数。
+
+        按 Thread.id 范围分段，每段一个事务，段与段之间释放写锁，
+        其他写入（以及增量重算）可以穿插进来；重算期间两段之间的分数
+        暂时使用新旧两个 N，差异很小，全部完成后即一致。
+        """
+        async with self.session_factory() as session:
+            N, C, W = await self._load_parameters(session)
+            max_id = (await session.execute(select(func.max(Thread.id)))).scalar()
+        score = ucb1_score_expression(N, C, W)
+
+        for start in range(0, (max_id or 0) + 1, RESCORE_ALL_CHUNK_SIZE):
+            async with self._lock:
+                async with self.session_factory() as session:
+                    await session.execute(
+                        update(Thread)
+                        .where(
+                            col(Thread.id) >= start,
+                            col(Thread.id) < start + RESCORE_ALL_CHUNK_SIZE,
+                        )
+                        .values(ucb_score=score)
+                    )
+                    await session.commit()
+            await asyncio.sleep(0)
+
+        self._last_factors = (C, W)
+        self._ready = True
+        logger.debug(f"UCB1 分数全量重算完成 (N={N}, C={C}, W={W})")
+
+    async def rescore(
+        self, *, row_ids: Iterable[int] = (), thread_ids: Iterable[int] = ()
+    ):
+        """
+        只重算指定帖子的分数。
+
+        Args:
+            row_ids: Thread.id 列表
+            thread_ids: Discord 帖子 ID 列表
+        """
+        row_ids = list(row_ids)
+        thread_ids = list(thread_ids)
+        if not row_ids and not thread_ids:
+            return
+
+        async with self._lock:
+            async with self.session_factory() as session:
+                N, C, W = await self._load_parameters(session)
+                score = ucb1_score_expression(N, C, W)
+                for column, ids in (
+                    (col(Thread.id), row_ids),
+                    (col(Thread.thread_id), thread_ids),
+                ):
+                    for start in range(0, len(ids), RESCORE_BATCH_SIZE):
+                        batch = ids[start : start + RESCORE_BATCH_SIZE]
+                        await session.execute(
+                            update(Thread)
+                            .where(column.in_(batch))
+                            .values(ucb_score=score)
+                        )
+                await session.commit()
+
+    # ---------------------------------------------------------------- 事件监听
+
+    async def on_impressions_flushed(self, increments: dict):
+        """监听 'impressions_flushed' 事件，键为 Thread.id"""
+        try:
+            await self.rescore(row_ids=increments.keys())
+        except Exception as e:
+            logger.error(f"重算 UCB1 分数失败: {e}", exc_info=True)
+
+    async def on_threads_synced(self, thread_ids: list[int]):
+        """监听 'threads_synced' 事件，反应数可能发生了变化"""
+        try:
+            await self.rescore(thread_ids=thread_ids)
+        except Exception as e:
+            logger.error(f"重算 UCB1 分数失败: {e}", exc_info=True)
+
+    async def on_config_updated(self):
+        """监听 'config_updated' 事件，C 或 W 被修改时全量重算"""
+        if self._last_factors is None:
+            return
+        try:
+            async with self.session_factory() as session:
+                _, C, W = await self._load_parameters(session)
+            if (C, W) != self._last_factors:
+                await self.rescore_all()
+        except Exception as e:
+            logger.error(f"全量重算 UCB1 分数失败: {e}", exc_info=True)
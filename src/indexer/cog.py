@@ -7,8 +7,16 @@ from discord import app_commands
 from discord.ext import commands
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from core.index_checkpoint_service import (
+    MODE_FULL,
+    MODE_INCREMENTAL,
+    MODE_RESUME,
+    IndexCheckpointService,
+    IndexRun,
+)
 from core.sync_service import SyncService
 from core.tag_cache_service import TagCacheService
+from core.thread_upsert_buffer import DEFAULT_UPSERT_BATCH_SIZE, ThreadUpsertBuffer
 from indexer.views import IndexerDashboard
 from shared.safe_defer import safe_defer
 from ThreadManager.cog import ThreadManager
@@ -19,6 +27,12 @@ if TYPE_CHECKING:
 # 获取一个模块级别的 logger
 logger = logging.getLogger(__name__)
 
+INDEX_MODE_LABELS = {
+    MODE_FULL: "全量索引",
+    MODE_INCREMENTAL: "增量索引（只处理上次完成后归档的帖子）",
+    MODE_RESUME: "续跑（从上次中断处继续）",
+}
+
 
 class Indexer(commands.Cog):
     """构建索引相关命令"""
@@ -36,12 +50,24 @@ class Indexer(commands.Cog):
         self.config = config
         self.tag_service = tag_service
         self.sync_service = sync_service
+        self.checkpoint_service = IndexCheckpointService(session_factory)
         logger.info("Indexer 模块已加载")
 
     @app_commands.command(
         name="构建索引", description="对当前论坛频道的所有帖子进行索引"
     )
-    async def build_index(self, interaction: discord.Interaction):
+    @app_commands.describe(模式="默认从上次中断处续跑，或只索引上次完成后归档的帖子")
+    @app_commands.choices(
+        模式=[
+            app_commands.Choice(name="自动（续跑或增量）", value="auto"),
+            app_commands.Choice(name="全量", value=MODE_FULL),
+        ]
+    )
+    async def build_index(
+        self,
+        interaction: discord.Interaction,
+        模式: app_commands.Choice[str] | None = None,
+    ):
         await safe_defer(interaction, ephemeral=True)
         if not isinstance(interaction.channel, discord.Thread):
             await self.bot.api_scheduler.submit(
@@ -62,7 +88,12 @@ class Indexer(commands.Cog):
             )
             return
 
-        dashboard = IndexerDashboard(self, channel, self.config)
+        dashboard = IndexerDashboard(
+            self,
+            channel,
+            self.config,
+            full_rebuild=模式 is not None and 模式.value == MODE_FULL,
+        )
         await dashboard.start(interaction)
 
     async def run_indexer(self, dashboard: IndexerDashboard):
@@ -89,14 +120,44 @@ class Indexer(commands.Cog):
             await dashboard.update_embed()
             return
 
-        # 步骤 2: 启动生产者和消费者
+        # 步骤 2: 读取检查点，决定全量、增量或续跑
+        try:
+            index_run = await self.checkpoint_service.begin_run(
+                dashboard.channel.id,
+                dashboard.channel.guild.id,
+                full=dashboard.full_rebuild,
+            )
+        except Exception as e:
+            logging.error(
+                f"[{dashboard.channel.id}] 读取索引检查点失败，索引已中止: {e}",
+                exc_info=True,
+            )
+            dashboard.progress["error"] = f"读取索引检查点失败: {e}"
+            dashboard.progress["finished"] = True
+            await dashboard.update_embed()
+            return
+
+        dashboard.progress["mode"] = INDEX_MODE_LABELS[index_run.mode]
+        dashboard.progress["processed"] = index_run.processed
+        dashboard.progress["discovered"] = index_run.processed
+        dashboard.progress["failures"].extend(index_run.failures)
+
+        # 步骤 3: 启动生产者和消费者
         logging.info(
             f"[{dashboard.channel.id}] 标签预同步完成，启动 {dashboard.consumer_concurrency} 个消费者"
         )
+        upsert_buffer = ThreadUpsertBuffer(
+            self.sync_service,
+            batch_size=self.config.get("performance", {}).get(
+                "indexer_batch_size", DEFAULT_UPSERT_BATCH_SIZE
+            ),
+        )
         loop = self.bot.loop
-        producer_task = loop.create_task(self.producer(dashboard))
+        producer_task = loop.create_task(
+            self.producer(dashboard, index_run, upsert_buffer)
+        )
         consumer_tasks = [
-            loop.create_task(self.consumer(dashboard, consumer_id=i))
+            loop.create_task(self.consumer(dashboard, upsert_buffer, consumer_id=i))
             for i in range(dashboard.consumer_concurrency)
         ]
 
@@ -105,7 +166,7 @@ class Indexer(commands.Cog):
             await producer_task
 
             # 等待队列中的所有项目都被消费者处理
-            await dashboard.queue.join()
+            await dashboard.wait_until_drained()
 
         except Exception as e:
             dashboard.progress["error"] = f"{type(e).__name__}: {e}"
@@ -119,6 +180,31 @@ class Indexer(commands.Cog):
             # 等待所有被取消的消费者任务完全停止
             await asyncio.gather(*consumer_tasks, return_exceptions=True)
 
+            # 写入缓冲区中剩余的帖子，并等待后台的自动关注完成
+            try:
+                await upsert_buffer.flush()
+                await upsert_buffer.wait_for_follows()
+            except Exception as e:
+                logging.error(
+                    f"[{dashboard.channel.id}] 写入剩余帖子时出错: {e}", exc_info=True
+                )
+            dashboard.progress["failures"].extend(upsert_buffer.failures)
+
+            # 正常完成时记录本轮的开始时间，供下次增量索引使用；
+            # 取消或出错时保留最后保存的翻页游标，下次续跑
+            if not dashboard.progress.get("error") and not dashboard.is_cancelled():
+                try:
+                    await self.checkpoint_service.complete_run(
+                        index_run,
+                        processed=dashboard.progress["processed"],
+                        failures=dashboard.progress["failures"],
+                    )
+                except Exception as e:
+                    logging.error(
+                        f"[{dashboard.channel.id}] 保存索引检查点失败: {e}",
+                        exc_info=True,
+                    )
+
             # 标记完成并更新UI
             if not dashboard.progress.get("error"):
                 dashboard.progress["finished"] = True
@@ -156,8 +242,19 @@ class Indexer(commands.Cog):
                 )
                 self.bot.dispatch("index_updated")
 
-    async def producer(self, dashboard: IndexerDashboard):
-        """生产者：发现帖子并放入队列"""
+    async def producer(
+        self,
+        dashboard: IndexerDashboard,
+        index_run: IndexRun,
+        upsert_buffer: ThreadUpsertBuffer,
+    ):
+        """
+        生产者：发现帖子并放入队列。
+
+        归档帖子逐页处理，每页处理并写入完成后保存翻页游标到检查点。
+        增量索引遇到归档时间早于截止时间的帖子即停止翻页。
+        获取归档帖子失败时抛出异常，本轮不会被标记为完成。
+        """
         channel = dashboard.channel
         progress = dashboard.progress
         queue = dashboard.queue
@@ -168,31 +265,62 @@ class Indexer(commands.Cog):
             progress["discovered"] += 1
 
         # 已归档线程 (手动分页)
-        before_timestamp = None
+        before_timestamp = index_run.resume_before
         while not dashboard.is_cancelled():
             batch = []
+            reached_since = False
             try:
                 async for thread in channel.archived_threads(
                     limit=100, before=before_timestamp
                 ):
+                    if (
+                        index_run.since is not None
+                        and thread.archive_timestamp <= index_run.since
+                    ):
+                        reached_since = True
+                        break
                     batch.append(thread)
                     await queue.put(thread)
                     progress["discovered"] += 1
             except Exception as e:
+                # 翻页失败不能当作已经到达末尾：抛出后本轮记为出错，
+                # 检查点停留在最后一个写入完成的页，下次续跑时重新获取这一页
                 logging.error(f"[{channel.id}] 获取归档帖子时出错: {e}", exc_info=True)
-                pass
+                raise
 
             if not batch:
                 break
 
             before_timestamp = batch[-1].archive_timestamp
 
+            # 本页处理完毕并写入数据库后才推进检查点
+            if not await dashboard.wait_until_drained():
+                break
+            await upsert_buffer.flush()
+            try:
+                await self.checkpoint_service.save_progress(
+                    channel.id,
+                    before_timestamp,
+                    processed=progress["processed"],
+                    failures=progress["failures"] + upsert_buffer.failures,
+                )
+            except Exception as e:
+                logging.error(f"[{channel.id}] 保存索引检查点失败: {e}", exc_info=True)
+
+            if reached_since:
+                break
+
         if not dashboard.is_cancelled():
             progress["total"] = progress["discovered"]
 
         # 生产者完成
 
-    async def consumer(self, dashboard: IndexerDashboard, consumer_id: int):
+    async def consumer(
+        self,
+        dashboard: IndexerDashboard,
+        upsert_buffer: ThreadUpsertBuffer,
+        consumer_id: int,
+    ):
         """消费者：从队列中取出帖子并处理，受信号量控制。"""
         try:
             while True:
@@ -210,7 +338,9 @@ class Indexer(commands.Cog):
 
                     try:
                         await self.sync_service.sync_thread(
-                            thread, fetch_if_incomplete=True
+                            thread,
+                            fetch_if_incomplete=True,
+                            upsert_buffer=upsert_buffer,
                         )
                     except Exception as e:
                         error_reason = f"{type(e).__name__}"
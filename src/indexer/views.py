@@ -11,12 +11,20 @@ from shared.safe_defer import safe_defer
 class IndexerDashboard(discord.ui.View):
     """索引器仪表板视图，用于控制和显示索引过程。"""
 
-    def __init__(self, cog, channel: discord.ForumChannel, config: dict):
+    def __init__(
+        self,
+        cog,
+        channel: discord.ForumChannel,
+        config: dict,
+        full_rebuild: bool = False,
+    ):
         super().__init__(timeout=None)
         self.cog = cog
         self.channel = channel
         self.interaction: Optional[discord.Interaction] = None
         self.config = config
+        # 为 True 时忽略检查点，从最新的帖子开始全量索引
+        self.full_rebuild = full_rebuild
 
         # 新增属性
         self.start_time: Optional[datetime] = None
@@ -37,6 +45,7 @@ class IndexerDashboard(discord.ui.View):
             "finished": False,
             "error": None,
             "failures": [],  # 用于记录非致命的处理失败
+            "mode": None,  # 全量 / 增量 / 续跑
         }
 
         self._paused = asyncio.Event()
@@ -99,6 +108,9 @@ class IndexerDashboard(discord.ui.View):
 
         embed = discord.Embed(title=title, color=color)
         embed.add_field(name="状态", value=state, inline=False)
+        mode = progress_stats.get("mode")
+        if mode:
+            embed.add_field(name="模式", value=mode, inline=False)
         embed.add_field(
             name="已发现帖子", value=str(progress_stats["discovered"]), inline=True
         )
@@ -211,3 +223,19 @@ class IndexerDashboard(discord.ui.View):
 
     async def wait_if_paused(self):
         await self._paused.wait()
+
+    async def wait_until_drained(self) -> bool:
+        """
+        等待队列中的帖子全部处理完毕。
+        取消后消费者不再取出帖子，此时提前返回 False。
+        """
+        join_task = asyncio.ensure_future(self.queue.join())
+        cancel_task = asyncio.ensure_future(self._cancelled.wait())
+        try:
+            await asyncio.wait(
+                {join_task, cancel_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            join_task.cancel()
+            cancel_task.cancel()
+        return not self.is_cancelled()
@@ -5,6 +5,8 @@ from models.banner_waitlist import BannerWaitlist
 from models.booklist import Booklist
 from models.booklist_item import BooklistItem
 from models.bot_config import BotConfig
+from models.index_checkpoint import IndexCheckpoint
+from models.journal_checkpoint import JournalCheckpoint
 from models.mutex_tag_group import MutexTagGroup
 from models.mutex_tag_rule import MutexTagRule
 from models.thread_tag_link import ThreadTagLink
@@ -15,6 +17,7 @@ from models.thread_follow import ThreadFollow
 from models.user_collection import UserCollection
 from models.user_search_preferences import UserSearchPreferences
 from models.user_update_preference import UserUpdatePreference
+from models.user_unread_counter import UserUnreadCounter
 
 __all__ = [
     "ThreadTagLink",
@@ -34,4 +37,7 @@ __all__ = [
     "UserCollection",
     "Booklist",
     "BooklistItem",
+    "IndexCheckpoint",
+    "UserUnreadCounter",
+    "JournalCheckpoint",
 ]
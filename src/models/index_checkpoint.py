@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlmodel import JSON, BigInteger, Column, Field, SQLModel
+
+
+class IndexCheckpoint(SQLModel, table=True):
+    """频道索引检查点，用于中断后续跑以及只索引新归档帖子的增量索引"""
+
+    __tablename__ = "index_checkpoint"  # type: ignore
+
+    channel_id: int = Field(
+        sa_column=Column(BigInteger, primary_key=True, autoincrement=False),
+        description="论坛频道 ID",
+    )
+    guild_id: int = Field(
+        default=0,
+        sa_column=Column(BigInteger, nullable=False),
+        description="频道所属的 Discord 服务器 ID",
+    )
+    status: str = Field(default="running", description="running 或 completed")
+    run_started_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="本轮索引的开始时间",
+    )
+    run_since: Optional[datetime] = Field(
+        default=None,
+        description="本轮只遍历归档时间晚于该时间的帖子，为空表示全量索引",
+    )
+    resume_before: Optional[datetime] = Field(
+        default=None,
+        description="已处理完的最旧一页归档帖子的归档时间，续跑时从这里继续翻页",
+    )
+    processed: int = Field(default=0, description="本轮已处理的帖子数")
+    failures: List[dict] = Field(
+        default_factory=list,
+        sa_column=Column(JSON),
+        description="本轮处理失败的帖子",
+    )
+    last_completed_at: Optional[datetime] = Field(
+        default=None, description="上一次完成的索引的开始时间"
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        description="检查点更新时间",
+    )
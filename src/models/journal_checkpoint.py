@@ -0,0 +1,10 @@
+from sqlmodel import Field, SQLModel
+
+
+class JournalCheckpoint(SQLModel, table=True):
+    """本地预写日志已写入数据库的最新日志段，与回写的数据在同一事务中更新"""
+
+    __tablename__ = "journal_checkpoint"  # type: ignore
+
+    name: str = Field(primary_key=True, description="日志名称，如 impressions")
+    segment: int = Field(description="已落库的最大日志段编号")
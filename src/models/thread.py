@@ -56,6 +56,11 @@ class Thread(SQLModel, table=True):
         index=True,
         description="审计拉取帖子数据 NotFound 时 +1, 拉取成功时归零",
     )
+    last_audited_at: Optional[datetime] = Field(
+        default=None,
+        index=True,
+        description="最近一次从 Discord 同步或审计该帖子的时间，审计器据此安排下一次审计",
+    )
 
     # UCB1算法相关字段
     display_count: int = Field(
@@ -63,6 +68,11 @@ class Thread(SQLModel, table=True):
         sa_column=Column(BigInteger, index=True),
         description="在搜索结果中的展示次数",
     )
+    ucb_score: float = Field(
+        default=0.0,
+        index=True,
+        description="物化的 UCB1 综合排序分数，由 UcbScoreService 维护",
+    )
 
     tags: List["Tag"] = Relationship(back_populates="threads", link_model=ThreadTagLink)
     votes: List["TagVote"] = Relationship(back_populates="thread")
@@ -0,0 +1,13 @@
+from sqlmodel import BigInteger, Column, Field, SQLModel
+
+
+class UserUnreadCounter(SQLModel, table=True):
+    """用户关注列表的未读更新数，由关注和更新操作增量维护，定期与 thread_follow 对账"""
+
+    __tablename__ = "user_unread_counter"  # type: ignore
+
+    user_id: int = Field(
+        sa_column=Column(BigInteger, primary_key=True, autoincrement=False),
+        description="用户Discord ID",
+    )
+    unread_count: int = Field(default=0, description="有未读更新的关注帖子数")
@@ -12,10 +12,13 @@ from config.config_service import ConfigService
 from core.cache_service import CacheService
 from core.impression_cache_service import ImpressionCacheService
 from core.tag_cache_service import TagCacheService
+from core.thread_index_service import ThreadIndexService
+from core.ucb_score_service import UcbScoreService
 from preferences.preferences_service import PreferencesService
 from search.dto.search_state import SearchStateDTO
 from search.qo.thread_search import ThreadSearchQuery
-from search.search_service import SearchService
+from search.result_cache import SearchResultCache, describe_query
+from search.search_service import FTS_MODE_AUTO, SearchService
 from search.strategies import AuthorSearchStrategy, CollectionSearchStrategy
 from search.views import (
     ChannelSelectionView,
@@ -25,6 +28,8 @@ from search.views import (
     ThreadEmbedBuilder,
 )
 from shared.enum.search_config_type import SearchConfigDefaults, SearchConfigType
+from shared.exceptions import InvalidSearchCursor
+from shared.metrics import StageTimer
 from shared.safe_defer import safe_defer
 
 if TYPE_CHECKING:
@@ -47,15 +52,27 @@ class Search(commands.Cog):
         preferences_service: PreferencesService,
         impression_cache_service: ImpressionCacheService,
         config_service: ConfigService,
+        thread_index_service: ThreadIndexService | None = None,
+        result_cache: SearchResultCache | None = None,
+        ucb_score_service: UcbScoreService | None = None,
+        read_session_factory: async_sessionmaker | None = None,
     ):
         self.bot = bot
         self.session_factory = session_factory
+        # 搜索只读数据库，使用只读连接池，不会排在写操作之后
+        self.read_session_factory = read_session_factory or session_factory
         self.config = config
         self.tag_service = tag_service
         self.cache_service = cache_service
         self.preferences_service = preferences_service
         self.impression_cache_service = impression_cache_service
         self.config_service = config_service
+        self.thread_index_service = thread_index_service
+        self.result_cache = result_cache
+        self.ucb_score_service = ucb_score_service
+        self.fts_mode = config.get("performance", {}).get(
+            "search_fts_mode", FTS_MODE_AUTO
+        )
         self.global_search_view = GlobalSearchView(self)
         self.persistent_channel_search_view = PersistentChannelSearchView(self)
         self._has_cached_tags = False  # 用于确保 on_ready 只执行一次缓存
@@ -402,7 +419,7 @@ class Search(commands.Cog):
 
     async def get_tags_for_author(self, author_id: int):
         """获取给定作者使用过的全部标签"""
-        async with self.session_factory() as session:
+        async with self.read_session_factory() as session:
             repo = SearchService(session, self.tag_service)
             return await repo.get_tags_for_author(author_id)
 
@@ -417,8 +434,15 @@ class Search(commands.Cog):
         page: int,
         per_page: int,
         preview_mode: str,
+        cursor: str | None = None,
     ) -> dict:
-        """通用搜索和显示函数"""
+        """
+        通用搜索和显示函数
+
+        首页和带游标的页使用游标分页，并在结果中返回下一页的游标；
+        直接跳转到没有游标的页时退回偏移量分页。
+        """
+        timer = StageTimer("bot")
         try:
             # 获取 UCB1 配置
             total_disp_conf = await self.config_service.get_config_from_cache(
@@ -447,19 +471,41 @@ class Search(commands.Cog):
                 else SearchConfigDefaults.STRENGTH_WEIGHT.value
             )
 
-            async with self.session_factory() as session:
-                repo = SearchService(session, self.tag_service)
-                offset = (page - 1) * per_page
-                limit = per_page
-
-                threads, total_threads = await repo.search_threads_with_count(
-                    search_qo,
-                    limit=limit,
-                    offset=offset,
-                    total_display_count=total_display_count,
-                    exploration_factor=exploration_factor,
-                    strength_weight=strength_weight,
+            async with self.read_session_factory() as session:
+                repo = SearchService(
+                    session,
+                    self.tag_service,
+                    self.thread_index_service,
+                    self.result_cache,
+                    self.ucb_score_service,
+                    fts_mode=self.fts_mode,
+                    timer=timer,
                 )
+                next_cursor = None
+                threads = None
+                if cursor is not None or page == 1:
+                    try:
+                        cursor_result = await repo.search_threads_with_cursor(
+                            search_qo,
+                            limit=per_page,
+                            cursor=cursor,
+                            total_display_count=total_display_count,
+                            exploration_factor=exploration_factor,
+                            strength_weight=strength_weight,
+                        )
+                        threads, total_threads, next_cursor = cursor_result
+                    except InvalidSearchCursor:
+                        logger.debug("搜索游标已失效，退回偏移量分页")
+
+                if threads is None:
+                    threads, total_threads = await repo.search_threads_with_count(
+                        search_qo,
+                        limit=per_page,
+                        offset=(page - 1) * per_page,
+                        total_display_count=total_display_count,
+                        exploration_factor=exploration_factor,
+                        strength_weight=strength_weight,
+                    )
 
             # 当排序方法为按创建时间或收藏时间排序时，不记录展示次数
             count_view = not (
@@ -476,6 +522,7 @@ class Search(commands.Cog):
                 await self.impression_cache_service.increment(thread_ids_to_update)
 
             if not threads:
+                timer.finish(describe_query(search_qo))
                 return {"has_results": False, "total": total_threads}
 
             embeds = []
@@ -497,6 +544,8 @@ class Search(commands.Cog):
                     for thread in threads
                 ]
                 embeds = await asyncio.gather(*embed_tasks)
+            timer.lap("render")
+            timer.finish(describe_query(search_qo))
 
             return {
                 "has_results": True,
@@ -505,6 +554,7 @@ class Search(commands.Cog):
                 "page": page,
                 "per_page": per_page,
                 "max_page": (total_threads + per_page - 1) // per_page or 1,
+                "next_cursor": next_cursor,
             }
         except Exception:
             logger.error("在 _search_and_display 中发生错误", exc_info=True)
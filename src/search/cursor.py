@@ -0,0 +1,81 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Hashable
+
+from shared.exceptions import InvalidSearchCursor
+
+
+def query_fingerprint(canonical_key: Hashable) -> str:
+    """计算规范化查询的指纹，用于校验游标是否属于当前查询"""
+    return hashlib.sha1(repr(canonical_key).encode("utf-8")).hexdigest()[:16]
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+def encode_cursor(payload: dict) -> str:
+    """
+    将游标内容编码为不透明的字符串。
+
+    payload 中的键:
+        q: 查询指纹
+        t: 首页计算出的总数
+        o: 偏移量（结果已完整在内存中时使用）
+        k / i: 上一页最后一行的排序键和 Thread.id（键集分页时使用）
+        n: 综合排序使用的总展示次数，保证翻页期间分数一致
+        x: 首页传入的 exclude_thread_ids，翻页时沿用
+    """
+    data = {key: _encode_value(value) for key, value in payload.items()}
+    raw = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_valid_state(data: dict) -> bool:
+    """检查游标的键和类型，客户端改过的游标不能进入查询"""
+    if not isinstance(data.get("q"), str) or not _is_int(data.get("t")):
+        return False
+    exclusions = data.get("x", [])
+    if not isinstance(exclusions, list) or not all(_is_int(i) for i in exclusions):
+        return False
+    if "o" in data:
+        return _is_int(data["o"]) and data["o"] >= 0
+    # 键集分页
+    return (
+        _is_int(data.get("i"))
+        and _is_int(data.get("n"))
+        and "k" in data
+        and (
+            data["k"] is None
+            or isinstance(data["k"], (int, float, str, datetime))
+            and not isinstance(data["k"], bool)
+        )
+    )
+
+
+def decode_cursor(cursor: str) -> dict:
+    """解析游标字符串，格式或内容不合法时抛出 InvalidSearchCursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if isinstance(data, dict):
+            data = {key: _decode_value(value) for key, value in data.items()}
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidSearchCursor("无法解析的搜索游标") from e
+    if not isinstance(data, dict) or not _is_valid_state(data):
+        raise InvalidSearchCursor("无法解析的搜索游标")
+    return data
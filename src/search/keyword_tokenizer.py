@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, Sequence
+
+import rjieba
+
+logger = logging.getLogger(__name__)
+
+# 进程级的关键词分词缓存容量
+TOKEN_CACHE_SIZE = 4096
+
+# 关键词 -> 分词结果（已去除空白词元）。只在事件循环线程中读写，无需加锁
+_token_cache: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+
+
+def _cut_many(keywords: Sequence[str]) -> list[tuple[str, ...]]:
+    """在线程池中对一批关键词分词"""
+    results = []
+    for keyword in keywords:
+        tokens = tuple(tok.strip() for tok in rjieba.cut(keyword) if tok.strip())
+        results.append(tokens)
+    return results
+
+
+async def cut_keywords(keywords: Iterable[str]) -> dict[str, tuple[str, ...]]:
+    """
+    对一次查询中的全部关键词分词。
+
+    命中缓存的关键词直接返回，未命中的合并为一次线程池调用，
+    避免每个关键词各跑一次 run_in_executor。
+    """
+    result: dict[str, tuple[str, ...]] = {}
+    misses: list[str] = []
+    for keyword in keywords:
+        if keyword in result:
+            continue
+        tokens = _token_cache.get(keyword)
+        if tokens is None:
+            if keyword not in misses:
+                misses.append(keyword)
+            continue
+        _token_cache.move_to_end(keyword)
+        result[keyword] = tokens
+
+    if misses:
+        loop = asyncio.get_running_loop()
+        cut_results = await loop.run_in_executor(None, _cut_many, misses)
+        for keyword, tokens in zip(misses, cut_results):
+            result[keyword] = tokens
+            _token_cache[keyword] = tokens
+            _token_cache.move_to_end(keyword)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+    return result
+
+
+def clear_token_cache():
+    _token_cache.clear()
+    build_exclude_match_expr.cache_clear()
+
+
+@lru_cache(maxsize=1024)
+def build_exclude_match_expr(
+    token_groups: tuple[tuple[str, ...], ...], exemption_markers: tuple[str, ...]
+) -> str:
+    """
+    构造反选关键词的 FTS MATCH 表达式。
+
+    每个关键词的最后一个词元做前缀匹配；有豁免标记时，
+    关键词首个词元附近出现标记（如 "禁"）的帖子不被排除。
+    用户保存的反选列表基本不变，表达式按 (分词结果, 豁免标记) 缓存。
+    """
+    all_exclude_parts = []
+    for tokens in token_groups:
+        if not tokens:
+            continue
+
+        match_parts = [f'"{tok}"' for tok in tokens[:-1]]
+        match_parts.append(f'"{tokens[-1]}"*')
+        match_expr = " AND ".join(match_parts)
+
+        if exemption_markers:
+            first_token = tokens[0]
+            exemption_clauses = [
+                f'NEAR("{first_token}" "{marker}", 4)' for marker in exemption_markers
+            ]
+            exemption_match_str = f"({' OR '.join(exemption_clauses)})"
+            all_exclude_parts.append(f"({match_expr}) NOT {exemption_match_str}")
+        else:
+            all_exclude_parts.append(f"({match_expr})")
+
+    return " OR ".join(all_exclude_parts)
@@ -0,0 +1,201 @@
+import logging
+import math
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import MISSING, fields
+from typing import Hashable, Optional, Sequence
+
+from search.qo.thread_search import ThreadSearchQuery
+from shared.enum.default_preferences import DefaultPreferences
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze(value) -> Hashable:
+    """将查询字段转换为与顺序无关的可哈希值"""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def canonical_query_key(
+    query: ThreadSearchQuery, exclude_thread_ids: Optional[Sequence[int]] = None
+) -> Hashable:
+    """构造规范化的查询键，字段顺序和列表内元素顺序都不影响结果"""
+    query_key = tuple((f.name, _freeze(getattr(query, f.name))) for f in fields(query))
+    return query_key, _freeze(exclude_thread_ids or ())
+
+
+def describe_query(query: ThreadSearchQuery) -> str:
+    """规范化的查询描述，只列出与默认值不同的字段，用于日志"""
+    parts = []
+    for f in fields(query):
+        value = _freeze(getattr(query, f.name))
+        if f.default is not MISSING:
+            default = f.default
+        elif f.default_factory is not MISSING:
+            default = f.default_factory()
+        else:
+            default = MISSING
+        if value != _freeze(default):
+            parts.append(f"{f.name}={value!r}")
+    return ", ".join(parts) or "<默认条件>"
+
+
+# 回复数/活跃时间回写会改变的列
+ACTIVITY_COLUMNS = frozenset({"reply_count", "last_active_at"})
+# 展示次数回写会改变的列
+IMPRESSION_COLUMNS = frozenset({"display_count"})
+
+
+def volatile_columns(query: ThreadSearchQuery, sort_method: str) -> frozenset[str]:
+    """查询结果依赖的、会被回复数和展示次数回写改变的列"""
+    columns = set()
+    if sort_method in ACTIVITY_COLUMNS | IMPRESSION_COLUMNS:
+        columns.add(sort_method)
+    if (
+        _freeze(query.reply_count_range)
+        != DefaultPreferences.DEFAULT_NUMERIC_RANGE.value
+    ):
+        columns.add("reply_count")
+    if query.active_after or query.active_before:
+        columns.add("last_active_at")
+    return frozenset(columns)
+
+
+def ucb_display_bucket(total_display_count: int) -> float:
+    """
+    总展示次数 N 的分桶。
+    UCB1 分数只通过 log(N) 依赖 N，按 log10(N) 保留两位小数分桶，
+    同一个桶内 N 相差约 2%，对排序的影响可以忽略。
+    """
+    return round(math.log10(max(1, total_display_count)), 2)
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存。
+
+    以规范化后的 ThreadSearchQuery 为键，缓存排好序的完整 Thread.id 列表，
+    同一查询的翻页直接在缓存的列表上切片，不再执行 FTS 和过滤查询。
+
+    每个条目记录它依赖的易变列（见 volatile_columns），回复数和展示次数回写时
+    只丢弃依赖这些列的条目；帖子同步和重建索引会改变任意列，丢弃全部条目。
+    综合排序的条目不随展示次数回写失效，键中的 N 按桶取值，分数的漂移由 TTL 兜底。
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        # 相对时间筛选（如 "7d"）会随时间漂移，用 TTL 兜底
+        self.ttl_seconds = ttl_seconds
+        # {key: (写入时间, 有序的 Thread.id)}，键的第二项是条目依赖的易变列
+        self._entries: OrderedDict[Hashable, tuple[float, array]] = OrderedDict()
+        # 每次数据变化都递增；记录最近一次全部清空和每个易变列变化时的世代
+        self._generation = 0
+        self._cleared_at = 0
+        self._column_changed_at: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self):
+        """数据发生变化，使所有已缓存的结果失效"""
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._entries.clear()
+
+    def invalidate_columns(self, columns: frozenset[str]):
+        """指定的列发生变化，只丢弃依赖这些列的条目"""
+        self._generation += 1
+        for column in columns:
+            self._column_changed_at[column] = self._generation
+        stale = [key for key in self._entries if key[1] & columns]
+        for key in stale:
+            del self._entries[key]
+
+    def make_key(
+        self,
+        query: ThreadSearchQuery,
+        *,
+        sort_method: str,
+        exclude_thread_ids: Optional[Sequence[int]] = None,
+        total_display_count: int,
+        exploration_factor: float,
+        strength_weight: float,
+    ) -> Hashable:
+        """
+        构造缓存键: (规范化查询, 依赖的易变列, 排序参数)。
+        只有综合排序的分数依赖 N/C/W，其他排序方式不把它们计入键中。
+        """
+        ranking = None
+        if sort_method == "comprehensive":
+            ranking = (
+                ucb_display_bucket(total_display_count),
+                exploration_factor,
+                strength_weight,
+            )
+        return (
+            canonical_query_key(query, exclude_thread_ids),
+            volatile_columns(query, sort_method),
+            ranking,
+        )
+
+    def contains(self, key: Hashable) -> bool:
+        """判断键是否有可用的缓存条目，不影响命中统计和 LRU 顺序"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        stored_at, _ = entry
+        return time.monotonic() - stored_at <= self.ttl_seconds
+
+    def get(self, key: Hashable) -> Optional[array]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, thread_ids = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return thread_ids
+
+    def put(self, key: Hashable, thread_ids: Sequence[int], generation: int):
+        """
+        写入缓存。generation 应为开始查询前读取的世代，
+        如果查询期间结果依赖的数据发生了变化，结果不会被缓存。
+        """
+        if self._cleared_at > generation or any(
+            self._column_changed_at.get(column, 0) > generation for column in key[1]
+        ):
+            return
+        self._entries[key] = (time.monotonic(), array("q", thread_ids))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ---------------------------------------------------------------- 事件监听
+
+    async def on_threads_synced(self, thread_ids: Sequence[int]):
+        """监听 'threads_synced' 事件"""
+        self.bump_generation()
+
+    async def on_thread_activity_flushed(self, updates: dict):
+        """监听 'thread_activity_flushed' 事件"""
+        self.invalidate_columns(ACTIVITY_COLUMNS)
+
+    async def on_impressions_flushed(self, increments: dict):
+        """监听 'impressions_flushed' 事件"""
+        self.invalidate_columns(IMPRESSION_COLUMNS)
+
+    async def on_index_updated(self):
+        """监听 'index_updated' 事件"""
+        self.bump_generation()
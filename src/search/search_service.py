@@ -1,30 +1,82 @@
-import asyncio
 import logging
 import re
-from functools import partial
-from typing import Sequence
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
 
-import rjieba
+from sqlalchemy import Select, except_, intersect, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
-from sqlmodel import Float, and_, case, cast, func, select
+from sqlmodel import and_, func, select
 
-from core.tag_cache_service import TagCacheService
+from core.tag_cache_service import TagCacheService, bitmap_to_ids
+from core.thread_index_service import INDEX_SORTABLE_COLUMNS, ThreadIndexService
+from core.ucb_score_service import UcbScoreService, ucb1_score_expression
 from models import Author, Tag, Thread, ThreadTagLink, UserCollection
 from search.qo.thread_search import ThreadSearchQuery
+from search.cursor import decode_cursor, encode_cursor, query_fingerprint
+from search.keyword_tokenizer import build_exclude_match_expr, cut_keywords
+from search.result_cache import SearchResultCache, canonical_query_key
 from shared.database import thread_fts_table
 from shared.enum.collection_type import CollectionType
 from shared.enum.default_preferences import DefaultPreferences
+from shared.exceptions import InvalidSearchCursor
+from shared.metrics import StageTimer
 from shared.range_parser import parse_range_string
 from shared.time_parser import parse_time_string
 
+# FTS 执行模式：
+# auto - SQL 路径先用带 LIMIT 的探测查询估计每个关键词组的命中数：命中数不超过
+#        FTS_SELECTIVE_HIT_LIMIT 的组直接取回 ID，以 IN 列表驱动主查询（规划器按主键查找这些行）；
+#        命中较多的组和排除关键词用 INTERSECT/EXCEPT 子查询折叠进主语句，ID 不往返 Python。
+#        内存索引路径退回集合模式
+# set  - 总是先取回 FTS 命中的 ID 集合，在 Python 中求交集后以 IN 列表回传
+FTS_MODE_AUTO = "auto"
+FTS_MODE_SET = "set"
+
+# 关键词组命中数不超过该值时视为高选择性，探测查询取回的 ID 直接作为候选集
+FTS_SELECTIVE_HIT_LIMIT = 1000
+
+# 标签位图命中的帖子数不超过该值时，直接用 Thread.id IN (...) 过滤
+TAG_BITMAP_ID_FILTER_LIMIT = 20000
+
+
+@dataclass
+class _SearchPlan:
+    """解析后的搜索计划"""
+
+    # 内存索引已经给出完整的有序结果时使用
+    ordered_ids: Optional[Sequence[int]] = None
+    # 否则为未排序的 ID 查询语句和排序表达式
+    statement: Optional[Select] = None
+    sort_expr: Any = None
+    descending: bool = True
+
 
 class SearchService:
     """封装与搜索相关的数据库操作。"""
 
-    def __init__(self, session: AsyncSession, tag_cache_service: TagCacheService):
+    def __init__(
+        self,
+        session: AsyncSession,
+        tag_cache_service: TagCacheService,
+        thread_index: ThreadIndexService | None = None,
+        result_cache: SearchResultCache | None = None,
+        ucb_score_service: UcbScoreService | None = None,
+        fts_mode: str = FTS_MODE_AUTO,
+        timer: StageTimer | None = None,
+    ):
         self.session = session
         self.tag_cache_service = tag_cache_service
+        self.thread_index = thread_index
+        self.result_cache = result_cache
+        self.ucb_score_service = ucb_score_service
+        self.fts_mode = fts_mode
+        self.timer = timer
+
+    def _lap(self, stage: str):
+        """记录一个搜索阶段的耗时"""
+        if self.timer is not None:
+            self.timer.lap(stage)
 
     def _apply_range_filter(self, filters, column, range_str):
         """解析范围字符串并应用为SQLAlchemy过滤器"""
@@ -52,23 +104,9 @@ class SearchService:
         应用 UCB1 算法对帖子进行排序。
         Score = W * (x / n) + C * sqrt(ln(N) / n)
         """
-        W = strength_weight
-        C = exploration_factor
-        N = float(max(1, total_display_count))
-
-        # reaction_count as x
-        # display_count as n
-        x = cast(Thread.reaction_count, Float)
-        n = case(
-            (Thread.display_count > 0, cast(Thread.display_count, Float)),
-            else_=1.0,  # 避免除零，并给新帖子最大探索加成
-        )
-
-        exploitation_term = W * (x / n)
-        # N/n 可能会非常大，取对数避免溢出
-        exploration_term = C * func.sqrt(func.log(N) / n)
-
-        final_score = (exploitation_term + exploration_term).label("final_score")
+        final_score = ucb1_score_expression(
+            total_display_count, exploration_factor, strength_weight
+        ).label("final_score")
 
         return statement, final_score
 
@@ -86,6 +124,272 @@ class SearchService:
         """
         根据搜索条件搜索帖子并分页
         """
+        # 收藏搜索的结果依赖用户的收藏操作，不走缓存
+        cache = None if query.user_id_for_collection_search else self.result_cache
+        ordered_ids = None
+        if cache is not None:
+            cache_key = cache.make_key(
+                query,
+                sort_method=self._effective_sort_method(query),
+                exclude_thread_ids=exclude_thread_ids,
+                total_display_count=total_display_count,
+                exploration_factor=exploration_factor,
+                strength_weight=strength_weight,
+            )
+            ordered_ids = cache.get(cache_key)
+            self._lap("cache")
+
+        if ordered_ids is None:
+            generation = cache.generation if cache is not None else 0
+            ordered_ids = await self._search_ordered_ids(
+                query,
+                total_display_count=total_display_count,
+                exploration_factor=exploration_factor,
+                strength_weight=strength_weight,
+                exclude_thread_ids=exclude_thread_ids,
+            )
+            if cache is not None:
+                cache.put(cache_key, ordered_ids, generation)
+
+        # 只回表查询当前页
+        page_ids = list(ordered_ids[offset : offset + limit])
+        threads = await self.fetch_threads_by_ids(page_ids)
+        return threads, len(ordered_ids)
+
+    async def search_threads_with_cursor(
+        self,
+        query: ThreadSearchQuery,
+        *,
+        limit: int,
+        total_display_count: int,
+        exploration_factor: float,
+        strength_weight: float,
+        cursor: str | None = None,
+        exclude_thread_ids: Sequence[int | str] | None = None,
+    ) -> tuple[Sequence[Thread], int, str | None]:
+        """
+        基于游标的分页搜索。
+
+        可以得到完整的有序结果时（内存索引，或开启了结果缓存），按偏移量翻页，
+        首页的结果写入缓存，之后的翻页直接切片；
+        否则使用键集分页，每页只查询 limit + 1 行，总数只在首页计算一次并随游标传递。
+
+        首页的 exclude_thread_ids 保存在游标中，翻页时不需要再传，传入的值会被忽略。
+
+        Returns:
+            (帖子列表, 总数, 下一页游标)，没有下一页时游标为 None
+        """
+        fingerprint = query_fingerprint(canonical_query_key(query))
+        state = decode_cursor(cursor) if cursor else None
+        if state is not None and state["q"] != fingerprint:
+            raise InvalidSearchCursor("搜索游标与当前查询条件不匹配")
+
+        if state is None:
+            exclude_thread_ids = sorted({int(i) for i in exclude_thread_ids or ()})
+            use_offset = self._pages_by_offset(query)
+        else:
+            exclude_thread_ids = state.get("x", [])
+            use_offset = "o" in state
+
+        if use_offset:
+            offset = state["o"] if state else 0
+            threads, total = await self.search_threads_with_count(
+                query,
+                limit=limit,
+                offset=offset,
+                total_display_count=total_display_count,
+                exploration_factor=exploration_factor,
+                strength_weight=strength_weight,
+                exclude_thread_ids=exclude_thread_ids,
+            )
+            next_cursor = None
+            if offset + limit < total:
+                next_cursor = encode_cursor(
+                    {
+                        "q": fingerprint,
+                        "t": total,
+                        "o": offset + limit,
+                        "x": exclude_thread_ids,
+                    }
+                )
+            return threads, total, next_cursor
+
+        # --- 键集分页 ---
+        # 综合排序沿用首页的总展示次数，保证翻页期间分数的计算方式一致
+        n = state["n"] if state else total_display_count
+        plan = await self._build_search_plan(
+            query,
+            total_display_count=n,
+            exploration_factor=exploration_factor,
+            strength_weight=strength_weight,
+            exclude_thread_ids=exclude_thread_ids,
+            allow_index=False,
+        )
+        if plan is None or plan.statement is None:
+            return [], 0, None
+
+        if state is None:
+            count_result = await self.session.execute(
+                select(func.count()).select_from(plan.statement.subquery())
+            )
+            total = count_result.scalar_one()
+            self._lap("count")
+        else:
+            total = state["t"]
+
+        page_stmt = plan.statement
+        if state is not None:
+            page_stmt = page_stmt.where(
+                self._keyset_condition(plan, state["k"], state["i"])
+            )
+        page_stmt = (
+            page_stmt.add_columns(plan.sort_expr)
+            .order_by(*self._order_by(plan))
+            .limit(limit + 1)
+        )
+        rows = (await self.session.execute(page_stmt)).all()
+        self._lap("id_query")
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_id, last_key = rows[-1]
+            next_cursor = encode_cursor(
+                {
+                    "q": fingerprint,
+                    "t": total,
+                    "n": n,
+                    "k": last_key,
+                    "i": last_id,
+                    "x": exclude_thread_ids,
+                }
+            )
+
+        threads = await self.fetch_threads_by_ids([row[0] for row in rows])
+        return threads, total, next_cursor
+
+    def _pages_by_offset(self, query: ThreadSearchQuery) -> bool:
+        """
+        判断游标分页是否按偏移量进行：内存索引可以直接给出完整的有序结果；
+        开启结果缓存时首页计算一次完整结果并写入缓存，之后的翻页从缓存中切片。
+        """
+        if query.user_id_for_collection_search:
+            return False
+        if (
+            self.thread_index is not None
+            and self.thread_index.is_ready
+            and self._effective_sort_method(query) in INDEX_SORTABLE_COLUMNS
+        ):
+            return True
+        return self.result_cache is not None
+
+    @staticmethod
+    def _fts_match_select(match_expr: str) -> Select:
+        return select(thread_fts_table.c.rowid).where(
+            thread_fts_table.c.thread_fts.op("MATCH")(match_expr)
+        )
+
+    @staticmethod
+    def _is_exact_keyword(keyword: str) -> bool:
+        """用双引号包裹的关键词按短语精确匹配，不分词"""
+        return keyword.startswith('"') and keyword.endswith('"') and len(keyword) > 2
+
+    @staticmethod
+    def _effective_sort_method(query: ThreadSearchQuery) -> str:
+        """获取实际生效的排序方式"""
+        # 如果是自定义搜索，则使用其基础排序算法，否则使用主排序算法
+        effective_sort_method = (
+            query.custom_base_sort
+            if query.sort_method == "custom"
+            else query.sort_method
+        )
+
+        # 如果按收藏时间排序，但不是收藏搜索，则退回综合排序
+        if (
+            effective_sort_method == "collected_at"
+            and not query.user_id_for_collection_search
+        ):
+            effective_sort_method = "comprehensive"
+        return effective_sort_method
+
+    @staticmethod
+    def _order_by(plan: "_SearchPlan"):
+        """以 Thread.id 作为次级排序，保证翻页和缓存时顺序稳定"""
+        if plan.descending:
+            return plan.sort_expr.desc(), Thread.id.desc()  # type: ignore
+        return plan.sort_expr.asc(), Thread.id.asc()  # type: ignore
+
+    @staticmethod
+    def _keyset_condition(plan: "_SearchPlan", last_key, last_id: int):
+        """
+        构造“位于上一页最后一行之后”的键集条件。
+        SQLite 中 NULL 小于任何值：降序时排在最后，升序时排在最前。
+        """
+        sort_expr = plan.sort_expr
+        if plan.descending:
+            if last_key is None:
+                return and_(sort_expr.is_(None), Thread.id < last_id)
+            return or_(
+                sort_expr < last_key,
+                and_(sort_expr == last_key, Thread.id < last_id),
+                sort_expr.is_(None),
+            )
+        if last_key is None:
+            return or_(
+                sort_expr.is_not(None),
+                and_(sort_expr.is_(None), Thread.id > last_id),
+            )
+        return or_(
+            sort_expr > last_key,
+            and_(sort_expr == last_key, Thread.id > last_id),
+        )
+
+    async def _search_ordered_ids(
+        self,
+        query: ThreadSearchQuery,
+        *,
+        total_display_count: int,
+        exploration_factor: float,
+        strength_weight: float,
+        exclude_thread_ids: Sequence[int | str] | None = None,
+    ) -> Sequence[int]:
+        """
+        执行过滤和排序，返回全部匹配帖子的 Thread.id，顺序即为最终展示顺序
+        """
+        plan = await self._build_search_plan(
+            query,
+            total_display_count=total_display_count,
+            exploration_factor=exploration_factor,
+            strength_weight=strength_weight,
+            exclude_thread_ids=exclude_thread_ids,
+        )
+        if plan is None:
+            return []
+        if plan.ordered_ids is not None:
+            return plan.ordered_ids
+
+        # --- 步骤 5: 按最终排序执行一次 ID 查询（FTS MATCH 只跑一次）---
+        id_result = await self.session.execute(
+            plan.statement.order_by(*self._order_by(plan))
+        )
+        ordered_ids = id_result.scalars().all()
+        self._lap("id_query")
+        return ordered_ids
+
+    async def _build_search_plan(
+        self,
+        query: ThreadSearchQuery,
+        *,
+        total_display_count: int,
+        exploration_factor: float,
+        strength_weight: float,
+        exclude_thread_ids: Sequence[int | str] | None = None,
+        allow_index: bool = True,
+    ) -> "_SearchPlan | None":
+        """
+        解析搜索条件，返回未排序的 ID 查询语句及其排序表达式；
+        走内存索引时直接返回排好序的 ID 列表。确定没有结果时返回 None。
+        """
         try:
             # 解析时间字符串
             try:
@@ -119,8 +423,8 @@ class SearchService:
                 filters.append(Thread.guild_id == query.guild_id)
             if query.channel_ids:
                 filters.append(Thread.channel_id.in_(query.channel_ids))  # type: ignore
+            normalized_ids = []
             if exclude_thread_ids:
-                normalized_ids = []
                 for tid in exclude_thread_ids:
                     try:
                         normalized_ids.append(int(tid))
@@ -133,6 +437,7 @@ class SearchService:
                 set(query.include_authors) if query.include_authors else set()
             )
 
+            self._lap("filters")
             if query.author_name:
                 normalized_author_name = query.author_name.strip()
                 if normalized_author_name:
@@ -151,6 +456,7 @@ class SearchService:
                         final_include_author_ids.intersection_update(matched_author_ids)
                     else:
                         final_include_author_ids = matched_author_ids
+                    self._lap("authors")
 
             # 应用作者过滤器
             if final_include_author_ids:
@@ -191,130 +497,237 @@ class SearchService:
                 filters.append(and_(*conditions))
 
             # -- 标签过滤 --
+            # 每组之间为 AND，组内为 OR，内存索引也使用同样的分组
+            include_tag_groups: list[list[int]] = []
             if resolved_include_tag_ids:
                 if query.tag_logic == "and":
-                    # TODO : 考虑精简
                     for tag_name in query.include_tags:
                         ids_for_name = self.tag_cache_service.get_ids_by_name(tag_name)
                         if ids_for_name:
-                            filters.append(Thread.tags.any(Tag.id.in_(ids_for_name)))  # type: ignore
+                            include_tag_groups.append(list(ids_for_name))
                 else:
-                    filters.append(
-                        Thread.tags.any(Tag.id.in_(resolved_include_tag_ids))  # type: ignore
-                    )  # type: ignore
-            if resolved_exclude_tag_ids:
-                filters.append(
-                    ~Thread.tags.any(Tag.id.in_(resolved_exclude_tag_ids))  # type: ignore
+                    include_tag_groups.append(resolved_include_tag_ids)
+
+            # 优先在标签倒排位图上做集合运算，结果集过大时退回 EXISTS 子查询
+            tag_filter_applied = False
+            if self.tag_cache_service.postings_ready and (
+                include_tag_groups or resolved_exclude_tag_ids
+            ):
+                include_bitmap, exclude_bitmap = (
+                    self.tag_cache_service.resolve_tag_filter(
+                        include_tag_groups, resolved_exclude_tag_ids
+                    )
                 )
+                if include_bitmap is not None:
+                    if not include_bitmap:
+                        return None
+                    if include_bitmap.bit_count() <= TAG_BITMAP_ID_FILTER_LIMIT:
+                        filters.append(
+                            Thread.id.in_(bitmap_to_ids(include_bitmap))  # type: ignore
+                        )
+                        tag_filter_applied = True
+                elif exclude_bitmap.bit_count() <= TAG_BITMAP_ID_FILTER_LIMIT:
+                    filters.append(
+                        Thread.id.not_in(bitmap_to_ids(exclude_bitmap))  # type: ignore
+                    )
+                    tag_filter_applied = True
 
-            # --- 步骤 2: 独立执行 FTS 查询，拿到匹配/排除的 ID 集合 ---
-            loop = asyncio.get_running_loop()
+            if not tag_filter_applied:
+                for tag_ids in include_tag_groups:
+                    filters.append(Thread.tags.any(Tag.id.in_(tag_ids)))  # type: ignore
+                if resolved_exclude_tag_ids:
+                    filters.append(
+                        ~Thread.tags.any(Tag.id.in_(resolved_exclude_tag_ids))  # type: ignore
+                    )
 
-            # 2a. 反选关键词 → 获取要排除的 thread ID
-            fts_exclude_ids: set[int] = set()
+            self._lap("tags")
+
+            # --- 步骤 2: FTS 查询 ---
+            exclude_keywords_list: list[str] = []
             if query.exclude_keywords:
-                exemption_markers = (
-                    query.exclude_keyword_exemption_markers
-                    if query.exclude_keyword_exemption_markers is not None
-                    else ["禁", "🈲"]
-                )
                 exclude_keywords_list = [
                     kw.strip()
                     for kw in re.split(r"[,，/\s]+", query.exclude_keywords)
                     if kw.strip()
                 ]
 
-                all_exclude_parts = []
-                for keyword in exclude_keywords_list:
-                    raw_tokens = await loop.run_in_executor(
-                        None, partial(rjieba.cut, keyword)
-                    )
-                    tokens = [tok.strip() for tok in raw_tokens if tok.strip()]
-                    if not tokens:
-                        continue
-
-                    match_parts = [f'"{tok}"' for tok in tokens[:-1]]
-                    match_parts.append(f'"{tokens[-1]}"*')
-                    match_expr = " AND ".join(match_parts)
-
-                    if exemption_markers:
-                        first_token = tokens[0]
-                        exemption_clauses = [
-                            f'NEAR("{first_token}" "{marker}", 4)'
-                            for marker in exemption_markers
-                        ]
-                        exemption_match_str = f"({' OR '.join(exemption_clauses)})"
-                        all_exclude_parts.append(
-                            f"({match_expr}) NOT {exemption_match_str}"
-                        )
-                    else:
-                        all_exclude_parts.append(f"({match_expr})")
-
-                if all_exclude_parts:
-                    final_exclude_expr = " OR ".join(all_exclude_parts)
-                    exc_result = await self.session.execute(
-                        select(thread_fts_table.c.rowid).where(
-                            thread_fts_table.c.thread_fts.op("MATCH")(
-                                final_exclude_expr
-                            )
-                        )
-                    )
-                    fts_exclude_ids = set(exc_result.scalars().all())
-
-            # 2b. 正选关键词 → 获取匹配的 thread ID（多组取交集）
-            fts_include_ids: set[int] | None = None
+            and_groups: list[list[str]] = []
             if query.keywords:
                 keywords_str = query.keywords.replace("，", ",").replace("／", "/")
                 and_groups = [
-                    group.strip()
+                    [kw.strip() for kw in group.split("/") if kw.strip()]
                     for group in keywords_str.split(",")
                     if group.strip()
                 ]
-                for group in and_groups:
-                    or_keywords = []
-                    for kw in group.split("/"):
-                        kw = kw.strip()
-                        if not kw:
-                            continue
-                        if kw.startswith('"') and kw.endswith('"') and len(kw) > 2:
-                            exact_kw = kw[1:-1].strip()
-                            if exact_kw:
-                                or_keywords.append(f'"{exact_kw}"')
-                        else:
-                            raw_tokens = await loop.run_in_executor(
-                                None, partial(rjieba.cut, kw)
-                            )
-                            tokens = [t.strip() for t in raw_tokens if t.strip()]
-                            if tokens:
-                                expr = " ".join(f"{t}*" for t in tokens)
-                                or_keywords.append(
-                                    f"({expr})" if len(tokens) > 1 else expr
-                                )
-
-                    if or_keywords:
-                        match_str = " OR ".join(or_keywords)
-                        grp_result = await self.session.execute(
-                            select(thread_fts_table.c.rowid).where(
-                                thread_fts_table.c.thread_fts.op("MATCH")(match_str)
+
+            # 本次查询所有需要分词的关键词一次性分词（带缓存）
+            token_map = await cut_keywords(
+                exclude_keywords_list
+                + [
+                    kw
+                    for group in and_groups
+                    for kw in group
+                    if not self._is_exact_keyword(kw)
+                ]
+            )
+
+            # 2a. 反选关键词 → 构造排除表达式
+            final_exclude_expr = ""
+            if exclude_keywords_list:
+                exemption_markers = (
+                    query.exclude_keyword_exemption_markers
+                    if query.exclude_keyword_exemption_markers is not None
+                    else ["禁", "🈲"]
+                )
+                final_exclude_expr = build_exclude_match_expr(
+                    tuple(token_map[kw] for kw in exclude_keywords_list),
+                    tuple(exemption_markers),
+                )
+
+            # 2b. 正选关键词 → 每个 AND 组一个 MATCH 表达式
+            group_match_strs: list[str] = []
+            for group in and_groups:
+                or_keywords = []
+                for kw in group:
+                    if self._is_exact_keyword(kw):
+                        exact_kw = kw[1:-1].strip()
+                        if exact_kw:
+                            or_keywords.append(f'"{exact_kw}"')
+                    else:
+                        tokens = token_map[kw]
+                        if tokens:
+                            expr = " ".join(f"{t}*" for t in tokens)
+                            or_keywords.append(f"({expr})" if len(tokens) > 1 else expr)
+
+                if or_keywords:
+                    group_match_strs.append(" OR ".join(or_keywords))
+
+            effective_sort_method = self._effective_sort_method(query)
+            use_index = (
+                allow_index
+                and self.thread_index is not None
+                and self.thread_index.is_ready
+                and not query.user_id_for_collection_search
+                and effective_sort_method in INDEX_SORTABLE_COLUMNS
+            )
+
+            fts_include_ids: set[int] | None = None
+            fts_exclude_ids: set[int] = set()
+            if self.fts_mode == FTS_MODE_AUTO and not use_index:
+                # 2c. 内联模式：先探测各组的命中数。
+                # 高选择性的组用取回的 ID 驱动主查询，其余的组折叠为子查询
+                selective_ids: list[int] | None = None
+                broad_match_strs: list[str] = []
+                for match_str in group_match_strs:
+                    if selective_ids is None:
+                        probe = await self.session.execute(
+                            self._fts_match_select(match_str).limit(
+                                FTS_SELECTIVE_HIT_LIMIT + 1
                             )
                         )
-                        group_ids = set(grp_result.scalars().all())
-                        if fts_include_ids is None:
-                            fts_include_ids = group_ids
-                        else:
-                            fts_include_ids &= group_ids
-
-                if fts_include_ids is not None and not fts_include_ids:
-                    return [], 0
-
-            # 2c. 合并 FTS 结果到过滤器（纯 ID 集合，不再 JOIN thread_fts）
-            if fts_include_ids is not None:
-                final_fts_ids = fts_include_ids - fts_exclude_ids
-                if not final_fts_ids:
-                    return [], 0
-                filters.append(Thread.id.in_(final_fts_ids))  # type: ignore
-            elif fts_exclude_ids:
-                filters.append(Thread.id.not_in(fts_exclude_ids))  # type: ignore
+                        probe_ids = probe.scalars().all()
+                        if not probe_ids:
+                            return None
+                        if len(probe_ids) <= FTS_SELECTIVE_HIT_LIMIT:
+                            selective_ids = list(probe_ids)
+                            continue
+                    broad_match_strs.append(match_str)
+                if selective_ids is not None:
+                    filters.append(Thread.id.in_(selective_ids))  # type: ignore
+
+                include_stmt = None
+                if broad_match_strs:
+                    group_stmts = [self._fts_match_select(m) for m in broad_match_strs]
+                    include_stmt = (
+                        intersect(*group_stmts)
+                        if len(group_stmts) > 1
+                        else group_stmts[0]
+                    )
+                if include_stmt is not None:
+                    if final_exclude_expr:
+                        include_stmt = except_(
+                            include_stmt, self._fts_match_select(final_exclude_expr)
+                        )
+                    filters.append(Thread.id.in_(include_stmt))  # type: ignore
+                elif final_exclude_expr:
+                    filters.append(
+                        Thread.id.not_in(  # type: ignore
+                            self._fts_match_select(final_exclude_expr)
+                        )
+                    )
+            else:
+                # 2c. 集合模式：独立执行 FTS 查询，拿到匹配/排除的 ID 集合。
+                # 内存索引路径需要 Python 侧的 ID 集合
+                if final_exclude_expr:
+                    exc_result = await self.session.execute(
+                        self._fts_match_select(final_exclude_expr)
+                    )
+                    fts_exclude_ids = set(exc_result.scalars().all())
+
+                for match_str in group_match_strs:
+                    grp_result = await self.session.execute(
+                        self._fts_match_select(match_str)
+                    )
+                    group_ids = set(grp_result.scalars().all())
+                    if fts_include_ids is None:
+                        fts_include_ids = group_ids
+                    else:
+                        fts_include_ids &= group_ids
+                    if not fts_include_ids:
+                        return None
+
+                # 合并 FTS 结果到过滤器（纯 ID 集合，不再 JOIN thread_fts）
+                if fts_include_ids is not None:
+                    final_fts_ids = fts_include_ids - fts_exclude_ids
+                    if not final_fts_ids:
+                        return None
+                    filters.append(Thread.id.in_(final_fts_ids))  # type: ignore
+                elif fts_exclude_ids:
+                    filters.append(Thread.id.not_in(fts_exclude_ids))  # type: ignore
+
+            self._lap("fts")
+
+            # --- 内存索引路径：过滤和排序都在快照上完成，只回表查询当前页 ---
+            if use_index:
+                default_range = DefaultPreferences.DEFAULT_NUMERIC_RANGE.value
+                ordered_ids = self.thread_index.search(
+                    guild_id=query.guild_id,
+                    channel_ids=query.channel_ids,
+                    include_author_ids=final_include_author_ids,
+                    exclude_author_ids=query.exclude_authors,
+                    exclude_thread_ids=normalized_ids,
+                    reaction_count_range=(
+                        query.reaction_count_range
+                        if query.reaction_count_range != default_range
+                        else None
+                    ),
+                    reply_count_range=(
+                        query.reply_count_range
+                        if query.reply_count_range != default_range
+                        else None
+                    ),
+                    created_after=created_after_dt,
+                    created_before=created_before_dt,
+                    active_after=active_after_dt,
+                    active_before=active_before_dt,
+                    include_tag_groups=include_tag_groups,
+                    exclude_tag_ids=resolved_exclude_tag_ids,
+                    candidate_row_ids=(
+                        fts_include_ids - fts_exclude_ids
+                        if fts_include_ids is not None
+                        else None
+                    ),
+                    excluded_row_ids=(
+                        fts_exclude_ids if fts_include_ids is None else None
+                    ),
+                    sort_method=effective_sort_method,
+                    sort_desc=query.sort_order == "desc",
+                    total_display_count=total_display_count,
+                    exploration_factor=exploration_factor,
+                    strength_weight=strength_weight,
+                )
+                self._lap("index")
+                return _SearchPlan(ordered_ids=ordered_ids)
 
             # --- 步骤 3: 组合其他过滤器（不再 JOIN thread_fts）---
             base_stmt = select(Thread.id).distinct()
@@ -337,69 +750,28 @@ class SearchService:
             if filters:
                 base_stmt = base_stmt.where(and_(*filters))
 
-            # --- 步骤 4: 一次性执行 ID 查询（FTS MATCH 只跑一次）---
-            id_result = await self.session.execute(base_stmt)
-            matched_ids = list(id_result.scalars().all())
-            total_count = len(matched_ids)
-
-            if total_count == 0:
-                return [], 0
-
-            # --- 步骤 5: 用具体 ID 列表获取分页数据（无嵌套子查询）---
-            final_select_stmt = (
-                select(Thread)
-                .where(Thread.id.in_(matched_ids))  # type: ignore
-                .options(
-                    selectinload(Thread.tags),  # type: ignore
-                    joinedload(Thread.author),  # type: ignore
-                )
-            )
-
-            order_by = None
-
-            # 如果是自定义搜索，则使用其基础排序算法，否则使用主排序算法
-            effective_sort_method = (
-                query.custom_base_sort
-                if query.sort_method == "custom"
-                else query.sort_method
-            )
-
-            # 如果按收藏时间排序，但不是收藏搜索，则退回综合排序
+            # --- 步骤 4: 确定排序表达式 ---
             if (
-                effective_sort_method == "collected_at"
-                and not query.user_id_for_collection_search
+                effective_sort_method == "comprehensive"
+                and self.ucb_score_service is not None
+                and self.ucb_score_service.ready
             ):
-                effective_sort_method = "comprehensive"
-
-            if effective_sort_method == "comprehensive":
-                final_select_stmt, final_score_expr = self._apply_ucb1_ranking(
-                    final_select_stmt,
+                # 物化的分数列带索引，首页可以直接沿索引扫描
+                sort_col = Thread.ucb_score
+            elif effective_sort_method == "comprehensive":
+                base_stmt, final_score_expr = self._apply_ucb1_ranking(
+                    base_stmt,
                     total_display_count,
                     exploration_factor,
                     strength_weight,
                 )
-                order_by = (
-                    final_score_expr.desc()
-                    if query.sort_order == "desc"
-                    else final_score_expr.asc()
-                )
+                sort_col = final_score_expr.element
             elif (
                 effective_sort_method == "collected_at"
                 and query.user_id_for_collection_search
             ):
-                # 按收藏时间排序
-                final_select_stmt = final_select_stmt.join(
-                    UserCollection,
-                    and_(
-                        Thread.thread_id == UserCollection.target_id,
-                        UserCollection.target_type == CollectionType.THREAD,
-                        UserCollection.user_id == query.user_id_for_collection_search,
-                    ),
-                )
+                # 按收藏时间排序，收藏表已在步骤 3 中按用户 JOIN
                 sort_col = getattr(UserCollection, "created_at")
-                order_by = (
-                    sort_col.desc() if query.sort_order == "desc" else sort_col.asc()
-                )
             else:
                 sort_col_name = (
                     effective_sort_method
@@ -407,21 +779,12 @@ class SearchService:
                     else "last_active_at"
                 )
                 sort_col = getattr(Thread, sort_col_name)
-                order_by = (
-                    sort_col.desc() if query.sort_order == "desc" else sort_col.asc()
-                )
-
-            if order_by is not None:
-                final_select_stmt = final_select_stmt.order_by(order_by)
-
-            if offset:
-                final_select_stmt = final_select_stmt.offset(offset)
-            final_select_stmt = final_select_stmt.limit(limit)
 
-            result = await self.session.execute(final_select_stmt)
-            threads = result.scalars().all()
-
-            return threads, total_count
+            return _SearchPlan(
+                statement=base_stmt,
+                sort_expr=sort_col,
+                descending=query.sort_order == "desc",
+            )
 
         except Exception:
             logging.error(
@@ -429,6 +792,22 @@ class SearchService:
             )
             raise
 
+    async def fetch_threads_by_ids(self, thread_row_ids: Sequence[int]) -> list[Thread]:
+        """按给定的 Thread.id 顺序获取帖子，并预加载标签和作者"""
+        if not thread_row_ids:
+            return []
+        result = await self.session.execute(
+            select(Thread)
+            .where(Thread.id.in_(thread_row_ids))  # type: ignore
+            .options(
+                selectinload(Thread.tags),  # type: ignore
+                joinedload(Thread.author),  # type: ignore
+            )
+        )
+        threads_by_id = {thread.id: thread for thread in result.unique().scalars()}
+        self._lap("page_fetch")
+        return [threads_by_id[i] for i in thread_row_ids if i in threads_by_id]
+
     async def get_tags_for_author(self, author_id: int) -> Sequence[Tag]:
         """获取指定作者发布过的所有帖子的唯一标签列表"""
         statement = (
@@ -34,7 +34,7 @@ class CollectionSearchStrategy(SearchStrategy):
     async def get_available_tags(
         self, cog: "Search", state: "SearchStateDTO"
     ) -> List[str]:
-        async with cog.session_factory() as session:
+        async with cog.read_session_factory() as session:
             service = SearchService(session, cog.tag_service)
             tags = await service.get_tags_for_collections(self.user_id)
         # 使用 set 去除重复的标签名，然后排序
@@ -57,6 +57,8 @@ class GenericSearchView(discord.ui.View):
         # --- UI状态 ---
         self.tags_per_page = 25
         self.last_search_results: dict | None = None
+        # 页码 -> 该页的搜索游标，顺序翻页时使用键集分页
+        self.page_cursors: dict[int, str] = {}
         self.custom_settings_message: Optional[discord.WebhookMessage] = None
 
     async def start(self, send_new_ephemeral: bool = False):
@@ -200,7 +202,11 @@ class GenericSearchView(discord.ui.View):
             page=state.page,
             per_page=state.results_per_page,  # 传递每页数量
             preview_mode=state.preview_image_mode,  # 传递预览模式
+            cursor=self.page_cursors.get(state.page),
         )
+        next_cursor = results.get("next_cursor")
+        if next_cursor:
+            self.page_cursors[state.page + 1] = next_cursor
         return results
 
     async def update_view_from_pager(
@@ -211,6 +217,8 @@ class GenericSearchView(discord.ui.View):
         preview_mode: str,
     ):
         """由分页视图 (SearchResultsView) 调用的回调"""
+        if per_page != self.search_state.results_per_page:
+            self.page_cursors.clear()
         self.search_state.page = page
         self.search_state.results_per_page = per_page
         self.search_state.preview_image_mode = preview_mode
@@ -220,6 +228,7 @@ class GenericSearchView(discord.ui.View):
         """当任何筛选条件改变时调用此方法，设置最后交互，重置页码并重新搜索"""
         self.last_interaction = interaction
         self.search_state.page = 1
+        self.page_cursors.clear()
         await self.update_view(interaction, rerun_search=True)
 
     async def on_sort_order_change(self, interaction: discord.Interaction):
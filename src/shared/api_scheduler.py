@@ -1,134 +1,519 @@
 import asyncio
+import contextvars
+import heapq
 import logging
+import math
+import time
+from dataclasses import dataclass, field
 from itertools import count
-from typing import Any, Callable, Coroutine, NamedTuple
+from typing import Any, Callable, Coroutine, Hashable, Mapping, NamedTuple, Optional
 
+import aiohttp
+import discord
 from aiohttp.client_exceptions import ClientConnectorError
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
 
+# 优先级数值小于等于该值的请求视为用户交互，可以使用预留的并发容量
+INTERACTIVE_PRIORITY = 2
+
 
 class APIRequest(NamedTuple):
     """
     定义一个API请求的结构...
     - coro_factory: 一个返回需要被执行的协程对象的可调用对象。
+    - attempt: 已经尝试的次数
+    - not_before: 重试前需要等待到的时间点 (time.monotonic)
+    - key: 去重键，相同键的请求共享同一个 future
+    - nested: 在另一个调度器请求内部提交的请求，不占用并发槽位
     """
 
     priority: int
     count: int
     coro_factory: Callable[[], Coroutine[Any, Any, Any]]  # 将 coro 改为 coro_factory
     future: asyncio.Future
+    attempt: int = 0
+    not_before: float = 0.0
+    key: Optional[Hashable] = None
+    nested: bool = False
+
+
+@dataclass
+class RateLimitInfo:
+    """从一次 Discord API 响应中解析出的速率限制信息"""
+
+    status: int
+    bucket: Optional[str] = None
+    remaining: Optional[int] = None
+    reset_after: Optional[float] = None
+    retry_after: Optional[float] = None
+    is_global: bool = False
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str], status: int) -> RateLimitInfo:
+    """解析 X-RateLimit-* 与 Retry-After 响应头"""
+    remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+    retry_after = None
+    if status == 429:
+        retry_after = _parse_float(headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = _parse_float(headers.get("X-RateLimit-Reset-After"))
+    return RateLimitInfo(
+        status=status,
+        bucket=headers.get("X-RateLimit-Bucket"),
+        remaining=int(remaining) if remaining is not None else None,
+        reset_after=_parse_float(headers.get("X-RateLimit-Reset-After")),
+        retry_after=retry_after,
+        is_global=headers.get("X-RateLimit-Global", "").lower() == "true"
+        or headers.get("X-RateLimit-Scope") == "global",
+    )
+
+
+@dataclass
+class _AttemptState:
+    """一次请求执行期间观察到的速率限制信息，由 HTTP 追踪回调写入"""
+
+    buckets: set[str] = field(default_factory=set)
+    rate_limited: Optional[RateLimitInfo] = None
+
+
+# 当前正在执行的调度器请求。discord.py 在调用方任务中发起 HTTP 请求，
+# 追踪回调因此可以把响应头归属到对应的调度器请求
+_current_attempt: contextvars.ContextVar[Optional[_AttemptState]] = (
+    contextvars.ContextVar("api_scheduler_attempt", default=None)
+)
+
+
+class RateLimitTracker:
+    """
+    记录 Discord 速率限制桶的状态。
+
+    discord.py 的请求通过 aiohttp 追踪回调上报响应头，
+    其他 HTTP 客户端（如 httpx）可以调用 observe() 上报。
+    """
+
+    def __init__(self):
+        # 桶 -> (剩余次数, 重置时间点 time.monotonic)
+        self.buckets: dict[str, tuple[Optional[int], float]] = {}
+        self.global_until = 0.0
+        self.rate_limited_count = 0
+
+    def observe(self, headers: Mapping[str, str], status: int) -> RateLimitInfo:
+        info = parse_rate_limit_headers(headers, status)
+        now = time.monotonic()
+
+        if info.bucket is not None and info.reset_after is not None:
+            self.buckets[info.bucket] = (info.remaining, now + info.reset_after)
+        if status == 429:
+            self.rate_limited_count += 1
+            if info.is_global and info.retry_after is not None:
+                self.global_until = max(self.global_until, now + info.retry_after)
+
+        attempt = _current_attempt.get()
+        if attempt is not None:
+            if info.bucket is not None:
+                attempt.buckets.add(info.bucket)
+            if status == 429:
+                attempt.rate_limited = info
+        return info
+
+    def bucket_reset_at(self, bucket: str) -> float:
+        """桶已耗尽时返回其重置时间点，否则返回 0"""
+        state = self.buckets.get(bucket)
+        if state is None:
+            return 0.0
+        remaining, reset_at = state
+        if remaining == 0 and reset_at > time.monotonic():
+            return reset_at
+        return 0.0
+
+    def global_wait(self) -> float:
+        return max(0.0, self.global_until - time.monotonic())
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """创建传给 discord.py (http_trace) 的 aiohttp 追踪配置"""
+
+        async def on_request_end(
+            session, context, params: aiohttp.TraceRequestEndParams
+        ):
+            self.observe(params.response.headers, params.response.status)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    if isinstance(error, discord.RateLimited):
+        return True
+    return isinstance(error, discord.HTTPException) and error.status == 429
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    自适应并发限制 (AIMD)。
+
+    - 连续成功 limit 次后并发上限加一，直到配置的最大值
+    - 遇到 429 时并发上限减半，短时间内的多次 429 只减一次
+    - 按比例为用户交互请求预留容量，后台请求不能占满全部并发
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 2,
+        reserved_ratio: float = 0.2,
+        decrease_cooldown: float = 1.0,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.reserved_ratio = reserved_ratio
+        self.decrease_cooldown = decrease_cooldown
+        self.limit = max_limit
+        self.in_flight = 0
+        self._successes = 0
+        self._last_decrease = -math.inf
+
+    @property
+    def reserved(self) -> int:
+        """为用户交互请求预留的并发数"""
+        if self.limit <= 1 or self.reserved_ratio <= 0:
+            return 0
+        return min(self.limit - 1, max(1, math.ceil(self.limit * self.reserved_ratio)))
+
+    def capacity(self, priority: int) -> int:
+        if priority <= INTERACTIVE_PRIORITY:
+            return self.limit
+        return self.limit - self.reserved
+
+    def can_start(self, priority: int) -> bool:
+        return self.in_flight < self.capacity(priority)
+
+    def acquire(self):
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+
+    def on_rate_limited(self):
+        self._successes = 0
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        old_limit = self.limit
+        self.limit = max(self.min_limit, self.limit // 2)
+        if self.limit != old_limit:
+            logger.warning(f"遇到速率限制，API 并发上限 {old_limit} -> {self.limit}")
+
+    def resize(self, max_limit: int):
+        """
+        修改最大并发数。只调整上限，正在执行的请求照常释放计数，
+        不会像替换信号量那样丢失已发放的许可。
+        """
+        delta = max_limit - self.max_limit
+        self.max_limit = max_limit
+        self.min_limit = min(self.min_limit, max_limit)
+        self.limit = max(self.min_limit, min(max_limit, self.limit + delta))
 
 
 class APIScheduler:
     """
     一个带优先级的中央API请求调度器。
     它确保高优先级任务（如用户UI交互）能抢占低优先级任务（如后台索引），
-    并使用Semaphore来使总并发数不超过Discord的速率限制。
+    并根据 Discord 返回的速率限制动态调整总并发数。
+
+    - 429 响应使并发上限减半，持续成功后逐步恢复
+    - 全局速率限制期间暂停派发；被限流的请求释放并发槽位，等待其桶重置后重新排队
+    - 后台请求不能占用为用户交互预留的容量
+    - 在请求内部再次提交的请求（如 sync_thread 中的 fetch_channel）直接执行，
+      不占用并发槽位，否则外层请求占满槽位后会等待永远无法开始的内层请求
     """
 
-    def __init__(self, concurrent_requests: int = 10):
+    def __init__(
+        self,
+        concurrent_requests: int = 10,
+        *,
+        reserved_ratio: float = 0.2,
+        max_retries: int = 3,
+    ):
         """
         初始化调度器。
         :param concurrent_requests: 允许同时发往Discord API的最大并发请求数。
+        :param reserved_ratio: 为用户交互请求预留的并发比例。
+        :param max_retries: 超时、连接错误或被限流时的最大尝试次数。
         """
-        self._queue = asyncio.PriorityQueue[APIRequest]()
-        self._semaphore = asyncio.Semaphore(concurrent_requests)
+        self._heap: list[APIRequest] = []
+        # 去重键 -> 该键最新的请求；排队中的键另外记录在 _queued_keys 中
+        self._keyed: dict[Hashable, APIRequest] = {}
+        self._queued_keys: set[Hashable] = set()
+        self._limiter = AdaptiveConcurrencyLimiter(
+            concurrent_requests, reserved_ratio=reserved_ratio
+        )
+        self.rate_limits = RateLimitTracker()
+        self.max_retries = max_retries
+        self._wakeup = asyncio.Event()
         self._task: asyncio.Task | None = None
+        self._workers: set[asyncio.Task] = set()
         self._is_running = False
         self._counter = count()
 
-    async def _dispatcher_loop(self):
-        """调度器的主循环，从队列中拉取请求并派发给worker。"""
-        logger.debug("API scheduler loop started.")
-        while self._is_running:
-            await self._semaphore.acquire()
-            try:
-                # 从优先级队列中获取下一个最高优先级的请求
-                request = await self._queue.get()
+    @property
+    def concurrency(self) -> int:
+        """当前的并发上限"""
+        return self._limiter.limit
 
-                # 检查是否是哨兵对象 (None)
-                if request is None:
-                    self._semaphore.release()  # 释放为哨兵对象获取的信号量
-                    self._queue.task_done()
-                    break
+    @property
+    def in_flight(self) -> int:
+        return self._limiter.in_flight
+
+    def _dispatch_ready(self) -> Optional[float]:
+        """
+        派发当前可以执行的请求。
+        返回下一次因时间推移可能有请求变为可执行的等待秒数，没有则返回 None。
+        """
+        global_wait = self.rate_limits.global_wait()
+        if global_wait > 0:
+            return global_wait
 
-                # 为请求创建一个worker任务
-                asyncio.create_task(self._worker(request))
+        now = time.monotonic()
+        deferred: list[APIRequest] = []
+        next_wakeup: Optional[float] = None
+        while self._heap:
+            request = self._heap[0]
+            if self._is_stale(request):
+                # 优先级被提升后留下的旧条目
+                heapq.heappop(self._heap)
+                continue
+            if request.not_before > now:
+                # 等待桶重置或退避，不阻塞后面的请求
+                heapq.heappop(self._heap)
+                deferred.append(request)
+                wait = request.not_before - now
+                next_wakeup = wait if next_wakeup is None else min(next_wakeup, wait)
+                continue
+            if not self._limiter.can_start(request.priority):
+                # 堆按优先级排序，优先级更低的请求可用容量只会更少
+                break
+            heapq.heappop(self._heap)
+            if request.key is not None:
+                self._queued_keys.discard(request.key)
+            self._start_worker(request)
 
-                # 立即标记任务完成，因为我们已经把它移交给了worker
-                self._queue.task_done()
+        for request in deferred:
+            heapq.heappush(self._heap, request)
+        return next_wakeup
 
+    async def _dispatcher_loop(self):
+        """调度器的主循环，在有空闲容量时按优先级派发请求。"""
+        logger.debug("API scheduler loop started.")
+        while self._is_running:
+            self._wakeup.clear()
+            try:
+                timeout = self._dispatch_ready()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
             except asyncio.CancelledError:
-                # 如果在获取信号量后、创建worker前被取消，释放信号量以防泄漏
-                self._semaphore.release()
                 logger.info("API scheduler loop was explicitly cancelled.")
                 break
             except Exception:
-                # 同样，在其他异常情况下也要释放信号量
-                self._semaphore.release()
                 logger.exception("Error in API scheduler loop. This should not happen.")
                 # 短暂休眠以避免在持续错误的情况下快速消耗CPU
                 await asyncio.sleep(1)
 
+    def _start_worker(self, request: APIRequest):
+        if not request.nested:
+            self._limiter.acquire()
+        worker = asyncio.create_task(self._worker(request))
+        self._workers.add(worker)
+        worker.add_done_callback(self._workers.discard)
+
+    def _is_stale(self, request: APIRequest) -> bool:
+        return request.key is not None and self._keyed.get(request.key) is not request
+
+    def _push(self, request: APIRequest):
+        if request.key is not None:
+            self._keyed[request.key] = request
+            self._queued_keys.add(request.key)
+        heapq.heappush(self._heap, request)
+
+    def _requeue(self, request: APIRequest, delay: float):
+        retry = request._replace(
+            attempt=request.attempt + 1, not_before=time.monotonic() + delay
+        )
+        if retry.key is not None and self._keyed.get(retry.key) is not request:
+            # 执行期间已有新的同键请求排队，重试不再占用去重键
+            retry = retry._replace(key=None)
+        if retry.nested:
+            # 内层请求不进入队列，等待结束后直接执行
+            if retry.key is not None:
+                self._keyed[retry.key] = retry
+            asyncio.get_running_loop().call_later(delay, self._start_worker, retry)
+            return
+        self._push(retry)
+
+    def _forget_key(self, key: Hashable, future: asyncio.Future):
+        """请求完成后释放去重键，键已被新的请求占用时不做处理"""
+        request = self._keyed.get(key)
+        if request is not None and request.future is future:
+            del self._keyed[key]
+            self._queued_keys.discard(key)
+
+    def _rate_limit_delay(self, state: _AttemptState, retry_after: float) -> float:
+        """请求被限流后的等待时间，取 retry_after 与所用桶重置时间中较晚者"""
+        reset_at = max(
+            (self.rate_limits.bucket_reset_at(bucket) for bucket in state.buckets),
+            default=0.0,
+        )
+        return max(retry_after, reset_at - time.monotonic(), 0.0)
+
+    def _fail(self, request: APIRequest, error: BaseException):
+        if not request.future.done():
+            request.future.set_exception(error)
+
     async def _worker(self, request: APIRequest):
-        """处理单个API请求的完整生命周期"""
-        max_retries = 3
-        retry_delay = 1.0  # 初始延迟时间 (秒)
+        """处理单个API请求的一次尝试"""
+        state = _AttemptState()
+        token = _current_attempt.set(state)
+        can_retry = request.attempt + 1 < self.max_retries
         try:
-            for attempt in range(max_retries):
-                try:
-                    # 在每次尝试时都创建一个新的协程
-                    fresh_coroutine = request.coro_factory()
-                    result = await fresh_coroutine
-
-                    if not request.future.done():
-                        request.future.set_result(result)
+            # 在每次尝试时都创建一个新的协程
+            result = await request.coro_factory()
+        except Exception as e:
+            if _is_rate_limited(e):
+                self._limiter.on_rate_limited()
+                if not can_retry:
+                    logger.error(
+                        f"协程 (优先级: {request.priority}) 在 {self.max_retries} 次尝试后仍被限流。"
+                    )
+                    self._fail(request, e)
                     return
-                except (asyncio.TimeoutError, ClientConnectorError) as e:
-                    if attempt < max_retries - 1:
-                        logger.debug(
-                            f"协程 (优先级: {request.priority}) 遇到可重试错误 ({type(e).__name__})，"
-                            f"将在 {retry_delay:.1f} 秒后进行重试 ({attempt + 2}/{max_retries})..."
-                        )
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
-                    else:
-                        logger.error(
-                            f"协程 (优先级: {request.priority}) 在 {max_retries} 次尝试后仍然失败。"
-                        )
-                        if not request.future.done():
-                            request.future.set_exception(e)
-                        return
-                except Exception as e:
-                    logger.exception(
-                        f"执行协程 (优先级: {request.priority}) 时发生错误: {e}"
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is None and state.rate_limited is not None:
+                    retry_after = state.rate_limited.retry_after
+                delay = self._rate_limit_delay(state, retry_after or 1.0)
+                logger.debug(
+                    f"协程 (优先级: {request.priority}) 被限流，"
+                    f"将在 {delay:.1f} 秒后重试 ({request.attempt + 2}/{self.max_retries})..."
+                )
+                self._requeue(request, delay)
+            elif isinstance(e, (asyncio.TimeoutError, ClientConnectorError)):
+                if not can_retry:
+                    logger.error(
+                        f"协程 (优先级: {request.priority}) 在 {self.max_retries} 次尝试后仍然失败。"
                     )
-                    if not request.future.done():
-                        request.future.set_exception(e)
+                    self._fail(request, e)
                     return
+                retry_delay = 2.0**request.attempt
+                logger.debug(
+                    f"协程 (优先级: {request.priority}) 遇到可重试错误 ({type(e).__name__})，"
+                    f"将在 {retry_delay:.1f} 秒后进行重试 ({request.attempt + 2}/{self.max_retries})..."
+                )
+                self._requeue(request, retry_delay)
+            else:
+                logger.exception(
+                    f"执行协程 (优先级: {request.priority}) 时发生错误: {e}"
+                )
+                self._fail(request, e)
+        else:
+            # discord.py 会在内部重试 429，成功返回也可能经历过限流
+            if state.rate_limited is not None:
+                self._limiter.on_rate_limited()
+            else:
+                self._limiter.on_success()
+            if not request.future.done():
+                request.future.set_result(result)
         finally:
-            self._semaphore.release()
+            _current_attempt.reset(token)
+            # 重试的请求已释放槽位，等待期间不占用并发
+            if not request.nested:
+                self._limiter.release()
+            self._wakeup.set()
 
     async def submit(
-        self, *, coro_factory: Callable[[], Coroutine], priority: int
+        self,
+        *,
+        coro_factory: Callable[[], Coroutine],
+        priority: int,
+        key: Optional[Hashable] = None,
+        share_in_flight: bool = True,
     ) -> Any:
         """
         向调度器提交一个API请求。
         :param coro_factory: 一个返回API调用协程的函数。
         :param priority: 请求的优先级 (1=最高, 10=低)。
+        :param key: 去重键。与排队中的同键请求合并，共享同一个结果；
+            新请求的优先级更高时提升排队请求的优先级。
+        :param share_in_flight: 同键请求已在执行时是否也共享其结果。
+            结果需要反映提交之后的状态时（如反应数）应设为 False，
+            此时会排入一个新的请求，之后的同键请求与它合并。
         :return: API调用协程的返回结果。
+
+        在另一个调度器请求内部调用时，请求不排队、不占用并发槽位，直接开始执行。
         """
         if not self._is_running:
             raise RuntimeError("API 调度器没有在运行")
+
+        nested = _current_attempt.get() is not None
+        if key is not None:
+            existing = self._keyed.get(key)
+            if existing is not None:
+                if key in self._queued_keys and nested:
+                    # 排队中的同键请求可能永远等不到槽位，改为由内层直接执行
+                    taken = existing._replace(nested=True)
+                    self._keyed[key] = taken
+                    self._queued_keys.discard(key)
+                    self._start_worker(taken)
+                    return await asyncio.shield(existing.future)
+                if key in self._queued_keys:
+                    if priority < existing.priority:
+                        # 旧条目留在堆中，派发时作为过期条目跳过
+                        self._push(existing._replace(priority=priority))
+                        self._wakeup.set()
+                    return await asyncio.shield(existing.future)
+                if share_in_flight:
+                    return await asyncio.shield(existing.future)
+
         future = asyncio.get_running_loop().create_future()
         count = next(self._counter)
         request = APIRequest(
-            priority=priority, count=count, coro_factory=coro_factory, future=future
+            priority=priority,
+            count=count,
+            coro_factory=coro_factory,
+            future=future,
+            key=key,
+            nested=nested,
         )
-        await self._queue.put(request)
-        return await future
+        if nested:
+            if key is not None:
+                self._keyed[key] = request
+            self._start_worker(request)
+        else:
+            self._push(request)
+            self._wakeup.set()
+        if key is None:
+            return await future
+        future.add_done_callback(lambda f: self._forget_key(key, f))
+        # 其他提交者共享这个 future，取消当前调用者时不能取消请求本身
+        return await asyncio.shield(future)
 
     def start(self):
         """启动调度器后台任务。"""
@@ -143,13 +528,11 @@ class APIScheduler:
         if new_concurrent_requests <= 0:
             raise ValueError("并发请求数必须大于0")
 
-        # 创建新的信号量
-        old_semaphore = self._semaphore
-        self._semaphore = asyncio.Semaphore(new_concurrent_requests)
+        old_limit = self._limiter.max_limit
+        self._limiter.resize(new_concurrent_requests)
+        self._wakeup.set()
 
-        logger.info(
-            f"API调度器并发数已更新: {old_semaphore._value} -> {new_concurrent_requests}"
-        )
+        logger.info(f"API调度器并发数已更新: {old_limit} -> {new_concurrent_requests}")
 
     async def stop(self):
         """停止调度器"""
@@ -159,8 +542,8 @@ class APIScheduler:
         logger.info("即将停止API调度器...")
         self._is_running = False
 
-        # 向队列中放入哨兵对象，以通知循环退出
-        await self._queue.put(None)  # type: ignore
+        # 唤醒主循环，使其退出
+        self._wakeup.set()
 
         # 等待调度器主循环任务自然结束
         if self._task:
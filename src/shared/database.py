@@ -1,25 +1,118 @@
+import logging
 import os
+from dataclasses import dataclass, field
 
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlmodel import Column, Integer, MetaData, SQLModel, Table, Text, text
 
 from shared.fts5_tokenizer import register_jieba_tokenizer
+from shared.fts_index import ensure_fts_index
 
 # 确保表被导入，以便 SQLModel.metadata.create_all 能够工作
 
+logger = logging.getLogger(__name__)
+
 DB_PATH = "data/database.db"
 DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-async_engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,
-    pool_size=10,
-    max_overflow=20,
-    pool_timeout=60,
-    pool_pre_ping=True,
-    pool_recycle=1800,
-)
+
+@dataclass(frozen=True)
+class DatabaseProfile:
+    """SQLite 连接调优方案"""
+
+    # 每个新连接上执行的 PRAGMA
+    pragmas: dict[str, str | int] = field(default_factory=dict)
+    # 写连接池大小。SQLite 同一时刻只允许一个写事务，为 1 时写操作在连接池中排队，
+    # 而不是在数据库上互相等待锁
+    writer_pool_size: int = 10
+    writer_max_overflow: int = 20
+    # 只读连接池大小，为 0 时读写共用一个连接池
+    reader_pool_size: int = 0
+    reader_max_overflow: int = 0
+
+
+DATABASE_PROFILES: dict[str, DatabaseProfile] = {
+    # 与原来的行为一致：读写共用连接池，只开启 WAL
+    "default": DatabaseProfile(pragmas={"journal_mode": "WAL"}),
+    # 单写连接 + 只读连接池，搜索不会排在写操作之后，也不会遇到 database is locked
+    "tuned": DatabaseProfile(
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -65536,  # 64 MiB
+            "mmap_size": 268435456,  # 256 MiB
+            "temp_store": "MEMORY",
+        },
+        writer_pool_size=1,
+        writer_max_overflow=0,
+        reader_pool_size=8,
+        reader_max_overflow=8,
+    ),
+}
+
+
+def _create_engine(
+    profile: DatabaseProfile,
+    pool_size: int,
+    max_overflow: int,
+    query_only: bool = False,
+) -> AsyncEngine:
+    engine = create_async_engine(
+        DATABASE_URL,
+        echo=False,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=60,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _setup_connection(dbapi_connection, connection_record):
+        """
+        为每个新的 SQLite 连接设置 PRAGMA 并注册 jieba 分词器。
+        执行双层解包以从 SQLAlchemy 异步适配器中获取标准连接。
+        """
+        try:
+            for name, value in profile.pragmas.items():
+                dbapi_connection.execute(f"PRAGMA {name}={value}")
+            if query_only:
+                dbapi_connection.execute("PRAGMA query_only=ON")
+            # dbapi_connection 是 SQLAlchemy 的异步包装器 (AsyncAdapt_...)
+            # 访问其 ._connection 属性，获取原始的 aiosqlite.Connection
+            aiosqlite_conn = dbapi_connection._connection
+
+            # 访问 aiosqlite.Connection 的内部 ._conn 属性，获取最终的标准 sqlite3.Connection
+            underlying_sqlite3_conn = aiosqlite_conn._conn
+
+            register_jieba_tokenizer(underlying_sqlite3_conn)
+
+        except Exception as e:
+            print(f"在新连接上注册分词器失败，解包过程可能出现问题: {e}")
+            raise
+
+    return engine
+
+
+def _create_engines(profile: DatabaseProfile) -> tuple[AsyncEngine, AsyncEngine]:
+    """创建写引擎和只读引擎，未配置只读连接池时两者相同"""
+    writer = _create_engine(
+        profile, profile.writer_pool_size, profile.writer_max_overflow
+    )
+    if profile.reader_pool_size <= 0:
+        return writer, writer
+    reader = _create_engine(
+        profile,
+        profile.reader_pool_size,
+        profile.reader_max_overflow,
+        query_only=True,
+    )
+    return writer, reader
+
+
+async_engine, read_engine = _create_engines(DATABASE_PROFILES["default"])
 
 metadata_obj = MetaData()
 thread_fts_table = Table(
@@ -32,35 +125,40 @@ thread_fts_table = Table(
 )
 
 
-@event.listens_for(async_engine.sync_engine, "connect")
-def _setup_tokenizer_on_connect(dbapi_connection, connection_record):
-    """
-    为每个新的 SQLite 连接注册 jieba 分词器。
-    执行双层解包以从 SQLAlchemy 异步适配器中获取标准连接。
-    """
-    try:
-        dbapi_connection.execute("PRAGMA journal_mode=WAL")
-        # dbapi_connection 是 SQLAlchemy 的异步包装器 (AsyncAdapt_...)
-        # 访问其 ._connection 属性，获取原始的 aiosqlite.Connection
-        aiosqlite_conn = dbapi_connection._connection
+AsyncSessionFactory = async_sessionmaker(
+    bind=async_engine,
+    expire_on_commit=False,
+)
 
-        # 访问 aiosqlite.Connection 的内部 ._conn 属性，获取最终的标准 sqlite3.Connection
-        underlying_sqlite3_conn = aiosqlite_conn._conn
+# 只读会话工厂，搜索等纯查询路径使用
+ReadSessionFactory = async_sessionmaker(
+    bind=read_engine,
+    expire_on_commit=False,
+)
 
-        register_jieba_tokenizer(underlying_sqlite3_conn)
 
-    except Exception as e:
-        print(f"在新连接上注册分词器失败，解包过程可能出现问题: {e}")
-        raise
+async def configure_database(profile_name: str = "default"):
+    """
+    按配置的调优方案重建数据库引擎，需在 init_db 之前调用。
+    已有的会话工厂会被重新绑定，模块外持有的引用无需更新。
+    """
+    global async_engine, read_engine
 
+    profile = DATABASE_PROFILES.get(profile_name)
+    if profile is None:
+        logger.warning(f"未知的数据库调优方案 '{profile_name}'，使用 default")
+        profile = DATABASE_PROFILES["default"]
 
-AsyncSessionFactory = async_sessionmaker(
-    bind=async_engine,
-    expire_on_commit=False,
-)
+    old_engines = {async_engine, read_engine}
+    async_engine, read_engine = _create_engines(profile)
+    AsyncSessionFactory.configure(bind=async_engine)
+    ReadSessionFactory.configure(bind=read_engine)
+    for engine in old_engines:
+        await engine.dispose()
+    logger.info(f"数据库调优方案: {profile_name}")
 
 
-async def init_db():
+async def init_db(fts_rebuild_workers: int = 0):
     db_dir = os.path.dirname(DB_PATH)
     if not os.path.exists(db_dir):
         os.makedirs(db_dir)
@@ -120,13 +218,8 @@ async def init_db():
             )
         )
 
-        # 重建 FTS 索引（使用当前分词器重新索引全部内容）并合并碎片段
-        await conn.execute(
-            text("INSERT INTO thread_fts(thread_fts) VALUES('rebuild')")
-        )
-        await conn.execute(
-            text("INSERT INTO thread_fts(thread_fts) VALUES('optimize')")
-        )
+        # 分词器版本变化时才重建 FTS 索引（使用当前分词器重新索引全部内容）
+        await ensure_fts_index(conn, workers=fts_rebuild_workers)
 
 
 async def init_db_for_test(engine_instance: AsyncEngine):
@@ -198,4 +291,6 @@ async def close_db():
     """
     print("正在关闭数据库连接池...")
     await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
     print("数据库连接池已关闭。")
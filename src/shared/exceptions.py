@@ -2,3 +2,9 @@ class InvalidRangeFormat(ValueError):
     """当范围字符串格式无效时抛出此异常。"""
 
     pass
+
+
+class InvalidSearchCursor(ValueError):
+    """当搜索游标无法解析或与当前查询不匹配时抛出此异常。"""
+
+    pass
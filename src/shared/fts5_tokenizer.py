@@ -1,6 +1,49 @@
+from importlib import metadata
+
 import rjieba
 from sqlitefts import fts5
 
+# 预分词文本的前缀标记和词元分隔符（ASCII 控制字符，正常文本中不会出现）
+PRETOKENIZED_MARKER = "\x1e"
+PRETOKENIZED_SEPARATOR = "\x1f"
+
+
+def _rjieba_version() -> str:
+    try:
+        return metadata.version("rjieba")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+# 分词器版本戳。分词逻辑或词典变化时 FTS 索引需要重建，修改分词规则时请递增末尾的版本号
+TOKENIZER_VERSION = f"rjieba-{_rjieba_version()}-lower-1"
+
+
+def pretokenize(text: str | None) -> str | None:
+    """
+    在 Python 侧预先分词，返回带标记的词元串。
+
+    写入 FTS 表后，分词器只需按分隔符切分，得到的词元序列与直接分词完全一致。
+    """
+    if text is None:
+        return None
+    tokens = [word.lower() for word, _, _ in rjieba.tokenize(text)]
+    return PRETOKENIZED_MARKER + PRETOKENIZED_SEPARATOR.join(tokens)
+
+
+def pretokenize_rows(
+    rows: list[tuple[int, str | None, str | None]],
+) -> list[dict]:
+    """对一批 (id, title, first_message_excerpt) 预分词，可在进程池中执行"""
+    return [
+        {
+            "rowid": row_id,
+            "title": pretokenize(title),
+            "first_message_excerpt": pretokenize(excerpt),
+        }
+        for row_id, title, excerpt in rows
+    ]
+
 
 class JiebaRSTokenizer(fts5.FTS5Tokenizer):
     """
@@ -19,9 +62,25 @@ class JiebaRSTokenizer(fts5.FTS5Tokenizer):
         Yields:
             tuple[str, int, int]: 包含词元、起始字节和结束字节的元组。
         """
+        if text.startswith(PRETOKENIZED_MARKER):
+            yield from self._split_pretokenized(text)
+            return
         for word, start, end in rjieba.tokenize(text):
             yield word.lower(), start, end
 
+    @staticmethod
+    def _split_pretokenized(text):
+        """切分 pretokenize 生成的词元串，偏移量按 UTF-8 字节计算"""
+        offset = len(PRETOKENIZED_MARKER.encode("utf-8"))
+        separator_len = len(PRETOKENIZED_SEPARATOR.encode("utf-8"))
+        body = text[len(PRETOKENIZED_MARKER) :]
+        if not body:
+            return
+        for word in body.split(PRETOKENIZED_SEPARATOR):
+            end = offset + len(word.encode("utf-8"))
+            yield word, offset, end
+            offset = end + separator_len
+
 
 def register_jieba_tokenizer(conn):
     """
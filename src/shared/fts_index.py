@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel import text
+
+from shared.fts5_tokenizer import TOKENIZER_VERSION, pretokenize_rows
+
+logger = logging.getLogger(__name__)
+
+# 批量重建时每批读取和写入的帖子数
+FTS_REBUILD_BATCH_SIZE = 2000
+
+
+async def ensure_fts_meta_table(conn: AsyncConnection):
+    await conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS fts_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+    )
+
+
+async def get_tokenizer_stamp(conn: AsyncConnection) -> str | None:
+    """读取当前 FTS 索引构建时使用的分词器版本"""
+    result = await conn.execute(
+        text("SELECT value FROM fts_meta WHERE key = 'tokenizer_version'")
+    )
+    return result.scalar_one_or_none()
+
+
+async def set_tokenizer_stamp(conn: AsyncConnection, version: str):
+    await conn.execute(
+        text(
+            """
+            INSERT INTO fts_meta (key, value) VALUES ('tokenizer_version', :version)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """
+        ),
+        {"version": version},
+    )
+
+
+async def bulk_rebuild_fts(
+    conn: AsyncConnection,
+    workers: int = 0,
+    batch_size: int = FTS_REBUILD_BATCH_SIZE,
+) -> int:
+    """
+    批量重建 thread_fts 索引。
+
+    与 'rebuild' 命令让 SQLite 逐行回调 jieba 分词不同，这里分批读取帖子，
+    在线程池（workers > 0 时为进程池）中预分词后批量写入，
+    分词器遇到预分词文本只做切分。thread_fts 是外部内容表，
+    snippet/highlight 仍然读取 thread 表中的原文。
+
+    Returns:
+        写入索引的帖子数
+    """
+    loop = asyncio.get_running_loop()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    total = 0
+    try:
+        await conn.execute(
+            text("INSERT INTO thread_fts(thread_fts) VALUES('delete-all')")
+        )
+
+        last_id = 0
+        while True:
+            result = await conn.execute(
+                text(
+                    """
+                    SELECT id, title, first_message_excerpt FROM thread
+                    WHERE id > :last_id ORDER BY id LIMIT :limit
+                    """
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            )
+            rows = [tuple(row) for row in result]
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            params = await loop.run_in_executor(executor, pretokenize_rows, rows)
+            await conn.execute(
+                text(
+                    """
+                    INSERT INTO thread_fts(rowid, title, first_message_excerpt)
+                    VALUES (:rowid, :title, :first_message_excerpt)
+                    """
+                ),
+                params,
+            )
+            total += len(rows)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    # 合并碎片段
+    await conn.execute(text("INSERT INTO thread_fts(thread_fts) VALUES('optimize')"))
+    return total
+
+
+async def ensure_fts_index(conn: AsyncConnection, workers: int = 0):
+    """
+    仅在分词器版本戳与当前版本不一致时重建 FTS 索引，
+    索引已是最新时跳过启动时的全量重建。
+    """
+    await ensure_fts_meta_table(conn)
+    stamp = await get_tokenizer_stamp(conn)
+    if stamp == TOKENIZER_VERSION:
+        logger.info(f"FTS 索引已是最新 (分词器版本 {stamp})，跳过重建")
+        return
+
+    logger.info(
+        f"分词器版本变化 ({stamp} -> {TOKENIZER_VERSION})，开始批量重建 FTS 索引..."
+    )
+    total = await bulk_rebuild_fts(conn, workers=workers)
+    await set_tokenizer_stamp(conn, TOKENIZER_VERSION)
+    logger.info(f"FTS 索引重建完成，共 {total} 个帖子")
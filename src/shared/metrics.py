@@ -0,0 +1,186 @@
+import bisect
+import logging
+import math
+import time
+from typing import Sequence
+
+logger = logging.getLogger(__name__)
+
+# 默认的耗时分桶（秒）
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    """带标签的累积分桶直方图，输出格式兼容 Prometheus"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> (各分桶计数, 总和, 总数)
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = [[0] * len(self.buckets), 0.0, 0]
+            self._series[key] = series
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        return series[2] if series else 0
+
+    def _format_labels(self, key: tuple[str, ...], extra: str | None = None) -> str:
+        parts = [
+            f'{name}="{_escape_label(value)}"'
+            for name, value in zip(self.labelnames, key)
+        ]
+        if extra is not None:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for key, (bucket_counts, total_sum, total_count) in sorted(
+            self._series.items()
+        ):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = self._format_labels(key, f'le="{_format_float(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {total_count}")
+            labels = self._format_labels(key)
+            lines.append(f"{self.name}_sum{labels} {_format_float(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {total_count}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_float(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """进程内的指标注册表"""
+
+    def __init__(self):
+        self._metrics: dict[str, Histogram] = {}
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = Histogram(name, documentation, labelnames, buckets)
+            self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出所有指标"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+SEARCH_STAGE_SECONDS = REGISTRY.histogram(
+    "search_stage_seconds",
+    "搜索各阶段耗时（秒）",
+    labelnames=("source", "stage"),
+)
+SEARCH_TOTAL_SECONDS = REGISTRY.histogram(
+    "search_total_seconds",
+    "搜索总耗时（秒）",
+    labelnames=("source",),
+)
+
+# 总耗时超过该值（秒）的搜索会记录慢查询日志
+slow_search_threshold = 1.0
+
+
+def set_slow_search_threshold(seconds: float):
+    global slow_search_threshold
+    slow_search_threshold = seconds
+
+
+class StageTimer:
+    """
+    分阶段计时器。
+
+    每次调用 lap() 记录从上一次 lap（或创建计时器）以来的耗时，
+    不需要为每个阶段缩进代码块。同名阶段的耗时累加。
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.stages: dict[str, float] = {}
+        self._started_at = time.perf_counter()
+        self._last = self._started_at
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        SEARCH_STAGE_SECONDS.observe(elapsed, source=self.source, stage=stage)
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def finish(self, query_repr: object = None):
+        """记录总耗时，超过阈值时输出慢查询日志"""
+        total = self.total
+        SEARCH_TOTAL_SECONDS.observe(total, source=self.source)
+        if total >= slow_search_threshold:
+            breakdown = ", ".join(
+                f"{stage}={elapsed * 1000:.1f}ms"
+                for stage, elapsed in self.stages.items()
+            )
+            logger.warning(
+                f"慢搜索 [{self.source}] 总耗时 {total * 1000:.1f}ms ({breakdown}) "
+                f"查询: {query_repr}"
+            )
@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# 已封存日志段的后缀，形如 thread_activity.jsonl.3.sealed
+SEALED_SUFFIX = ".sealed"
+
+
+class WriteAheadJournal:
+    """
+    内存缓冲区使用的追加式本地日志（JSON Lines）。
+
+    缓冲区每次变更先追加一行记录，进程崩溃或被杀后，启动时通过 replay() 重建缓冲区。
+    回写数据库时先 seal() 封存当前日志段，之后的新记录写入新段；
+    回写成功后 commit() 删除已封存的段。回写失败时数据会放回内存缓冲区，
+    封存的段保留到下一次成功回写，因此任何时刻日志都覆盖内存中尚未落库的数据。
+
+    数据库提交与删除日志段之间退出会留下已落库的段，使用方应在回写事务中记录段编号，
+    启动时先用 recover() 丢弃这些段再回放。
+
+    记录只写入操作系统缓冲区，能防止进程崩溃丢数据；fsync=True 时每次写入都同步到磁盘。
+    """
+
+    def __init__(self, path: str | os.PathLike, *, fsync: bool = False):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.name = self.path.stem
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = None
+        self._next_segment = self._find_max_segment() + 1
+
+    def _sealed_segments(self) -> list[tuple[int, Path]]:
+        """按顺序列出所有已封存的日志段"""
+        segments = []
+        prefix = self.path.name + "."
+        for candidate in self.path.parent.glob(f"{self.path.name}.*{SEALED_SUFFIX}"):
+            number = candidate.name[len(prefix) : -len(SEALED_SUFFIX)]
+            if number.isdigit():
+                segments.append((int(number), candidate))
+        return sorted(segments)
+
+    def _find_max_segment(self) -> int:
+        segments = self._sealed_segments()
+        return segments[-1][0] if segments else 0
+
+    def append(self, record: dict[str, Any]):
+        """追加一条记录"""
+        if self._file is None:
+            # 上次被杀时可能留下写到一半的行，先补上换行，避免与新记录粘在一起
+            needs_newline = False
+            if self.path.exists() and self.path.stat().st_size > 0:
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b"\n"
+            self._file = open(self.path, "a", encoding="utf-8")
+            if needs_newline:
+                self._file.write("\n")
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def seal(self) -> Optional[int]:
+        """
+        封存当前日志段，之后的记录写入新段。
+
+        Returns:
+            封存段的编号，当前段为空时返回最近封存的编号（可能为 None）。
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self.path.exists() and self.path.stat().st_size > 0:
+            segment = self._next_segment
+            self._next_segment += 1
+            self.path.rename(
+                self.path.with_name(f"{self.path.name}.{segment}{SEALED_SUFFIX}")
+            )
+            return segment
+
+        segments = self._sealed_segments()
+        return segments[-1][0] if segments else None
+
+    def commit(self, segment: Optional[int]):
+        """删除编号不大于 segment 的所有封存段，它们的数据已经写入数据库"""
+        if segment is None:
+            return
+        for number, path in self._sealed_segments():
+            if number > segment:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def recover(self, committed_segment: Optional[int]):
+        """
+        丢弃编号不大于 committed_segment 的封存段（它们已经写入数据库），
+        并保证之后封存的段编号大于它，需要在第一次 seal() 之前调用。
+        """
+        if committed_segment is None:
+            return
+        self.commit(committed_segment)
+        self._next_segment = max(self._next_segment, committed_segment + 1)
+
+    def replay(self) -> Iterator[dict[str, Any]]:
+        """按写入顺序读出所有封存段和当前段中的记录，损坏的行（如写到一半被杀）会被跳过"""
+        paths = [path for _, path in self._sealed_segments()]
+        if self.path.exists():
+            paths.append(self.path)
+
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(
+                            f"跳过日志 {path} 第 {line_number} 行的损坏记录。"
+                        )
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def open_journal(directory: str, name: str) -> Optional[WriteAheadJournal]:
+    """在 directory 下打开名为 name 的日志，directory 为空时返回 None（不使用日志）"""
+    if not directory:
+        return None
+    return WriteAheadJournal(Path(directory) / f"{name}.jsonl")
@@ -0,0 +1,395 @@
+import asyncio
+import time
+
+import aiohttp
+import discord
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from shared.api_scheduler import APIScheduler, parse_rate_limit_headers
+
+
+class FakeDiscord:
+    """模拟 Discord API 的速率限制响应，按顺序返回预设的状态码和响应头"""
+
+    def __init__(self):
+        self.responses: list[tuple[int, dict]] = []
+        self.request_times: list[float] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.request_times.append(time.monotonic())
+        status, headers = self.responses.pop(0) if self.responses else (200, {})
+        body = {"ok": True}
+        if status == 429:
+            body = {
+                "message": "You are being rate limited.",
+                "retry_after": float(headers.get("Retry-After", 0)),
+                "global": headers.get("X-RateLimit-Global") == "true",
+            }
+        return web.json_response(body, status=status, headers=headers)
+
+
+@pytest_asyncio.fixture
+async def fake_discord():
+    fake = FakeDiscord()
+    app = web.Application()
+    app.router.add_get("/api/channels/{channel_id}", fake.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    fake.url = f"http://127.0.0.1:{port}/api/channels/1"  # type: ignore
+
+    yield fake
+
+    await runner.cleanup()
+
+
+@pytest_asyncio.fixture
+async def scheduler():
+    scheduler = APIScheduler(concurrent_requests=4, reserved_ratio=0.25)
+    scheduler.start()
+
+    yield scheduler
+
+    await scheduler.stop()
+
+
+def make_fetch(session: aiohttp.ClientSession, url: str):
+    """与 discord.py 一样，在 429 时抛出 HTTPException"""
+
+    async def fetch():
+        async with session.get(url) as response:
+            data = await response.json()
+            if response.status == 429:
+                raise discord.HTTPException(response, data)  # type: ignore
+            return data
+
+    return fetch
+
+
+def test_parse_rate_limit_headers():
+    info = parse_rate_limit_headers(
+        {
+            "X-RateLimit-Bucket": "abc",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset-After": "1.5",
+            "Retry-After": "2",
+            "X-RateLimit-Scope": "global",
+        },
+        429,
+    )
+    assert info.bucket == "abc"
+    assert info.remaining == 0
+    assert info.reset_after == 1.5
+    assert info.retry_after == 2.0
+    assert info.is_global
+
+
+@pytest.mark.asyncio
+async def test_background_requests_leave_reserved_capacity(scheduler):
+    release = asyncio.Event()
+    running = 0
+    peak = 0
+
+    async def background():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+
+    background_tasks = [
+        asyncio.create_task(scheduler.submit(coro_factory=background, priority=10))
+        for _ in range(8)
+    ]
+    await asyncio.sleep(0.05)
+    # 4 个并发中预留 1 个给用户交互
+    assert peak == 3
+
+    async def interactive():
+        return "ok"
+
+    result = await asyncio.wait_for(
+        scheduler.submit(coro_factory=interactive, priority=1), timeout=1
+    )
+    assert result == "ok"
+
+    release.set()
+    await asyncio.gather(*background_tasks)
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_update_concurrency_keeps_in_flight_accounting(scheduler):
+    release = asyncio.Event()
+
+    async def blocked():
+        await release.wait()
+
+    tasks = [
+        asyncio.create_task(scheduler.submit(coro_factory=blocked, priority=1))
+        for _ in range(4)
+    ]
+    await asyncio.sleep(0.05)
+    assert scheduler.in_flight == 4
+
+    scheduler.update_concurrency(2)
+    release.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.in_flight == 0
+    assert scheduler.concurrency == 2
+
+    scheduler.update_concurrency(6)
+    assert scheduler.concurrency == 6
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_request_is_requeued_after_retry_after(
+    scheduler, fake_discord
+):
+    fake_discord.responses = [
+        (
+            429,
+            {
+                "Retry-After": "0.2",
+                "X-RateLimit-Bucket": "bucket-1",
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset-After": "0.2",
+            },
+        ),
+        (200, {"X-RateLimit-Bucket": "bucket-1", "X-RateLimit-Remaining": "4"}),
+    ]
+    async with aiohttp.ClientSession(
+        trace_configs=[scheduler.rate_limits.trace_config()]
+    ) as session:
+        result = await scheduler.submit(
+            coro_factory=make_fetch(session, fake_discord.url), priority=5
+        )
+
+    assert result == {"ok": True}
+    assert len(fake_discord.request_times) == 2
+    assert fake_discord.request_times[1] - fake_discord.request_times[0] >= 0.19
+    # 429 后并发上限减半
+    assert scheduler.concurrency == 2
+    assert scheduler.rate_limits.rate_limited_count == 1
+
+
+@pytest.mark.asyncio
+async def test_global_rate_limit_pauses_dispatch(scheduler, fake_discord):
+    fake_discord.responses = [
+        (429, {"Retry-After": "0.3", "X-RateLimit-Global": "true"}),
+    ]
+    async with aiohttp.ClientSession(
+        trace_configs=[scheduler.rate_limits.trace_config()]
+    ) as session:
+        first = asyncio.create_task(
+            scheduler.submit(
+                coro_factory=make_fetch(session, fake_discord.url), priority=5
+            )
+        )
+        await asyncio.sleep(0.05)
+
+        started_at = time.monotonic()
+        ran_at = None
+
+        async def other():
+            nonlocal ran_at
+            ran_at = time.monotonic()
+
+        await scheduler.submit(coro_factory=other, priority=1)
+        await first
+
+    assert ran_at is not None
+    assert ran_at - started_at >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_non_rate_limit_errors_fail_immediately(scheduler):
+    calls = 0
+
+    async def broken():
+        nonlocal calls
+        calls += 1
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await scheduler.submit(coro_factory=broken, priority=5)
+    assert calls == 1
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_keyed_requests_share_one_call(scheduler):
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    tasks = [
+        asyncio.create_task(
+            scheduler.submit(coro_factory=fetch, priority=5, key=("thread", 1))
+        )
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0.05)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert results == [1] * 5
+
+    # 完成后键被释放，之后的提交会重新执行
+    assert (
+        await scheduler.submit(coro_factory=fetch, priority=5, key=("thread", 1)) == 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_keyed_submit_upgrades_queued_priority(scheduler):
+    release = asyncio.Event()
+    order = []
+
+    async def blocker():
+        await release.wait()
+
+    # 占满所有并发，让后续请求排队
+    blockers = [
+        asyncio.create_task(scheduler.submit(coro_factory=blocker, priority=1))
+        for _ in range(4)
+    ]
+    await asyncio.sleep(0.05)
+
+    def record(name):
+        async def run():
+            order.append(name)
+            return name
+
+        return run
+
+    low = asyncio.create_task(
+        scheduler.submit(coro_factory=record("keyed"), priority=10, key="k")
+    )
+    middle = asyncio.create_task(
+        scheduler.submit(coro_factory=record("middle"), priority=5)
+    )
+    await asyncio.sleep(0.01)
+    upgraded = asyncio.create_task(
+        scheduler.submit(coro_factory=record("duplicate"), priority=1, key="k")
+    )
+    await asyncio.sleep(0.01)
+
+    release.set()
+    await asyncio.gather(*blockers)
+    assert await low == "keyed"
+    assert await upgraded == "keyed"
+    await middle
+
+    assert order == ["keyed", "middle"]
+
+
+@pytest.mark.asyncio
+async def test_share_in_flight_false_queues_one_follow_up(scheduler):
+    first_started = asyncio.Event()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        call_number = calls
+        first_started.set()
+        await release.wait()
+        return call_number
+
+    first = asyncio.create_task(
+        scheduler.submit(
+            coro_factory=fetch, priority=5, key="reactions", share_in_flight=False
+        )
+    )
+    await first_started.wait()
+    followers = [
+        asyncio.create_task(
+            scheduler.submit(
+                coro_factory=fetch, priority=5, key="reactions", share_in_flight=False
+            )
+        )
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.05)
+    release.set()
+
+    assert await first == 1
+    assert await asyncio.gather(*followers) == [2, 2, 2]
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_shared_request(scheduler):
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(
+        scheduler.submit(coro_factory=fetch, priority=5, key="shared")
+    )
+    second = asyncio.create_task(
+        scheduler.submit(coro_factory=fetch, priority=5, key="shared")
+    )
+    await asyncio.sleep(0.05)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_nested_submits_do_not_deadlock_under_reduced_limit(scheduler):
+    # 连续被限流后并发上限降到最低
+    for _ in range(3):
+        scheduler._limiter._last_decrease = float("-inf")
+        scheduler._limiter.on_rate_limited()
+    assert scheduler.concurrency == 2
+
+    async def inner():
+        await asyncio.sleep(0.01)
+        return "inner"
+
+    async def outer():
+        # 与 sync_thread 一样，在占用槽位期间再提交请求
+        channel = await scheduler.submit(coro_factory=inner, priority=10)
+        keyed = await scheduler.submit(coro_factory=inner, priority=10, key="k")
+        return channel, keyed
+
+    outer_tasks = [
+        asyncio.create_task(scheduler.submit(coro_factory=outer, priority=10))
+        for _ in range(6)
+    ]
+    await asyncio.sleep(0.05)
+
+    async def interactive():
+        return "ok"
+
+    # 后台请求占满非预留槽位时，用户交互请求仍然可以执行
+    assert (
+        await asyncio.wait_for(
+            scheduler.submit(coro_factory=interactive, priority=1), timeout=1
+        )
+        == "ok"
+    )
+    results = await asyncio.wait_for(asyncio.gather(*outer_tasks), timeout=2)
+    assert results == [("inner", "inner")] * 6
+    assert scheduler.in_flight == 0
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from api.state_snapshot import (
+    SYNCED_THREADS_HISTORY,
+    ApiStateWriter,
+    SnapshotCacheService,
+    write_event,
+)
+
+
+def make_channel(channel_id: int, guild_id: int, tags: list[tuple[int, str]]):
+    return SimpleNamespace(
+        id=channel_id,
+        name=f"频道{channel_id}",
+        guild=SimpleNamespace(id=guild_id),
+        available_tags=[SimpleNamespace(id=i, name=n) for i, n in tags],
+    )
+
+
+class FakeCacheService:
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_indexed_channels(self):
+        return list(self.channels)
+
+
+def make_bot(channels, ucb_ready=True):
+    dispatched = []
+    return SimpleNamespace(
+        cache_service=FakeCacheService(channels),
+        ucb_score_service=SimpleNamespace(ready=ucb_ready),
+        dispatched=dispatched,
+        dispatch=lambda event, *args: dispatched.append((event, args)),
+    )
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "api_state.json"
+    bot = make_bot(
+        [
+            make_channel(10, 1, [(100, "原创"), (101, "翻译")]),
+            make_channel(11, 1, []),
+            make_channel(20, 2, [(200, "其他")]),
+        ]
+    )
+    ApiStateWriter(bot, path=str(path)).write_if_changed()  # type: ignore[arg-type]
+
+    snapshot = SnapshotCacheService(str(path))
+    assert snapshot.reload() == (True, True)
+
+    assert snapshot.ready is True
+    assert snapshot.is_channel_indexed(10)
+    assert not snapshot.is_channel_indexed(30)
+    assert snapshot.get_indexed_channel_ids_set() == {10, 11, 20}
+    assert sorted(snapshot.get_indexed_channel_ids_list(1)) == [10, 11]
+    assert snapshot.get_indexed_channel_ids_set(3) == set()
+    [channel] = snapshot.get_indexed_channels(2)
+    assert channel.guild_id == 2
+    assert [tag.name for tag in channel.available_tags] == ["其他"]
+
+
+def test_versions_drive_reload_flags(tmp_path):
+    path = tmp_path / "api_state.json"
+    channels = [make_channel(10, 1, [(100, "原创")])]
+    writer = ApiStateWriter(make_bot(channels), path=str(path))  # type: ignore[arg-type]
+    writer.write_if_changed()
+
+    snapshot = SnapshotCacheService(str(path))
+    snapshot.reload()
+    # 文件没有变化时不重新读取
+    assert snapshot.reload() == (False, False)
+
+    writer.index_version += 1
+    writer.write_if_changed()
+    assert snapshot.reload() == (True, False)
+
+    writer.config_version += 1
+    writer.write_if_changed()
+    assert snapshot.reload() == (False, True)
+
+
+def test_unchanged_state_is_not_rewritten(tmp_path):
+    path = tmp_path / "api_state.json"
+    channels = [make_channel(10, 1, [])]
+    writer = ApiStateWriter(make_bot(channels), path=str(path))  # type: ignore[arg-type]
+    writer.write_if_changed()
+    path.unlink()
+
+    writer.write_if_changed()
+    assert not path.exists()
+
+    channels.append(make_channel(11, 1, []))
+    writer.write_if_changed()
+    snapshot = SnapshotCacheService(str(path))
+    snapshot.reload()
+    assert snapshot.get_indexed_channel_ids_set() == {10, 11}
+
+
+def test_missing_snapshot_is_empty(tmp_path):
+    snapshot = SnapshotCacheService(str(tmp_path / "missing.json"))
+
+    assert snapshot.reload() == (False, False)
+    assert snapshot.ready is False
+    assert snapshot.get_indexed_channels() == []
+
+
+def test_synced_threads_are_tracked_by_version(tmp_path):
+    path = tmp_path / "api_state.json"
+    writer = ApiStateWriter(make_bot([]), path=str(path))  # type: ignore[arg-type]
+    writer.write_if_changed()
+    snapshot = SnapshotCacheService(str(path))
+    snapshot.reload()
+    seen = snapshot.threads_version
+    assert snapshot.synced_thread_ids_since(seen) == set()
+
+    asyncio.run(writer.on_threads_synced([1001, 1002]))
+    asyncio.run(writer.on_threads_synced([1003]))
+    writer.write_if_changed()
+    snapshot.reload()
+    assert snapshot.synced_thread_ids_since(seen) == {1001, 1002, 1003}
+    assert snapshot.synced_thread_ids_since(seen + 1) == {1003}
+
+    # 超出保留的记录或机器人进程重启后需要全量重建
+    for _ in range(SYNCED_THREADS_HISTORY):
+        asyncio.run(writer.on_threads_synced([2000]))
+    writer.write_if_changed()
+    snapshot.reload()
+    assert snapshot.synced_thread_ids_since(seen) is None
+    assert snapshot.synced_thread_ids_since(snapshot.threads_version + 1) is None
+
+
+def test_worker_events_are_forwarded_in_order(tmp_path):
+    events_dir = tmp_path / "api_events"
+    write_event(events_dir, "impressions_flushed", {1: 3, 2: 1})
+    write_event(events_dir, "config_updated")
+    write_event(events_dir, "threads_synced", {1001, 1002})
+    write_event(events_dir, "unknown_event")
+
+    bot = make_bot([])
+    writer = ApiStateWriter(
+        bot,  # type: ignore[arg-type]
+        path=str(tmp_path / "api_state.json"),
+        events_dir=str(events_dir),
+    )
+    writer.forward_worker_events()
+
+    assert [event for event, _ in bot.dispatched] == [
+        "impressions_flushed",
+        "config_updated",
+        "threads_synced",
+    ]
+    assert bot.dispatched[0][1] == ({1: 3, 2: 1},)
+    assert sorted(bot.dispatched[2][1][0]) == [1001, 1002]
+    # 事件只分发一次
+    writer.forward_worker_events()
+    assert len(bot.dispatched) == 3
+    assert list(events_dir.iterdir()) == []
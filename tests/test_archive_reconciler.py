@@ -0,0 +1,196 @@
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from datetime import datetime, timedelta, timezone
+
+import discord
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Tag, Thread, ThreadTagLink
+import auditor.reconciler as reconciler_module
+from auditor.reconciler import ARCHIVE_PAGE_SIZE, ArchiveReconciler
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_listed_thread(thread_id: int, **overrides):
+    """模拟帖子列表接口返回的帖子，默认与数据库中的记录一致"""
+    data = dict(
+        id=thread_id,
+        name=f"帖子{thread_id}",
+        applied_tags=[SimpleNamespace(id=1)],
+        message_count=3,
+        last_message_id=discord.utils.time_snowflake(
+            BASE_TIME + timedelta(days=thread_id)
+        ),
+        created_at=BASE_TIME,
+        archive_timestamp=BASE_TIME + timedelta(days=1000 - thread_id),
+    )
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.calls = 0
+
+    async def submit(self, *, coro_factory, priority, **kwargs):
+        self.calls += 1
+        return await coro_factory()
+
+
+class FakeSyncService:
+    def __init__(self):
+        self.synced = []
+
+    async def sync_thread(self, thread, **kwargs):
+        self.synced.append(thread.id)
+
+
+class FakeForumChannel:
+    """按归档时间倒序分页返回帖子"""
+
+    def __init__(self, archived: list, active: list | None = None):
+        self.id = 1
+        self.threads = active or []
+        self.archived = sorted(
+            archived, key=lambda t: t.archive_timestamp, reverse=True
+        )
+
+    async def archived_threads(self, *, limit, before=None):
+        count = 0
+        for thread in self.archived:
+            if before is not None and thread.archive_timestamp >= before:
+                continue
+            if count >= limit:
+                return
+            count += 1
+            yield thread
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建一个使用内存数据库的会话工厂。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    await engine.dispose()
+
+
+async def add_threads(factory, thread_ids):
+    """添加与 make_listed_thread 默认值一致的帖子记录"""
+    async with factory() as session:
+        session.add(Tag(id=1, name="标签1"))
+        for thread_id in thread_ids:
+            row = Thread(
+                channel_id=1,
+                thread_id=thread_id,
+                title=f"帖子{thread_id}",
+                author_id=1,
+                created_at=BASE_TIME.replace(tzinfo=None),
+                last_active_at=(BASE_TIME + timedelta(days=thread_id)).replace(
+                    tzinfo=None
+                ),
+                reply_count=3,
+            )
+            session.add(row)
+            await session.flush()
+            session.add(ThreadTagLink(thread_id=row.id, tag_id=1))
+        await session.commit()
+
+
+async def get_audited_ids(factory) -> set[int]:
+    async with factory() as session:
+        result = await session.execute(
+            select(Thread.thread_id).where(Thread.last_audited_at.is_not(None))  # type: ignore
+        )
+        return set(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_only_changed_threads_are_synced(db_session_factory):
+    await add_threads(db_session_factory, range(1, 7))
+    channel = FakeForumChannel(
+        archived=[
+            make_listed_thread(1),
+            make_listed_thread(2, name="改过的标题"),
+            make_listed_thread(3, applied_tags=[SimpleNamespace(id=2)]),
+            make_listed_thread(
+                4, last_message_id=discord.utils.time_snowflake(BASE_TIME)
+            ),
+            make_listed_thread(5),
+            # 数据库中没有记录的帖子
+            make_listed_thread(99),
+        ],
+        active=[make_listed_thread(6, message_count=4)],
+    )
+    scheduler = FakeScheduler()
+    sync_service = FakeSyncService()
+    reconciler = ArchiveReconciler(db_session_factory, scheduler, sync_service)  # type: ignore
+
+    result = await reconciler.reconcile_channel(channel)  # type: ignore
+
+    assert sorted(sync_service.synced) == [2, 3, 4, 6, 99]
+    assert await get_audited_ids(db_session_factory) == {1, 5}
+    assert result.listed == 7
+    assert result.unchanged == 2
+    assert result.synced == 5
+    assert result.pages == 1
+
+
+@pytest.mark.asyncio
+async def test_archived_listing_is_paged(db_session_factory, monkeypatch):
+    monkeypatch.setattr(reconciler_module, "PAGE_INTERVAL", 0)
+    thread_ids = range(1, ARCHIVE_PAGE_SIZE + 51)
+    await add_threads(db_session_factory, thread_ids)
+    channel = FakeForumChannel(archived=[make_listed_thread(i) for i in thread_ids])
+    scheduler = FakeScheduler()
+    sync_service = FakeSyncService()
+    reconciler = ArchiveReconciler(db_session_factory, scheduler, sync_service)  # type: ignore
+
+    result = await reconciler.reconcile_channel(channel)  # type: ignore
+
+    # 150 个未变化的帖子只需要 2 次列表请求，不需要任何逐帖同步
+    assert result.pages == 2
+    assert scheduler.calls == 2
+    assert sync_service.synced == []
+    assert await get_audited_ids(db_session_factory) == set(thread_ids)
+
+
+@pytest.mark.asyncio
+async def test_missing_threads_are_left_for_per_thread_audit(db_session_factory):
+    await add_threads(db_session_factory, [1, 2])
+    async with db_session_factory() as session:
+        row = await session.scalar(select(Thread).where(Thread.thread_id == 2))  # type: ignore
+        assert row is not None
+        row.not_found_count = 1
+        await session.commit()
+
+    channel = FakeForumChannel(archived=[make_listed_thread(2)])
+    sync_service = FakeSyncService()
+    reconciler = ArchiveReconciler(db_session_factory, FakeScheduler(), sync_service)  # type: ignore
+
+    await reconciler.reconcile_channel(channel)  # type: ignore
+
+    # 曾经找不到的帖子重新出现，交给完整同步清零计数；未出现在列表中的帖子不做改动
+    assert sync_service.synced == [2]
+    assert await get_audited_ids(db_session_factory) == set()
@@ -0,0 +1,194 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Thread
+from auditor.repository import AuditorRepository
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建一个使用内存数据库的会话工厂。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    await engine.dispose()
+
+
+async def add_thread(
+    factory,
+    thread_id: int,
+    *,
+    last_active_ago: timedelta,
+    last_audited_ago: timedelta | None,
+    reaction_count: int = 0,
+    not_found_count: int = 0,
+):
+    async with factory() as session:
+        session.add(
+            Thread(
+                channel_id=1,
+                thread_id=thread_id,
+                title=f"帖子{thread_id}",
+                author_id=1,
+                created_at=NOW - timedelta(days=365),
+                last_active_at=NOW - last_active_ago,
+                last_audited_at=(
+                    NOW - last_audited_ago if last_audited_ago is not None else None
+                ),
+                reaction_count=reaction_count,
+                not_found_count=not_found_count,
+            )
+        )
+        await session.commit()
+
+
+async def get_due(factory, limit: int = 10) -> list[int]:
+    async with factory() as session:
+        return await AuditorRepository(session).get_due_thread_ids(NOW, limit)
+
+
+@pytest.mark.asyncio
+async def test_active_threads_are_audited_more_often(db_session_factory):
+    # 一小时前审计过：活跃帖子已到期，冷帖子还远未到期
+    await add_thread(
+        db_session_factory,
+        1,
+        last_active_ago=timedelta(hours=2),
+        last_audited_ago=timedelta(hours=1),
+    )
+    await add_thread(
+        db_session_factory,
+        2,
+        last_active_ago=timedelta(days=200),
+        last_audited_ago=timedelta(hours=1),
+    )
+
+    assert await get_due(db_session_factory) == [1]
+
+
+@pytest.mark.asyncio
+async def test_due_threads_are_ordered_by_urgency(db_session_factory):
+    await add_thread(
+        db_session_factory,
+        1,
+        last_active_ago=timedelta(days=200),
+        last_audited_ago=timedelta(days=8),
+    )
+    await add_thread(
+        db_session_factory,
+        2,
+        last_active_ago=timedelta(hours=3),
+        last_audited_ago=timedelta(hours=5),
+    )
+    # 从未审计过的帖子以创建时间为基准，是最紧迫的
+    await add_thread(
+        db_session_factory,
+        3,
+        last_active_ago=timedelta(days=3),
+        last_audited_ago=None,
+    )
+
+    assert await get_due(db_session_factory) == [3, 2, 1]
+    assert await get_due(db_session_factory, limit=1) == [3]
+
+
+@pytest.mark.asyncio
+async def test_popular_and_missing_threads_are_prioritized(db_session_factory):
+    await add_thread(
+        db_session_factory,
+        1,
+        last_active_ago=timedelta(days=200),
+        last_audited_ago=timedelta(days=8),
+    )
+    await add_thread(
+        db_session_factory,
+        2,
+        last_active_ago=timedelta(days=200),
+        last_audited_ago=timedelta(days=8),
+        reaction_count=500,
+    )
+    # 冷帖子，但上次审计时没有找到，需要尽快确认
+    await add_thread(
+        db_session_factory,
+        3,
+        last_active_ago=timedelta(days=200),
+        last_audited_ago=timedelta(hours=2),
+        not_found_count=1,
+    )
+
+    assert await get_due(db_session_factory) == [2, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_mark_audited_removes_threads_from_due_list(db_session_factory):
+    for thread_id in (1, 2):
+        await add_thread(
+            db_session_factory,
+            thread_id,
+            last_active_ago=timedelta(days=2),
+            last_audited_ago=None,
+        )
+
+    async with db_session_factory() as session:
+        await AuditorRepository(session).mark_audited([1], NOW)
+
+    assert await get_due(db_session_factory) == [2]
+    async with db_session_factory() as session:
+        audited_at = await session.scalar(
+            select(Thread.last_audited_at).where(Thread.thread_id == 1)  # type: ignore
+        )
+    assert audited_at == NOW
+
+
+@pytest.mark.asyncio
+async def test_oldest_audited_threads_are_not_starved(db_session_factory):
+    # 大量活跃帖子的紧迫度远高于到期不久的冷帖子
+    for thread_id in range(1, 7):
+        await add_thread(
+            db_session_factory,
+            thread_id,
+            last_active_ago=timedelta(hours=1),
+            last_audited_ago=timedelta(hours=2),
+        )
+    await add_thread(
+        db_session_factory,
+        7,
+        last_active_ago=timedelta(days=200),
+        last_audited_ago=timedelta(days=8),
+    )
+    # 刚审计过的帖子不会出现在候选中
+    await add_thread(
+        db_session_factory,
+        8,
+        last_active_ago=timedelta(hours=1),
+        last_audited_ago=timedelta(minutes=1),
+    )
+
+    due = await get_due(db_session_factory, limit=3)
+    assert len(due) == 3
+    assert due[-1] == 7
+    assert 8 not in await get_due(db_session_factory, limit=10)
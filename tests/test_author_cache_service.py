@@ -0,0 +1,175 @@
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Author
+from core.author_cache_service import AuthorCacheService
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+def make_user(user_id: int, name: str, avatar: str = "a"):
+    return SimpleNamespace(
+        id=user_id,
+        name=name,
+        global_name=None,
+        display_name=name,
+        display_avatar=SimpleNamespace(url=f"https://cdn.example.com/{avatar}"),
+    )
+
+
+class FakeScheduler:
+    async def submit(self, *, coro_factory, priority, **kwargs):
+        return await coro_factory()
+
+
+class FakeBot:
+    """成员缓存为空，所有用户都需要通过 API 获取"""
+
+    def __init__(self):
+        self.api_scheduler = FakeScheduler()
+        self.users: dict[int, SimpleNamespace] = {}
+        self.fetches = 0
+
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_user(self, user_id):
+        self.fetches += 1
+        return self.users[user_id]
+
+
+class CountingSessionFactory:
+    """记录打开会话次数的会话工厂"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return self.factory()
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建一个空的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    await engine.dispose()
+
+
+async def get_authors(factory) -> dict[int, str]:
+    async with factory() as session:
+        authors = (await session.execute(select(Author))).scalars().all()
+        return {a.id: a.name for a in authors}
+
+
+@pytest.mark.asyncio
+async def test_uncached_author_is_fetched_once_within_ttl(db_session_factory):
+    bot = FakeBot()
+    bot.users[1] = make_user(1, "alice")
+    cache = AuthorCacheService(bot, db_session_factory)  # type: ignore
+
+    for _ in range(300):
+        await cache.observe(1)
+    await cache.flush()
+
+    assert bot.fetches == 1
+    assert await get_authors(db_session_factory) == {1: "alice"}
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_is_fetched_again(db_session_factory):
+    bot = FakeBot()
+    bot.users[1] = make_user(1, "alice")
+    cache = AuthorCacheService(bot, db_session_factory, ttl=0)  # type: ignore
+
+    await cache.observe(1)
+    await cache.observe(1)
+
+    assert bot.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_unchanged_authors_are_not_written(db_session_factory):
+    counting = CountingSessionFactory(db_session_factory)
+    bot = FakeBot()
+    cache = AuthorCacheService(bot, counting)  # type: ignore
+
+    await cache.observe(1, source_member=make_user(1, "alice"))  # type: ignore
+    await cache.flush()
+    opened_after_first_write = counting.opened
+
+    # 重启后从数据库加载，相同的作者信息不会再次写入
+    restarted = AuthorCacheService(bot, counting)  # type: ignore
+    await restarted.load()
+    opened_after_load = counting.opened
+    for _ in range(10):
+        await restarted.observe(1, source_member=make_user(1, "alice"))  # type: ignore
+    await restarted.flush()
+
+    assert opened_after_first_write == 1
+    assert counting.opened == opened_after_load
+
+
+@pytest.mark.asyncio
+async def test_changed_authors_are_flushed_in_one_batch(db_session_factory):
+    counting = CountingSessionFactory(db_session_factory)
+    cache = AuthorCacheService(FakeBot(), counting)  # type: ignore
+
+    await cache.observe(1, source_member=make_user(1, "alice"))  # type: ignore
+    await cache.flush()
+    await cache.observe(1, source_member=make_user(1, "alice", avatar="b"))  # type: ignore
+    await cache.observe(2, source_member=make_user(2, "bob"))  # type: ignore
+    await cache.flush()
+
+    assert counting.opened == 2
+    async with db_session_factory() as session:
+        avatar = await session.scalar(
+            select(Author.avatar_url).where(Author.id == 1)  # type: ignore
+        )
+    assert avatar == "https://cdn.example.com/b"
+    assert await get_authors(db_session_factory) == {1: "alice", 2: "bob"}
+
+
+@pytest.mark.asyncio
+async def test_fallback_lookup_receives_thread_guild(db_session_factory, monkeypatch):
+    seen = []
+
+    async def fake_get_or_fetch_user(bot, user_id, guild=None, source_member=None):
+        seen.append(guild)
+        return make_user(user_id, "alice")
+
+    monkeypatch.setattr(
+        "core.author_cache_service.DiscordUtils.get_or_fetch_user",
+        fake_get_or_fetch_user,
+    )
+    guild = SimpleNamespace(get_member=lambda user_id: None)
+    cache = AuthorCacheService(FakeBot(), db_session_factory)  # type: ignore
+
+    await cache.observe(1, guild=guild)  # type: ignore
+    await cache.flush()
+
+    assert seen == [guild]
+    assert await get_authors(db_session_factory) == {1: "alice"}
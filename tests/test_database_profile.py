@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import text
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import shared.database as database
+from shared.database import DATABASE_PROFILES, _create_engines
+
+
+@pytest.mark.asyncio
+async def test_tuned_profile_splits_reader_and_writer(tmp_path, monkeypatch):
+    """tuned 方案下写连接可写，只读连接池只能查询，且 PRAGMA 已生效。"""
+    monkeypatch.setattr(
+        database, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+    )
+    writer, reader = _create_engines(DATABASE_PROFILES["tuned"])
+    assert writer is not reader
+    try:
+        async with writer.begin() as conn:
+            await conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+            await conn.execute(text("INSERT INTO item (id) VALUES (1)"))
+
+        async with reader.connect() as conn:
+            count = await conn.execute(text("SELECT count(*) FROM item"))
+            assert count.scalar() == 1
+            synchronous = await conn.execute(text("PRAGMA synchronous"))
+            assert synchronous.scalar() == 1  # NORMAL
+            with pytest.raises(OperationalError):
+                await conn.execute(text("INSERT INTO item (id) VALUES (2)"))
+    finally:
+        await writer.dispose()
+        await reader.dispose()
+
+
+@pytest.mark.asyncio
+async def test_default_profile_shares_engine(tmp_path, monkeypatch):
+    """default 方案下读写共用一个引擎。"""
+    monkeypatch.setattr(
+        database, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+    )
+    writer, reader = _create_engines(DATABASE_PROFILES["default"])
+    assert writer is reader
+    await writer.dispose()
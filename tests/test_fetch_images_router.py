@@ -0,0 +1,202 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime
+from types import SimpleNamespace
+
+import httpx
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from api.v1.routers import fetch_images
+from api.v1.routers.fetch_images import (
+    FetchImageItem,
+    FetchImageRequest,
+    refresh_thread_thumbnails,
+)
+from models import Thread
+from shared import http_client
+from shared.api_scheduler import RateLimitTracker
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class FakeDiscord:
+    """返回首楼消息的 Discord 接口，可以预设某个帖子先返回若干次 429"""
+
+    def __init__(self):
+        self.requests: list[int] = []
+        self.rate_limited: dict[int, int] = {}
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        thread_id = int(request.url.path.rsplit("/", 1)[-1])
+        self.requests.append(thread_id)
+        await asyncio.sleep(0.01)
+        if self.rate_limited.get(thread_id, 0) > 0:
+            self.rate_limited[thread_id] -= 1
+            return httpx.Response(429, headers={"Retry-After": "0.01"}, json={})
+        if thread_id >= 9000:
+            return httpx.Response(404, json={})
+        return httpx.Response(
+            200,
+            json={
+                "content": "",
+                "attachments": [
+                    {
+                        "filename": "cover.png",
+                        "url": f"https://cdn.example/{thread_id}.png?sig=new",
+                    }
+                ],
+            },
+        )
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有三个测试帖子的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        for thread_id in (1001, 1002, 1003):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=thread_id,
+                    title=f"帖子{thread_id}",
+                    author_id=1,
+                    created_at=datetime(2025, 1, 1),
+                    thumbnail_urls=[f"https://cdn.example/{thread_id}.png?sig=old"],
+                )
+            )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def discord_api(db_session_factory):
+    api = FakeDiscord()
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(api.handler))
+    fetch_images._recent_results.clear()
+    fetch_images._inflight.clear()
+    fetch_images._fetch_semaphore = asyncio.Semaphore(
+        fetch_images.MAX_CONCURRENT_FETCHES
+    )
+    fetch_images.configure_fetch_images_router(
+        session_factory=db_session_factory,
+        bot_token="token",
+        guild_id="1",
+        rate_limits=RateLimitTracker(),
+    )
+    yield api
+    await http_client.close_http_client()
+
+
+def make_request(*thread_ids: int) -> FetchImageRequest:
+    return FetchImageRequest(
+        items=[FetchImageItem(thread_id=thread_id) for thread_id in thread_ids]
+    )
+
+
+async def get_thumbnails(factory) -> dict[int, list[str]]:
+    async with factory() as session:
+        result = await session.execute(select(Thread.thread_id, Thread.thumbnail_urls))
+        return {thread_id: urls for thread_id, urls in result.all()}
+
+
+@pytest.mark.asyncio
+async def test_batch_is_fetched_and_written_once(discord_api, db_session_factory):
+    response = await refresh_thread_thumbnails(make_request(1001, 1002, 1002, 9001))
+
+    assert [r.thread_id for r in response.results] == ["1001", "1002", "1002", "9001"]
+    assert [r.updated for r in response.results] == [True, True, True, False]
+    assert response.results[3].error == "not_found"
+    assert sorted(discord_api.requests) == [1001, 1002, 9001]
+
+    thumbnails = await get_thumbnails(db_session_factory)
+    assert thumbnails[1001] == ["https://cdn.example/1001.png?sig=new"]
+    assert thumbnails[1002] == ["https://cdn.example/1002.png?sig=new"]
+    assert thumbnails[1003] == ["https://cdn.example/1003.png?sig=old"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reports_share_one_fetch(discord_api):
+    responses = await asyncio.gather(
+        *(refresh_thread_thumbnails(make_request(1001)) for _ in range(10))
+    )
+
+    assert discord_api.requests == [1001]
+    assert all(
+        r.results[0].thumbnail_urls == ["https://cdn.example/1001.png?sig=new"]
+        for r in responses
+    )
+
+
+@pytest.mark.asyncio
+async def test_recent_results_are_reused(discord_api):
+    await refresh_thread_thumbnails(make_request(1001, 9001))
+    response = await refresh_thread_thumbnails(make_request(1001, 9001))
+
+    assert sorted(discord_api.requests) == [1001, 9001]
+    assert response.results[0].thumbnail_urls
+    assert response.results[1].error == "not_found"
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_fetch_is_retried(discord_api):
+    discord_api.rate_limited[1001] = 1
+
+    response = await refresh_thread_thumbnails(make_request(1001))
+
+    assert discord_api.requests == [1001, 1001]
+    assert response.results[0].updated
+
+
+@pytest.mark.asyncio
+async def test_persistent_rate_limit_is_not_cached(discord_api):
+    discord_api.rate_limited[1001] = 2
+
+    first = await refresh_thread_thumbnails(make_request(1001))
+    second = await refresh_thread_thumbnails(make_request(1001))
+
+    assert first.results[0].error == "rate_limited"
+    assert second.results[0].updated
+    assert discord_api.requests == [1001, 1001, 1001]
+
+
+@pytest.mark.asyncio
+async def test_updated_threads_are_dispatched(discord_api, db_session_factory):
+    dispatched = []
+    fetch_images.configure_fetch_images_router(
+        session_factory=db_session_factory,
+        bot_token="token",
+        guild_id="1",
+        rate_limits=RateLimitTracker(),
+        bot=SimpleNamespace(  # type: ignore[arg-type]
+            dispatch=lambda event, *args: dispatched.append((event, args))
+        ),
+    )
+
+    await refresh_thread_thumbnails(make_request(1001, 1002, 9001))
+
+    [(event, (thread_ids,))] = dispatched
+    assert event == "threads_synced"
+    assert sorted(thread_ids) == [1001, 1002]
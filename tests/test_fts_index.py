@@ -0,0 +1,167 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlmodel import SQLModel, text
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import shared.fts_index as fts_index
+from models import Thread
+from shared.fts5_tokenizer import TOKENIZER_VERSION, register_jieba_tokenizer
+from shared.fts_index import bulk_rebuild_fts, ensure_fts_index, get_tokenizer_stamp
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+TITLES = [
+    ("百合小说连载", "这是一篇百合小说，禁止破坏"),
+    ("纯爱小说分享", "纯爱向的短篇合集"),
+    ("科幻推荐 Sci-Fi", "硬科幻和软科幻都有"),
+    ("百合破坏讨论", None),
+    ("日常闲聊", "今天天气不错 ABC"),
+]
+
+QUERIES = [
+    "小说*",
+    '"百合"*',
+    '"科幻"',
+    "sci*",
+    'NEAR("百合" "禁止", 4)',
+    '("百合"*) NOT (NEAR("百合" "禁止", 4))',
+    "abc",
+]
+
+
+@pytest_asyncio.fixture
+async def engine() -> AsyncGenerator[AsyncEngine, None]:
+    """创建带有 FTS 表和触发器的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_conn, connection_record):
+        register_jieba_tokenizer(dbapi_conn._connection._conn)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            text(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS thread_fts USING fts5(
+                    title,
+                    first_message_excerpt,
+                    content='thread',
+                    content_rowid='id',
+                    tokenize = 'jieba'
+                );
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS thread_after_insert
+                AFTER INSERT ON thread BEGIN
+                    INSERT INTO thread_fts(rowid, title, first_message_excerpt)
+                    VALUES (new.id, new.title, new.first_message_excerpt);
+                END;
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS thread_after_update
+                AFTER UPDATE ON thread
+                WHEN
+                    new.title IS NOT old.title OR
+                    new.first_message_excerpt IS NOT old.first_message_excerpt
+                BEGIN
+                    INSERT INTO thread_fts(thread_fts, rowid, title, first_message_excerpt)
+                    VALUES ('delete', old.id, old.title, old.first_message_excerpt);
+                    INSERT INTO thread_fts(rowid, title, first_message_excerpt)
+                    VALUES (new.id, new.title, new.first_message_excerpt);
+                END;
+                """
+            )
+        )
+
+    async with AsyncSession(engine) as session:
+        for i, (title, excerpt) in enumerate(TITLES * 4):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=1000 + i,
+                    title=title,
+                    author_id=1,
+                    first_message_excerpt=excerpt,
+                )
+            )
+        await session.commit()
+
+    yield engine
+
+    await engine.dispose()
+
+
+async def _match_all(conn):
+    results = {}
+    for query in QUERIES:
+        rows = await conn.execute(
+            text(
+                "SELECT rowid FROM thread_fts WHERE thread_fts MATCH :q ORDER BY rowid"
+            ),
+            {"q": query},
+        )
+        results[query] = [row[0] for row in rows]
+    return results
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+@pytest.mark.asyncio
+async def test_bulk_rebuild_matches_trigger_index(engine, workers):
+    """预分词批量重建后的索引与逐行分词的索引查询结果一致。"""
+    async with engine.begin() as conn:
+        expected = await _match_all(conn)
+        assert all(expected.values())
+
+        total = await bulk_rebuild_fts(conn, workers=workers, batch_size=7)
+        assert total == len(TITLES) * 4
+        assert await _match_all(conn) == expected
+
+        # 重建后通过触发器的增量更新（'delete' 使用原文）仍然正确
+        await conn.execute(
+            text(
+                "UPDATE thread SET title = '全新标题', first_message_excerpt = NULL WHERE id = 1"
+            )
+        )
+        after_update = await _match_all(conn)
+        assert 1 not in after_update["小说*"]
+
+
+@pytest.mark.asyncio
+async def test_ensure_fts_index_skips_when_stamp_is_current(engine, monkeypatch):
+    """版本戳一致时跳过重建。"""
+    calls = []
+    original = fts_index.bulk_rebuild_fts
+
+    async def counting_rebuild(conn, workers=0):
+        calls.append(workers)
+        return await original(conn, workers=workers)
+
+    monkeypatch.setattr(fts_index, "bulk_rebuild_fts", counting_rebuild)
+
+    async with engine.begin() as conn:
+        await ensure_fts_index(conn)
+        assert await get_tokenizer_stamp(conn) == TOKENIZER_VERSION
+        await ensure_fts_index(conn)
+    assert calls == [0]
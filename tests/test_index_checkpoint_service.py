@@ -0,0 +1,166 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from core.index_checkpoint_service import (
+    MODE_FULL,
+    MODE_INCREMENTAL,
+    MODE_RESUME,
+    STATUS_COMPLETED,
+    IndexCheckpointService,
+)
+from indexer.cog import Indexer
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+CHANNEL_ID = 123456789012345678
+GUILD_ID = 987654321098765432
+
+
+@pytest_asyncio.fixture
+async def checkpoint_service() -> AsyncGenerator[IndexCheckpointService, None]:
+    """创建一个使用内存数据库的检查点服务。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    yield IndexCheckpointService(factory)
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_first_run_is_full(checkpoint_service):
+    run = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+
+    assert run.mode == MODE_FULL
+    assert run.since is None
+    assert run.resume_before is None
+    assert run.processed == 0
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_resumes_from_cursor(checkpoint_service):
+    await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    cursor = datetime(2025, 3, 1, 8, 30, tzinfo=timezone.utc)
+    failures = [{"id": 1, "reason": "NotFound"}]
+    await checkpoint_service.save_progress(
+        CHANNEL_ID, cursor, processed=250, failures=failures
+    )
+
+    run = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+
+    assert run.mode == MODE_RESUME
+    # 与 Discord 的 archive_timestamp 一样带 UTC 时区
+    assert run.resume_before == cursor
+    assert run.processed == 250
+    assert run.failures == failures
+
+
+@pytest.mark.asyncio
+async def test_completed_run_makes_next_run_incremental(checkpoint_service):
+    first = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    await checkpoint_service.complete_run(first, processed=1000, failures=[])
+
+    checkpoint = await checkpoint_service.get(CHANNEL_ID)
+    assert checkpoint is not None
+    assert checkpoint.status == STATUS_COMPLETED
+
+    run = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    assert run.mode == MODE_INCREMENTAL
+    assert run.since == first.run_started_at
+    assert run.resume_before is None
+    assert run.processed == 0
+
+
+@pytest.mark.asyncio
+async def test_interrupted_incremental_run_keeps_cutoff(checkpoint_service):
+    first = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    await checkpoint_service.complete_run(first, processed=10, failures=[])
+    incremental = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+
+    run = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    assert run.mode == MODE_RESUME
+    assert run.since == incremental.since
+
+
+@pytest.mark.asyncio
+async def test_full_rebuild_ignores_checkpoint(checkpoint_service):
+    await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    await checkpoint_service.save_progress(
+        CHANNEL_ID,
+        datetime(2025, 3, 1, tzinfo=timezone.utc),
+        processed=100,
+        failures=[],
+    )
+
+    run = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID, full=True)
+    assert run.mode == MODE_FULL
+    assert run.resume_before is None
+    assert run.processed == 0
+
+
+class FlakyArchiveChannel:
+    """第一页正常返回，之后的翻页请求失败"""
+
+    id = CHANNEL_ID
+    threads: list = []
+
+    def __init__(self):
+        self.requests: list = []
+
+    async def archived_threads(self, *, limit, before):
+        self.requests.append(before)
+        if len(self.requests) > 1:
+            raise ConnectionError("gateway hiccup")
+        base = datetime(2025, 3, 1, tzinfo=timezone.utc)
+        for i in range(3):
+            yield SimpleNamespace(archive_timestamp=base - timedelta(hours=i))
+
+
+class FakeDashboard:
+    def __init__(self, channel):
+        self.channel = channel
+        self.progress = {"discovered": 0, "processed": 0, "failures": []}
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def is_cancelled(self) -> bool:
+        return False
+
+    async def wait_until_drained(self) -> bool:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        return True
+
+
+@pytest.mark.asyncio
+async def test_archive_fetch_error_keeps_run_resumable(checkpoint_service):
+    """翻页失败时生产者抛出异常，检查点停在最后写入完成的页。"""
+    run = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    dashboard = FakeDashboard(FlakyArchiveChannel())
+    buffer = SimpleNamespace(flush=lambda: asyncio.sleep(0), failures=[])
+    cog = SimpleNamespace(checkpoint_service=checkpoint_service)
+
+    with pytest.raises(ConnectionError):
+        await Indexer.producer(cog, dashboard, run, buffer)  # type: ignore
+
+    resumed = await checkpoint_service.begin_run(CHANNEL_ID, GUILD_ID)
+    assert resumed.mode == MODE_RESUME
+    assert resumed.resume_before == datetime(2025, 2, 28, 22, tzinfo=timezone.utc)
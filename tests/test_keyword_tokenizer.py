@@ -0,0 +1,46 @@
+import pytest
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import search.keyword_tokenizer as keyword_tokenizer
+from search.keyword_tokenizer import (
+    build_exclude_match_expr,
+    clear_token_cache,
+    cut_keywords,
+)
+
+
+@pytest.mark.asyncio
+async def test_cut_keywords_batches_and_caches(monkeypatch):
+    """未命中缓存的关键词合并为一次分词调用，再次查询直接命中缓存。"""
+    clear_token_cache()
+    calls = []
+    original = keyword_tokenizer._cut_many
+
+    def counting_cut_many(keywords):
+        calls.append(list(keywords))
+        return original(keywords)
+
+    monkeypatch.setattr(keyword_tokenizer, "_cut_many", counting_cut_many)
+
+    first = await cut_keywords(["百合小说", "科幻", "百合小说"])
+    assert calls == [["百合小说", "科幻"]]
+    assert "".join(first["百合小说"]) == "百合小说"
+
+    second = await cut_keywords(["科幻", "纯爱"])
+    assert calls[-1] == ["纯爱"]
+    assert second["科幻"] == first["科幻"]
+
+    await cut_keywords(["科幻", "纯爱"])
+    assert len(calls) == 2
+
+
+def test_build_exclude_match_expr():
+    """反选表达式与豁免标记的格式。"""
+    expr = build_exclude_match_expr((("百合", "破坏"), ()), ("禁",))
+    assert expr == '("百合" AND "破坏"*) NOT (NEAR("百合" "禁", 4))'
+    assert build_exclude_match_expr((("ntr",),), ()) == '("ntr"*)'
+    assert build_exclude_match_expr(((),), ("禁",)) == ""
@@ -0,0 +1,157 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+
+import httpx
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from core.member_cache_service import MemberCacheService
+from shared import http_client
+
+GUILD_ID = 1
+ROLE_ID = "500"
+
+
+class FakeDiscord:
+    """按用户 ID 返回预设状态码的成员接口"""
+
+    def __init__(self, statuses: dict[int, int]):
+        self.statuses = statuses
+        self.requests: list[int] = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        user_id = int(request.url.path.rsplit("/", 1)[-1])
+        self.requests.append(user_id)
+        await asyncio.sleep(0)
+        status_code = self.statuses.get(user_id, 404)
+        if status_code != 200:
+            return httpx.Response(status_code, json={})
+        roles = [ROLE_ID] if user_id % 2 == 0 else []
+        return httpx.Response(
+            200,
+            json={
+                "roles": roles,
+                "user": {
+                    "id": str(user_id),
+                    "username": f"user{user_id}",
+                    "global_name": None,
+                    "avatar": "hash",
+                },
+            },
+        )
+
+
+@pytest_asyncio.fixture
+async def discord_api():
+    api = FakeDiscord({10: 200, 11: 200, 12: 429})
+    http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(api.handler))
+    yield api
+    await http_client.close_http_client()
+
+
+def make_service(**kwargs) -> MemberCacheService:
+    return MemberCacheService(
+        guild_id=GUILD_ID, role_ids=[ROLE_ID], bot_token="token", **kwargs
+    )
+
+
+def make_member(user_id: int, role_ids: list[int]):
+    return SimpleNamespace(
+        id=user_id,
+        name=f"user{user_id}",
+        global_name=None,
+        avatar=None,
+        guild=SimpleNamespace(id=GUILD_ID),
+        roles=[SimpleNamespace(id=role_id) for role_id in role_ids],
+    )
+
+
+@pytest.mark.asyncio
+async def test_results_are_cached_within_ttl(discord_api):
+    service = make_service()
+
+    first = await service.get_status(10)
+    second = await service.get_status(10)
+
+    assert first is not None and first.verified
+    assert first.user_info["username"] == "user10"
+    assert second == first
+    assert discord_api.requests == [10]
+
+
+@pytest.mark.asyncio
+async def test_negative_results_are_cached(discord_api):
+    service = make_service()
+
+    missing_role = await service.get_status(11)
+    not_member = await service.get_status(99)
+    await service.get_status(11)
+    await service.get_status(99)
+
+    assert missing_role.is_member and not missing_role.verified
+    assert not not_member.is_member
+    assert discord_api.requests == [11, 99]
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_refetched(discord_api):
+    service = make_service(ttl=0, negative_ttl=0)
+
+    await service.get_status(10)
+    await service.get_status(10)
+
+    assert discord_api.requests == [10, 10]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_lookups_are_not_cached(discord_api):
+    service = make_service()
+
+    assert await service.get_status(12) is None
+    assert await service.get_status(12) is None
+    assert discord_api.requests == [12, 12]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_request(discord_api):
+    service = make_service()
+
+    results = await asyncio.gather(*(service.get_status(10) for _ in range(5)))
+
+    assert all(result.verified for result in results)
+    assert discord_api.requests == [10]
+
+
+@pytest.mark.asyncio
+async def test_gateway_members_skip_http(discord_api):
+    service = make_service()
+    members = {20: make_member(20, [int(ROLE_ID)])}
+    guild = SimpleNamespace(get_member=members.get)
+    service.bot = SimpleNamespace(get_guild=lambda guild_id: guild)  # type: ignore
+
+    status = await service.get_status(20)
+
+    assert status.verified
+    assert status.user_info["id"] == "20"
+    assert discord_api.requests == []
+
+
+@pytest.mark.asyncio
+async def test_member_events_replace_cached_results(discord_api):
+    service = make_service()
+    assert (await service.get_status(10)).verified
+
+    await service.on_member_update(None, make_member(10, []))  # type: ignore
+    assert not (await service.get_status(10)).verified
+
+    await service.on_member_update(None, make_member(10, [int(ROLE_ID)]))  # type: ignore
+    assert (await service.get_status(10)).verified
+
+    await service.on_member_remove(make_member(10, []))  # type: ignore
+    assert not (await service.get_status(10)).is_member
+    assert discord_api.requests == [10]
@@ -0,0 +1,66 @@
+import logging
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+import shared.metrics as metrics
+from search.qo.thread_search import ThreadSearchQuery
+from search.result_cache import describe_query
+from shared.metrics import Histogram, MetricsRegistry, StageTimer
+
+
+def test_histogram_renders_prometheus_text():
+    """直方图按累积分桶输出 Prometheus 文本格式。"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "demo_seconds", "示例", labelnames=("stage",), buckets=(0.1, 1.0)
+    )
+    histogram.observe(0.05, stage="fts")
+    histogram.observe(0.1, stage="fts")
+    histogram.observe(5.0, stage="fts")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE demo_seconds histogram" in lines
+    assert 'demo_seconds_bucket{stage="fts",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{stage="fts",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{stage="fts",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{stage="fts"} 3' in lines
+    assert registry.histogram("demo_seconds", "示例") is histogram
+
+
+def test_stage_timer_records_stages_and_slow_log(monkeypatch, caplog):
+    """计时器累加同名阶段，超过阈值时输出慢查询日志。"""
+    stage_histogram = Histogram("stage", "", labelnames=("source", "stage"))
+    monkeypatch.setattr(metrics, "SEARCH_STAGE_SECONDS", stage_histogram)
+    monkeypatch.setattr(
+        metrics, "SEARCH_TOTAL_SECONDS", Histogram("t", "", ("source",))
+    )
+    monkeypatch.setattr(metrics, "slow_search_threshold", 0.0)
+
+    timer = StageTimer("test")
+    timer.lap("fts")
+    timer.lap("id_query")
+    timer.lap("fts")
+    assert set(timer.stages) == {"fts", "id_query"}
+    assert stage_histogram.count(source="test", stage="fts") == 2
+
+    query = ThreadSearchQuery(keywords="百合", channel_ids=[2, 1])
+    with caplog.at_level(logging.WARNING, logger="shared.metrics"):
+        timer.finish(describe_query(query))
+    assert "慢搜索" in caplog.text
+    assert "keywords='百合'" in caplog.text
+    assert "channel_ids=(1, 2)" in caplog.text
+    assert "sort_method" not in caplog.text
+
+
+def test_metrics_endpoint_requires_token():
+    from api.main import _metrics_authorized
+
+    assert _metrics_authorized("Bearer s3cret", "s3cret")
+    assert not _metrics_authorized("", "s3cret")
+    assert not _metrics_authorized("Bearer wrong", "s3cret")
+    assert not _metrics_authorized("s3cret", "s3cret")
+    # 未配置令牌时，即使是本机请求也拒绝
+    assert not _metrics_authorized("Bearer ", "")
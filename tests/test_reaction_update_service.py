@@ -0,0 +1,188 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from datetime import datetime
+
+import discord
+from discord.ext import commands
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from models import Thread
+from ThreadManager.reaction_update_service import ReactionUpdateService
+import bot_main
+
+# bot_main 导入时会启用 uvloop，其余测试仍使用默认的事件循环
+asyncio.set_event_loop_policy(None)
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class FakeScheduler:
+    async def submit(self, *, coro_factory, priority, **kwargs):
+        return await coro_factory()
+
+
+class FakeBot:
+    def __init__(self):
+        self.api_scheduler = FakeScheduler()
+        self.dispatched = []
+
+    def dispatch(self, event, *args):
+        self.dispatched.append((event, args))
+
+
+class FakeSyncService:
+    def __init__(self):
+        self.bot = FakeBot()
+        self.synced = []
+
+    async def sync_thread(self, thread, **kwargs):
+        self.synced.append(thread.id)
+
+
+class FakeThread:
+    """只实现 get_partial_message().fetch() 的帖子"""
+
+    def __init__(self, thread_id: int, counts: list[int]):
+        self.id = thread_id
+        self.counts = counts
+        self.fetch_count = 0
+
+    def get_partial_message(self, message_id: int):
+        async def fetch():
+            self.fetch_count += 1
+            return SimpleNamespace(
+                reactions=[SimpleNamespace(count=c) for c in self.counts]
+            )
+
+        return SimpleNamespace(fetch=fetch)
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有两个测试帖子的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        for thread_id in (1001, 1002):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=thread_id,
+                    title=f"帖子{thread_id}",
+                    author_id=1,
+                    created_at=datetime(2025, 1, 1),
+                    reaction_count=0,
+                )
+            )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def get_reaction_counts(factory) -> dict[int, int]:
+    async with factory() as session:
+        result = await session.execute(select(Thread.thread_id, Thread.reaction_count))
+        return {thread_id: count for thread_id, count in result.all()}
+
+
+@pytest.mark.asyncio
+async def test_events_are_coalesced_per_thread(db_session_factory):
+    sync_service = FakeSyncService()
+    service = ReactionUpdateService(db_session_factory, sync_service)  # type: ignore
+    hot = FakeThread(1001, [3, 12])
+    other = FakeThread(1002, [4])
+
+    for _ in range(50):
+        service.add_reaction_event(hot)  # type: ignore
+    service.add_reaction_event(other)  # type: ignore
+    await service.flush()
+
+    assert hot.fetch_count == 1
+    assert other.fetch_count == 1
+    assert await get_reaction_counts(db_session_factory) == {1001: 12, 1002: 4}
+    [(event, (thread_ids,))] = sync_service.bot.dispatched
+    assert event == "threads_synced"
+    assert sorted(thread_ids) == [1001, 1002]
+    assert service.pending_threads == {}
+
+
+@pytest.mark.asyncio
+async def test_missing_threads_trigger_full_sync(db_session_factory):
+    sync_service = FakeSyncService()
+    service = ReactionUpdateService(db_session_factory, sync_service)  # type: ignore
+    ghost = FakeThread(2001, [])
+
+    service.add_reaction_event(FakeThread(1001, [7]))  # type: ignore
+    service.add_reaction_event(ghost)  # type: ignore
+    await service.flush()
+    await asyncio.sleep(0)
+
+    assert (await get_reaction_counts(db_session_factory))[1001] == 7
+    assert sync_service.synced == [2001]
+    assert sync_service.bot.dispatched == [("threads_synced", ([1001],))]
+
+
+@pytest.mark.asyncio
+async def test_flush_without_events_does_nothing(db_session_factory):
+    sync_service = FakeSyncService()
+    service = ReactionUpdateService(db_session_factory, sync_service)  # type: ignore
+
+    await service.flush()
+
+    assert sync_service.bot.dispatched == []
+
+
+class ReactionCog(commands.Cog):
+    """与 ThreadManager 一样在 cog_unload 中停止反应数更新服务"""
+
+    def __init__(self, service: ReactionUpdateService):
+        self.service = service
+
+    async def cog_unload(self):
+        await self.service.stop()
+
+
+async def _noop():
+    pass
+
+
+@pytest.mark.asyncio
+async def test_bot_close_flushes_reactions_before_scheduler_stops(
+    db_session_factory,
+):
+    bot = bot_main.MyBot(intents=discord.Intents.none(), config={"db_url": ""})
+    bot.impression_cache_service = SimpleNamespace(stop=_noop)  # type: ignore
+    bot.author_cache_service = SimpleNamespace(stop=_noop)  # type: ignore
+    bot.api_scheduler.start()
+
+    sync_service = FakeSyncService()
+    sync_service.bot = bot  # type: ignore
+    service = ReactionUpdateService(db_session_factory, sync_service)  # type: ignore
+    await bot.add_cog(ReactionCog(service))
+    service.add_reaction_event(FakeThread(1001, [9]))  # type: ignore
+
+    await bot.close()
+
+    assert (await get_reaction_counts(db_session_factory))[1001] == 9
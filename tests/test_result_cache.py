@@ -0,0 +1,88 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from search.qo.thread_search import ThreadSearchQuery
+from search.result_cache import SearchResultCache
+
+
+def _key(cache: SearchResultCache, query: ThreadSearchQuery, **kwargs):
+    return cache.make_key(
+        query,
+        sort_method=query.sort_method,
+        total_display_count=kwargs.get("total_display_count", 100),
+        exploration_factor=1.414,
+        strength_weight=5.0,
+        exclude_thread_ids=kwargs.get("exclude_thread_ids"),
+    )
+
+
+def test_key_ignores_list_order():
+    cache = SearchResultCache()
+    a = ThreadSearchQuery(channel_ids=[1, 2], include_tags=["甲", "乙"])
+    b = ThreadSearchQuery(channel_ids=[2, 1], include_tags=["乙", "甲"])
+    c = ThreadSearchQuery(channel_ids=[1, 2], include_tags=["甲"])
+    assert _key(cache, a) == _key(cache, b)
+    assert _key(cache, a) != _key(cache, c)
+    # 综合排序的 N 按桶计入键中
+    assert _key(cache, a) == _key(cache, a, total_display_count=101)
+    assert _key(cache, a) != _key(cache, a, total_display_count=200)
+    # 其他排序方式与 N 无关
+    d = ThreadSearchQuery(sort_method="created_at")
+    assert _key(cache, d) == _key(cache, d, total_display_count=200)
+
+
+def test_generation_invalidates_entries():
+    cache = SearchResultCache()
+    key = _key(cache, ThreadSearchQuery())
+    cache.put(key, [3, 1, 2], cache.generation)
+    assert list(cache.get(key)) == [3, 1, 2]
+
+    cache.bump_generation()
+    assert cache.get(key) is None
+
+    # 查询期间发生写入时，旧世代的结果不应被缓存
+    generation = cache.generation
+    cache.bump_generation()
+    cache.put(key, [1], generation)
+    assert cache.get(key) is None
+
+
+def test_lru_eviction():
+    cache = SearchResultCache(max_entries=2)
+    keys = [_key(cache, ThreadSearchQuery(guild_id=i)) for i in range(3)]
+    cache.put(keys[0], [0], cache.generation)
+    cache.put(keys[1], [1], cache.generation)
+    cache.get(keys[0])
+    cache.put(keys[2], [2], cache.generation)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+
+
+def test_flushes_only_invalidate_dependent_entries():
+    cache = SearchResultCache()
+    ucb = _key(cache, ThreadSearchQuery())
+    by_reply = _key(cache, ThreadSearchQuery(sort_method="reply_count"))
+    by_display = _key(cache, ThreadSearchQuery(sort_method="display_count"))
+    active_filter = _key(
+        cache, ThreadSearchQuery(sort_method="created_at", active_after="7d")
+    )
+    for key in (ucb, by_reply, by_display, active_filter):
+        cache.put(key, [1], cache.generation)
+
+    cache.invalidate_columns(frozenset({"display_count"}))
+    assert cache.get(by_display) is None
+    assert cache.get(ucb) is not None
+    assert cache.get(by_reply) is not None
+
+    # 查询期间依赖的列发生变化时不缓存，无关的列变化不影响写入
+    generation = cache.generation
+    cache.invalidate_columns(frozenset({"reply_count", "last_active_at"}))
+    assert cache.get(by_reply) is None
+    assert cache.get(active_filter) is None
+    cache.put(by_reply, [2], generation)
+    cache.put(by_display, [3], generation)
+    assert cache.get(by_reply) is None
+    assert list(cache.get(by_display)) == [3]
+    assert cache.get(ucb) is not None
@@ -0,0 +1,232 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Thread
+from search.cursor import decode_cursor, encode_cursor
+from search.search_service import SearchService
+from search.qo.thread_search import ThreadSearchQuery
+from search.result_cache import SearchResultCache
+from core.tag_cache_service import TagCacheService
+from core.thread_index_service import ThreadIndexService
+from shared.exceptions import InvalidSearchCursor
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+UCB_PARAMS = dict(
+    total_display_count=300, exploration_factor=1.414, strength_weight=5.0
+)
+
+
+@pytest_asyncio.fixture(scope="module")
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建包含重复排序值和空活跃时间的测试数据。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        for i in range(23):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=5000 + i,
+                    title=f"帖子{i}",
+                    author_id=i % 3,
+                    created_at=datetime(2025, 1, 1) + timedelta(hours=i),
+                    last_active_at=(
+                        None
+                        if i % 4 == 0
+                        else datetime(2025, 2, 1) + timedelta(days=i % 5)
+                    ),
+                    reaction_count=i % 6,
+                    reply_count=i % 3,
+                    display_count=i % 7 + 1,
+                )
+            )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def _collect_pages(factory, tag_service, query, limit, **service_kwargs):
+    """沿着游标翻完所有页"""
+    collected = []
+    totals = set()
+    cursor = None
+    while True:
+        async with factory() as session:
+            repo = SearchService(session, tag_service, **service_kwargs)
+            threads, total, cursor = await repo.search_threads_with_cursor(
+                query, limit=limit, cursor=cursor, **UCB_PARAMS
+            )
+        collected.extend(t.thread_id for t in threads)
+        totals.add(total)
+        if cursor is None:
+            return collected, totals
+
+
+@pytest.mark.parametrize(
+    "query_kwargs",
+    [
+        {},
+        {"sort_order": "asc"},
+        {"sort_method": "last_active_at"},
+        {"sort_method": "last_active_at", "sort_order": "asc"},
+        {"sort_method": "reaction_count"},
+        {"sort_method": "created_at", "include_authors": [1, 2]},
+    ],
+)
+@pytest.mark.asyncio
+async def test_keyset_pages_match_offset_order(db_session_factory, query_kwargs):
+    """键集分页拼接起来的结果应与一次性排序的结果完全一致。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    query = ThreadSearchQuery(**query_kwargs)
+
+    async with db_session_factory() as session:
+        repo = SearchService(session, tag_service)
+        threads, total = await repo.search_threads_with_count(
+            query, limit=100, **UCB_PARAMS
+        )
+    expected = [t.thread_id for t in threads]
+
+    collected, totals = await _collect_pages(db_session_factory, tag_service, query, 4)
+    assert collected == expected
+    assert totals == {total}
+
+
+@pytest.mark.asyncio
+async def test_offset_cursor_when_results_in_memory(db_session_factory):
+    """结果已在内存中时使用偏移量游标，结果同样一致。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    index = ThreadIndexService(db_session_factory)
+    await index.build()
+    query = ThreadSearchQuery(sort_method="created_at")
+
+    sql_pages, _ = await _collect_pages(db_session_factory, tag_service, query, 5)
+    index_pages, _ = await _collect_pages(
+        db_session_factory, tag_service, query, 5, thread_index=index
+    )
+    cached_pages, _ = await _collect_pages(
+        db_session_factory, tag_service, query, 5, result_cache=SearchResultCache()
+    )
+    assert index_pages == sql_pages
+    assert cached_pages == sql_pages
+
+
+@pytest.mark.asyncio
+async def test_cursor_rejects_other_query(db_session_factory):
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    async with db_session_factory() as session:
+        repo = SearchService(session, tag_service)
+        _, _, cursor = await repo.search_threads_with_cursor(
+            ThreadSearchQuery(), limit=3, **UCB_PARAMS
+        )
+        with pytest.raises(InvalidSearchCursor):
+            await repo.search_threads_with_cursor(
+                ThreadSearchQuery(sort_method="created_at"),
+                limit=3,
+                cursor=cursor,
+                **UCB_PARAMS,
+            )
+        with pytest.raises(InvalidSearchCursor):
+            await repo.search_threads_with_cursor(
+                ThreadSearchQuery(), limit=3, cursor="not-a-cursor", **UCB_PARAMS
+            )
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        lambda state: state.pop("k"),
+        lambda state: state.pop("i"),
+        lambda state: state.pop("n"),
+        lambda state: state.update(i="5"),
+        lambda state: state.update(k=[1]),
+        lambda state: state.update(t=None),
+        lambda state: state.update(x=["a"]),
+        lambda state: state.update(o="3"),
+        lambda state: state.update(o=-1),
+        lambda state: state.update(k={"$dt": "not-a-date"}),
+    ],
+)
+@pytest.mark.asyncio
+async def test_tampered_cursor_is_rejected(db_session_factory, tamper):
+    """被客户端修改过的游标应返回 InvalidSearchCursor，而不是在查询中出错。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    async with db_session_factory() as session:
+        repo = SearchService(session, tag_service)
+        _, _, cursor = await repo.search_threads_with_cursor(
+            ThreadSearchQuery(), limit=3, **UCB_PARAMS
+        )
+        state = decode_cursor(cursor)
+        tamper(state)
+        with pytest.raises(InvalidSearchCursor):
+            await repo.search_threads_with_cursor(
+                ThreadSearchQuery(),
+                limit=3,
+                cursor=encode_cursor(state),
+                **UCB_PARAMS,
+            )
+
+
+@pytest.mark.asyncio
+async def test_cursor_keeps_first_page_exclusions(db_session_factory):
+    """翻页时不再传 exclude_thread_ids，游标沿用首页的排除列表。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    query = ThreadSearchQuery(sort_method="created_at")
+    for service_kwargs in ({}, {"result_cache": SearchResultCache()}):
+        async with db_session_factory() as session:
+            repo = SearchService(session, tag_service, **service_kwargs)
+            all_threads, _ = await repo.search_threads_with_count(
+                query, limit=100, **UCB_PARAMS
+            )
+            excluded = [t.thread_id for t in all_threads[:3]]
+
+            first, total, cursor = await repo.search_threads_with_cursor(
+                query, limit=5, exclude_thread_ids=excluded, **UCB_PARAMS
+            )
+            second, second_total, _ = await repo.search_threads_with_cursor(
+                query, limit=5, cursor=cursor, **UCB_PARAMS
+            )
+
+        assert total == second_total == len(all_threads) - 3
+        assert [t.thread_id for t in first + second] == [
+            t.thread_id for t in all_threads[3:13]
+        ]
+
+
+@pytest.mark.asyncio
+async def test_first_page_fills_result_cache(db_session_factory):
+    """开启结果缓存时首页写入缓存，之后的翻页命中缓存。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    cache = SearchResultCache()
+    query = ThreadSearchQuery()
+
+    pages, _ = await _collect_pages(
+        db_session_factory, tag_service, query, 5, result_cache=cache
+    )
+    sql_pages, _ = await _collect_pages(db_session_factory, tag_service, query, 5)
+
+    assert pages == sql_pages
+    assert cache.misses == 1
+    assert cache.hits == len(pages) // 5 + (len(pages) % 5 > 0) - 1
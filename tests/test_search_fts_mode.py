@@ -0,0 +1,215 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, text
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from shared.fts5_tokenizer import register_jieba_tokenizer
+from models import Tag, Thread, ThreadTagLink
+from search import search_service
+from search.search_service import FTS_MODE_AUTO, FTS_MODE_SET, SearchService
+from search.qo.thread_search import ThreadSearchQuery
+from core.tag_cache_service import TagCacheService
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest_asyncio.fixture(scope="module")
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有 FTS 表和测试数据的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_conn, connection_record):
+        register_jieba_tokenizer(dbapi_conn._connection._conn)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            text(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS thread_fts USING fts5(
+                    title,
+                    first_message_excerpt,
+                    content='thread',
+                    content_rowid='id',
+                    tokenize = 'jieba'
+                );
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS thread_after_insert
+                AFTER INSERT ON thread BEGIN
+                    INSERT INTO thread_fts(rowid, title, first_message_excerpt)
+                    VALUES (new.id, new.title, new.first_message_excerpt);
+                END;
+                """
+            )
+        )
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    titles = [
+        "百合小说",
+        "纯爱小说分享",
+        "科幻推荐",
+        "百合破坏讨论",
+        "日常闲聊",
+        "禁止百合破坏的小说",
+    ]
+    async with factory() as session:
+        session.add_all(
+            [Tag(id=1, name="原创"), Tag(id=2, name="同人"), Tag(id=3, name="完结")]
+        )
+        for i in range(30):
+            session.add(
+                Thread(
+                    guild_id=9,
+                    channel_id=1 if i % 3 else 2,
+                    thread_id=1000 + i,
+                    title=titles[i % len(titles)],
+                    author_id=i % 4,
+                    created_at=BASE_TIME + timedelta(hours=i),
+                    last_active_at=BASE_TIME + timedelta(hours=(i * 7) % 30),
+                    reaction_count=(i * 13) % 17,
+                    reply_count=(i * 5) % 11,
+                    display_count=i * 3 + 1,
+                    not_found_count=1 if i % 10 == 9 else 0,
+                )
+            )
+        await session.commit()
+
+        for i in range(30):
+            row_id = i + 1
+            if i % 2 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=1))
+            if i % 3 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=2))
+            if i % 5 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=3))
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def _search(factory, tag_service, fts_mode, query, offset=0):
+    async with factory() as session:
+        repo = SearchService(session, tag_service, fts_mode=fts_mode)
+        threads, total = await repo.search_threads_with_count(
+            query,
+            limit=10,
+            offset=offset,
+            total_display_count=500,
+            exploration_factor=1.414,
+            strength_weight=5.0,
+        )
+    return [t.thread_id for t in threads], total
+
+
+@pytest.mark.parametrize(
+    "query_kwargs",
+    [
+        {"keywords": "小说"},
+        {"keywords": "小说, 百合"},
+        {"keywords": "科幻/纯爱"},
+        {"keywords": '"百合破坏"'},
+        {"keywords": "不存在的词"},
+        {"keywords": "小说, 科幻"},
+        {"exclude_keywords": "百合"},
+        {"exclude_keywords": "百合", "exclude_keyword_exemption_markers": []},
+        {"keywords": "小说", "exclude_keywords": "纯爱"},
+        {"keywords": "百合", "exclude_keywords": "破坏", "include_tags": ["原创"]},
+        {"keywords": "小说", "sort_method": "created_at", "channel_ids": [1]},
+    ],
+)
+@pytest.mark.parametrize("selective_hit_limit", [0, 5, 1000])
+@pytest.mark.asyncio
+async def test_inline_fts_matches_set_mode(
+    db_session_factory, query_kwargs, selective_hit_limit, monkeypatch
+):
+    """
+    自动模式与集合模式返回相同的总数和顺序。
+    阈值为 0 时所有关键词组都折叠为子查询，为 1000 时都由探测到的 ID 驱动，为 5 时两者混合。
+    """
+    monkeypatch.setattr(search_service, "FTS_SELECTIVE_HIT_LIMIT", selective_hit_limit)
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+
+    for offset in (0, 10):
+        expected = await _search(
+            db_session_factory,
+            tag_service,
+            FTS_MODE_SET,
+            ThreadSearchQuery(**query_kwargs),
+            offset=offset,
+        )
+        actual = await _search(
+            db_session_factory,
+            tag_service,
+            FTS_MODE_AUTO,
+            ThreadSearchQuery(**query_kwargs),
+            offset=offset,
+        )
+        assert actual == expected
+
+
+@pytest.mark.asyncio
+async def test_inline_fts_uses_compound_subquery(db_session_factory, monkeypatch):
+    """命中数较多时，多个 AND 组编译为 INTERSECT/EXCEPT 子查询。"""
+    monkeypatch.setattr(search_service, "FTS_SELECTIVE_HIT_LIMIT", 0)
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+    async with db_session_factory() as session:
+        repo = SearchService(session, tag_service, fts_mode=FTS_MODE_AUTO)
+        plan = await repo._build_search_plan(
+            ThreadSearchQuery(keywords="小说, 百合", exclude_keywords="破坏"),
+            total_display_count=500,
+            exploration_factor=1.414,
+            strength_weight=5.0,
+        )
+    assert plan is not None and plan.statement is not None
+    sql = str(plan.statement.compile())
+    assert "INTERSECT" in sql
+    assert "EXCEPT" in sql
+
+
+@pytest.mark.asyncio
+async def test_selective_keyword_drives_query_with_ids(db_session_factory):
+    """命中数较少的关键词组由探测查询取回的 ID 驱动，不再内联子查询。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+    async with db_session_factory() as session:
+        repo = SearchService(session, tag_service, fts_mode=FTS_MODE_AUTO)
+        plan = await repo._build_search_plan(
+            ThreadSearchQuery(keywords="科幻", exclude_keywords="破坏"),
+            total_display_count=500,
+            exploration_factor=1.414,
+            strength_weight=5.0,
+        )
+    assert plan is not None and plan.statement is not None
+    sql = str(plan.statement.compile(compile_kwargs={"literal_binds": True}))
+    assert "INTERSECT" not in sql
+    assert "EXCEPT" not in sql
+    assert "MATCH" in sql  # 排除关键词仍以子查询过滤
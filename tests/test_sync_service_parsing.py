@@ -0,0 +1,257 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from datetime import datetime, timezone
+
+import discord
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Author
+from core.sync_service import SyncService
+from core.thread_upsert_buffer import ThreadUpsertBuffer
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+REPOST_CHANNEL_ID = 555
+REBUILD_CONTENT = (
+    "发帖人: <@42>\n"
+    "原始创建时间: 2024年3月5日 20:30\n"
+    "补档: 1. [图片](https://discord.com/channels/1/555/{message_id})"
+)
+SECOND_FLOOR = (
+    "正文第一行\n-# 👍 12 | 🔥 30\n-# 📎 a.png (1 MB)\n-# (已编辑)\n正文第二行"
+)
+
+
+class FakeScheduler:
+    async def submit(self, *, coro_factory, priority, **kwargs):
+        return await coro_factory()
+
+
+class FakeRepostChannel(discord.abc.Messageable):
+    """只实现 fetch_message 的补档频道"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def _get_channel(self):
+        return self
+
+    async def fetch_message(self, message_id: int):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return SimpleNamespace(
+            attachments=[
+                SimpleNamespace(
+                    url=f"https://cdn.example.com/{message_id}.png",
+                    filename=f"{message_id}.png",
+                    content_type="image/png",
+                )
+            ],
+            embeds=[],
+        )
+
+
+class FakeBot:
+    def __init__(self):
+        self.api_scheduler = FakeScheduler()
+        self.repost_channel = FakeRepostChannel()
+        self.channel_fetches = 0
+
+    def get_channel(self, channel_id):
+        return None
+
+    def get_user(self, user_id):
+        return None
+
+    async def fetch_channel(self, channel_id):
+        self.channel_fetches += 1
+        return self.repost_channel
+
+
+class FakeThread:
+    def __init__(self, thread_id: int, messages: list):
+        self.id = thread_id
+        self.name = f"帖子{thread_id}"
+        self.owner_id = 1
+        self.owner = None
+        self.guild = SimpleNamespace(id=1, get_member=lambda user_id: None)
+        self.parent_id = 10
+        self.created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.last_message_id = None
+        self.message_count = 2
+        self.messages = messages
+
+    async def history(self, limit, oldest_first):
+        for message in self.messages[:limit]:
+            yield message
+
+
+def make_rebuild_thread(thread_id: int) -> FakeThread:
+    return FakeThread(
+        thread_id,
+        [
+            SimpleNamespace(
+                content=REBUILD_CONTENT.format(message_id=thread_id),
+                reactions=[SimpleNamespace(count=2)],
+                attachments=[],
+                embeds=[],
+            ),
+            SimpleNamespace(
+                content=SECOND_FLOOR, reactions=[], attachments=[], embeds=[]
+            ),
+        ],
+    )
+
+
+class RecordingBuffer:
+    def __init__(self):
+        self.authors = []
+
+    def add_author(self, author_id, guild, source_member=None):
+        self.authors.append(author_id)
+
+
+def make_user(user_id: int, name: str):
+    return SimpleNamespace(
+        id=user_id,
+        name=name,
+        global_name=None,
+        display_name=name,
+        display_avatar=SimpleNamespace(url=f"https://cdn.example.com/{user_id}"),
+    )
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建一个空的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_rebuild_thread_is_parsed(db_session_factory):
+    service = SyncService(FakeBot(), db_session_factory)  # type: ignore
+    buffer = RecordingBuffer()
+
+    data = await service._parse_thread_data(make_rebuild_thread(7), buffer)  # type: ignore
+
+    assert data is not None
+    assert data["author_id"] == 42
+    assert data["created_at"] == datetime(2024, 3, 5, 12, 30, tzinfo=timezone.utc)
+    assert data["thumbnail_urls"] == ["https://cdn.example.com/7.png"]
+    # 首楼反应数加上第二楼中记录的原反应数
+    assert data["reaction_count"] == 32
+    assert data["first_message_excerpt"] == "正文第一行\n正文第二行"
+    # 有缓冲区时作者交给缓冲区批量写入
+    assert buffer.authors == [42]
+
+
+@pytest.mark.asyncio
+async def test_repost_fetches_are_bounded_and_share_channel(db_session_factory):
+    bot = FakeBot()
+    service = SyncService(bot, db_session_factory, repost_fetch_concurrency=2)  # type: ignore
+
+    results = await asyncio.gather(
+        *(
+            service._parse_thread_data(make_rebuild_thread(i), RecordingBuffer())  # type: ignore
+            for i in range(10)
+        )
+    )
+
+    assert all(result is not None for result in results)
+    assert bot.channel_fetches == 1
+    assert bot.repost_channel.peak <= 2
+
+
+@pytest.mark.asyncio
+async def test_buffer_writes_each_author_once(db_session_factory):
+    sync_service = SyncService(FakeBot(), db_session_factory)  # type: ignore
+    buffer = ThreadUpsertBuffer(sync_service)  # type: ignore
+    guild = SimpleNamespace(get_member=lambda user_id: None)
+
+    buffer.add_author(1, guild, make_user(1, "alice"))  # type: ignore
+    buffer.add_author(2, guild, make_user(2, "bob"))  # type: ignore
+    await buffer.flush()
+    # 同一次索引中再次出现的作者不会重复写入
+    buffer.add_author(1, guild, make_user(1, "alice-renamed"))  # type: ignore
+    await buffer.flush()
+
+    async with db_session_factory() as session:
+        authors = (await session.execute(select(Author))).scalars().all()
+    assert {a.id: a.name for a in authors} == {1: "alice", 2: "bob"}
+
+
+class DispatchingBot(FakeBot):
+    def __init__(self):
+        super().__init__()
+        self.tag_cache_service = None
+        self.dispatched = []
+
+    def dispatch(self, event, *args):
+        self.dispatched.append((event, args))
+
+
+@pytest.mark.asyncio
+async def test_buffer_auto_follows_in_background(db_session_factory):
+    sync_service = SyncService(DispatchingBot(), db_session_factory)  # type: ignore
+    buffer = ThreadUpsertBuffer(sync_service, batch_size=10)  # type: ignore
+    release = asyncio.Event()
+    running = 0
+    peak = 0
+    followed = []
+
+    async def fake_auto_follow(thread):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        followed.append(thread.id)
+
+    sync_service._auto_follow_on_first_detect = fake_auto_follow  # type: ignore
+    for thread_id in (1001, 1002, 1003):
+        await buffer.add(
+            FakeThread(thread_id, []),  # type: ignore
+            {
+                "channel_id": 10,
+                "thread_id": thread_id,
+                "title": f"帖子{thread_id}",
+                "author_id": 1,
+                "created_at": datetime(2025, 1, 1),
+            },
+            {},
+        )
+
+    # 写入不等待获取成员，各帖子的自动关注并发执行
+    await asyncio.wait_for(buffer.flush(), timeout=1)
+    await asyncio.sleep(0)
+    assert peak == 3
+    assert followed == []
+
+    release.set()
+    await buffer.wait_for_follows()
+    assert sorted(followed) == [1001, 1002, 1003]
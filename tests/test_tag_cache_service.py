@@ -0,0 +1,197 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Tag, Thread, ThreadTagLink
+from search.search_service import SearchService
+from search.qo.thread_search import ThreadSearchQuery
+from core.tag_cache_service import TagCacheService, bitmap_to_ids, ids_to_bitmap
+from core.thread_service import ThreadService
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+@pytest_asyncio.fixture(scope="function")
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有标签测试数据的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        # 标签 11 和 12 同名，模拟不同频道下的同名标签
+        session.add_all(
+            [
+                Tag(id=11, name="原创"),
+                Tag(id=12, name="原创"),
+                Tag(id=2, name="同人"),
+                Tag(id=3, name="完结"),
+            ]
+        )
+        for i in range(20):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=1000 + i,
+                    title=f"帖子{i}",
+                    author_id=1,
+                    created_at=datetime(2025, 1, 1) + timedelta(hours=i),
+                )
+            )
+        await session.commit()
+        for i in range(20):
+            row_id = i + 1
+            if i % 2 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=11 if i % 4 else 12))
+            if i % 3 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=2))
+            if i % 5 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=3))
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def _search_ids(factory, tag_service, **query_kwargs):
+    async with factory() as session:
+        repo = SearchService(session, tag_service)
+        threads, total = await repo.search_threads_with_count(
+            ThreadSearchQuery(sort_method="created_at", **query_kwargs),
+            limit=50,
+            total_display_count=1,
+            exploration_factor=1.0,
+            strength_weight=1.0,
+        )
+    return [t.thread_id for t in threads], total
+
+
+def test_bitmap_roundtrip():
+    ids = [0, 1, 5, 64, 65, 1000]
+    assert bitmap_to_ids(ids_to_bitmap(ids)) == ids
+    assert bitmap_to_ids(0) == []
+
+
+@pytest.mark.parametrize(
+    "query_kwargs",
+    [
+        {"include_tags": ["原创", "同人"], "tag_logic": "and"},
+        {"include_tags": ["原创", "完结"], "tag_logic": "or"},
+        {"include_tags": ["原创"], "exclude_tags": ["同人"]},
+        {"exclude_tags": ["完结", "同人"]},
+        {"include_tags": ["不存在的标签"]},
+    ],
+)
+@pytest.mark.asyncio
+async def test_bitmap_filter_matches_exists_filter(db_session_factory, query_kwargs):
+    """位图过滤与 EXISTS 子查询过滤应返回相同的结果。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+    assert tag_service.postings_ready
+
+    bitmap_result = await _search_ids(db_session_factory, tag_service, **query_kwargs)
+
+    tag_service._postings_ready = False
+    exists_result = await _search_ids(db_session_factory, tag_service, **query_kwargs)
+
+    assert bitmap_result == exists_result
+
+
+@pytest.mark.asyncio
+async def test_thread_service_updates_postings(db_session_factory):
+    """ThreadService 写入标签后，位图应同步更新。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+
+    async with db_session_factory() as session:
+        repo = ThreadService(session, tag_cache_service=tag_service)
+        await repo.add_or_update_thread_with_tags(
+            thread_data={
+                "channel_id": 1,
+                "thread_id": 1000,
+                "title": "帖子0",
+                "author_id": 1,
+                "created_at": datetime(2025, 1, 1),
+            },
+            tags_data={3: "完结"},
+        )
+        await repo.add_or_update_thread_with_tags(
+            thread_data={
+                "channel_id": 1,
+                "thread_id": 2000,
+                "title": "新帖子",
+                "author_id": 1,
+                "created_at": datetime(2025, 2, 1),
+            },
+            tags_data={2: "同人"},
+        )
+
+    ids, _ = await _search_ids(db_session_factory, tag_service, include_tags=["同人"])
+    assert 2000 in ids
+    assert 1000 not in ids
+    assert 1 not in bitmap_to_ids(tag_service.get_tag_bitmap([12]))
+
+    async with db_session_factory() as session:
+        repo = ThreadService(session, tag_cache_service=tag_service)
+        await repo.delete_thread_index(thread_id=2000)
+
+    ids, _ = await _search_ids(db_session_factory, tag_service, include_tags=["同人"])
+    assert 2000 not in ids
+
+
+@pytest.mark.asyncio
+async def test_refresh_threads_follows_other_writers(db_session_factory):
+    """其他进程写入的标签变化，按帖子 ID 刷新后位图应与数据库一致。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+
+    # 不经过本进程的 TagCacheService 修改标签
+    async with db_session_factory() as session:
+        repo = ThreadService(session)
+        await repo.add_or_update_thread_with_tags(
+            thread_data={
+                "channel_id": 1,
+                "thread_id": 1000,
+                "title": "帖子0",
+                "author_id": 1,
+                "created_at": datetime(2025, 1, 1),
+            },
+            tags_data={},
+        )
+        await repo.add_or_update_thread_with_tags(
+            thread_data={
+                "channel_id": 1,
+                "thread_id": 2000,
+                "title": "新帖子",
+                "author_id": 1,
+                "created_at": datetime(2025, 2, 1),
+            },
+            tags_data={2: "同人"},
+        )
+    ids, _ = await _search_ids(db_session_factory, tag_service, include_tags=["同人"])
+    assert 2000 not in ids
+
+    await tag_service.refresh_threads([1000, 2000])
+
+    ids, _ = await _search_ids(db_session_factory, tag_service, include_tags=["同人"])
+    assert 2000 in ids
+    assert 1000 not in ids
+    assert 1 not in bitmap_to_ids(tag_service.get_tag_bitmap([12, 2, 3]))
@@ -0,0 +1,167 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Tag, Thread, ThreadFollow, ThreadTagLink
+from core.thread_service import ThreadService
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def make_thread_data(thread_id: int, **overrides) -> dict:
+    data = {
+        "thread_id": thread_id,
+        "guild_id": 1,
+        "channel_id": 10,
+        "title": f"帖子{thread_id}",
+        "author_id": 7,
+        "created_at": BASE_TIME + timedelta(hours=thread_id % 100),
+        "last_active_at": BASE_TIME + timedelta(hours=thread_id % 100),
+        "reaction_count": 3,
+        "reply_count": 5,
+        "not_found_count": 0,
+        "first_message_excerpt": "摘要",
+        "thumbnail_urls": [f"https://example.com/{thread_id}.png"],
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建一个空的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_inserts_new_threads_with_defaults(db_session_factory):
+    items = [
+        (make_thread_data(1001), {1: "标签A", 2: "标签B"}),
+        (make_thread_data(1002), {2: "标签B"}),
+    ]
+    async with db_session_factory() as session:
+        row_ids = await ThreadService(session).bulk_upsert_threads_with_tags(items)
+
+    assert set(row_ids) == {1001, 1002}
+
+    async with db_session_factory() as session:
+        threads = (await session.execute(select(Thread))).scalars().all()
+        by_thread_id = {t.thread_id: t for t in threads}
+        assert by_thread_id[1001].id == row_ids[1001]
+        assert by_thread_id[1001].display_count == 0
+        assert by_thread_id[1001].thumbnail_urls == ["https://example.com/1001.png"]
+
+        tags = (await session.execute(select(Tag))).scalars().all()
+        assert {t.id: t.name for t in tags} == {1: "标签A", 2: "标签B"}
+
+        links = (await session.execute(select(ThreadTagLink))).scalars().all()
+        assert {(link.thread_id, link.tag_id) for link in links} == {
+            (row_ids[1001], 1),
+            (row_ids[1001], 2),
+            (row_ids[1002], 2),
+        }
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_updates_existing_rows_and_keeps_votes(
+    db_session_factory,
+):
+    async with db_session_factory() as session:
+        row_ids = await ThreadService(session).bulk_upsert_threads_with_tags(
+            [(make_thread_data(1001), {1: "标签A", 2: "标签B"})]
+        )
+    row_id = row_ids[1001]
+
+    # 模拟用户投票和展示次数累积
+    async with db_session_factory() as session:
+        link = await session.get(ThreadTagLink, (row_id, 1))
+        assert link is not None
+        link.upvotes = 4
+        thread = await session.get(Thread, row_id)
+        assert thread is not None
+        thread.display_count = 42
+        await session.commit()
+
+    async with db_session_factory() as session:
+        new_row_ids = await ThreadService(session).bulk_upsert_threads_with_tags(
+            [
+                (
+                    make_thread_data(1001, title="新标题", reaction_count=9),
+                    {1: "标签A", 3: "标签C"},
+                ),
+                (make_thread_data(1002), {}),
+            ]
+        )
+    assert new_row_ids[1001] == row_id
+
+    async with db_session_factory() as session:
+        thread = await session.get(Thread, row_id)
+        assert thread is not None
+        assert thread.title == "新标题"
+        assert thread.reaction_count == 9
+        # 同步数据中没有的字段不会被覆盖
+        assert thread.display_count == 42
+
+        links = (
+            (
+                await session.execute(
+                    select(ThreadTagLink).where(ThreadTagLink.thread_id == row_id)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        assert {link.tag_id: link.upvotes for link in links} == {1: 4, 3: 0}
+
+
+@pytest.mark.asyncio
+async def test_bulk_upsert_keeps_last_duplicate(db_session_factory):
+    items = [
+        (make_thread_data(1001, title="旧"), {1: "标签A"}),
+        (make_thread_data(1001, title="新"), {2: "标签B"}),
+    ]
+    async with db_session_factory() as session:
+        row_ids = await ThreadService(session).bulk_upsert_threads_with_tags(items)
+
+    async with db_session_factory() as session:
+        thread = await session.get(Thread, row_ids[1001])
+        assert thread is not None
+        assert thread.title == "新"
+        links = (await session.execute(select(ThreadTagLink))).scalars().all()
+        assert [link.tag_id for link in links] == [2]
+
+
+@pytest.mark.asyncio
+async def test_get_followed_thread_ids(db_session_factory):
+    async with db_session_factory() as session:
+        session.add(ThreadFollow(user_id=1, thread_id=1001))
+        session.add(ThreadFollow(user_id=2, thread_id=1001))
+        await session.commit()
+
+    async with db_session_factory() as session:
+        followed = await ThreadService(session).get_followed_thread_ids([1001, 1002])
+    assert followed == {1001}
@@ -0,0 +1,232 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, text
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from shared.fts5_tokenizer import register_jieba_tokenizer
+from models import Tag, Thread, ThreadTagLink
+from search.search_service import SearchService
+from search.qo.thread_search import ThreadSearchQuery
+from core.tag_cache_service import TagCacheService
+from core.thread_index_service import ThreadIndexService
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest_asyncio.fixture(scope="module")
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有 FTS 表和测试数据的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_conn, connection_record):
+        register_jieba_tokenizer(dbapi_conn._connection._conn)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.execute(
+            text(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS thread_fts USING fts5(
+                    title,
+                    first_message_excerpt,
+                    content='thread',
+                    content_rowid='id',
+                    tokenize = 'jieba'
+                );
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+                CREATE TRIGGER IF NOT EXISTS thread_after_insert
+                AFTER INSERT ON thread BEGIN
+                    INSERT INTO thread_fts(rowid, title, first_message_excerpt)
+                    VALUES (new.id, new.title, new.first_message_excerpt);
+                END;
+                """
+            )
+        )
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    titles = ["百合小说", "纯爱小说分享", "科幻推荐", "百合破坏讨论", "日常闲聊"]
+    async with factory() as session:
+        session.add_all(
+            [Tag(id=1, name="原创"), Tag(id=2, name="同人"), Tag(id=3, name="完结")]
+        )
+        for i in range(30):
+            session.add(
+                Thread(
+                    guild_id=9,
+                    channel_id=1 if i % 3 else 2,
+                    thread_id=1000 + i,
+                    title=titles[i % len(titles)],
+                    author_id=i % 4,
+                    created_at=BASE_TIME + timedelta(hours=i),
+                    last_active_at=BASE_TIME + timedelta(hours=(i * 7) % 30),
+                    reaction_count=(i * 13) % 17,
+                    reply_count=(i * 5) % 11,
+                    display_count=i * 3 + 1,
+                    not_found_count=1 if i % 10 == 9 else 0,
+                )
+            )
+        await session.commit()
+
+        for i in range(30):
+            row_id = i + 1
+            if i % 2 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=1))
+            if i % 3 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=2))
+            if i % 5 == 0:
+                session.add(ThreadTagLink(thread_id=row_id, tag_id=3))
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def _search(factory, tag_service, index, query, limit=8, offset=0):
+    async with factory() as session:
+        repo = SearchService(session, tag_service, index)
+        threads, total = await repo.search_threads_with_count(
+            query,
+            limit=limit,
+            offset=offset,
+            total_display_count=500,
+            exploration_factor=1.414,
+            strength_weight=5.0,
+        )
+    return [t.thread_id for t in threads], total
+
+
+@pytest.mark.parametrize(
+    "query_kwargs",
+    [
+        {},
+        {"sort_method": "created_at"},
+        {"sort_method": "created_at", "sort_order": "asc"},
+        {"sort_method": "last_active_at"},
+        {"channel_ids": [1], "sort_method": "created_at"},
+        {
+            "include_tags": ["原创", "同人"],
+            "tag_logic": "and",
+            "sort_method": "created_at",
+        },
+        {
+            "include_tags": ["原创", "完结"],
+            "tag_logic": "or",
+            "sort_method": "created_at",
+        },
+        {"exclude_tags": ["同人"], "sort_method": "created_at"},
+        {"include_authors": [1, 2], "sort_method": "created_at"},
+        {"exclude_authors": [0], "sort_method": "created_at"},
+        {"reaction_count_range": "[3, 10)", "sort_method": "created_at"},
+        {"reply_count_range": "(2, 8]", "sort_method": "created_at"},
+        {"created_after": "2025-01-02", "sort_method": "created_at"},
+        {"active_before": "2025-01-02", "sort_method": "created_at"},
+        {"keywords": "小说", "sort_method": "created_at"},
+        {
+            "exclude_keywords": "百合",
+            "exclude_keyword_exemption_markers": [],
+            "sort_method": "created_at",
+        },
+    ],
+)
+@pytest.mark.asyncio
+async def test_index_matches_sql(db_session_factory, query_kwargs):
+    """内存索引路径与 SQL 路径应返回相同的总数和顺序。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+    index = ThreadIndexService(db_session_factory)
+    await index.build()
+
+    for offset in (0, 8):
+        sql_result = await _search(
+            db_session_factory,
+            tag_service,
+            None,
+            ThreadSearchQuery(**query_kwargs),
+            offset=offset,
+        )
+        index_result = await _search(
+            db_session_factory,
+            tag_service,
+            index,
+            ThreadSearchQuery(**query_kwargs),
+            offset=offset,
+        )
+        assert index_result == sql_result
+
+
+@pytest.mark.asyncio
+async def test_index_incremental_updates(db_session_factory):
+    """增量更新后，索引排序应反映新的数据。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+    index = ThreadIndexService(db_session_factory)
+    await index.build()
+
+    query = ThreadSearchQuery(sort_method="reply_count", channel_ids=[2])
+    ids, total = await _search(db_session_factory, tag_service, index, query)
+    last_thread_id = ids[-1]
+
+    index.apply_activity_updates(
+        {last_thread_id: {"increment": 100, "last_active_at": None}}
+    )
+    new_ids, new_total = await _search(db_session_factory, tag_service, index, query)
+    assert new_total == total
+    assert new_ids[0] == last_thread_id
+
+    # 数据库中不存在的帖子刷新后应从索引中移除
+    await index.refresh_threads(thread_ids=[last_thread_id, 999999])
+    assert len(index) == 30
+
+
+@pytest.mark.asyncio
+async def test_index_reconcile_reuses_slots(db_session_factory):
+    """对账只补齐缺少的帖子，删除后空出的位置会被复用。"""
+    tag_service = TagCacheService(session_factory=db_session_factory)
+    await tag_service.build_cache()
+    index = ThreadIndexService(db_session_factory)
+    await index.build()
+
+    query = ThreadSearchQuery(include_tags=["原创"], sort_method="created_at")
+    expected = await _search(db_session_factory, tag_service, index, query)
+
+    # 模拟漏掉的事件：两个帖子从快照中丢失
+    columns = index._columns
+    for thread_id in (1000, 1002):
+        columns.kill(columns.pos_by_thread_id[thread_id])
+    assert len(index) == 28
+    assert (await _search(db_session_factory, tag_service, index, query))[1] == (
+        expected[1] - 2
+    )
+
+    await index.on_index_updated()
+
+    assert len(index) == 30
+    assert len(columns.row_ids) == 30
+    assert index._columns is columns
+    assert await _search(db_session_factory, tag_service, index, query) == expected
@@ -0,0 +1,207 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Thread
+from core.thumbnail_refresh_service import (
+    ThumbnailRefreshService,
+    earliest_expiry,
+    parse_expiry,
+)
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+NOW = 1_700_000_000
+
+
+def cdn_url(name: str, expiry: int) -> str:
+    return f"https://cdn.discordapp.com/attachments/1/2/{name}.png?ex={expiry:x}&is=0&hm=abc"
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.priorities = []
+
+    async def submit(self, *, coro_factory, priority, **kwargs):
+        self.priorities.append(priority)
+        return await coro_factory()
+
+
+class FakeHTTP:
+    """把链接的过期时间推后一天，fail=True 时模拟请求失败"""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+        self.fail = False
+
+    async def request(self, route, *, json):
+        self.batches.append(json["attachment_urls"])
+        if self.fail:
+            raise RuntimeError("boom")
+        return {
+            "refreshed_urls": [
+                {
+                    "original": url,
+                    "refreshed": url.replace(
+                        f"ex={parse_expiry(url):x}", f"ex={parse_expiry(url) + 86400:x}"
+                    ),
+                }
+                for url in json["attachment_urls"]
+            ]
+        }
+
+
+class FakeBot:
+    def __init__(self):
+        self.api_scheduler = FakeScheduler()
+        self.http = FakeHTTP()
+
+
+THUMBNAILS = {
+    # 30 分钟后过期，在提前量之内
+    1001: [cdn_url("a", NOW + 1800), "https://example.com/external.png"],
+    # 10 小时后过期
+    1002: [cdn_url("b", NOW + 36000)],
+    # 没有签名的链接不跟踪
+    1003: ["https://example.com/cover.png"],
+    1004: [],
+}
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        for thread_id, urls in THUMBNAILS.items():
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=thread_id,
+                    title=f"帖子{thread_id}",
+                    author_id=1,
+                    created_at=datetime(2025, 1, 1),
+                    thumbnail_urls=urls,
+                )
+            )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def get_thumbnails(factory) -> dict[int, list[str]]:
+    async with factory() as session:
+        result = await session.execute(select(Thread.thread_id, Thread.thumbnail_urls))
+        return {thread_id: urls for thread_id, urls in result.all()}
+
+
+def test_parse_expiry():
+    assert parse_expiry(cdn_url("a", NOW)) == NOW
+    assert parse_expiry(f"https://media.discordapp.net/x.png?ex={NOW:x}") == NOW
+    assert parse_expiry(f"https://example.com/x.png?ex={NOW:x}") is None
+    assert parse_expiry("https://cdn.discordapp.com/x.png") is None
+    assert parse_expiry("https://cdn.discordapp.com/x.png?ex=zz") is None
+    assert earliest_expiry([cdn_url("a", NOW + 5), cdn_url("b", NOW + 2)]) == NOW + 2
+    assert earliest_expiry(["https://example.com/x.png"]) is None
+
+
+@pytest.mark.asyncio
+async def test_due_threads_are_refreshed_in_bulk(db_session_factory):
+    bot = FakeBot()
+    service = ThumbnailRefreshService(bot, db_session_factory, lead_time=3600)  # type: ignore
+    await service.load()
+    assert service.tracked_count == 2
+
+    assert await service.refresh_due(now=NOW) == 1
+
+    assert bot.http.batches == [[THUMBNAILS[1001][0]]]
+    assert bot.api_scheduler.priorities == [20]
+    thumbnails = await get_thumbnails(db_session_factory)
+    assert thumbnails[1001] == [
+        cdn_url("a", NOW + 1800 + 86400),
+        "https://example.com/external.png",
+    ]
+    assert thumbnails[1002] == THUMBNAILS[1002]
+
+    # 新链接重新入堆，短时间内不会再次刷新
+    assert service.tracked_count == 2
+    assert await service.refresh_due(now=NOW + 60) == 0
+    assert len(bot.http.batches) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_is_retried(db_session_factory):
+    bot = FakeBot()
+    service = ThumbnailRefreshService(bot, db_session_factory, lead_time=3600)  # type: ignore
+    await service.load()
+
+    bot.http.fail = True
+    assert await service.refresh_due(now=NOW) == 0
+    assert (await get_thumbnails(db_session_factory))[1001] == THUMBNAILS[1001]
+
+    bot.http.fail = False
+    assert await service.refresh_due(now=NOW + 60) == 1
+    assert len(bot.http.batches) == 2
+
+
+@pytest.mark.asyncio
+async def test_batches_are_limited_to_fifty_urls(db_session_factory):
+    bot = FakeBot()
+    service = ThumbnailRefreshService(bot, db_session_factory, lead_time=3600)  # type: ignore
+    async with db_session_factory() as session:
+        for i in range(120):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=5000 + i,
+                    title="帖子",
+                    author_id=1,
+                    created_at=datetime(2025, 1, 1),
+                    thumbnail_urls=[cdn_url(f"bulk{i}", NOW + 60)],
+                )
+            )
+        await session.commit()
+    await service.load()
+
+    assert await service.refresh_due(now=NOW) == 121
+
+    assert [len(batch) for batch in bot.http.batches] == [50, 50, 21]
+
+
+@pytest.mark.asyncio
+async def test_synced_threads_replace_stale_heap_entries(db_session_factory):
+    bot = FakeBot()
+    service = ThumbnailRefreshService(bot, db_session_factory, lead_time=3600)  # type: ignore
+    await service.load()
+
+    # 帖子重新同步后有了新的链接，旧的堆条目应被丢弃
+    async with db_session_factory() as session:
+        thread = (
+            await session.execute(select(Thread).where(Thread.thread_id == 1001))
+        ).scalar_one()
+        thread.thumbnail_urls = [cdn_url("new", NOW + 86400)]
+        await session.commit()
+    await service.on_threads_synced([1001])
+
+    assert service.pop_due(NOW) == []
+    assert service.pop_due(NOW + 86400) == [1002, 1001]
@@ -0,0 +1,175 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timedelta
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select, update
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import BotConfig, Thread
+from search.search_service import SearchService
+from search.qo.thread_search import ThreadSearchQuery
+from core.tag_cache_service import TagCacheService
+from core import ucb_score_service
+from core.ucb_score_service import UcbScoreService
+from shared.enum.search_config_type import SearchConfigType
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有测试帖子和 UCB1 配置的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async with factory() as session:
+        session.add_all(
+            [
+                BotConfig(
+                    type=SearchConfigType.TOTAL_DISPLAY_COUNT,
+                    type_str="N",
+                    value_int=500,
+                ),
+                BotConfig(
+                    type=SearchConfigType.UCB1_EXPLORATION_FACTOR,
+                    type_str="C",
+                    value_float=1.414,
+                ),
+                BotConfig(
+                    type=SearchConfigType.STRENGTH_WEIGHT,
+                    type_str="W",
+                    value_float=5.0,
+                ),
+            ]
+        )
+        for i in range(20):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=1000 + i,
+                    title=f"帖子{i}",
+                    author_id=i % 3,
+                    created_at=BASE_TIME + timedelta(hours=i),
+                    reaction_count=(i * 13) % 17,
+                    display_count=(i * 7) % 23,
+                )
+            )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def _search(factory, scorer):
+    tag_service = TagCacheService(session_factory=factory)
+    async with factory() as session:
+        repo = SearchService(session, tag_service, ucb_score_service=scorer)
+        threads, total = await repo.search_threads_with_count(
+            ThreadSearchQuery(),
+            limit=20,
+            offset=0,
+            total_display_count=500,
+            exploration_factor=1.414,
+            strength_weight=5.0,
+        )
+    return [t.thread_id for t in threads]
+
+
+@pytest.mark.asyncio
+async def test_materialized_score_matches_live_ranking(db_session_factory):
+    """物化分数排序应与实时计算的 UCB1 排序一致。"""
+    scorer = UcbScoreService(db_session_factory)
+    assert not scorer.ready
+
+    live = await _search(db_session_factory, None)
+    # 首次全量重算之前退回实时计算
+    assert await _search(db_session_factory, scorer) == live
+
+    await scorer.rescore_all()
+    assert scorer.ready
+    assert await _search(db_session_factory, scorer) == live
+
+
+@pytest.mark.asyncio
+async def test_incremental_rescore(db_session_factory):
+    """展示次数回写和帖子同步后只重算受影响的帖子。"""
+    scorer = UcbScoreService(db_session_factory)
+    await scorer.rescore_all()
+
+    async with db_session_factory() as session:
+        await session.execute(
+            update(Thread).where(Thread.id == 1).values(display_count=400)
+        )
+        await session.execute(
+            update(Thread).where(Thread.thread_id == 1005).values(reaction_count=90)
+        )
+        await session.commit()
+
+    await scorer.on_impressions_flushed({1: 400})
+    await scorer.on_threads_synced([1005])
+    assert await _search(db_session_factory, scorer) == await _search(
+        db_session_factory, None
+    )
+
+
+@pytest.mark.asyncio
+async def test_config_change_triggers_full_rescore(db_session_factory):
+    """修改权重后全量重算。"""
+    scorer = UcbScoreService(db_session_factory)
+    await scorer.rescore_all()
+
+    async with db_session_factory() as session:
+        before = dict(
+            (await session.execute(select(Thread.id, Thread.ucb_score))).all()
+        )
+        await session.execute(
+            update(BotConfig)
+            .where(BotConfig.type == SearchConfigType.STRENGTH_WEIGHT)
+            .values(value_float=10.0)
+        )
+        await session.commit()
+
+    await scorer.on_config_updated()
+
+    async with db_session_factory() as session:
+        after = dict((await session.execute(select(Thread.id, Thread.ucb_score))).all())
+    changed = [row_id for row_id in before if before[row_id] != after[row_id]]
+    assert changed
+
+
+@pytest.mark.asyncio
+async def test_full_rescore_is_chunked(db_session_factory, monkeypatch):
+    """全量重算分段提交，所有帖子都会被覆盖。"""
+    monkeypatch.setattr(ucb_score_service, "RESCORE_ALL_CHUNK_SIZE", 3)
+    async with db_session_factory() as session:
+        await session.execute(update(Thread).values(ucb_score=-1.0))
+        await session.commit()
+
+    scorer = UcbScoreService(db_session_factory)
+    await scorer.rescore_all()
+
+    async with db_session_factory() as session:
+        scores = (await session.execute(select(Thread.ucb_score))).scalars().all()
+    assert min(scores) >= 0
+    assert await _search(db_session_factory, scorer) == await _search(
+        db_session_factory, None
+    )
@@ -0,0 +1,147 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from core.thread_service import ThreadService
+from models import Thread, ThreadFollow, UserUnreadCounter
+from ThreadManager.services.follow_service import FollowService
+from ThreadManager.services.unread_counter_service import (
+    UnreadCounterService,
+    unread_condition,
+)
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+USERS = (1, 2, 3)
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有三个测试帖子的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        for thread_id in (1001, 1002, 1003):
+            session.add(
+                Thread(
+                    channel_id=1,
+                    thread_id=thread_id,
+                    title=f"帖子{thread_id}",
+                    author_id=1,
+                    created_at=datetime(2025, 1, 1),
+                )
+            )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def joined_unread_count(session: AsyncSession, user_id: int) -> int:
+    """原来的联表计数方式，作为计数器的对照"""
+    result = await session.execute(
+        select(func.count())
+        .select_from(ThreadFollow)
+        .join(Thread, ThreadFollow.thread_id == Thread.thread_id)
+        .where(ThreadFollow.user_id == user_id, unread_condition())
+    )
+    return result.scalar() or 0
+
+
+async def assert_counters_match(factory):
+    async with factory() as session:
+        follow_service = FollowService(session)
+        for user_id in USERS:
+            assert await follow_service.get_unread_count(
+                user_id
+            ) == await joined_unread_count(session, user_id)
+
+
+async def publish(factory, thread_id: int):
+    async with factory() as session:
+        await ThreadService(session).update_thread_update_info(
+            thread_id, f"https://discord.com/channels/1/{thread_id}/1"
+        )
+
+
+@pytest.mark.asyncio
+async def test_counter_follows_the_joined_count(db_session_factory):
+    async with db_session_factory() as session:
+        follow_service = FollowService(session)
+        await follow_service.add_follow(1, 1001)
+        await follow_service.add_follow(1, 1002)
+        await follow_service.add_follow(2, 1001, auto_view=True)
+        await follow_service.batch_add_follows(1002, [1, 2, 3])
+    await assert_counters_match(db_session_factory)
+
+    await publish(db_session_factory, 1001)
+    await publish(db_session_factory, 1002)
+    await assert_counters_match(db_session_factory)
+    async with db_session_factory() as session:
+        assert await FollowService(session).get_unread_count(1) == 2
+
+    # 重复更新不会重复计数
+    await publish(db_session_factory, 1001)
+    await assert_counters_match(db_session_factory)
+
+    async with db_session_factory() as session:
+        follow_service = FollowService(session)
+        await follow_service.update_last_viewed(1, 1001)
+        await follow_service.remove_follow(2, 1002)
+        # 新关注已有更新的帖子时直接计为未读
+        await follow_service.add_follow(3, 1001)
+    await assert_counters_match(db_session_factory)
+    async with db_session_factory() as session:
+        assert await FollowService(session).get_unread_count(1) == 1
+
+    async with db_session_factory() as session:
+        await FollowService(session).update_last_viewed(3)
+    await assert_counters_match(db_session_factory)
+    async with db_session_factory() as session:
+        assert await FollowService(session).get_unread_count(3) == 0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_drift(db_session_factory):
+    async with db_session_factory() as session:
+        follow_service = FollowService(session)
+        await follow_service.batch_add_follows(1001, [1, 2])
+        await follow_service.add_follow(1, 1003)
+    await publish(db_session_factory, 1001)
+    await publish(db_session_factory, 1003)
+
+    # 删除帖子后关注记录随之失效，计数产生偏差
+    async with db_session_factory() as session:
+        await ThreadService(session).delete_thread_index(1003)
+        session.add(UserUnreadCounter(user_id=3, unread_count=5))
+        await session.commit()
+        assert await FollowService(session).get_unread_count(1) == 2
+
+    async with db_session_factory() as session:
+        await UnreadCounterService(session).reconcile()
+        await session.commit()
+
+    await assert_counters_match(db_session_factory)
+    async with db_session_factory() as session:
+        counter = UnreadCounterService(session)
+        assert [await counter.get(user_id) for user_id in USERS] == [1, 1, 0]
@@ -0,0 +1,214 @@
+import pytest
+import pytest_asyncio
+from typing import AsyncGenerator
+from datetime import datetime, timezone
+
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlmodel import SQLModel, select
+
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+
+from models import Thread
+from shared.write_ahead_journal import WriteAheadJournal
+from ThreadManager.batch_update_service import BatchUpdateService
+
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+
+class FakeBot:
+    def __init__(self):
+        self.dispatched = []
+
+    def dispatch(self, event, *args):
+        self.dispatched.append((event, args))
+
+
+class FakeSyncService:
+    def __init__(self):
+        self.bot = FakeBot()
+
+    async def sync_thread(self, thread, **kwargs):
+        pass
+
+
+@pytest_asyncio.fixture
+async def db_session_factory() -> AsyncGenerator[
+    async_sessionmaker[AsyncSession], None
+]:
+    """创建带有一个测试帖子的内存数据库。"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with factory() as session:
+        session.add(
+            Thread(
+                channel_id=1,
+                thread_id=1001,
+                title="帖子",
+                author_id=1,
+                created_at=datetime(2025, 1, 1),
+                reply_count=10,
+            )
+        )
+        await session.commit()
+
+    yield factory
+
+    await engine.dispose()
+
+
+async def get_reply_count(factory) -> int:
+    async with factory() as session:
+        return await session.scalar(
+            select(Thread.reply_count).where(Thread.thread_id == 1001)  # type: ignore
+        )
+
+
+def test_replay_returns_records_in_order(tmp_path):
+    journal = WriteAheadJournal(tmp_path / "test.jsonl")
+    journal.append({"n": 1})
+    journal.seal()
+    journal.append({"n": 2})
+    journal.close()
+
+    reopened = WriteAheadJournal(tmp_path / "test.jsonl")
+    assert [r["n"] for r in reopened.replay()] == [1, 2]
+
+
+def test_commit_removes_only_sealed_segments(tmp_path):
+    journal = WriteAheadJournal(tmp_path / "test.jsonl")
+    journal.append({"n": 1})
+    segment = journal.seal()
+    # 回写期间的新记录写入新段
+    journal.append({"n": 2})
+    journal.commit(segment)
+
+    assert [r["n"] for r in journal.replay()] == [2]
+
+
+def test_failed_flush_keeps_segment_until_next_commit(tmp_path):
+    journal = WriteAheadJournal(tmp_path / "test.jsonl")
+    journal.append({"n": 1})
+    journal.seal()  # 这次回写失败，没有 commit
+    journal.append({"n": 2})
+    segment = journal.seal()
+
+    assert [r["n"] for r in journal.replay()] == [1, 2]
+    journal.commit(segment)
+    assert list(journal.replay()) == []
+
+
+def test_torn_line_is_skipped(tmp_path):
+    path = tmp_path / "test.jsonl"
+    path.write_text('{"n":1}\n{"n":', encoding="utf-8")
+
+    journal = WriteAheadJournal(path)
+    journal.append({"n": 3})
+
+    assert [r["n"] for r in journal.replay()] == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_batch_updates_survive_restart(db_session_factory, tmp_path):
+    journal_path = tmp_path / "thread_activity.jsonl"
+    message_time = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    crashed = BatchUpdateService(
+        db_session_factory,
+        FakeSyncService(),  # type: ignore
+        journal=WriteAheadJournal(journal_path),
+    )
+    for _ in range(3):
+        await crashed.add_update(1001, message_time)
+    await crashed.add_deletion(1001)
+    # 进程在回写前被杀，内存中的更新丢失
+
+    restarted = BatchUpdateService(
+        db_session_factory,
+        FakeSyncService(),  # type: ignore
+        journal=WriteAheadJournal(journal_path),
+    )
+    await restarted._replay_journal()
+    assert restarted.pending_updates[1001] == {
+        "increment": 2,
+        "last_active_at": message_time,
+    }
+
+    await restarted.flush_to_db()
+    assert await get_reply_count(db_session_factory) == 12
+    assert list(WriteAheadJournal(journal_path).replay()) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_updates(db_session_factory, tmp_path):
+    journal_path = tmp_path / "thread_activity.jsonl"
+    service = BatchUpdateService(
+        db_session_factory,
+        FakeSyncService(),  # type: ignore
+        journal=WriteAheadJournal(journal_path),
+    )
+    await service.add_update(1001, datetime(2025, 2, 1, tzinfo=timezone.utc))
+
+    def broken_factory():
+        raise RuntimeError("database is locked")
+
+    service.session_factory = broken_factory  # type: ignore
+    await service.flush_to_db()
+
+    assert service.pending_updates[1001]["increment"] == 1
+    assert len(list(WriteAheadJournal(journal_path).replay())) == 1
+
+    service.session_factory = db_session_factory
+    await service.flush_to_db()
+    assert await get_reply_count(db_session_factory) == 11
+    assert list(WriteAheadJournal(journal_path).replay()) == []
+
+
+@pytest.mark.asyncio
+async def test_committed_segment_is_not_replayed(db_session_factory, tmp_path):
+    journal_path = tmp_path / "thread_activity.jsonl"
+    crashed = BatchUpdateService(
+        db_session_factory,
+        FakeSyncService(),  # type: ignore
+        journal=WriteAheadJournal(journal_path),
+    )
+    await crashed.add_update(1001, datetime(2025, 2, 1, tzinfo=timezone.utc))
+    # 数据库已提交，但进程在删除日志段之前被杀
+    crashed.journal.commit = lambda segment: None  # type: ignore
+    await crashed.flush_to_db()
+    assert await get_reply_count(db_session_factory) == 11
+    assert len(list(WriteAheadJournal(journal_path).replay())) == 1
+
+    restarted = BatchUpdateService(
+        db_session_factory,
+        FakeSyncService(),  # type: ignore
+        journal=WriteAheadJournal(journal_path),
+    )
+    await restarted._replay_journal()
+    assert not restarted.pending_updates
+    assert list(WriteAheadJournal(journal_path).replay()) == []
+
+    await restarted.add_update(1001, datetime(2025, 2, 2, tzinfo=timezone.utc))
+    await restarted.flush_to_db()
+    assert await get_reply_count(db_session_factory) == 12
+
+    # 日志段全部删除后重启，新封存的段编号仍大于检查点，不会被误认为已落库
+    for expected in (0, 1):
+        service = BatchUpdateService(
+            db_session_factory,
+            FakeSyncService(),  # type: ignore
+            journal=WriteAheadJournal(journal_path),
+        )
+        await service._replay_journal()
+        assert service.pending_updates[1001]["increment"] == expected
+        await service.add_update(1001, datetime(2025, 2, 3, tzinfo=timezone.utc))
+        service.journal.seal()